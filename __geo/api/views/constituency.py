@@ -15,6 +15,7 @@ from __geo.helpers import apply_query_filter
 from __geo.models import Constituency
 from __geo.serializers import ConstituencySerializer, ConstituencyChoiceSerializer, ConstituencySubmitSerializer
 from __poll.constants import ROWS_PER_PAGE
+from __poll.utils.etags import versioned_etag, GEO_LIST_VERSION_KEYS
 from django.middleware.csrf import get_token
 
 
@@ -38,6 +39,7 @@ def constituency_choices(request):
 
 
 @login_required
+@versioned_etag(GEO_LIST_VERSION_KEYS)
 @api_view(['GET', 'POST'])
 @renderer_classes([JSONRenderer])
 def constituency_list(request, **kwargs):
@@ -12,6 +12,7 @@ from __geo.helpers import apply_query_filter
 from __geo.models import Nation
 from __geo.serializers import NationSerializer, NationChoiceSerializer, NationSubmitSerializer
 from __poll.constants import ROWS_PER_PAGE
+from __poll.utils.etags import versioned_etag, GEO_LIST_VERSION_KEYS
 from django.middleware.csrf import get_token
 
 
@@ -35,6 +36,7 @@ def nation_choices(request):
 
 
 @login_required
+@versioned_etag(GEO_LIST_VERSION_KEYS)
 @api_view(['GET', 'POST'])
 @renderer_classes([JSONRenderer])
 def nation_list(request, **kwargs):
@@ -15,6 +15,7 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from __geo.models import Region
 from __geo.serializers import RegionSerializer, RegionChoiceSerializer, RegionSubmitSerializer
 from __poll.constants import ROWS_PER_PAGE
+from __poll.utils.etags import versioned_etag, GEO_LIST_VERSION_KEYS
 from django.middleware.csrf import get_token
 
 
@@ -38,6 +39,7 @@ def region_choices(request):
 
 
 @login_required
+@versioned_etag(GEO_LIST_VERSION_KEYS)
 @api_view(['GET', 'POST'])
 @renderer_classes([JSONRenderer])
 def region_list(request, **kwargs):
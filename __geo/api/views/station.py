@@ -14,6 +14,7 @@ from __geo.helpers import apply_query_filter
 from __geo.models import Station
 from __geo.serializers import StationSerializer, StationChoiceSerializer, StationSubmitSerializer
 from __poll.constants import ROWS_PER_PAGE
+from __poll.utils.etags import versioned_etag, GEO_LIST_VERSION_KEYS
 from django.middleware.csrf import get_token
 
 
@@ -37,6 +38,7 @@ def station_choices(request):
 
 
 @login_required
+@versioned_etag(GEO_LIST_VERSION_KEYS)
 @api_view(['GET', 'POST'])
 @renderer_classes([JSONRenderer])  # Specify JSONRenderer for rendering JSON response
 def station_list(request, **kwargs):
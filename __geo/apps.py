@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GeoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = '__geo'
+
+    def ready(self):
+        # connects the hierarchy index invalidation receivers
+        from __geo.helpers import hierarchy  # noqa: F401
@@ -1 +1,2 @@
-from .queryset import apply_query_filter, get_queryset_filter
\ No newline at end of file
+from .queryset import apply_query_filter, get_queryset_filter
+from .hierarchy import get_geo_hierarchy, invalidate_geo_hierarchy
@@ -0,0 +1,184 @@
+import time
+from array import array
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from __geo.models import Nation, Region, Constituency, Station
+
+
+# GEO HIERARCHY INDEX
+# Parent pointers are kept in typed arrays indexed by zone id (0 = no parent)
+# and children as per-parent id arrays, so a station's ancestors and a zone's
+# descendants are single lookups instead of four-level joins. The index is
+# versioned: geo saves/deletes bump a shared version in the cache and every
+# process rebuilds its copy once it sees a newer version.
+
+GEO_HIERARCHY_VERSION_KEY = 'geo:hierarchy:version'
+# seconds between checks of the shared version from a process
+GEO_HIERARCHY_CHECK_INTERVAL = 5
+
+GEO_LEVELS = ['nation', 'region', 'constituency', 'station']
+
+
+class GeoHierarchy:
+    '''Array-backed nation > region > constituency > station index'''
+
+    def __init__(self, version=None):
+        self.version = version
+        self.built_at = time.time()
+        self.parents = dict()
+        self.children = dict()
+
+    @classmethod
+    def build(cls, version=None):
+        hierarchy = cls(version=version)
+        hierarchy.load('region', Region.objects.values_list('id', 'nation_id'))
+        hierarchy.load('constituency', Constituency.objects.values_list('id', 'region_id'))
+        hierarchy.load('station', Station.objects.values_list('id', 'constituency_id'))
+        # flatten the tree so deep descendants are single lookups too
+        for level, child_level in [('region', 'station'), ('nation', 'constituency'), ('nation', 'station')]:
+            through_level = GEO_LEVELS[GEO_LEVELS.index(child_level) - 1]
+            flat = dict()
+            for through_id in hierarchy.parents[through_level].nonzero_ids():
+                ancestor_id = hierarchy.ancestor(through_level, through_id, level)
+                if ancestor_id is not None:
+                    flat.setdefault(ancestor_id, array('q')) \
+                        .extend(hierarchy.children[(through_level, child_level)].get(through_id, []))
+            hierarchy.children[(level, child_level)] = flat
+        return hierarchy
+
+    def load(self, level, rows):
+        parent_level = GEO_LEVELS[GEO_LEVELS.index(level) - 1]
+        parents = ParentArray()
+        children = dict()
+        for zone_id, parent_id in rows:
+            parents[zone_id] = parent_id or 0
+            if parent_id is not None:
+                children.setdefault(parent_id, array('q')).append(zone_id)
+        self.parents[level] = parents
+        self.children[(parent_level, level)] = children
+
+    def parent(self, level, zone_id):
+        if level == 'nation':
+            return None
+        return self.parents[level].get(zone_id)
+
+    def ancestor(self, level, zone_id, ancestor_level):
+        '''Id of the ancestor_level zone above zone_id, e.g. ("station", 12, "region")'''
+        while level != ancestor_level:
+            zone_id = self.parent(level, zone_id)
+            if zone_id is None:
+                return None
+            level = GEO_LEVELS[GEO_LEVELS.index(level) - 1]
+        return zone_id
+
+    def station_ancestors(self, station_id):
+        '''
+        (constituency_id, region_id, nation_id) of a station, or None when the
+        station (or any of its ancestors) is not in the index
+        '''
+        constituency_id = self.parent('station', station_id)
+        region_id = self.parent('constituency', constituency_id) if constituency_id else None
+        nation_id = self.parent('region', region_id) if region_id else None
+        if nation_id is None:
+            return None
+        return constituency_id, region_id, nation_id
+
+    def descendants(self, level, zone_id, child_level='station'):
+        '''Ids of the child_level zones below a zone, e.g. every station of a region'''
+        return self.children.get((level, child_level), dict()).get(zone_id, array('q'))
+
+    def __contains__(self, station_id):
+        return self.parent('station', station_id) is not None
+
+
+class ParentArray:
+    '''Parent id per zone id, grown on demand; 0 marks a missing zone'''
+
+    def __init__(self):
+        self.values = array('q')
+
+    def __setitem__(self, zone_id, parent_id):
+        if zone_id >= len(self.values):
+            self.values.extend([0] * (zone_id + 1 - len(self.values)))
+        self.values[zone_id] = parent_id
+
+    def get(self, zone_id):
+        if zone_id is None or zone_id < 0 or zone_id >= len(self.values):
+            return None
+        return self.values[zone_id] or None
+
+    def nonzero_ids(self):
+        return [zone_id for zone_id, parent_id in enumerate(self.values) if parent_id]
+
+
+# pending: a geo edit of this process has not committed yet
+geo_hierarchy = dict(index=None, checked_at=0, pending=False)
+
+
+def get_geo_hierarchy_version():
+    try:
+        return cache.get(GEO_HIERARCHY_VERSION_KEY, 0)
+    except Exception as e:
+        # the index is then rebuilt every interval, see get_geo_hierarchy
+        print(e)
+        return None
+
+
+def bump_geo_hierarchy_version():
+    try:
+        cache.add(GEO_HIERARCHY_VERSION_KEY, 0, timeout=None)
+        return cache.incr(GEO_HIERARCHY_VERSION_KEY)
+    except Exception as e:
+        print(e)
+        return None
+
+
+def get_geo_hierarchy() -> GeoHierarchy:
+    '''The process's hierarchy index, rebuilt when the shared version moves on'''
+    if geo_hierarchy['pending'] and not connection.in_atomic_block:
+        # the edit was rolled back, the index may hold zones that never existed
+        clear_geo_hierarchy()
+    index = geo_hierarchy['index']
+    now = time.time()
+    if index is not None and now - geo_hierarchy['checked_at'] < GEO_HIERARCHY_CHECK_INTERVAL:
+        return index
+    version = get_geo_hierarchy_version()
+    geo_hierarchy['checked_at'] = now
+    # an unknown version (unreadable, or an edit not committed yet) never
+    # matches, so such an index is rebuilt at the next check
+    if index is None or index.version is None or version != index.version:
+        index = GeoHierarchy.build(version=None if geo_hierarchy['pending'] else version)
+        geo_hierarchy['index'] = index
+    return index
+
+
+def clear_geo_hierarchy():
+    geo_hierarchy['index'] = None
+    geo_hierarchy['checked_at'] = 0
+    geo_hierarchy['pending'] = False
+
+
+def invalidate_geo_hierarchy():
+    '''Drops this process's index now and bumps the shared version on commit'''
+    clear_geo_hierarchy()
+    geo_hierarchy['pending'] = connection.in_atomic_block
+
+    def on_commit():
+        clear_geo_hierarchy()
+        bump_geo_hierarchy_version()
+
+    transaction.on_commit(on_commit)
+
+
+@receiver(post_save, sender=Nation)
+@receiver(post_save, sender=Region)
+@receiver(post_save, sender=Constituency)
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Nation)
+@receiver(post_delete, sender=Region)
+@receiver(post_delete, sender=Constituency)
+@receiver(post_delete, sender=Station)
+def geo_hierarchy_changed(sender, instance, **kwargs):
+    invalidate_geo_hierarchy()
@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+from __geo.helpers import get_geo_hierarchy
+from __geo.helpers.hierarchy import geo_hierarchy, clear_geo_hierarchy
+
+UNREACHABLE_CACHES = dict(default=dict(BACKEND='django_redis.cache.RedisCache',
+                                       LOCATION='redis://127.0.0.1:1/0'))
+
+
+class GeoHierarchyTestCase(TestCase):
+    def setUp(self):
+        self.region = RegionFactory()
+        self.constituency = ConstituencyFactory(region=self.region)
+        self.station = StationFactory(constituency=self.constituency)
+
+    def test_station_ancestors(self):
+        hierarchy = get_geo_hierarchy()
+        self.assertEqual(hierarchy.station_ancestors(self.station.pk),
+                         (self.constituency.pk, self.region.pk, self.region.nation_id))
+        self.assertIsNone(hierarchy.station_ancestors(self.station.pk + 1000))
+
+    def test_descendants(self):
+        hierarchy = get_geo_hierarchy()
+        self.assertEqual(list(hierarchy.descendants('region', self.region.pk)), [self.station.pk])
+        self.assertEqual(list(hierarchy.descendants('nation', self.region.nation_id, 'constituency')),
+                         [self.constituency.pk])
+
+    def test_lookups_use_no_queries(self):
+        hierarchy = get_geo_hierarchy()
+        with self.assertNumQueries(0):
+            get_geo_hierarchy().station_ancestors(self.station.pk)
+        self.assertIs(get_geo_hierarchy(), hierarchy)
+
+    def test_rebuilds_when_geo_changes(self):
+        hierarchy = get_geo_hierarchy()
+        station = StationFactory(constituency=self.constituency)
+        self.assertIsNot(get_geo_hierarchy(), hierarchy)
+        self.assertEqual(get_geo_hierarchy().station_ancestors(station.pk)[0], self.constituency.pk)
+
+
+class GeoHierarchyVersionTestCase(TransactionTestCase):
+    def setUp(self):
+        clear_geo_hierarchy()
+        self.constituency = ConstituencyFactory(region=RegionFactory())
+
+    def test_rolled_back_edits_are_dropped(self):
+        get_geo_hierarchy()
+        try:
+            with transaction.atomic():
+                station = StationFactory(constituency=self.constituency)
+                self.assertIn(station.pk, get_geo_hierarchy())
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertNotIn(station.pk, get_geo_hierarchy())
+
+    def test_rebuilds_when_the_version_is_unreadable(self):
+        hierarchy = get_geo_hierarchy()
+        self.assertIsNotNone(hierarchy.version)
+        with override_settings(CACHES=UNREACHABLE_CACHES):
+            # next check
+            geo_hierarchy['checked_at'] = 0
+            rebuilt = get_geo_hierarchy()
+            self.assertIsNot(rebuilt, hierarchy)
+            geo_hierarchy['checked_at'] = 0
+            self.assertIsNot(get_geo_hierarchy(), rebuilt)
@@ -3,7 +3,7 @@ from __geo.models import Station
 from __geo.serializers import ConstituencySerializer
 from __geo.models import Station, Constituency, Region, Nation
 from __people.models import Agent, Candidate
-from __poll.utils.utils import get_zone_ct
+from __poll.utils.utils import get_zone_ct, get_zone_ct_id
 
 
 class StationSubmitSerializer(serializers.ModelSerializer):
@@ -66,54 +66,54 @@ class StationSerializer(serializers.ModelSerializer):
     def get_total_presidential_votes(self, obj):
         total_votes = 0
         for result_sheet in obj.result_sheets.all():
-            if result_sheet.position.zone_ct == get_zone_ct(Nation):
+            if result_sheet.position.zone_ct_id == get_zone_ct_id(Nation):
                 total_votes += result_sheet.total_valid_votes
         return total_votes
 
     def get_total_parliamentary_votes(self, obj):
         total_votes = 0
         for result_sheet in obj.result_sheets.all():
-            if result_sheet.position.zone_ct == get_zone_ct(Constituency):
+            if result_sheet.position.zone_ct_id == get_zone_ct_id(Constituency):
                 total_votes += result_sheet.total_valid_votes
         return total_votes
 
     def get_has_presidential_approval(self, obj):
-        nation_ct = get_zone_ct(Nation)
-        constituency_ct = get_zone_ct(Constituency)
-        region_ct = get_zone_ct(Region)
-        station_ct = get_zone_ct(Station)
+        nation_ct = get_zone_ct_id(Nation)
+        constituency_ct = get_zone_ct_id(Constituency)
+        region_ct = get_zone_ct_id(Region)
+        station_ct = get_zone_ct_id(Station)
         ct = dict(station='1', constituency='1', region='1', nation='1')
         for result_sheet in obj.result_sheets.all():
-            if result_sheet.position.zone_ct == nation_ct:
+            if result_sheet.position.zone_ct_id == nation_ct:
                 for result_sheet_approval in result_sheet.approvals.all():
-                    if result_sheet_approval.approving_agent.zone_ct == station_ct:
+                    if result_sheet_approval.approving_agent.zone_ct_id == station_ct:
                         ct['station'] = ''
-                    elif result_sheet_approval.approving_agent.zone_ct == constituency_ct:
+                    elif result_sheet_approval.approving_agent.zone_ct_id == constituency_ct:
                         ct['constituency'] = ''
-                    elif result_sheet_approval.approving_agent.zone_ct == region_ct:
+                    elif result_sheet_approval.approving_agent.zone_ct_id == region_ct:
                         ct['region'] = ''
-                    elif result_sheet_approval.approving_agent.zone_ct == nation_ct:
+                    elif result_sheet_approval.approving_agent.zone_ct_id == nation_ct:
                         ct['nation'] = ''
         if ''.join(list(ct.values())) == '':
             return True
         return False
 
     def get_has_parliamentary_approval(self, obj):
-        nation_ct = get_zone_ct(Nation)
-        constituency_ct = get_zone_ct(Constituency)
-        region_ct = get_zone_ct(Region)
-        station_ct = get_zone_ct(Station)
+        nation_ct = get_zone_ct_id(Nation)
+        constituency_ct = get_zone_ct_id(Constituency)
+        region_ct = get_zone_ct_id(Region)
+        station_ct = get_zone_ct_id(Station)
         ct = dict(station='1', constituency='1', region='1', nation='1')
         for result_sheet in obj.result_sheets.all():
-            if result_sheet.position.zone_ct == constituency_ct:
+            if result_sheet.position.zone_ct_id == constituency_ct:
                 for result_sheet_approval in result_sheet.approvals.all():
-                    if result_sheet_approval.approving_agent.zone_ct == station_ct:
+                    if result_sheet_approval.approving_agent.zone_ct_id == station_ct:
                         ct['station'] = ''
-                    elif result_sheet_approval.approving_agent.zone_ct == constituency_ct:
+                    elif result_sheet_approval.approving_agent.zone_ct_id == constituency_ct:
                         ct['constituency'] = ''
-                    elif result_sheet_approval.approving_agent.zone_ct == region_ct:
+                    elif result_sheet_approval.approving_agent.zone_ct_id == region_ct:
                         ct['region'] = ''
-                    elif result_sheet_approval.approving_agent.zone_ct == nation_ct:
+                    elif result_sheet_approval.approving_agent.zone_ct_id == nation_ct:
                         ct['nation'] = ''
         if ''.join(ct.values()) == '':
             return True
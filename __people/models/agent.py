@@ -1,10 +1,13 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from __poll.constants import StatusChoices
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from __geo.models import Nation, Region, Constituency, Station
-from __poll.utils.utils import get_zone_ct
+from __poll.utils.utils import get_zone_ct, get_zone_ct_id, get_content_type
+from __poll.utils.etags import mark_agents_changed
 
 
 class Agent(models.Model):
@@ -46,29 +49,29 @@ class Agent(models.Model):
 
 	@property
 	def zone_title(self):
-		nation_ct = get_zone_ct(Nation)
-		region_ct = get_zone_ct(Region)
-		constituency_ct = get_zone_ct(Constituency)
-		station_ct = get_zone_ct(Station)
-		if self.zone_ct == nation_ct and nation_ct is not None:
-			return Nation.objects.get(pk=self.zone_id).title
-		if self.zone_ct == region_ct and region_ct is not None:
-			return Region.objects.get(pk=self.zone_id).title
-		if self.zone_ct == constituency_ct and constituency_ct is not None:
-			return Constituency.objects.get(pk=self.zone_id).title
-		if self.zone_ct == station_ct and station_ct is not None:
-			return Station.objects.get(pk=self.zone_id).title
+		zone_ct = get_content_type(self.zone_ct_id)
+		if zone_ct is not None:
+			zone_model = zone_ct.model_class()
+			if zone_model in [Nation, Region, Constituency, Station]:
+				return zone_model.objects.get(pk=self.zone_id).title
 		return ''
 		
 	@property
 	def zone_type(self):
-		if self.zone_ct is not None:
-			if self.zone_ct == get_zone_ct(Nation):
+		if self.zone_ct_id is not None:
+			if self.zone_ct_id == get_zone_ct_id(Nation):
 				return 'Nation'
-			if self.zone_ct == get_zone_ct(Region):
+			if self.zone_ct_id == get_zone_ct_id(Region):
 				return 'Region'
-			if self.zone_ct == get_zone_ct(Constituency):
+			if self.zone_ct_id == get_zone_ct_id(Constituency):
 				return 'Constituency'
-			if self.zone_ct == get_zone_ct(Station):
+			if self.zone_ct_id == get_zone_ct_id(Station):
 				return 'Polling Station'
 		return 'N/A'
+
+
+# the geo listings show each zone's agent and are revalidated against their version
+@receiver(post_save, sender=Agent)
+@receiver(post_delete, sender=Agent)
+def agents_changed(sender, instance=None, **kwargs):
+	mark_agents_changed()
@@ -43,17 +43,17 @@ class PartyModelCollationCountsTest(TestCase):
         self.total_votes = self.total_presidential_votes + self.total_parliamentary_votes
         for k, v in self.votes.items():
             zone_ct = get_zone_ct(apps.get_model('__geo', k))
-            for total_vote in v:
-                collation = SupernationalCollationSheet(
-                    party=self.party,
-                    nation=nation,
-                    total_votes = total_vote,
-                    total_invalid_votes = 3,
-                    total_votes_ec = 22,
-                    status = StatusChoices.ACTIVE,
-                    zone_ct = zone_ct,
-                )
-                collation.save()
+            # one sheet per party, nation and position type
+            collation = SupernationalCollationSheet(
+                party=self.party,
+                nation=nation,
+                total_votes = sum(v),
+                total_invalid_votes = 3,
+                total_votes_ec = 22,
+                status = StatusChoices.ACTIVE,
+                zone_ct = zone_ct,
+            )
+            collation.save()
 
     def test_result_votes(self):
         # Add necessary supernational_collation_sheets related to the party
@@ -2,6 +2,9 @@
 # from django.urls import path
 from django.conf.urls import url
 from __poll import views as poll_views
+from __poll.api.views.ingest import result_ingest
+from __poll.api.views.sync import result_sync
+from __poll.api.views.upload import result_sheet_upload_list, result_sheet_upload_detail
 # from .views import RegisterView
 
 
@@ -14,6 +17,10 @@ urlpatterns = [
     url(r'^positions/$', poll_views.position_list),
     url(r'^position/(?P<pk>[0-9]+)$', poll_views.position_detail),
     url(r'^results/$', poll_views.result_list),
+    url(r'^results/ingest/$', result_ingest),
+    url(r'^results/sync/$', result_sync),
+    url(r'^result_sheets/uploads/$', result_sheet_upload_list),
+    url(r'^result_sheets/uploads/(?P<uid>[0-9a-f-]{36})$', result_sheet_upload_detail),
     url(r'^result/(?P<pk>[0-9]+)$', poll_views.result_detail),
     url(r'^result_approvals/$', poll_views.result_approval_list),
     url(r'^result_approval/(?P<pk>[0-9]+)$', poll_views.result_approval_detail),
@@ -0,0 +1,30 @@
+from rest_framework.response import Response
+from rest_framework.decorators import api_view
+from rest_framework import status
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from __poll.serializers import ResultIngestSerializer
+from __poll.utils.ingest import validate_result_records, ingest_result_records
+from __poll.utils.ingest_stream import append_result_records
+
+
+@login_required
+@api_view(['POST'])
+def result_ingest(request):
+    """
+    Create or update the result sheets and results of many stations at once
+    """
+    serializer = ResultIngestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    records = serializer.validated_data['records']
+    # the batch is written whole or not at all
+    errors = validate_result_records(records)
+    if len(errors) > 0:
+        return Response(dict(records=errors), status=status.HTTP_400_BAD_REQUEST)
+    if settings.RESULT_INGEST_WRITE_BEHIND:
+        # written by the stream consumers, see __poll.utils.ingest_stream
+        entry_id = append_result_records(records)
+        return Response(dict(records=len(records), entry=entry_id), status=status.HTTP_202_ACCEPTED)
+    return Response(ingest_result_records(records), status=status.HTTP_201_CREATED)
@@ -0,0 +1,28 @@
+from rest_framework.response import Response
+from rest_framework.decorators import api_view
+from rest_framework import status
+
+from django.contrib.auth.decorators import login_required
+from __people.models import Agent
+from __poll.serializers import ResultSyncSerializer
+from __poll.utils.sync import sync_result_submissions
+
+
+@login_required
+@api_view(['POST'])
+def result_sync(request):
+    """
+    Apply a field agent's queued result sheets, acknowledging retries without redoing them
+    """
+    agent = Agent.objects \
+                 .filter(user=request.user) \
+                 .values('pk', 'zone_ct_id', 'zone_id') \
+                 .first()
+    if agent is None:
+        return Response(dict(detail='Only field agents can sync results.'), status=status.HTTP_403_FORBIDDEN)
+    serializer = ResultSyncSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    outcomes, summary = sync_result_submissions(agent['pk'], serializer.validated_data['submissions'],
+                                                zone_ct_id=agent['zone_ct_id'], zone_id=agent['zone_id'])
+    return Response(dict(submissions=outcomes, ingest=summary))
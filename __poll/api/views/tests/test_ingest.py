@@ -0,0 +1,242 @@
+import json
+import threading
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DataError, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from redis.exceptions import ConnectionError
+from rest_framework.test import APIRequestFactory
+from __geo.models import Constituency
+from __poll.models import (Position, Result, ResultSheet, StationCollationSheet,
+                           SupernationalCollationSheet, ReportRow)
+from __poll.constants import GeoLevelChoices
+from __poll.factories import PositionFactory
+from __poll.utils.utils import get_zone_ct
+from __poll.utils.collations import get_collation_zone_version_key
+from __poll.utils.ingest import lock_result_sheets, ingest_result_records
+from __poll.utils.ingest_stream import (RESULT_INGEST_STREAM, RESULT_INGEST_DEAD_STREAM,
+                                        RESULT_INGEST_STREAM_METRICS_KEY, get_stream_connection,
+                                        append_result_records, read_stream_entries, ensure_stream_group,
+                                        drain_result_stream, get_result_stream_stats)
+from __poll.api.views.ingest import result_ingest
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+
+
+class ResultIngestFixtureMixin:
+    def setUp(self):
+        self.presidential = PositionFactory.create_with_zone(zone_name='nation')
+        self.constituency = ConstituencyFactory(region=RegionFactory(nation=self.presidential.zone))
+        self.parliamentary = Position.objects.create(title='MP',
+                                                     zone_ct=get_zone_ct(Constituency),
+                                                     zone_id=self.constituency.pk)
+        self.party_a = PartyFactory(code='AAA')
+        self.party_b = PartyFactory(code='BBB')
+        self.president_a = CandidateFactory(position=self.presidential, party=self.party_a)
+        self.president_b = CandidateFactory(position=self.presidential, party=self.party_b)
+        self.mp_a = CandidateFactory(position=self.parliamentary, party=self.party_a)
+        self.stations = [StationFactory(constituency=self.constituency) for _ in range(3)]
+        self.user = get_user_model().objects.create_user(username='entry', password='secret')
+
+    def get_records(self, votes):
+        records = []
+        for station in self.stations:
+            records.append(dict(station=station.pk, position=self.presidential.pk,
+                                total_valid_votes=votes * 2, total_invalid_votes=1,
+                                results=[dict(candidate=self.president_a.pk, votes=votes),
+                                         dict(candidate=self.president_b.pk, votes=votes)]))
+            records.append(dict(station=station.pk, position=self.parliamentary.pk,
+                                results=[dict(candidate=self.mp_a.pk, votes=votes)]))
+        return records
+
+
+# results are collated and changes refreshed inline rather than by queued jobs
+@override_settings(COLLATION_ASYNC=False, REPORT_REFRESH_ASYNC=False)
+class ResultIngestTest(ResultIngestFixtureMixin, TestCase):
+    def post(self, records):
+        request = APIRequestFactory().post('/poll/api/results/ingest/', dict(records=records), format='json')
+        request.user = self.user
+        with self.captureOnCommitCallbacks(execute=True):
+            return result_ingest(request)
+
+    def write(self, records):
+        self.post(records)
+
+    def test_batch_upserts_and_collates(self):
+        response = self.post(self.get_records(10))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['result_sheets_created'], response.data['results_created']), (6, 9))
+        self.assertEqual(SupernationalCollationSheet.objects.get(party=self.party_a,
+                                                                 zone_ct=get_zone_ct(self.presidential.zone)).total_votes, 30)
+        self.assertEqual(StationCollationSheet.objects.get(station=self.stations[0],
+                                                           candidate=self.president_a).total_invalid_votes, 1)
+        row = ReportRow.objects.get(level=GeoLevelChoices.NATIONAL, party=self.party_a,
+                                    zone_ct=get_zone_ct(Constituency))
+        self.assertEqual(row.total_valid_votes, 30)
+
+        # resubmitting updates the same rows and collates only the difference
+        response = self.post(self.get_records(25))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['result_sheets_updated'], response.data['results_updated']), (6, 9))
+        self.assertEqual(ResultSheet.objects.count(), 6)
+        self.assertEqual(Result.objects.count(), 9)
+        self.assertEqual(SupernationalCollationSheet.objects.get(party=self.party_b).total_votes, 75)
+        self.assertEqual(StationCollationSheet.objects.filter(station=self.stations[0]).count(), 3)
+
+    def test_invalid_votes_mark_their_stations_changed(self):
+        self.write(self.get_records(10))
+        zone_ct_id = get_zone_ct(self.presidential.zone).pk
+        keys = [get_collation_zone_version_key(zone_ct_id, 'station', station.pk) for station in self.stations]
+        versions = [cache.get(key) or 0 for key in keys]
+
+        # only the first station's votes change, the others only their invalid votes
+        records = self.get_records(10)
+        records[0]['results'][0]['votes'] = 12
+        for record in records:
+            record['total_invalid_votes'] = 4
+        self.write(records)
+        self.assertEqual(StationCollationSheet.objects.get(station=self.stations[2],
+                                                           candidate=self.president_b).total_invalid_votes, 4)
+        self.assertEqual([cache.get(key) for key in keys], [version + 1 for version in versions])
+        # and the reports of every level show them
+        row = ReportRow.objects.get(level=GeoLevelChoices.NATIONAL, party=self.party_a, zone_ct_id=zone_ct_id)
+        self.assertEqual(row.total_invalid_votes, 12)
+
+    def test_invalid_batch_writes_nothing(self):
+        records = self.get_records(10)
+        records[1]['results'][0]['candidate'] = self.president_a.pk
+        records.append(dict(records[0]))
+        response = self.post(records)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['records'].keys()), {1, len(records) - 1})
+        self.assertFalse(ResultSheet.objects.exists())
+        self.assertFalse(Result.objects.exists())
+
+
+@override_settings(RESULT_INGEST_WRITE_BEHIND=True)
+class ResultStreamIngestTest(ResultIngestTest):
+    def setUp(self):
+        super().setUp()
+        self.connection = get_stream_connection()
+        try:
+            self.connection.ping()
+        except ConnectionError:
+            self.skipTest('Redis is not available')
+        self.clear_stream()
+        self.addCleanup(self.clear_stream)
+
+    def clear_stream(self):
+        self.connection.delete(RESULT_INGEST_STREAM, RESULT_INGEST_DEAD_STREAM, RESULT_INGEST_STREAM_METRICS_KEY)
+
+    def write(self, records):
+        self.post(records)
+        with self.captureOnCommitCallbacks(execute=True):
+            drain_result_stream('test')
+
+    def test_batch_upserts_and_collates(self):
+        response = self.post(self.get_records(10))
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(ResultSheet.objects.exists())
+        self.assertEqual(get_result_stream_stats()['length'], 1)
+
+        # the later entry of a sheet wins when both are drained together
+        self.post(self.get_records(25))
+        self.assertEqual(drain_result_stream('test'), 2)
+        self.assertEqual(ResultSheet.objects.count(), 6)
+        self.assertEqual(SupernationalCollationSheet.objects.get(party=self.party_b).total_votes, 75)
+        stats = get_result_stream_stats()
+        self.assertEqual((stats['length'], stats['pending'], stats['records_drained']), (0, 0, 6))
+        self.assertEqual(drain_result_stream('test'), 0)
+
+    def test_records_invalid_when_drained_are_set_aside(self):
+        self.post(self.get_records(10))
+        self.stations[0].delete()
+        self.assertEqual(drain_result_stream('test'), 1)
+        self.assertEqual(ResultSheet.objects.count(), 4)
+        stats = get_result_stream_stats()
+        self.assertEqual((stats['length'], stats['dead'], stats['records_rejected']), (0, 1, 2))
+
+    def get_sheet_votes(self):
+        return SupernationalCollationSheet.objects.get(party=self.party_b,
+                                                       zone_ct=get_zone_ct(self.presidential.zone)).total_votes
+
+    def test_older_entries_do_not_overwrite_newer_sheets(self):
+        self.post(self.get_records(10))
+        self.post(self.get_records(25))
+        # a consumer takes the first entry and stalls
+        ensure_stream_group(self.connection)
+        self.assertEqual(len(read_stream_entries(self.connection, 'stalled', 1)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(drain_result_stream('test'), 1)
+        self.assertEqual(self.get_sheet_votes(), 75)
+
+        # claimed once the stalled consumer is given up on, but older than the sheets
+        with override_settings(RESULT_INGEST_STREAM_CLAIM_IDLE=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(drain_result_stream('test'), 1)
+        self.assertEqual(self.get_sheet_votes(), 75)
+        stats = get_result_stream_stats()
+        self.assertEqual((stats['length'], stats['records_drained'], stats['records_skipped']), (0, 6, 6))
+
+    def test_queued_entries_do_not_overwrite_direct_writes(self):
+        self.post(self.get_records(10))
+        # an offline sync of the same sheets written before the stream is drained
+        records = [dict(record, total_votes=51, total_valid_votes=50, total_invalid_votes=1)
+                   for record in self.get_records(25)]
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_result_records(records)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(drain_result_stream('test'), 1)
+        self.assertEqual(self.get_sheet_votes(), 75)
+        self.assertEqual(ResultSheet.objects.get(station=self.stations[0], position=self.presidential).total_valid_votes, 50)
+
+        # what is queued after the direct write is newer
+        self.write(self.get_records(30))
+        self.assertEqual(self.get_sheet_votes(), 90)
+
+    @override_settings(RESULT_INGEST_STREAM_CLAIM_IDLE=0, RESULT_INGEST_STREAM_MAX_DELIVERIES=2)
+    def test_entries_failing_every_delivery_are_set_aside(self):
+        record = dict(self.get_records(10)[0], total_votes=2 ** 70, total_valid_votes=20, total_invalid_votes=1)
+        append_result_records([record])
+        for _ in range(2):
+            with self.assertRaises(DataError):
+                drain_result_stream('test')
+        self.assertEqual(drain_result_stream('test'), 1)
+        self.assertFalse(ResultSheet.objects.exists())
+        stats = get_result_stream_stats()
+        self.assertEqual((stats['length'], stats['pending'], stats['dead'], stats['undeliverable']), (0, 0, 1, 1))
+        _, fields = self.connection.xrange(RESULT_INGEST_DEAD_STREAM)[0]
+        self.assertEqual(json.loads(fields[b'records']), [record])
+
+
+@override_settings(COLLATION_ASYNC=False, REPORT_REFRESH_ASYNC=False)
+class ResultSheetLockTest(ResultIngestFixtureMixin, TransactionTestCase):
+    def run_in_thread(self, target):
+        def run():
+            try:
+                target()
+            finally:
+                connections.close_all()
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_writers_of_a_sheet_wait_for_each_other(self):
+        records = [dict(record, total_votes=21, total_valid_votes=20, total_invalid_votes=1)
+                   for record in self.get_records(10)]
+        with transaction.atomic():
+            # as the result form holds it while saving the first sheet
+            lock_result_sheets([(self.stations[0].pk, self.presidential.pk)])
+            same = self.run_in_thread(lambda: ingest_result_records(records[:1]))
+            other = self.run_in_thread(lambda: ingest_result_records(records[2:3]))
+            other.join(10)
+            self.assertFalse(other.is_alive())
+            same.join(0.5)
+            self.assertTrue(same.is_alive())
+            ResultSheet.objects.create(station=self.stations[0], position=self.presidential)
+        same.join(10)
+        self.assertFalse(same.is_alive())
+        # the batch updates the committed sheet rather than adding its own
+        self.assertEqual(ResultSheet.objects.filter(station=self.stations[0]).count(), 1)
+        self.assertEqual(ResultSheet.objects.get(station=self.stations[0]).total_valid_votes, 20)
+        self.assertEqual(ResultSheet.objects.filter(station=self.stations[1]).count(), 1)
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from __poll.models import Result, ResultSubmission, SupernationalCollationSheet
+from __poll.constants import SyncStatusChoices
+from __poll.factories import PositionFactory
+from __poll.api.views.sync import result_sync
+from __people.factories import CandidateFactory, PartyFactory, AgentFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+
+
+# results are collated on save rather than by a queued job
+@override_settings(COLLATION_ASYNC=False)
+class ResultSyncTest(TestCase):
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.candidate = CandidateFactory(position=self.position, party=PartyFactory(code='AAA'))
+        self.region = RegionFactory(nation=self.position.zone)
+        self.station = StationFactory(constituency=ConstituencyFactory(region=self.region))
+        self.user = get_user_model().objects.create_user(username='agent', email='agent@kabanga.test', password='secret')
+        self.agent = AgentFactory(user=self.user, zone=self.region)
+
+    def sync(self, *submissions, user=None):
+        request = APIRequestFactory().post('/poll/api/results/sync/', dict(submissions=list(submissions)), format='json')
+        request.user = user or self.user
+        with self.captureOnCommitCallbacks(execute=True):
+            return result_sync(request)
+
+    def get_submission(self, key, sequence, votes):
+        return dict(key=key, sequence=sequence, station=self.station.pk, position=self.position.pk,
+                    total_valid_votes=votes, results=[dict(candidate=self.candidate.pk, votes=votes)])
+
+    def get_statuses(self, response):
+        return {key: outcome['status'] for key, outcome in response.data['submissions'].items()}
+
+    def get_collated_votes(self):
+        return SupernationalCollationSheet.objects.get(party=self.candidate.party).total_votes
+
+    def test_retries_and_older_edits_are_dropped(self):
+        response = self.sync(self.get_submission('a', 1, 10), self.get_submission('b', 2, 20))
+        self.assertEqual(self.get_statuses(response), dict(a=SyncStatusChoices.STALE, b=SyncStatusChoices.APPLIED))
+        self.assertEqual(self.get_collated_votes(), 20)
+
+        # a retry is answered from one lookup
+        with self.assertNumQueries(2):
+            response = self.sync(self.get_submission('b', 2, 20))
+        self.assertEqual(self.get_statuses(response), dict(b=SyncStatusChoices.DUPLICATE))
+        self.assertIsNone(response.data['ingest'])
+
+        # an edit queued offline before the applied one does not overwrite it
+        response = self.sync(self.get_submission('c', 1, 5), self.get_submission('d', 3, 30))
+        self.assertEqual(self.get_statuses(response), dict(c=SyncStatusChoices.STALE, d=SyncStatusChoices.APPLIED))
+        self.assertEqual(Result.objects.get().votes, 30)
+        self.assertEqual(self.get_collated_votes(), 30)
+        self.assertEqual(ResultSubmission.objects.count(), 4)
+
+    def test_invalid_submission_is_not_recorded(self):
+        submission = self.get_submission('a', 1, 10)
+        submission['results'][0]['candidate'] = CandidateFactory(position=PositionFactory()).pk
+        response = self.sync(submission)
+        self.assertEqual(self.get_statuses(response), dict(a=SyncStatusChoices.INVALID))
+        self.assertFalse(ResultSubmission.objects.exists())
+
+        response = self.sync(self.get_submission('a', 1, 10))
+        self.assertEqual(self.get_statuses(response), dict(a=SyncStatusChoices.APPLIED))
+
+    def test_only_agents_sync(self):
+        user = get_user_model().objects.create_user(username='viewer', email='viewer@kabanga.test', password='secret')
+        self.assertEqual(self.sync(self.get_submission('a', 1, 10), user=user).status_code, 403)
+
+    def test_stations_outside_the_agents_zone_are_invalid(self):
+        other_station = StationFactory(constituency=ConstituencyFactory(region=RegionFactory(nation=self.position.zone)))
+        submission = dict(self.get_submission('a', 1, 10), station=other_station.pk)
+        response = self.sync(submission, self.get_submission('b', 1, 20))
+        self.assertEqual(self.get_statuses(response), dict(a=SyncStatusChoices.INVALID, b=SyncStatusChoices.APPLIED))
+        self.assertEqual(list(ResultSubmission.objects.values_list('idempotency_key', flat=True)), ['b'])
+        self.assertEqual(self.get_collated_votes(), 20)
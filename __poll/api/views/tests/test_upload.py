@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from __poll.models import ResultSheet, ResultSheetUpload
+from __poll.factories import PositionFactory
+from __poll.api.views.upload import result_sheet_upload_list, result_sheet_upload_detail
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+
+
+class ResultSheetUploadTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root,
+                                          RESULT_SHEET_UPLOAD_DIR=os.path.join(self.media_root, 'uploads'),
+                                          RESULT_SHEET_UPLOAD_CHUNK_SIZE=4,
+                                          RESULT_SHEET_ASYNC=False)
+        self.settings.enable()
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.station = StationFactory(constituency=ConstituencyFactory(region=RegionFactory(nation=self.position.zone)))
+        self.user = get_user_model().objects.create_user(username='agent', email='agent@kabanga.test', password='secret')
+        self.content = b'%PDF-pink-sheet'
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def open_upload(self):
+        request = APIRequestFactory().post('/poll/api/result_sheets/uploads/',
+                                           dict(station=self.station.pk, position=self.position.pk,
+                                                file_name='sheet.pdf', size=len(self.content)),
+                                           format='json')
+        request.user = self.user
+        response = result_sheet_upload_list(request)
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def put(self, uid, offset, chunk, user=None):
+        request = APIRequestFactory().put(f'/poll/api/result_sheets/uploads/{uid}', chunk,
+                                          content_type='application/offset+octet-stream',
+                                          HTTP_UPLOAD_OFFSET=str(offset))
+        request.user = user or self.user
+        with self.captureOnCommitCallbacks(execute=True):
+            return result_sheet_upload_detail(request, uid=uid)
+
+    def get_offset(self, uid):
+        request = APIRequestFactory().get(f'/poll/api/result_sheets/uploads/{uid}')
+        request.user = self.user
+        return result_sheet_upload_detail(request, uid=uid).data['offset']
+
+    def test_upload_resumes_from_acknowledged_offset(self):
+        uid = self.open_upload()
+        self.assertEqual(self.put(uid, 0, self.content[:4]).data['offset'], 4)
+        # a resent chunk is refused with the offset to resume from
+        response = self.put(uid, 0, self.content[:4])
+        self.assertEqual((response.status_code, response['Upload-Offset']), (409, '4'))
+
+        offset = self.get_offset(uid)
+        while offset < len(self.content):
+            response = self.put(uid, offset, self.content[offset:offset + 4])
+            self.assertEqual(response.status_code, 200)
+            offset = response.data['offset']
+        self.assertTrue(response.data['completed'])
+
+        sheet = ResultSheet.objects.get(station=self.station, position=self.position)
+        self.assertEqual(response.data['result_sheet'], sheet.pk)
+        with default_storage.open(sheet.result_sheet.name) as stored:
+            self.assertEqual(stored.read(), self.content)
+        self.assertIsNotNone(sheet.scan_id)
+        self.assertFalse(os.listdir(os.path.join(self.media_root, 'uploads')))
+
+    def test_chunks_are_checked(self):
+        uid = self.open_upload()
+        self.assertEqual(self.put(uid, 0, self.content[:5]).status_code, 413)
+        self.assertEqual(self.put(uid, 'start', self.content[:4]).status_code, 400)
+        other = get_user_model().objects.create_user(username='other', email='other@kabanga.test', password='secret')
+        self.assertEqual(self.put(uid, 0, self.content[:4], user=other).status_code, 404)
+        self.assertEqual(ResultSheetUpload.objects.get().offset, 0)
@@ -0,0 +1,76 @@
+from rest_framework.response import Response
+from rest_framework.decorators import api_view
+from rest_framework import status
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from __geo.models import Station
+from __poll.models import Position, ResultSheetUpload
+from __poll.serializers import ResultSheetUploadSerializer
+from __poll.utils.uploads import get_upload_state, append_upload_chunk
+
+
+def get_upload_response(upload, status_code=status.HTTP_200_OK):
+    response = Response(get_upload_state(upload), status=status_code)
+    response['Upload-Offset'] = upload.offset
+    return response
+
+
+@login_required
+@api_view(['POST'])
+def result_sheet_upload_list(request):
+    """
+    Open a resumable upload of a station's result sheet file
+    """
+    serializer = ResultSheetUploadSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    errors = dict()
+    if not Station.objects.filter(pk=data['station']).exists():
+        errors['station'] = ['Unknown station.']
+    if not Position.objects.filter(pk=data['position']).exists():
+        errors['position'] = ['Unknown position.']
+    if len(errors) > 0:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+    upload = ResultSheetUpload.objects.create(user=request.user,
+                                              station_id=data['station'],
+                                              position_id=data['position'],
+                                              file_name=data['file_name'],
+                                              size=data['size'])
+    return get_upload_response(upload, status.HTTP_201_CREATED)
+
+
+@login_required
+@api_view(['GET', 'PUT'])
+def result_sheet_upload_detail(request, uid):
+    """
+    GET the offset to resume an upload from, PUT the chunk starting at Upload-Offset
+    """
+    upload = ResultSheetUpload.objects \
+                              .filter(uid=uid, user=request.user) \
+                              .first()
+    if upload is None:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'GET':
+        return get_upload_response(upload)
+
+    try:
+        offset = int(request.META.get('HTTP_UPLOAD_OFFSET', ''))
+    except ValueError:
+        return Response(dict(detail='The Upload-Offset header is required.'), status=status.HTTP_400_BAD_REQUEST)
+    # read as is, the chunk is not parsed as request data
+    chunk = request.body
+    if len(chunk) == 0:
+        return Response(dict(detail='The chunk is empty.'), status=status.HTTP_400_BAD_REQUEST)
+    if len(chunk) > settings.RESULT_SHEET_UPLOAD_CHUNK_SIZE:
+        return Response(dict(detail=f'Chunks are at most {settings.RESULT_SHEET_UPLOAD_CHUNK_SIZE} bytes.'),
+                        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    try:
+        upload, written = append_upload_chunk(upload.pk, offset, chunk)
+    except ValueError as e:
+        return Response(dict(detail=str(e)), status=status.HTTP_400_BAD_REQUEST)
+    if not written:
+        # resume from the acknowledged offset
+        return get_upload_response(upload, status.HTTP_409_CONFLICT)
+    return get_upload_response(upload)
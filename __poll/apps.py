@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PollConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = '__poll'
+
+    def ready(self):
+        from __poll.utils.utils import warm_content_types, clear_content_types
+        post_migrate.connect(clear_content_types, dispatch_uid='poll_clear_content_types')
+        warm_content_types()
@@ -50,3 +50,9 @@ class FormMessages:
     INVALID_REQUIRED = '{} is required.'
     INVALID_ENTRY = 'Invalid {} entered. Please enter a valid value.'
     INVALID_CHOICE = 'Invalid {} selected. Please select a valid choice.'
+
+class SyncStatusChoices(models.TextChoices):
+    APPLIED = "Applied"
+    DUPLICATE = "Duplicate"
+    STALE = "Stale"
+    INVALID = "Invalid"
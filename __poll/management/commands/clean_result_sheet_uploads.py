@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from __poll.utils.uploads import delete_expired_uploads
+
+
+class Command(BaseCommand):
+    '''
+    Delete resumable result sheet uploads abandoned before completion
+    python manage.py clean_result_sheet_uploads
+    '''
+    help = 'Delete resumable result sheet uploads abandoned before completion'
+
+    def handle(self, *args, **kwargs):
+        deleted = delete_expired_uploads()
+        self.stdout.write(self.style.SUCCESS(f'{deleted} expired uploads deleted.'))
@@ -0,0 +1,49 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from __poll.utils.ingest_stream import drain_result_stream, get_result_stream_stats, get_consumer_name
+
+
+class Command(BaseCommand):
+    '''
+    Write the result records queued on the ingest stream to the database
+    python manage.py drain_result_stream [--flush]
+    '''
+    help = 'Write the result records queued on the ingest stream to the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flush',
+                            action='store_true',
+                            help='drain what is queued and stop, instead of consuming until stopped')
+        parser.add_argument('--batch',
+                            type=int,
+                            help='stream entries written per transaction (RESULT_INGEST_STREAM_BATCH)')
+
+    def handle(self, *args, **kwargs):
+        batch = kwargs['batch']
+        if batch is not None and batch < 1:
+            raise CommandError('--batch must be at least 1')
+
+        consumer = get_consumer_name()
+        drained = 0
+        while True:
+            start = time.time()
+            try:
+                # consumers wait on the stream for up to 5s between batches
+                count = drain_result_stream(consumer, count=batch, block=None if kwargs['flush'] else 5000)
+            except Exception as e:
+                # the batch stays pending and is claimed again
+                self.stdout.write(self.style.ERROR(f'Error draining the result stream: {e}'))
+                if kwargs['flush']:
+                    raise CommandError('Result stream flush stopped')
+                time.sleep(1)
+                continue
+            if count > 0:
+                drained = drained + count
+                self.stdout.write(f'{count} entries written ({round(time.time() - start, 3)}s)')
+            elif kwargs['flush']:
+                break
+
+        stats = get_result_stream_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'{drained} entries written, {stats["length"]} left on the stream '
+            f'({stats["pending"]} pending with other consumers)'))
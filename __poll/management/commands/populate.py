@@ -9,6 +9,7 @@ from __poll.models import (Event, Office, Position,
                          )
 from __people.models import (Agent, Party, Candidate)
 from __geo.models import (Nation, Region, Constituency, Station)
+from __geo.helpers import invalidate_geo_hierarchy
 from account.models import User
 from faker import Faker
 import random
@@ -1012,6 +1013,9 @@ class Command(BaseCommand):
         if use_verbose:
             print('--------------------------------------------------------------')
 
+        # bulk created geo rows do not send the signals that refresh it
+        invalidate_geo_hierarchy()
+
         self.stdout.write(self.style.SUCCESS(f'Done: {len(json_files)} total tables checked, {len(found_tables)} tables found, {len(seeded)} tables seeded'))
         stop_time = time.time()
         self.stdout.write(self.style.SUCCESS(f'Time elapsed: {stop_time - start_time} seconds'))
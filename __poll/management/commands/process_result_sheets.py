@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from __poll.models import ResultSheet
+from __poll.utils.scans import process_result_sheet
+
+
+class Command(BaseCommand):
+    '''
+    Hash, deduplicate and render previews of stored result sheets
+    python manage.py process_result_sheets [--all]
+    '''
+    help = 'Hash, deduplicate and render previews of stored result sheets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Reprocess sheets already linked to a scan')
+
+    def handle(self, *args, **kwargs):
+        sheets = ResultSheet.objects.exclude(result_sheet='').exclude(result_sheet__isnull=True)
+        if not kwargs['all']:
+            sheets = sheets.filter(scan__isnull=True)
+        handled = 0
+        for sheet_id in sheets.values_list('pk', flat=True).iterator():
+            try:
+                if process_result_sheet(sheet_id) is not None:
+                    handled = handled + 1
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'Error processing result sheet {sheet_id}: {e}'))
+        self.stdout.write(self.style.SUCCESS(f'{handled} result sheets processed.'))
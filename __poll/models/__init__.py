@@ -9,3 +9,7 @@ from .result import (
 from .position import Position
 from .event import Event
 from .office import Office
+from .snapshot import CollationSnapshot, CollationSnapshotDelta, CollationSnapshotTotal
+from .report import ReportRow, LeaderboardEntry
+from .sync import ResultSubmission
+from .scan import ResultSheetScan, ResultSheetUpload
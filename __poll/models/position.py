@@ -6,7 +6,7 @@ from __geo.models import Nation, Region, Constituency, Station
 from __poll.models.office import Office
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
-from __poll.utils.utils import get_zone_ct
+from __poll.utils.utils import get_zone_ct, get_zone_ct_id
 
 
 class Position(models.Model):
@@ -45,11 +45,12 @@ class Position(models.Model):
 
     @property
     def zone_type(self):
-        nation_ct = get_zone_ct(Nation)
-        constituency_ct = get_zone_ct(Constituency)
-        if self.zone_ct == nation_ct and nation_ct is not None:
+        # compare ids so the zone_ct relation is never fetched
+        nation_ct_id = get_zone_ct_id(Nation)
+        constituency_ct_id = get_zone_ct_id(Constituency)
+        if self.zone_ct_id == nation_ct_id and nation_ct_id is not None:
             return 'Nation'
-        if self.zone_ct == constituency_ct and constituency_ct is not None:
+        if self.zone_ct_id == constituency_ct_id and constituency_ct_id is not None:
             return 'Constituency'
         return 'N/A'
 
@@ -0,0 +1,65 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from django.contrib.contenttypes.models import ContentType
+from __poll.constants import GeoLevelChoices
+
+
+class ReportRow(models.Model):
+    '''
+    A party's row on the report page of one zone and position type, pivoted
+    from the collation sheets and refreshed by collation (see report_rows)
+    '''
+    # position type the votes were cast for, as on the collation sheets
+    zone_ct = models.ForeignKey(ContentType,
+                                on_delete=models.CASCADE,
+                                related_name='+')
+    level = models.PositiveSmallIntegerField(choices=GeoLevelChoices.choices, help_text=_("Level of the zone"))
+    zone_id = models.PositiveIntegerField(help_text=_("Nation, region, constituency or station id"))
+    party = models.ForeignKey("__people.Party",
+                              on_delete=models.CASCADE,
+                              related_name='+')
+    total_valid_votes = models.BigIntegerField(_("Collated valid votes in the zone"), default=0)
+    total_invalid_votes = models.BigIntegerField(_("Collated invalid votes in the zone"), default=0)
+    total_votes_ec = models.BigIntegerField(_("EC Summary Collation totals"), default=0)
+    sub_zone_total_votes = models.BigIntegerField(_("Collated votes of the sub-zones"), default=0)
+    sub_zone_total_votes_ec = models.BigIntegerField(_("EC Summary Collation totals of the sub-zones"), default=0)
+    cells = models.JSONField(default=dict, help_text=_("Votes per sub-zone id"))
+    seats = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField("Updated At", auto_now=True)
+
+    class Meta:
+        db_table = 'poll_report_row'
+        constraints = [
+            models.UniqueConstraint(fields=['zone_ct', 'level', 'zone_id', 'party'],
+                                    name='poll_report_row_key'),
+        ]
+
+    def __str__(self):
+        return f'{self.zone_ct_id} {self.level} {self.zone_id} {self.party_id}'
+
+
+class LeaderboardEntry(models.Model):
+    '''
+    A station's, constituency's or party's collated votes on one leaderboard,
+    kept in step with the report rows by collation (see leaderboards)
+    '''
+    # office and member type, e.g. presidential:station or all:party
+    board = models.CharField(max_length=32)
+    member_id = models.PositiveIntegerField(help_text=_("Station, constituency or party id"))
+    votes = models.BigIntegerField(_("Collated valid votes"), default=0)
+    updated_at = models.DateTimeField("Updated At", auto_now=True)
+
+    class Meta:
+        db_table = 'poll_leaderboard_entry'
+        constraints = [
+            models.UniqueConstraint(fields=['board', 'member_id'],
+                                    name='poll_leaderboard_entry_key'),
+        ]
+        indexes = [
+            # top-N reads walk this index from the top of a board
+            models.Index(fields=['board', '-votes', 'member_id'],
+                         name='poll_leaderboard_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.board} {self.member_id} {self.votes}'
@@ -1,18 +1,15 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 from django.contrib.contenttypes.models import ContentType
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
+from django.conf import settings
 from __poll.constants import GeoLevelChoices, StatusChoices
 from __poll.utils.utils import upload_result_sheet, intify, get_zone_ct
-from __poll.utils.collations import (
-    save_supernational_collation_sheet,
-    save_national_collation_sheet,
-    save_regional_collation_sheet,
-    save_constituency_collation_sheet,
-    save_station_collation_sheet
-)
+from __poll.utils.collations import collate_result_delta, get_collated_state, lock_collated_state
+from __poll.tasks import enqueue_result_collation, enqueue_result_sheet_processing
+from __poll.utils.etags import mark_result_sheets_changed
 
 
 ZONE_OPTIONS = models.Q(app_label='__geo', model='Nation') | \
@@ -76,6 +73,10 @@ class SupernationalCollationSheet(models.Model):
 
     class Meta:
         db_table = 'poll_supernational_collation_sheet'
+        constraints = [
+            models.UniqueConstraint(fields=['party', 'nation', 'zone_ct'],
+                                    name='poll_supernational_collation_sheet_unique'),
+        ]
 
     def clean(self):
         self.total_votes = intify(self.total_votes)
@@ -111,6 +112,10 @@ class NationalCollationSheet(models.Model):
 
     class Meta:
         db_table = 'poll_national_collation_sheet'
+        constraints = [
+            models.UniqueConstraint(fields=['party', 'region', 'zone_ct'],
+                                    name='poll_national_collation_sheet_unique'),
+        ]
 
     def clean(self):
         self.total_votes = intify(self.total_votes)
@@ -146,6 +151,10 @@ class RegionalCollationSheet(models.Model):
 
     class Meta:
         db_table = 'poll_regional_collation_sheet'
+        constraints = [
+            models.UniqueConstraint(fields=['party', 'constituency', 'zone_ct'],
+                                    name='poll_regional_collation_sheet_unique'),
+        ]
 
     def clean(self):
         self.total_votes = intify(self.total_votes)
@@ -181,6 +190,10 @@ class ConstituencyCollationSheet(models.Model):
 
     class Meta:
         db_table = 'poll_constituency_collation_sheet'
+        constraints = [
+            models.UniqueConstraint(fields=['party', 'station', 'zone_ct'],
+                                    name='poll_constituency_collation_sheet_unique'),
+        ]
 
     def clean(self):
         self.total_votes = intify(self.total_votes)
@@ -216,6 +229,10 @@ class StationCollationSheet(models.Model):
 
     class Meta:
         db_table = 'poll_station_collation_sheet'
+        constraints = [
+            models.UniqueConstraint(fields=['candidate', 'station', 'zone_ct'],
+                                    name='poll_station_collation_sheet_unique'),
+        ]
 
     def clean(self):
         self.total_votes = intify(self.total_votes)
@@ -240,12 +257,19 @@ class ResultSheet(models.Model):
                                     help_text=_("Statement of poll and declaration of results"),
                                     max_length=500,
                                     default=None, null=True, blank=True)
+    # hash, size and rendered previews of the uploaded file, set in the background
+    scan = models.ForeignKey("ResultSheetScan",
+                             on_delete=models.SET_NULL,
+                             related_name='result_sheets',
+                             default=None, null=True, blank=True)
     station_agent = models.ForeignKey("__people.Agent",
                              on_delete=models.CASCADE,
                              help_text=_("Constituency agent that recorded results"),
                              related_name='result_sheets',
                              default=None, null=True, blank=True)
     station_approval_at = models.DateTimeField("Date of Stational Approved At", default=None, null=True, blank=True)
+    # the last ingest stream entry written to the sheet, see __poll.utils.ingest
+    stream_id = models.CharField(max_length=41, default=None, null=True, blank=True)
     created_at = models.DateTimeField("Created At", auto_now_add=True)
     status = models.CharField(max_length=35, choices=StatusChoices.choices, default=StatusChoices.ACTIVE, blank=True, null=True)
 
@@ -300,6 +324,18 @@ class Result(models.Model):
     class Meta:
         db_table = 'poll_result'
 
+    def save(self, *args, **kwargs):
+        # the collated state is read again under a row lock, so concurrent
+        # saves of stale instances apply their deltas one after the other
+        with transaction.atomic():
+            lock_collated_state(self)
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            lock_collated_state(self)
+            return super().delete(*args, **kwargs)
+
     def candidate_details(self):
         if self.candidate is not None:
             if self.candidate.party is not None:
@@ -362,23 +398,46 @@ class ResultApproval(models.Model):
         return "{} {} {}".format(self.result.position, self.result.station, self.result.votes)
 
 
-# process collations sheets on Result post save
-@receiver(post_save, sender=Result)
-def collate_station_sheet(sender, instance=None, created=False, **kwargs):
-    station_sheet = save_station_collation_sheet(instance)
-
-@receiver(post_save, sender=StationCollationSheet)
-def collate_station_sheet(sender, instance=None, created=False, **kwargs):
-    constituency_sheet = save_constituency_collation_sheet(instance)
-
-@receiver(post_save, sender=ConstituencyCollationSheet)
-def collate_station_sheet(sender, instance=None, created=False, **kwargs):
-    regional_sheet = save_regional_collation_sheet(instance)
+# process collations sheets on Result save/delete: only the change in votes
+# is applied to each collation level (see collate_result_delta), either on
+# the request thread or, with COLLATION_ASYNC, by a coalesced rq job
+@receiver(post_init, sender=Result)
+def track_collated_result(sender, instance=None, **kwargs):
+    instance._collated_state = get_collated_state(instance)
 
-@receiver(post_save, sender=RegionalCollationSheet)
-def collate_station_sheet(sender, instance=None, created=False, **kwargs):
-    national_sheet = save_national_collation_sheet(instance)
-
-@receiver(post_save, sender=NationalCollationSheet)
-def collate_station_sheet(sender, instance=None, created=False, **kwargs):
-    supernational_sheet = save_supernational_collation_sheet(instance)
+@receiver(post_save, sender=Result)
+def collate_result(sender, instance=None, created=False, **kwargs):
+    if settings.COLLATION_ASYNC:
+        enqueue_result_collation(instance)
+    else:
+        collate_result_delta(instance)
+
+@receiver(post_delete, sender=Result)
+def uncollate_result(sender, instance=None, **kwargs):
+    if settings.COLLATION_ASYNC:
+        enqueue_result_collation(instance, deleted=True)
+    else:
+        collate_result_delta(instance, deleted=True)
+
+
+# listings showing result sheets are revalidated against their version
+@receiver(post_save, sender=ResultSheet)
+@receiver(post_save, sender=ResultSheetApproval)
+@receiver(post_delete, sender=ResultSheet)
+@receiver(post_delete, sender=ResultSheetApproval)
+def result_sheets_changed(sender, instance=None, **kwargs):
+    mark_result_sheets_changed()
+
+
+# uploaded result sheets are hashed, deduplicated and rendered to previews
+# once stored (see __poll.utils.scans)
+@receiver(post_init, sender=ResultSheet)
+def track_result_sheet_file(sender, instance=None, **kwargs):
+    instance._result_sheet_name = str(instance.__dict__.get('result_sheet') or '')
+
+@receiver(post_save, sender=ResultSheet)
+def process_result_sheet_file(sender, instance=None, **kwargs):
+    name = instance.result_sheet.name or ''
+    if name != '' and name != instance._result_sheet_name:
+        enqueue_result_sheet_processing(instance.pk)
+    instance._result_sheet_name = name
@@ -0,0 +1,64 @@
+import uuid
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class ResultSheetScan(models.Model):
+    '''
+    A stored result sheet upload identified by the hash of its content, so
+    identical re-uploads share one file, with the thumbnail, preview and
+    tiles the approval pages load instead of the full scan (see scans)
+    '''
+    content_hash = models.CharField(max_length=64, unique=True, help_text=_("SHA-256 of the file"))
+    # storage name of the original upload, shared by every sheet with this content
+    file_name = models.CharField(max_length=500)
+    size = models.BigIntegerField(_("Size in bytes"), default=0)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    thumbnail = models.FileField(max_length=500, default=None, null=True, blank=True)
+    preview = models.FileField(max_length=500, default=None, null=True, blank=True)
+    # tile_size, columns, rows and the storage name of every tile by "column_row"
+    tiles = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default='', help_text=_("Why no images were rendered"))
+    processed_at = models.DateTimeField("Processed At", default=None, null=True, blank=True)
+    created_at = models.DateTimeField("Created At", auto_now_add=True)
+
+    class Meta:
+        db_table = 'poll_result_sheet_scan'
+
+    def __str__(self):
+        return f'{self.content_hash} {self.file_name}'
+
+
+class ResultSheetUpload(models.Model):
+    '''
+    A result sheet file sent in chunks (see uploads), resumed from its offset
+    after a dropped connection and attached to the station's sheet once whole
+    '''
+    uid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey("account.User",
+                             on_delete=models.CASCADE,
+                             related_name='+')
+    station = models.ForeignKey("__geo.Station",
+                                on_delete=models.CASCADE,
+                                related_name='+')
+    position = models.ForeignKey("__poll.Position",
+                                 on_delete=models.CASCADE,
+                                 related_name='+')
+    file_name = models.CharField(max_length=255, help_text=_("Name of the file on the device"))
+    size = models.BigIntegerField(_("Size in bytes"))
+    offset = models.BigIntegerField(_("Bytes received"), default=0)
+    result_sheet = models.ForeignKey("__poll.ResultSheet",
+                                     on_delete=models.SET_NULL,
+                                     related_name='+',
+                                     default=None, null=True, blank=True)
+    completed_at = models.DateTimeField("Completed At", default=None, null=True, blank=True)
+    created_at = models.DateTimeField("Created At", auto_now_add=True)
+    updated_at = models.DateTimeField("Updated At", auto_now=True)
+
+    class Meta:
+        db_table = 'poll_result_sheet_upload'
+
+    def __str__(self):
+        return f'{self.uid} {self.offset}/{self.size}'
@@ -0,0 +1,70 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from django.contrib.contenttypes.models import ContentType
+from __poll.constants import GeoLevelChoices
+
+
+class CollationSnapshot(models.Model):
+    '''
+    A point in the append-only history of collated totals, its deltas only
+    hold the per party totals that changed since the previous snapshot
+    '''
+    source = models.CharField(max_length=35, default='manual', help_text=_("What took the snapshot"))
+    total_deltas = models.PositiveIntegerField(default=0, help_text=_("Number of totals that changed"))
+    created_at = models.DateTimeField("Created At", auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'poll_collation_snapshot'
+
+    def __str__(self):
+        return f'{self.created_at} ({self.source})'
+
+
+class CollationSnapshotDelta(models.Model):
+    snapshot = models.ForeignKey(CollationSnapshot,
+                                 on_delete=models.CASCADE,
+                                 related_name='deltas')
+    level = models.PositiveSmallIntegerField(choices=GeoLevelChoices.choices, help_text=_("Level of the zone"))
+    zone_id = models.PositiveIntegerField(help_text=_("Nation, region, constituency or station id"))
+    # position type the votes were cast for, as on the collation sheets
+    zone_ct = models.ForeignKey(ContentType,
+                                on_delete=models.CASCADE,
+                                related_name='+',
+                                null=True, blank=True)
+    party = models.ForeignKey("__people.Party",
+                              on_delete=models.CASCADE,
+                              related_name='+',
+                              null=True, blank=True)
+    votes = models.BigIntegerField(_("Change in total votes since the previous snapshot"))
+
+    class Meta:
+        db_table = 'poll_collation_snapshot_delta'
+        indexes = [
+            models.Index(fields=['level', 'zone_id', 'zone_ct', 'snapshot'],
+                         name='poll_snapshot_delta_zone_idx'),
+        ]
+
+
+class CollationSnapshotTotal(models.Model):
+    '''
+    Per party totals as of the latest snapshot, kept alongside the history
+    so the next snapshot diffs against them instead of re-summing every delta
+    '''
+    level = models.PositiveSmallIntegerField(choices=GeoLevelChoices.choices, help_text=_("Level of the zone"))
+    zone_id = models.PositiveIntegerField(help_text=_("Nation, region, constituency or station id"))
+    zone_ct = models.ForeignKey(ContentType,
+                                on_delete=models.CASCADE,
+                                related_name='+',
+                                null=True, blank=True)
+    party = models.ForeignKey("__people.Party",
+                              on_delete=models.CASCADE,
+                              related_name='+',
+                              null=True, blank=True)
+    votes = models.BigIntegerField(_("Total votes at the latest snapshot"))
+
+    class Meta:
+        db_table = 'poll_collation_snapshot_total'
+        indexes = [
+            models.Index(fields=['level', 'zone_id', 'zone_ct', 'party'],
+                         name='poll_snapshot_total_zone_idx'),
+        ]
@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from __poll.constants import SyncStatusChoices
+
+
+class ResultSubmission(models.Model):
+    '''
+    A field agent's result sheet submission received by sync, kept so its
+    retries are dropped and older edits of the same sheet are not applied
+    '''
+    agent = models.ForeignKey("__people.Agent",
+                              on_delete=models.CASCADE,
+                              related_name='result_submissions')
+    # generated by the agent's device, the same for every retry
+    idempotency_key = models.CharField(max_length=64)
+    station = models.ForeignKey("__geo.Station",
+                                on_delete=models.CASCADE,
+                                related_name='+')
+    position = models.ForeignKey("__poll.Position",
+                                 on_delete=models.CASCADE,
+                                 related_name='+')
+    sequence = models.PositiveBigIntegerField(help_text=_("Order of the agent's edits of this station's sheet"))
+    status = models.CharField(max_length=35, choices=SyncStatusChoices.choices, default=SyncStatusChoices.APPLIED)
+    recorded_at = models.DateTimeField("Recorded At", default=None, null=True, blank=True,
+                                       help_text=_("When the agent recorded it, offline or not"))
+    created_at = models.DateTimeField("Created At", auto_now_add=True)
+
+    class Meta:
+        db_table = 'poll_result_submission'
+        constraints = [
+            models.UniqueConstraint(fields=['agent', 'idempotency_key'],
+                                    name='poll_result_submission_key'),
+        ]
+        indexes = [
+            # latest sequence of an agent's station/position sheet
+            models.Index(fields=['agent', 'station', 'position', '-sequence'],
+                         name='poll_result_submission_seq'),
+        ]
+
+    def __str__(self):
+        return f'{self.agent_id} {self.idempotency_key} {self.sequence}'
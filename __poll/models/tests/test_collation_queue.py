@@ -0,0 +1,108 @@
+import threading
+from django.db import connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from redis.exceptions import ConnectionError
+from __poll.models import Result, StationCollationSheet, SupernationalCollationSheet
+from __poll.factories import PositionFactory
+from __poll.tasks import (COLLATION_PENDING_KEY, COLLATION_METRICS_KEY, get_collation_queue,
+                          collate_station_position_task)
+from __poll.utils.collations import collate_station_position, lock_collation_rebuild
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+
+
+class CollationQueueFixtureMixin:
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.party = PartyFactory(code='AAA')
+        self.candidate = CandidateFactory(position=self.position, party=self.party)
+        self.station = StationFactory(constituency=ConstituencyFactory(region=RegionFactory(nation=self.position.zone)))
+
+    def get_station_votes(self):
+        return StationCollationSheet.objects.get(station=self.station, candidate=self.candidate).total_votes
+
+    def get_party_votes(self):
+        return SupernationalCollationSheet.objects.get(party=self.party, zone_ct=self.position.zone_ct).total_votes
+
+
+@override_settings(COLLATION_ASYNC=True, REPORT_REFRESH_ASYNC=False)
+class CollationQueueTest(CollationQueueFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.queue = get_collation_queue()
+        self.pending_key = COLLATION_PENDING_KEY.format(self.station.pk, self.position.pk)
+        try:
+            self.queue.connection.delete(self.pending_key)
+        except ConnectionError:
+            self.skipTest('Redis is not available')
+        self.addCleanup(self.queue.connection.delete, self.pending_key)
+        self.job_ids = set(self.queue.job_ids)
+        self.addCleanup(self.delete_jobs)
+
+    def get_collation_jobs(self):
+        return [job for job in self.queue.get_jobs()
+                if job.id not in self.job_ids and job.func == collate_station_position_task]
+
+    def delete_jobs(self):
+        for job in self.queue.get_jobs():
+            if job.id not in self.job_ids:
+                job.delete()
+
+    def test_updates_wait_for_one_job(self):
+        coalesced = int(self.queue.connection.hget(COLLATION_METRICS_KEY, 'coalesced') or 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+            # nothing is queued before the results commit
+            self.assertEqual(self.get_collation_jobs(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            result.votes = 25
+            result.save()
+        jobs = self.get_collation_jobs()
+        self.assertEqual([job.args for job in jobs], [(self.station.pk, self.position.pk)])
+        self.assertEqual(int(self.queue.connection.hget(COLLATION_METRICS_KEY, 'coalesced')), coalesced + 1)
+        self.assertFalse(StationCollationSheet.objects.exists())
+
+        # the job collates the latest votes and lets the next update queue again
+        with self.captureOnCommitCallbacks(execute=True):
+            jobs[0].perform()
+        self.assertEqual((self.get_station_votes(), self.get_party_votes()), (25, 25))
+        self.assertIsNone(self.queue.connection.get(self.pending_key))
+        with self.captureOnCommitCallbacks(execute=True):
+            result.votes = 30
+            result.save()
+        self.assertEqual(len(self.get_collation_jobs()), 2)
+
+    def test_jobs_are_idempotent(self):
+        Result.objects.bulk_create([Result(station=self.station, candidate=self.candidate, votes=40)])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(collate_station_position(self.station.pk, self.position.pk), 5)
+            self.assertEqual(collate_station_position(self.station.pk, self.position.pk), 0)
+        self.assertEqual((self.get_station_votes(), self.get_party_votes()), (40, 40))
+
+
+@override_settings(COLLATION_ASYNC=True, REPORT_REFRESH_ASYNC=False)
+class CollationJobLockTest(CollationQueueFixtureMixin, TransactionTestCase):
+    def run_in_thread(self, target):
+        def run():
+            try:
+                target()
+            finally:
+                connections.close_all()
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_concurrent_jobs_collate_once(self):
+        # written without the signals, as a bulk ingest does, so only the jobs collate it
+        Result.objects.bulk_create([Result(station=self.station, candidate=self.candidate, votes=100)])
+        with transaction.atomic():
+            # both jobs start while a rebuild holds the collation
+            lock_collation_rebuild()
+            jobs = [self.run_in_thread(lambda: collate_station_position(self.station.pk, self.position.pk))
+                    for _ in range(2)]
+            jobs[0].join(0.5)
+            self.assertTrue(all([job.is_alive() for job in jobs]))
+        for job in jobs:
+            job.join(10)
+            self.assertFalse(job.is_alive())
+        self.assertEqual((self.get_station_votes(), self.get_party_votes()), (100, 100))
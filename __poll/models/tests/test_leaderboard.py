@@ -0,0 +1,60 @@
+from django.test import TestCase, override_settings
+from __geo.models import Constituency
+from __poll.models import Position, Result, LeaderboardEntry, ConstituencyCollationSheet
+from __poll.factories import PositionFactory
+from __poll.utils.utils import get_zone_ct
+from __poll.utils.report_rows import refresh_report_rows
+from __poll.utils.leaderboards import get_leaderboard, get_leaderboard_votes
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+
+
+# results are collated and changes refreshed inline rather than by queued jobs
+@override_settings(COLLATION_ASYNC=False, REPORT_REFRESH_ASYNC=False)
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        self.presidential = PositionFactory.create_with_zone(zone_name='nation')
+        self.region = RegionFactory(nation=self.presidential.zone)
+        self.constituency = ConstituencyFactory(region=self.region)
+        self.parliamentary = Position.objects.create(title='MP',
+                                                     zone_ct=get_zone_ct(Constituency),
+                                                     zone_id=self.constituency.pk)
+        self.party_a = PartyFactory(code='AAA')
+        self.party_b = PartyFactory(code='BBB')
+        self.president_a = CandidateFactory(position=self.presidential, party=self.party_a)
+        self.president_b = CandidateFactory(position=self.presidential, party=self.party_b)
+        self.mp_a = CandidateFactory(position=self.parliamentary, party=self.party_a)
+        self.station_1 = StationFactory(constituency=self.constituency)
+        self.station_2 = StationFactory(constituency=self.constituency)
+        with self.captureOnCommitCallbacks(execute=True):
+            Result.objects.create(station=self.station_1, candidate=self.president_a, votes=10)
+            Result.objects.create(station=self.station_1, candidate=self.president_b, votes=5)
+            Result.objects.create(station=self.station_2, candidate=self.president_a, votes=20)
+            Result.objects.create(station=self.station_1, candidate=self.mp_a, votes=30)
+
+    def test_boards_ranked_per_office(self):
+        self.assertEqual(get_leaderboard('all', 'station'),
+                         [(self.station_1.pk, 45), (self.station_2.pk, 20)])
+        self.assertEqual(get_leaderboard('presidential', 'station', limit=1), [(self.station_2.pk, 20)])
+        self.assertEqual(get_leaderboard('parliamentary', 'constituency'), [(self.constituency.pk, 30)])
+        self.assertEqual(get_leaderboard('all', 'party'), [(self.party_a.pk, 60), (self.party_b.pk, 5)])
+        votes = get_leaderboard_votes('party', [self.party_b.pk])
+        self.assertEqual(votes['presidential'], {self.party_b.pk: 5})
+        self.assertEqual(votes['parliamentary'], dict())
+
+    def test_refresh_follows_touched_zones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Result.objects.create(station=self.station_2, candidate=self.mp_a, votes=40)
+        self.assertEqual(get_leaderboard('all', 'station', limit=1), [(self.station_2.pk, 60)])
+        self.assertEqual(get_leaderboard('parliamentary', 'party'), [(self.party_a.pk, 70)])
+
+        ConstituencyCollationSheet.objects.filter(station=self.station_1).delete()
+        refresh_report_rows([('station', self.station_1.pk)])
+        self.assertFalse(LeaderboardEntry.objects.filter(board__endswith=':station',
+                                                         member_id=self.station_1.pk).exists())
+        self.assertEqual(LeaderboardEntry.objects.filter(member_id=self.station_2.pk,
+                                                         board__endswith=':station').count(), 3)
+
+    def test_top_n_reads_one_query(self):
+        with self.assertNumQueries(1):
+            get_leaderboard('all', 'station', limit=10)
@@ -0,0 +1,18 @@
+from django.test import TestCase
+from __poll.models import Position
+from __poll.factories import PositionFactory
+from __poll.utils.utils import warm_content_types
+
+
+class PositionZoneTypeTest(TestCase):
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        warm_content_types()
+
+    def test_zone_type(self):
+        self.assertEqual(self.position.zone_type, 'Nation')
+
+    def test_zone_type_uses_no_queries(self):
+        position = Position.objects.get(pk=self.position.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(position.zone_type, 'Nation')
@@ -0,0 +1,118 @@
+import json
+import django_rq
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+from redis.exceptions import ConnectionError
+from __poll.constants import GeoLevelChoices
+from __poll.models import Result, ReportRow, NationalCollationSheet, RegionalCollationSheet
+from __poll.factories import PositionFactory
+from __poll.utils.report_rows import refresh_report_rows
+from __poll.utils.collations import (mark_collation_changed, refresh_collation_changes_task,
+                                     COLLATION_VERSION_KEY, REPORT_REFRESH_PENDING_KEY, REPORT_REFRESH_ZONES_KEY)
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+
+
+# results are collated and changes refreshed inline rather than by queued jobs
+@override_settings(COLLATION_ASYNC=False, REPORT_REFRESH_ASYNC=False)
+class ReportRowTest(TestCase):
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.party = PartyFactory(code='AAA')
+        self.candidate = CandidateFactory(position=self.position, party=self.party)
+        self.region = RegionFactory(nation=self.position.zone)
+        self.station = StationFactory(constituency=ConstituencyFactory(region=self.region))
+
+    def test_delta_refreshes_touched_rows(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        row = ReportRow.objects.get(level=GeoLevelChoices.NATIONAL, zone_id=self.position.zone.pk)
+        self.assertEqual(row.total_valid_votes, 10)
+        self.assertEqual(row.cells, {str(self.region.pk): 10})
+        self.assertEqual(ReportRow.objects.filter(zone_id=self.station.pk,
+                                                  level=GeoLevelChoices.STATION).count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result.votes = 25
+            result.save()
+        row.refresh_from_db()
+        self.assertEqual((row.total_valid_votes, row.cells), (25, {str(self.region.pk): 25}))
+
+    def test_refresh_writes_only_changes(self):
+        Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        # station, constituency, region and nation rows
+        self.assertEqual(refresh_report_rows(), 4)
+        self.assertEqual(refresh_report_rows(), 0)
+
+    def test_refresh_removes_emptied_rows(self):
+        Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        refresh_report_rows()
+        NationalCollationSheet.objects.all().delete()
+        RegionalCollationSheet.objects.all().delete()
+        refresh_report_rows([('region', self.region.pk)])
+        self.assertFalse(ReportRow.objects.filter(level=GeoLevelChoices.REGION).exists())
+        self.assertTrue(ReportRow.objects.filter(level=GeoLevelChoices.NATIONAL).exists())
+
+
+@override_settings(COLLATION_ASYNC=False, REPORT_REFRESH_ASYNC=True)
+class ReportRefreshQueueTest(TestCase):
+    def setUp(self):
+        self.queue = django_rq.get_queue(settings.COLLATION_QUEUE)
+        try:
+            self.queue.connection.delete(REPORT_REFRESH_PENDING_KEY, REPORT_REFRESH_ZONES_KEY)
+        except ConnectionError:
+            self.skipTest('Redis is not available')
+        self.addCleanup(self.queue.connection.delete, REPORT_REFRESH_PENDING_KEY, REPORT_REFRESH_ZONES_KEY)
+        self.job_ids = set(self.queue.job_ids)
+        self.addCleanup(self.delete_jobs)
+        position = PositionFactory.create_with_zone(zone_name='nation')
+        self.nation = position.zone
+        self.candidate = CandidateFactory(position=position, party=PartyFactory(code='AAA'))
+        self.station = StationFactory(constituency=ConstituencyFactory(region=RegionFactory(nation=self.nation)))
+
+    def get_refresh_jobs(self):
+        return [job for job in self.queue.get_jobs()
+                if job.id not in self.job_ids and job.func == refresh_collation_changes_task]
+
+    def delete_jobs(self):
+        for job in self.queue.get_jobs():
+            if job.id not in self.job_ids:
+                job.delete()
+
+    def test_changes_wait_for_one_job(self):
+        version = cache.get(COLLATION_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            result.votes = 25
+            result.save()
+        self.assertEqual(len(self.get_refresh_jobs()), 1)
+        # nothing is refreshed or bumped on the request thread
+        self.assertFalse(ReportRow.objects.filter(level=GeoLevelChoices.NATIONAL).exists())
+        self.assertEqual(cache.get(COLLATION_VERSION_KEY), version)
+
+        refresh_collation_changes_task()
+        row = ReportRow.objects.get(level=GeoLevelChoices.NATIONAL, zone_id=self.nation.pk)
+        self.assertEqual(row.total_valid_votes, 25)
+        self.assertNotEqual(cache.get(COLLATION_VERSION_KEY), version)
+
+    def test_failed_refresh_bumps_nothing(self):
+        version = cache.get(COLLATION_VERSION_KEY)
+        # a zone id the refresh cannot read
+        bad_zone = json.dumps([None, 'station', 'x'])
+        self.queue.connection.sadd(REPORT_REFRESH_ZONES_KEY, bad_zone)
+        with self.assertRaises(Exception):
+            with transaction.atomic():
+                refresh_collation_changes_task()
+        self.assertEqual(cache.get(COLLATION_VERSION_KEY), version)
+        # left for the next job
+        self.assertEqual(self.queue.connection.smembers(REPORT_REFRESH_ZONES_KEY), {bad_zone.encode()})
+
+    @override_settings(REPORT_REFRESH_ASYNC=False)
+    def test_failed_refresh_on_commit_bumps_nothing(self):
+        version = cache.get(COLLATION_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_collation_changed(None, [('station', 'x')])
+        self.assertEqual(cache.get(COLLATION_VERSION_KEY), version)
@@ -0,0 +1,82 @@
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from __poll.models import (
+    Result, StationCollationSheet, ConstituencyCollationSheet,
+    RegionalCollationSheet, NationalCollationSheet,
+    SupernationalCollationSheet,
+)
+from __poll.factories import PositionFactory
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+
+
+# results are collated on save rather than by a queued job
+@override_settings(COLLATION_ASYNC=False)
+class ResultDeltaCollationTest(TestCase):
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.party = PartyFactory()
+        self.candidate = CandidateFactory(position=self.position, party=self.party)
+        # nations are singletons, hang the stations off the position's nation
+        region = RegionFactory(nation=self.position.zone)
+        self.station = StationFactory(constituency=ConstituencyFactory(region=region))
+        self.sheet_models = [
+            StationCollationSheet, ConstituencyCollationSheet,
+            RegionalCollationSheet, NationalCollationSheet,
+            SupernationalCollationSheet,
+        ]
+
+    def assertCollatedVotes(self, votes):
+        for model in self.sheet_models:
+            sheet = model.objects.get(zone_ct=self.position.zone_ct)
+            self.assertEqual(sheet.total_votes, votes, model.__name__)
+
+    def test_result_create_collates_all_levels(self):
+        Result.objects.create(station=self.station, candidate=self.candidate, votes=120)
+        self.assertCollatedVotes(120)
+
+    def test_result_update_applies_only_the_difference(self):
+        result = Result.objects.create(station=self.station, candidate=self.candidate, votes=120)
+        result = Result.objects.get(pk=result.pk)
+        result.votes = 100
+        result.save()
+        self.assertCollatedVotes(100)
+        Result.objects.update_or_create(station=self.station,
+                                        candidate=self.candidate,
+                                        defaults=dict(votes=150))
+        self.assertCollatedVotes(150)
+
+    def test_result_delete_removes_votes(self):
+        result = Result.objects.create(station=self.station, candidate=self.candidate, votes=120)
+        result.delete()
+        self.assertCollatedVotes(0)
+
+    def test_result_moved_to_another_station(self):
+        result = Result.objects.create(station=self.station, candidate=self.candidate, votes=120)
+        result.station = StationFactory(constituency=self.station.constituency)
+        result.save()
+        old_sheet = StationCollationSheet.objects.get(station=self.station)
+        new_sheet = StationCollationSheet.objects.get(station=result.station)
+        self.assertEqual(old_sheet.total_votes, 0)
+        self.assertEqual(new_sheet.total_votes, 120)
+        self.assertEqual(RegionalCollationSheet.objects.get().total_votes, 120)
+
+    def test_stale_instances_apply_deltas_from_the_stored_votes(self):
+        result = Result.objects.create(station=self.station, candidate=self.candidate, votes=120)
+        first = Result.objects.get(pk=result.pk)
+        second = Result.objects.get(pk=result.pk)
+        first.votes = 100
+        first.save()
+        # loaded at 120, but collated from the 100 stored by the first save
+        second.votes = 150
+        second.save()
+        self.assertCollatedVotes(150)
+        first.delete()
+        self.assertCollatedVotes(0)
+
+    def test_sheet_natural_keys_are_unique(self):
+        Result.objects.create(station=self.station, candidate=self.candidate, votes=120)
+        sheet = StationCollationSheet.objects.get()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            StationCollationSheet.objects.create(station=self.station, candidate=self.candidate,
+                                                 zone_ct=sheet.zone_ct, total_votes=1)
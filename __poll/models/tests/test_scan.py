@@ -0,0 +1,95 @@
+import io
+import shutil
+import tempfile
+import unittest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from redis.exceptions import ConnectionError
+from __poll.models import ResultSheet, ResultSheetScan
+from __poll.tasks import get_result_sheet_queue, process_result_sheet_task
+from __poll.factories import PositionFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+class ResultSheetScanTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root, RESULT_SHEET_ASYNC=False)
+        self.settings.enable()
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.constituency = ConstituencyFactory(region=RegionFactory(nation=self.position.zone))
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, name, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            sheet = ResultSheet.objects.create(station=StationFactory(constituency=self.constituency),
+                                               position=self.position,
+                                               result_sheet=SimpleUploadedFile(name, content))
+        # the name stored by the upload, before any dedup
+        self.uploaded_name = sheet.result_sheet.name
+        return ResultSheet.objects.select_related('scan').get(pk=sheet.pk)
+
+    def test_identical_uploads_share_one_scan(self):
+        first = self.upload('sheet.pdf', b'%PDF-1.4 pink sheet')
+        second = self.upload('again.pdf', b'%PDF-1.4 pink sheet')
+        self.assertEqual(ResultSheetScan.objects.count(), 1)
+        self.assertEqual(first.scan_id, second.scan_id)
+        self.assertEqual(second.result_sheet.name, first.result_sheet.name)
+        self.assertFalse(default_storage.exists(self.uploaded_name))
+        self.assertTrue(default_storage.exists(first.result_sheet.name))
+        self.assertIsNotNone(first.scan.error)
+
+        third = self.upload('other.pdf', b'%PDF-1.4 another sheet')
+        self.assertNotEqual(third.scan_id, first.scan_id)
+
+    @unittest.skipIf(Image is None, 'Pillow is not installed')
+    def test_image_upload_is_rendered(self):
+        output = io.BytesIO()
+        Image.new('RGB', (1200, 700), 'pink').save(output, format='PNG')
+        scan = self.upload('sheet.png', output.getvalue()).scan
+        self.assertEqual((scan.width, scan.height), (1200, 700))
+        self.assertEqual((scan.tiles['columns'], scan.tiles['rows']), (3, 2))
+        with default_storage.open(scan.thumbnail.name) as thumbnail:
+            self.assertLessEqual(max(Image.open(thumbnail).size), 256)
+        self.assertTrue(default_storage.exists(scan.preview.name))
+
+
+class ResultSheetQueueTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        # RESULT_SHEET_ASYNC is left at its default
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.queue = get_result_sheet_queue()
+        try:
+            self.job_ids = set(self.queue.job_ids)
+        except ConnectionError:
+            self.skipTest('Redis is not available')
+        self.addCleanup(self.delete_jobs)
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.constituency = ConstituencyFactory(region=RegionFactory(nation=self.position.zone))
+
+    def delete_jobs(self):
+        for job in self.queue.get_jobs():
+            if job.id not in self.job_ids:
+                job.delete()
+
+    def test_upload_is_processed_on_the_queue(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sheet = ResultSheet.objects.create(station=StationFactory(constituency=self.constituency),
+                                               position=self.position,
+                                               result_sheet=SimpleUploadedFile('sheet.pdf', b'%PDF-1.4 pink sheet'))
+        self.assertFalse(ResultSheetScan.objects.exists())
+        jobs = [job for job in self.queue.get_jobs() if job.id not in self.job_ids]
+        self.assertEqual([(job.func, job.args) for job in jobs], [(process_result_sheet_task, (sheet.pk,))])
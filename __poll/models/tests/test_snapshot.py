@@ -0,0 +1,104 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from __poll.constants import GeoLevelChoices
+from __poll.models import Result, CollationSnapshot, CollationSnapshotDelta, CollationSnapshotTotal
+from __poll.factories import PositionFactory
+from __poll.utils.snapshots import (take_collation_snapshot, get_collation_trend, COLLATION_SNAPSHOT_DUE_KEY,
+                                    SNAPSHOT_SOURCE_INTERVAL)
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+from __report.api.views import collation_trend
+
+
+# results are collated and changes refreshed inline rather than by queued jobs
+@override_settings(COLLATION_ASYNC=False, REPORT_REFRESH_ASYNC=False)
+class CollationSnapshotTest(TestCase):
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.party = PartyFactory(code='AAA')
+        self.candidate = CandidateFactory(position=self.position, party=self.party)
+        self.region = RegionFactory(nation=self.position.zone)
+        self.station = StationFactory(constituency=ConstituencyFactory(region=self.region))
+
+    def test_snapshot_stores_only_changes(self):
+        result = Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        first = take_collation_snapshot()
+        # nation, region and constituency totals all moved
+        self.assertEqual(first.total_deltas, 3)
+
+        unchanged = take_collation_snapshot()
+        self.assertEqual(unchanged.total_deltas, 0)
+
+        result.votes = 25
+        result.save()
+        second = take_collation_snapshot()
+        delta = CollationSnapshotDelta.objects.get(snapshot=second, level=GeoLevelChoices.REGION)
+        self.assertEqual(delta.votes, 15)
+
+    def test_snapshot_diffs_against_the_running_totals(self):
+        result = Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        take_collation_snapshot()
+        self.assertEqual(CollationSnapshotTotal.objects.get(level=GeoLevelChoices.REGION).votes, 10)
+        # a history pruned below the totals does not change what is diffed
+        CollationSnapshotDelta.objects.all().delete()
+        result.votes = 25
+        result.save()
+        second = take_collation_snapshot()
+        self.assertEqual(CollationSnapshotDelta.objects.get(snapshot=second, level=GeoLevelChoices.REGION).votes, 15)
+        self.assertEqual(CollationSnapshotTotal.objects.get(level=GeoLevelChoices.REGION).votes, 25)
+
+    def test_running_totals_are_seeded_from_the_history(self):
+        result = Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        take_collation_snapshot()
+        CollationSnapshotTotal.objects.all().delete()
+        result.votes = 25
+        result.save()
+        second = take_collation_snapshot()
+        self.assertEqual(CollationSnapshotDelta.objects.get(snapshot=second, level=GeoLevelChoices.REGION).votes, 15)
+
+    @override_settings(COLLATION_SNAPSHOT_INTERVAL=60)
+    def test_collation_changes_take_interval_snapshots(self):
+        cache.delete(COLLATION_SNAPSHOT_DUE_KEY)
+        self.addCleanup(cache.delete, COLLATION_SNAPSHOT_DUE_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        snapshot = CollationSnapshot.objects.get()
+        self.assertEqual(snapshot.source, SNAPSHOT_SOURCE_INTERVAL)
+        self.assertEqual(snapshot.total_deltas, 3)
+        # within the interval
+        with self.captureOnCommitCallbacks(execute=True):
+            result.votes = 25
+            result.save()
+        self.assertEqual(CollationSnapshot.objects.count(), 1)
+
+    def test_snapshot_respects_min_interval(self):
+        take_collation_snapshot()
+        self.assertIsNone(take_collation_snapshot(min_interval=60))
+
+    def test_trend(self):
+        result = Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        take_collation_snapshot()
+        result.votes = 25
+        result.save()
+        take_collation_snapshot()
+
+        points = get_collation_trend(GeoLevelChoices.REGION, self.region.pk)
+        self.assertEqual([point['totals'] for point in points], [dict(AAA=10), dict(AAA=25)])
+
+        later = get_collation_trend(GeoLevelChoices.REGION, self.region.pk, start=points[1]['created_at'])
+        self.assertEqual([point['totals'] for point in later], [dict(AAA=25)])
+
+    def test_trend_view(self):
+        Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        take_collation_snapshot()
+
+        def get(**params):
+            params = dict(level='region', zone=self.region.pk, **params)
+            return collation_trend(APIRequestFactory().get('/report/collate/trend', params))
+        response = get(position='presidential')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([point['totals'] for point in response.data['points']], [dict(AAA=10)])
+        # the offices are not mixed, nor impossible dates a server error
+        self.assertEqual(get().status_code, 400)
+        self.assertEqual(get(position='presidential', start='2024-13-40T00:00:00').status_code, 400)
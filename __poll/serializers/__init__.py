@@ -3,3 +3,4 @@ from .position import PositionSerializer, PositionCollationSerializer
 from .result import ResultSerializer
 from .result import ResultApprovalSerializer
 from .office import OfficeSerializer
+from .ingest import ResultIngestSerializer, ResultSyncSerializer, ResultSheetUploadSerializer
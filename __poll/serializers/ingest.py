@@ -0,0 +1,61 @@
+from django.conf import settings
+from rest_framework import serializers
+
+
+class ResultIngestVoteSerializer(serializers.Serializer):
+    candidate = serializers.IntegerField(min_value=1)
+    votes = serializers.IntegerField(min_value=0)
+
+
+class ResultIngestRecordSerializer(serializers.Serializer):
+    '''A station's result sheet for one position with its candidates' votes'''
+    station = serializers.IntegerField(min_value=1)
+    position = serializers.IntegerField(min_value=1)
+    total_votes = serializers.IntegerField(min_value=0, default=0)
+    total_valid_votes = serializers.IntegerField(min_value=0, default=0)
+    total_invalid_votes = serializers.IntegerField(min_value=0, default=0)
+    results = ResultIngestVoteSerializer(many=True, allow_empty=False)
+
+    def validate_results(self, results):
+        candidates = [result['candidate'] for result in results]
+        if len(set(candidates)) != len(candidates):
+            raise serializers.ValidationError('A candidate can only be listed once per record.')
+        return results
+
+
+class ResultIngestSerializer(serializers.Serializer):
+    records = ResultIngestRecordSerializer(many=True, allow_empty=False)
+
+    def validate_records(self, records):
+        if len(records) > settings.RESULT_INGEST_MAX_RECORDS:
+            raise serializers.ValidationError(f'At most {settings.RESULT_INGEST_MAX_RECORDS} records can be submitted at once.')
+        return records
+
+
+class ResultSyncRecordSerializer(ResultIngestRecordSerializer):
+    '''A result sheet recorded by a field agent, possibly offline and resent'''
+    key = serializers.CharField(max_length=64)
+    sequence = serializers.IntegerField(min_value=0)
+    recorded_at = serializers.DateTimeField(required=False, allow_null=True, default=None)
+
+
+class ResultSyncSerializer(serializers.Serializer):
+    submissions = ResultSyncRecordSerializer(many=True, allow_empty=False)
+
+    def validate_submissions(self, submissions):
+        if len(submissions) > settings.RESULT_INGEST_MAX_RECORDS:
+            raise serializers.ValidationError(f'At most {settings.RESULT_INGEST_MAX_RECORDS} submissions can be synced at once.')
+        return submissions
+
+
+class ResultSheetUploadSerializer(serializers.Serializer):
+    '''A result sheet file about to be sent in chunks'''
+    station = serializers.IntegerField(min_value=1)
+    position = serializers.IntegerField(min_value=1)
+    file_name = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+
+    def validate_size(self, size):
+        if size > settings.RESULT_SHEET_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'Files of at most {settings.RESULT_SHEET_UPLOAD_MAX_SIZE} bytes can be uploaded.')
+        return size
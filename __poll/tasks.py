@@ -0,0 +1,179 @@
+import time
+import django_rq
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django_rq import job
+from __poll.utils.collations import collate_station_position, collate_station_positions, get_collated_state
+from __poll.utils.scans import process_result_sheet
+
+
+# one pending marker per station/position, holding the time it was queued
+COLLATION_PENDING_KEY = 'collation:pending:{}:{}'
+COLLATION_METRICS_KEY = 'collation:metrics'
+# markers outlive a lost job by at most this long
+COLLATION_PENDING_TIMEOUT = 3600
+
+
+def get_collation_queue():
+    return django_rq.get_queue(settings.COLLATION_QUEUE)
+
+
+def enqueue_station_collation(station_id, position_id):
+    '''Queues a collation job for a station/position unless one is already waiting'''
+    if station_id is None or position_id is None:
+        return None
+    queue = get_collation_queue()
+    key = COLLATION_PENDING_KEY.format(station_id, position_id)
+    enqueued_at = time.time()
+    # only the first update schedules a job; later ones are picked up by it
+    # as long as it has not started (the job clears the marker when it starts)
+    if not queue.connection.set(key, enqueued_at, nx=True, ex=COLLATION_PENDING_TIMEOUT):
+        queue.connection.hincrby(COLLATION_METRICS_KEY, 'coalesced', 1)
+        return None
+    try:
+        job = queue.enqueue(collate_station_position_task,
+                            station_id, position_id,
+                            enqueued_at=enqueued_at)
+    except Exception:
+        # without a job the marker would hold back every later update
+        queue.connection.delete(key)
+        raise
+    queue.connection.hincrby(COLLATION_METRICS_KEY, 'enqueued', 1)
+    return job
+
+
+def collate_station_after_commit(station_id, position_id):
+    '''Queues a station/position's collation, collating it here when the queue is unavailable'''
+    try:
+        enqueue_station_collation(station_id, position_id)
+    except Exception as e:
+        print(e)
+        collate_station_position(station_id, position_id)
+
+
+def enqueue_result_collation(result, deleted=False):
+    '''Schedules collation for the station/position a result was and is counted under'''
+    candidate_model = apps.get_model('__people', 'Candidate')
+    old_station_id, old_candidate_id, _ = getattr(result, '_collated_state', (None, None, None))
+    station_id, candidate_id, _ = (None, None, None) if deleted else get_collated_state(result)
+    candidate_ids = {c for c in [old_candidate_id, candidate_id] if c is not None}
+    positions = dict(candidate_model.objects \
+                                    .filter(pk__in=candidate_ids) \
+                                    .values_list('id', 'position_id'))
+    keys = {
+        (s, positions.get(c))
+        for s, c in [(old_station_id, old_candidate_id), (station_id, candidate_id)]
+        if s is not None and c is not None
+    }
+    for key in keys:
+        # enqueue after commit so the job never reads uncommitted results
+        transaction.on_commit(lambda key=key: collate_station_after_commit(*key))
+    result._collated_state = get_collated_state(result)
+    return len(keys)
+
+
+@job
+def collate_station_position_task(station_id, position_id, enqueued_at=None):
+    connection = django_rq.get_connection(settings.COLLATION_QUEUE)
+    started = time.time()
+    # clear the marker first: results saved while this runs need a new job
+    connection.delete(COLLATION_PENDING_KEY.format(station_id, position_id))
+    total = collate_station_position(station_id, position_id)
+    finished = time.time()
+    waited = started - enqueued_at if enqueued_at is not None else 0
+    latency = finished - (enqueued_at or started)
+    pipe = connection.pipeline()
+    pipe.hincrby(COLLATION_METRICS_KEY, 'processed', 1)
+    pipe.hincrbyfloat(COLLATION_METRICS_KEY, 'total_wait_seconds', waited)
+    pipe.hincrbyfloat(COLLATION_METRICS_KEY, 'total_run_seconds', finished - started)
+    pipe.hset(COLLATION_METRICS_KEY, 'last_latency_seconds', latency)
+    pipe.execute()
+    return dict(station_id=station_id,
+                position_id=position_id,
+                sheets=total,
+                wait_seconds=waited,
+                run_seconds=finished - started,
+                latency_seconds=latency)
+
+
+def enqueue_batch_collation(station_positions):
+    '''Queues one collation job for every (station id, position id) of a bulk submission'''
+    queue = get_collation_queue()
+    job = queue.enqueue(collate_station_positions_task,
+                        [list(station_position) for station_position in station_positions],
+                        enqueued_at=time.time())
+    queue.connection.hincrby(COLLATION_METRICS_KEY, 'enqueued', 1)
+    return job
+
+
+def collate_batch_after_commit(station_positions):
+    '''Queues a bulk submission's collation, collating it here when the queue is unavailable'''
+    try:
+        enqueue_batch_collation(station_positions)
+    except Exception as e:
+        print(e)
+        collate_station_positions(station_positions)
+
+
+@job
+def collate_station_positions_task(station_positions, enqueued_at=None):
+    connection = django_rq.get_connection(settings.COLLATION_QUEUE)
+    started = time.time()
+    total = collate_station_positions([tuple(station_position) for station_position in station_positions])
+    finished = time.time()
+    waited = started - enqueued_at if enqueued_at is not None else 0
+    pipe = connection.pipeline()
+    pipe.hincrby(COLLATION_METRICS_KEY, 'processed', 1)
+    pipe.hincrbyfloat(COLLATION_METRICS_KEY, 'total_wait_seconds', waited)
+    pipe.hincrbyfloat(COLLATION_METRICS_KEY, 'total_run_seconds', finished - started)
+    pipe.hset(COLLATION_METRICS_KEY, 'last_latency_seconds', finished - (enqueued_at or started))
+    pipe.execute()
+    return dict(station_positions=len(station_positions),
+                sheets=total,
+                wait_seconds=waited,
+                run_seconds=finished - started)
+
+
+def get_result_sheet_queue():
+    return django_rq.get_queue(settings.RESULT_SHEET_QUEUE)
+
+
+def enqueue_result_sheet_processing(sheet_id):
+    '''Hashes and renders a result sheet's file once the current transaction commits'''
+    def on_commit():
+        if not settings.RESULT_SHEET_ASYNC:
+            process_result_sheet(sheet_id)
+            return
+        try:
+            get_result_sheet_queue().enqueue(process_result_sheet_task, sheet_id)
+        except Exception as e:
+            # the sheet is served from its original file until reprocessed
+            print(e)
+
+    transaction.on_commit(on_commit)
+
+
+@job
+def process_result_sheet_task(sheet_id):
+    scan = process_result_sheet(sheet_id)
+    return dict(sheet_id=sheet_id, scan_id=scan.pk if scan is not None else None)
+
+
+def get_collation_queue_stats():
+    queue = get_collation_queue()
+    metrics = {
+        k.decode('utf-8'): float(v)
+        for k, v in queue.connection.hgetall(COLLATION_METRICS_KEY).items()
+    }
+    processed = metrics.get('processed', 0)
+    return dict(
+        queue=queue.name,
+        queued=queue.count,
+        enqueued=int(metrics.get('enqueued', 0)),
+        coalesced=int(metrics.get('coalesced', 0)),
+        processed=int(processed),
+        average_wait_seconds=metrics.get('total_wait_seconds', 0) / processed if processed else 0,
+        average_run_seconds=metrics.get('total_run_seconds', 0) / processed if processed else 0,
+        last_latency_seconds=metrics.get('last_latency_seconds', 0),
+    )
@@ -1,11 +1,25 @@
-from django.contrib.contenttypes.models import ContentType 
+import json
+import time
+import django_rq
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Value, Sum
+from django.db.models.functions import Coalesce
+from __poll.constants import StatusChoices
+from __poll.utils.utils import get_content_type_model
+from __geo.helpers.hierarchy import get_geo_hierarchy
+from __poll.utils.report_rows import refresh_report_rows
+from __poll.utils.live import publish_collation_change
+from __poll.utils.snapshots import take_interval_snapshot
 
 
 def save_supernational_collation_sheet(sheet):
     # source_model: NationalCollationSheet
-    source_model = ContentType.objects.get(model='nationalcollationsheet').model_class()
+    source_model = get_content_type_model('nationalcollationsheet')
     # target_model: SupernationalCollationSheet
-    target_model = ContentType.objects.get(model='supernationalcollationsheet').model_class()
+    target_model = get_content_type_model('supernationalcollationsheet')
     cs = None
     if sheet is not None:
         parent_sheet = sheet.region.nation
@@ -56,9 +70,9 @@ def save_supernational_collation_sheet(sheet):
 
 def save_national_collation_sheet(sheet):
     # source_model: RegionalCollationSheet
-    source_model = ContentType.objects.get(model='regionalcollationsheet').model_class()
+    source_model = get_content_type_model('regionalcollationsheet')
     # target_model: NationalCollationSheet
-    target_model = ContentType.objects.get(model='nationalcollationsheet').model_class()
+    target_model = get_content_type_model('nationalcollationsheet')
     cs = None
     if sheet is not None:
         parent_sheet = sheet.constituency.region
@@ -109,9 +123,9 @@ def save_national_collation_sheet(sheet):
 
 def save_regional_collation_sheet(sheet):
     # source_model: ConstituencyCollationSheet
-    source_model = ContentType.objects.get(model='constituencycollationsheet').model_class()
+    source_model = get_content_type_model('constituencycollationsheet')
     # target_model: RegionalCollationSheet
-    target_model = ContentType.objects.get(model='regionalcollationsheet').model_class()
+    target_model = get_content_type_model('regionalcollationsheet')
     cs = None
     if sheet is not None:
         parent_sheet = sheet.station.constituency
@@ -162,9 +176,9 @@ def save_regional_collation_sheet(sheet):
 
 def save_constituency_collation_sheet(sheet):
     # source_model: StationCollationSheet
-    source_model = ContentType.objects.get(model='stationcollationsheet').model_class()
+    source_model = get_content_type_model('stationcollationsheet')
     # target_model: ConstituencyCollationSheet
-    target_model = ContentType.objects.get(model='constituencycollationsheet').model_class()
+    target_model = get_content_type_model('constituencycollationsheet')
     cs = None
     if sheet is not None:
         parent_sheet = sheet.station
@@ -215,9 +229,9 @@ def save_constituency_collation_sheet(sheet):
 
 def save_station_collation_sheet(result):
     # source_model: Result
-    source_model = ContentType.objects.get(model='result').model_class()
+    source_model = get_content_type_model('result')
     # target_model: StationCollationSheet
-    target_model = ContentType.objects.get(model='stationcollationsheet').model_class()
+    target_model = get_content_type_model('stationcollationsheet')
     cs = None
     result_sheet = result.result_sheet
     if result is not None and result_sheet is not None:
@@ -277,3 +291,583 @@ def save_station_collation_sheet(result):
         # cs.save()
                     
     return cs
+
+
+# DELTA COLLATION
+# A result only ever moves its own votes, so instead of re-summing every
+# child sheet (the save_*_collation_sheet cascade above) the difference
+# between the previously collated and the new vote count is pushed up
+# through all five collation levels with atomic `total_votes + delta`
+# updates: a constant number of writes per result save.
+
+def get_station_ancestors(station_id):
+    '''(constituency_id, region_id, nation_id) from the geo hierarchy index'''
+    ancestors = get_geo_hierarchy().station_ancestors(station_id)
+    if ancestors is None:
+        # station newer than this process's index, read it directly
+        station = apps.get_model('__geo', 'Station').objects \
+                            .values_list(
+                                'constituency_id',
+                                'constituency__region_id',
+                                'constituency__region__nation_id',
+                            ) \
+                            .filter(pk=station_id) \
+                            .first()
+        if station is not None and None not in station:
+            ancestors = station
+    return ancestors
+
+
+def get_collation_delta_keys(station_id, candidate_id):
+    '''Returns (model, lookup) pairs for every collation sheet a result rolls into'''
+    candidate_model = apps.get_model('__people', 'Candidate')
+    ancestors = get_station_ancestors(station_id)
+    candidate = candidate_model.objects \
+                            .values('party_id', 'position__zone_ct_id') \
+                            .filter(pk=candidate_id) \
+                            .first()
+    if ancestors is None or candidate is None:
+        return []
+    constituency_id, region_id, nation_id = ancestors
+    zone_ct_id = candidate['position__zone_ct_id']
+    party_id = candidate['party_id']
+    return [
+        (apps.get_model('__poll', 'StationCollationSheet'),
+            dict(station_id=station_id, candidate_id=candidate_id, zone_ct_id=zone_ct_id)),
+        (apps.get_model('__poll', 'ConstituencyCollationSheet'),
+            dict(station_id=station_id, party_id=party_id, zone_ct_id=zone_ct_id)),
+        (apps.get_model('__poll', 'RegionalCollationSheet'),
+            dict(constituency_id=constituency_id, party_id=party_id, zone_ct_id=zone_ct_id)),
+        (apps.get_model('__poll', 'NationalCollationSheet'),
+            dict(region_id=region_id, party_id=party_id, zone_ct_id=zone_ct_id)),
+        (apps.get_model('__poll', 'SupernationalCollationSheet'),
+            dict(nation_id=nation_id, party_id=party_id, zone_ct_id=zone_ct_id)),
+    ]
+
+
+def increment_collation_sheet(model, lookup, votes_delta, total_invalid_votes=None):
+    '''Atomically adds votes_delta to a single collation sheet, creating it when missing'''
+    updates = dict(total_votes=Coalesce(F('total_votes'), Value(0)) + votes_delta)
+    if total_invalid_votes is not None:
+        updates['total_invalid_votes'] = total_invalid_votes
+    if model.objects.filter(**lookup).update(**updates) > 0:
+        return
+    if None in lookup.values():
+        # NULLs never conflict on the natural key constraint, so creators of
+        # such a sheet are serialised on an advisory lock held until commit
+        sheet_key = model._meta.db_table + ':' + ':'.join([f'{k}={lookup[k]}' for k in sorted(lookup)])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [sheet_key])
+        if model.objects.filter(**lookup).update(**updates) > 0:
+            return
+    try:
+        # savepoint so a concurrent insert of the same sheet (caught by the
+        # natural key constraint) does not poison the surrounding transaction
+        with transaction.atomic():
+            model.objects.create(**lookup,
+                                 total_votes=votes_delta,
+                                 total_invalid_votes=total_invalid_votes or 0,
+                                 total_votes_ec=0)
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**updates)
+
+
+COLLATION_REBUILD_LOCK = 'collation:rebuild'
+COLLATION_REGION_LOCK = 'collation:rebuild:region:{}'
+COLLATION_STATION_LOCK = 'collation:station:{}:{}'
+
+
+def lock_collation_rebuild(shared=False):
+    '''
+    Takes the collation rebuild advisory lock until the current transaction
+    ends. Full recollations hold it exclusively, delta writers share it, so
+    deltas queue behind a rebuild instead of racing its delete and reinsert.
+    '''
+    lock = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {lock}(hashtext(%s))', [COLLATION_REBUILD_LOCK])
+
+
+def lock_region_collation(region_id, shared=False):
+    '''
+    Takes a region's collation lock until the current transaction ends. A
+    region's recollation holds it exclusively while only sharing the rebuild
+    lock, so deltas into that region wait for the new totals rather than being
+    overwritten by a snapshot taken before they committed. Always taken after
+    the rebuild lock.
+    '''
+    lock = 'pg_advisory_xact_lock_shared' if shared else 'pg_advisory_xact_lock'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {lock}(hashtext(%s))', [COLLATION_REGION_LOCK.format(region_id)])
+
+
+def lock_station_collation(station_id, position_id):
+    '''
+    Takes a station/position's collation lock until the current transaction
+    ends, so one reconciliation at a time reads its results and station sheets
+    and applies the difference. Taken after the rebuild lock.
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))',
+                       [COLLATION_STATION_LOCK.format(station_id, position_id)])
+
+
+# COLLATION VERSIONS
+# Cached reports are keyed by the versions of what they read: every change
+# bumps the global version, deltas also bump the version of each zone they
+# touched (per position type) and full rebuilds bump the epoch, so a cached
+# page is only recomputed once the sheets behind it have changed.
+
+COLLATION_VERSION_KEY = 'collation:version'
+COLLATION_EPOCH_KEY = 'collation:epoch'
+COLLATION_ZONE_VERSION_KEY = 'collation:version:{}:{}:{}'
+
+
+def get_collation_zone_version_key(zone_ct_id, zone_type, zone_id):
+    return COLLATION_ZONE_VERSION_KEY.format(zone_ct_id, zone_type, zone_id)
+
+
+def bump_collation_versions(keys):
+    '''Increments every version key, returns the new versions'''
+    versions = dict()
+    try:
+        for key in keys:
+            cache.add(key, 0, timeout=None)
+            versions[key] = cache.incr(key)
+    except Exception as e:
+        # reports are then served from cache until their timeout
+        print(e)
+    return versions
+
+
+# REPORT REFRESH
+# A change's report rows are refreshed, and its versions bumped, after the
+# change commits. With REPORT_REFRESH_ASYNC this runs on the collation queue
+# instead of the request thread: the changed zones are added to a pending set
+# and only the first change schedules a job, which clears the marker, takes
+# the whole set and refreshes it at once (like the coalesced collation jobs
+# of __poll.tasks). Versions are only bumped once the rows are refreshed, a
+# failed refresh puts its zones back for the next job.
+
+REPORT_REFRESH_PENDING_KEY = 'collation:refresh:pending'
+REPORT_REFRESH_ZONES_KEY = 'collation:refresh:zones'
+# pending set member of a full refresh
+REPORT_REFRESH_REBUILT = 'rebuilt'
+# markers outlive a lost job by at most this long
+REPORT_REFRESH_PENDING_TIMEOUT = 3600
+
+
+def get_collation_change_keys(zone_ct_id=None, zones=(), rebuilt=False):
+    '''Version keys bumped by a change'''
+    keys = [COLLATION_VERSION_KEY]
+    if rebuilt:
+        keys.append(COLLATION_EPOCH_KEY)
+    keys.extend([get_collation_zone_version_key(zone_ct_id, zone_type, zone_id)
+                 for zone_type, zone_id in zones])
+    return keys
+
+
+def refresh_collation_changes(changes):
+    '''
+    Refreshes the report rows of (zone_ct_id, zones, rebuilt) changes, then
+    bumps their versions, publishes them to live viewers and takes any
+    interval snapshot due. Raises, bumping nothing, when the refresh fails.
+    '''
+    rebuilt = any([change_rebuilt for _, _, change_rebuilt in changes])
+    zones = {zone for _, change_zones, _ in changes for zone in change_zones}
+    # before the bump so no page is cached under the new version from stale rows
+    if rebuilt or len(zones) > 0:
+        refresh_report_rows(None if rebuilt else list(zones))
+    keys = []
+    for zone_ct_id, change_zones, change_rebuilt in changes:
+        keys.extend(get_collation_change_keys(zone_ct_id, change_zones, change_rebuilt))
+    versions = bump_collation_versions(list(dict.fromkeys(keys)))
+    if COLLATION_VERSION_KEY in versions:
+        for zone_ct_id, change_zones, change_rebuilt in changes:
+            publish_collation_change(versions[COLLATION_VERSION_KEY],
+                                     zone_ct_id=zone_ct_id,
+                                     zones=change_zones,
+                                     rebuilt=change_rebuilt)
+    # records the trend whichever way the change was collated
+    try:
+        take_interval_snapshot()
+    except Exception as e:
+        print(e)
+    return versions
+
+
+def get_refresh_connection():
+    return django_rq.get_connection(settings.COLLATION_QUEUE)
+
+
+def dump_refresh_change(zone_ct_id, zones, rebuilt):
+    if rebuilt:
+        return [REPORT_REFRESH_REBUILT]
+    return [json.dumps([zone_ct_id, zone_type, zone_id]) for zone_type, zone_id in zones]
+
+
+def load_refresh_changes(members):
+    changes = dict()
+    rebuilt = False
+    for member in members:
+        member = member.decode('utf-8')
+        if member == REPORT_REFRESH_REBUILT:
+            rebuilt = True
+            continue
+        zone_ct_id, zone_type, zone_id = json.loads(member)
+        changes.setdefault(zone_ct_id, []).append((zone_type, zone_id))
+    changes = [(zone_ct_id, zones, False) for zone_ct_id, zones in changes.items()]
+    if rebuilt:
+        changes.append((None, [], True))
+    return changes
+
+
+def enqueue_collation_refresh(zone_ct_id=None, zones=(), rebuilt=False):
+    '''Adds a change to the pending refresh, queueing a job unless one is waiting'''
+    connection = get_refresh_connection()
+    members = dump_refresh_change(zone_ct_id, zones, rebuilt)
+    if len(members) > 0:
+        connection.sadd(REPORT_REFRESH_ZONES_KEY, *members)
+    # later changes are picked up by the waiting job
+    if not connection.set(REPORT_REFRESH_PENDING_KEY, time.time(), nx=True, ex=REPORT_REFRESH_PENDING_TIMEOUT):
+        return None
+    return django_rq.get_queue(settings.COLLATION_QUEUE).enqueue(refresh_collation_changes_task)
+
+
+def refresh_collation_changes_task():
+    connection = get_refresh_connection()
+    # clear the marker first: changes made while this runs need a new job
+    connection.delete(REPORT_REFRESH_PENDING_KEY)
+    pipe = connection.pipeline()
+    pipe.smembers(REPORT_REFRESH_ZONES_KEY)
+    pipe.delete(REPORT_REFRESH_ZONES_KEY)
+    members = list(pipe.execute()[0])
+    if len(members) == 0:
+        return None
+    try:
+        versions = refresh_collation_changes(load_refresh_changes(members))
+    except Exception:
+        # the versions stay put, the next job refreshes these zones too
+        connection.sadd(REPORT_REFRESH_ZONES_KEY, *members)
+        raise
+    return dict(changes=len(members), version=versions.get(COLLATION_VERSION_KEY))
+
+
+def mark_collation_changed(zone_ct_id=None, zones=(), rebuilt=False, refresh=True):
+    '''
+    Refreshes the report rows, bumps the collation versions, publishes the
+    change to live viewers and takes any interval snapshot due once the
+    current transaction commits (see refresh_collation_changes). zones are the (zone type, zone id) pairs a
+    delta touched, rebuilt marks a change to any sheet (a full or partial
+    recollation, whose report rows are all refreshed unless refresh is off).
+    '''
+    zones = list(zones)
+
+    def on_commit():
+        if not refresh:
+            # without a refresh the viewers would reload the rows as they were
+            bump_collation_versions(get_collation_change_keys(zone_ct_id, zones, rebuilt))
+            return
+        if settings.REPORT_REFRESH_ASYNC:
+            try:
+                enqueue_collation_refresh(zone_ct_id, zones, rebuilt)
+                return
+            except Exception as e:
+                # without the queue the change is refreshed here
+                print(e)
+        try:
+            refresh_collation_changes([(zone_ct_id, zones, rebuilt)])
+        except Exception as e:
+            # cached pages keep the versions matching the rows they were built from
+            print(e)
+
+    transaction.on_commit(on_commit)
+
+
+def get_station_zones(station_id, ancestors):
+    '''(zone type, zone id) pairs of a station and its ancestors'''
+    zones = [('station', station_id)]
+    if ancestors is not None:
+        zones.extend(zip(['constituency', 'region', 'nation'], ancestors))
+    return zones
+
+
+def apply_collation_delta(station_id, candidate_id, votes_delta, total_invalid_votes=None, mark_changed=True):
+    '''
+    Pushes a change of votes_delta for one candidate at one station up through
+    the station, constituency, regional, national and supernational sheets.
+    total_invalid_votes (if given) is written to the station sheet as-is.
+    Without mark_changed the caller marks the change (see mark_collation_changed).
+    Returns the number of sheets written.
+    '''
+    if station_id is None or candidate_id is None:
+        return 0
+    if not votes_delta and total_invalid_votes is None:
+        return 0
+    collation_keys = get_collation_delta_keys(station_id, candidate_id)
+    region_id = collation_keys[3][1]['region_id'] if len(collation_keys) > 3 else None
+    # the reports of every level show the station's invalid votes, so an
+    # invalid-only change still marks the ancestors
+    zones = [(zone_type, lookup[f'{zone_type}_id'])
+             for zone_type, (model, lookup) in zip(['station', 'station', 'constituency', 'region', 'nation'],
+                                                   collation_keys)]
+    if not votes_delta:
+        # nothing to roll up, only the station sheet's invalid votes change
+        collation_keys = collation_keys[:1]
+    with transaction.atomic():
+        lock_collation_rebuild(shared=True)
+        if region_id is not None:
+            lock_region_collation(region_id, shared=True)
+        for level, (model, lookup) in enumerate(collation_keys):
+            increment_collation_sheet(model, lookup, votes_delta,
+                                      total_invalid_votes=total_invalid_votes if level == 0 else None)
+        if len(collation_keys) > 0 and mark_changed:
+            mark_collation_changed(collation_keys[0][1]['zone_ct_id'], list(set(zones)))
+    return len(collation_keys)
+
+
+def get_collated_state(result):
+    '''Snapshot of the result fields that decide what (and where) it is collated'''
+    # unsaved results have not been collated anywhere yet
+    if result.pk is None:
+        return (None, None, None)
+    # read from __dict__ so deferred fields never trigger a query
+    values = result.__dict__
+    return (values.get('station_id'), values.get('candidate_id'), values.get('votes'))
+
+
+def lock_collated_state(result):
+    '''
+    Locks a result's row until the transaction ends and takes its stored
+    fields as the collated state, rather than what the instance was loaded
+    with: a stale instance would otherwise apply its delta from an old total.
+    '''
+    if result.pk is None:
+        return
+    state = result.__class__.objects \
+                        .select_for_update() \
+                        .values_list('station_id', 'candidate_id', 'votes') \
+                        .filter(pk=result.pk) \
+                        .first()
+    result._collated_state = (None, None, None) if state is None else tuple(state)
+
+
+def collate_result_delta(result, deleted=False):
+    '''Applies the difference between a result's last collated state and its current state'''
+    old_station_id, old_candidate_id, old_votes = getattr(result, '_collated_state', (None, None, None))
+    station_id, candidate_id, votes = (None, None, None) if deleted else get_collated_state(result)
+    old_votes = old_votes or 0
+    votes = votes or 0
+    total_invalid_votes = None
+    if not deleted and result.result_sheet_id is not None:
+        total_invalid_votes = result.result_sheet.total_invalid_votes
+    total = 0
+    if (old_station_id, old_candidate_id) == (station_id, candidate_id):
+        total += apply_collation_delta(station_id, candidate_id, votes - old_votes,
+                                       total_invalid_votes=total_invalid_votes)
+    else:
+        # the result moved to another station/candidate (or was removed):
+        # take its votes out of the old sheets and add them to the new ones
+        total += apply_collation_delta(old_station_id, old_candidate_id, -old_votes)
+        total += apply_collation_delta(station_id, candidate_id, votes,
+                                       total_invalid_votes=total_invalid_votes)
+    result._collated_state = get_collated_state(result)
+    return total
+
+
+def collate_station_position(station_id, position_id):
+    '''
+    Reconciles the collation sheets of one station/position with its Result rows.
+    The station sheets hold what has been collated so far, so the difference per
+    candidate is applied upwards; running it twice is a no-op, which is what lets
+    queued collation jobs for the same station/position be coalesced into one.
+    The difference is read and applied under the station/position's lock, so
+    two reconciliations (or one and a batch) never apply it twice.
+    '''
+    result_model = apps.get_model('__poll', 'Result')
+    result_sheet_model = apps.get_model('__poll', 'ResultSheet')
+    station_sheet_model = apps.get_model('__poll', 'StationCollationSheet')
+    with transaction.atomic():
+        lock_collation_rebuild(shared=True)
+        lock_station_collation(station_id, position_id)
+        result_votes = {
+            r['candidate_id']: r['votes'] or 0
+            for r in result_model.objects \
+                                .filter(station_id=station_id,
+                                        candidate__position_id=position_id) \
+                                .values('candidate_id') \
+                                .annotate(votes=Sum('votes'))
+        }
+        collated_votes = {
+            s['candidate_id']: s['votes'] or 0
+            for s in station_sheet_model.objects \
+                                .filter(station_id=station_id,
+                                        candidate__position_id=position_id) \
+                                .values('candidate_id') \
+                                .annotate(votes=Sum('total_votes'))
+        }
+        total_invalid_votes = result_sheet_model.objects \
+                                .filter(station_id=station_id, position_id=position_id) \
+                                .values_list('total_invalid_votes', flat=True) \
+                                .first()
+        total = 0
+        for candidate_id in set(result_votes) | set(collated_votes):
+            votes_delta = result_votes.get(candidate_id, 0) - collated_votes.get(candidate_id, 0)
+            total += apply_collation_delta(station_id, candidate_id, votes_delta,
+                                           total_invalid_votes=total_invalid_votes if candidate_id in result_votes else None,
+                                           mark_changed=False)
+        if total > 0:
+            # one report refresh and version bump for the whole station/position
+            zone_ct_id = apps.get_model('__poll', 'Position').objects \
+                                .values_list('zone_ct_id', flat=True) \
+                                .filter(pk=position_id) \
+                                .first()
+            mark_collation_changed(zone_ct_id, get_station_zones(station_id, get_station_ancestors(station_id)))
+    return total
+
+
+# BATCH COLLATION
+# Results written set-based (see __poll.utils.ingest) bypass the Result
+# signals, so their station/positions are reconciled together: the delta of
+# every station/candidate between its results and its station sheet is read
+# in one query, summed per sheet key and applied to each level with a single
+# statement, then the change is marked once per position type. The batch
+# holds the rebuild lock exclusively as its inserts are not serialised per
+# sheet key like increment_collation_sheet.
+
+BATCH_COLLATION_LEVELS = [
+    ('poll_station_collation_sheet', ['station_id', 'candidate_id', 'zone_ct_id']),
+    ('poll_constituency_collation_sheet', ['station_id', 'party_id', 'zone_ct_id']),
+    ('poll_regional_collation_sheet', ['constituency_id', 'party_id', 'zone_ct_id']),
+    ('poll_national_collation_sheet', ['region_id', 'party_id', 'zone_ct_id']),
+    ('poll_supernational_collation_sheet', ['nation_id', 'party_id', 'zone_ct_id']),
+]
+
+BATCH_COLLATION_FIELDS = ['station_id', 'candidate_id', 'party_id', 'zone_ct_id',
+                          'constituency_id', 'region_id', 'nation_id', 'votes_delta']
+
+BATCH_COLLATION_DELTA_QUERY = '''WITH touched AS (
+                    SELECT DISTINCT p.station_id, p.position_id
+                    FROM UNNEST(%(station_ids)s::integer[], %(position_ids)s::integer[])
+                        AS p(station_id, position_id)
+                ),
+                results AS (
+                    SELECT r.station_id, r.candidate_id, SUM(COALESCE(r.votes, 0)) AS votes
+                    FROM poll_result r
+                        INNER JOIN people_candidate ca ON ca.id = r.candidate_id
+                        INNER JOIN touched p ON p.station_id = r.station_id AND p.position_id = ca.position_id
+                    GROUP BY r.station_id, r.candidate_id
+                ),
+                collated AS (
+                    SELECT s.station_id, s.candidate_id, SUM(COALESCE(s.total_votes, 0)) AS votes
+                    FROM poll_station_collation_sheet s
+                        INNER JOIN people_candidate ca ON ca.id = s.candidate_id
+                        INNER JOIN touched p ON p.station_id = s.station_id AND p.position_id = ca.position_id
+                    GROUP BY s.station_id, s.candidate_id
+                ),
+                deltas AS (
+                    SELECT COALESCE(r.station_id, c.station_id) AS station_id,
+                           COALESCE(r.candidate_id, c.candidate_id) AS candidate_id,
+                           COALESCE(r.votes, 0) - COALESCE(c.votes, 0) AS votes_delta
+                    FROM results r
+                        FULL JOIN collated c ON c.station_id = r.station_id AND c.candidate_id = r.candidate_id
+                )
+                SELECT d.station_id, d.candidate_id, ca.party_id, pos.zone_ct_id,
+                       st.constituency_id, co.region_id, re.nation_id, d.votes_delta::bigint
+                FROM deltas d
+                    INNER JOIN people_candidate ca ON ca.id = d.candidate_id
+                    LEFT JOIN poll_position pos ON pos.id = ca.position_id
+                    INNER JOIN geo_station st ON st.id = d.station_id
+                    INNER JOIN geo_constituency co ON co.id = st.constituency_id
+                    INNER JOIN geo_region re ON re.id = co.region_id
+                WHERE d.votes_delta <> 0'''
+
+
+def get_batch_increment_query(table, key_fields):
+    '''Adds %(votes_delta)s to the sheets of each key in the key arrays, inserting the missing ones'''
+    keys = ', '.join(key_fields)
+    unnest = ', '.join([f'%({key})s::integer[]' for key in key_fields])
+    match = ' AND '.join([f't.{key} IS NOT DISTINCT FROM d.{key}' for key in key_fields])
+    updated_match = ' AND '.join([f'u.{key} IS NOT DISTINCT FROM d.{key}' for key in key_fields])
+    return f'''WITH d AS (
+                    SELECT * FROM UNNEST({unnest}, %(votes_delta)s::bigint[]) AS d({keys}, votes_delta)
+                ),
+                updated AS (
+                    UPDATE {table} t
+                        SET total_votes = COALESCE(t.total_votes, 0) + d.votes_delta
+                        FROM d
+                        WHERE {match}
+                    RETURNING {', '.join([f't.{key}' for key in key_fields])}
+                ),
+                inserted AS (
+                    INSERT INTO {table}
+                        ({keys}, total_votes, total_invalid_votes, total_votes_ec, status, created_at)
+                    SELECT {keys}, votes_delta, 0, 0, %(status)s, NOW()
+                        FROM d
+                        WHERE NOT EXISTS (SELECT 1 FROM updated u WHERE {updated_match})
+                    RETURNING id
+                )
+                SELECT (SELECT COUNT(*) FROM updated) + (SELECT COUNT(*) FROM inserted);'''
+
+
+BATCH_INVALID_VOTES_QUERY = '''UPDATE poll_station_collation_sheet s
+                SET total_invalid_votes = rs.total_invalid_votes
+                FROM people_candidate ca, poll_position pos, poll_result_sheet rs,
+                    geo_station st, geo_constituency co, geo_region re,
+                    UNNEST(%(station_ids)s::integer[], %(position_ids)s::integer[]) AS p(station_id, position_id)
+                WHERE ca.id = s.candidate_id
+                    AND pos.id = ca.position_id
+                    AND st.id = s.station_id
+                    AND co.id = st.constituency_id
+                    AND re.id = co.region_id
+                    AND s.station_id = p.station_id
+                    AND ca.position_id = p.position_id
+                    AND rs.station_id = p.station_id
+                    AND rs.position_id = p.position_id
+                    AND s.total_invalid_votes IS DISTINCT FROM rs.total_invalid_votes
+                RETURNING s.station_id, pos.zone_ct_id, st.constituency_id, co.region_id, re.nation_id'''
+
+
+def collate_station_positions(station_positions):
+    '''
+    Reconciles the collation sheets of many (station id, position id) pairs
+    with their Result rows in one pass, like collate_station_position does
+    for one. Returns the number of sheets written.
+    '''
+    station_positions = list({(s, p) for s, p in station_positions if s is not None and p is not None})
+    if len(station_positions) == 0:
+        return 0
+    params = dict(station_ids=[s for s, p in station_positions],
+                  position_ids=[p for s, p in station_positions])
+    total = 0
+    with transaction.atomic():
+        lock_collation_rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute(BATCH_COLLATION_DELTA_QUERY, params)
+            deltas = [dict(zip(BATCH_COLLATION_FIELDS, row)) for row in cursor.fetchall()]
+            for table, key_fields in BATCH_COLLATION_LEVELS:
+                level_deltas = dict()
+                for delta in deltas:
+                    key = tuple([delta[key] for key in key_fields])
+                    level_deltas[key] = level_deltas.get(key, 0) + delta['votes_delta']
+                level_params = {key: [k[i] for k in level_deltas.keys()] for i, key in enumerate(key_fields)}
+                level_params.update(votes_delta=list(level_deltas.values()), status=StatusChoices.ACTIVE)
+                if len(level_deltas) > 0:
+                    cursor.execute(get_batch_increment_query(table, key_fields), level_params)
+                    total += cursor.fetchone()[0]
+            cursor.execute(BATCH_INVALID_VOTES_QUERY, params)
+            invalid_votes_changed = cursor.fetchall()
+            total += len(invalid_votes_changed)
+
+        # one report refresh and version bump per position type
+        zones_by_zone_ct = dict()
+        for delta in deltas:
+            zones = zones_by_zone_ct.setdefault(delta['zone_ct_id'], set())
+            zones.update(get_station_zones(delta['station_id'],
+                                           (delta['constituency_id'], delta['region_id'], delta['nation_id'])))
+        for station_id, zone_ct_id, *ancestors in invalid_votes_changed:
+            # the reports of every level show the station's invalid votes
+            zones_by_zone_ct.setdefault(zone_ct_id, set()).update(get_station_zones(station_id, ancestors))
+        for zone_ct_id, zones in zones_by_zone_ct.items():
+            mark_collation_changed(zone_ct_id, list(zones))
+    return total
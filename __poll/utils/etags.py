@@ -0,0 +1,99 @@
+import hashlib
+import uuid
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+from __geo.helpers.hierarchy import GEO_HIERARCHY_VERSION_KEY
+from __poll.utils.collations import COLLATION_VERSION_KEY, COLLATION_EPOCH_KEY
+
+
+# CONDITIONAL GET
+# Responses built from collated data carry an ETag made of the versions of
+# what they read (geo, collation and result sheet versions, all kept in the
+# cache), so a client revalidating an unchanged response is answered 304
+# from a single cache read, before any query runs. The ETag is per session
+# as the pages embed the user and their CSRF token. The versions start over
+# when the cache is flushed, so the ETag also carries an epoch drawn once per
+# cache lifetime: a client's copy from before a flush never matches again.
+
+RESULT_SHEET_VERSION_KEY = 'result-sheet:version'
+AGENT_VERSION_KEY = 'agent:version'
+CACHE_EPOCH_KEY = 'cache:epoch'
+
+# what the geo listings show: the zones, their agents, their collated totals
+# and the result sheets and approvals of their stations
+GEO_LIST_VERSION_KEYS = [GEO_HIERARCHY_VERSION_KEY, COLLATION_VERSION_KEY,
+                         COLLATION_EPOCH_KEY, RESULT_SHEET_VERSION_KEY, AGENT_VERSION_KEY]
+DASHBOARD_VERSION_KEYS = [GEO_HIERARCHY_VERSION_KEY, COLLATION_VERSION_KEY]
+
+
+def mark_version_changed(key):
+    '''Bumps the version at key once the current transaction commits'''
+    def on_commit():
+        try:
+            cache.add(key, 0, timeout=None)
+            cache.incr(key)
+        except Exception as e:
+            print(e)
+
+    transaction.on_commit(on_commit)
+
+
+def mark_result_sheets_changed():
+    mark_version_changed(RESULT_SHEET_VERSION_KEY)
+
+
+def mark_agents_changed():
+    mark_version_changed(AGENT_VERSION_KEY)
+
+
+def get_cache_epoch(epoch=None):
+    '''The cache's epoch, drawn by the first caller after the cache was (re)started'''
+    if epoch is None:
+        cache.add(CACHE_EPOCH_KEY, uuid.uuid4().hex, timeout=None)
+        epoch = cache.get(CACHE_EPOCH_KEY)
+    return epoch
+
+
+def get_version_etag(request, *versions, epoch=None):
+    '''ETag of a request's path and session at the given versions, None without the cache'''
+    try:
+        epoch = get_cache_epoch(epoch)
+    except Exception as e:
+        print(e)
+        return None
+    session = getattr(request, 'session', None)
+    parts = [request.get_full_path(), session.session_key if session is not None else None, epoch]
+    parts.extend(versions)
+    return hashlib.md5(':'.join([str(part) for part in parts]).encode()).hexdigest()
+
+
+def get_cached_versions_etag(request, keys):
+    try:
+        versions = cache.get_many(keys + [CACHE_EPOCH_KEY])
+    except Exception as e:
+        # without the versions nothing can be validated
+        print(e)
+        return None
+    return get_version_etag(request, *[versions.get(key, 0) for key in keys],
+                            epoch=versions.get(CACHE_EPOCH_KEY))
+
+
+def get_not_modified_response(request, etag):
+    '''The 304 (or 412) response when the request's conditions match etag, else None'''
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=quote_etag(etag))
+
+
+def set_response_etag(request, response, etag):
+    if etag is not None and request.method in ('GET', 'HEAD'):
+        response.headers.setdefault('ETag', quote_etag(etag))
+    return response
+
+
+def versioned_etag(keys):
+    '''Answers a GET with 304 while the cached versions of keys are unchanged'''
+    return condition(etag_func=lambda request, *args, **kwargs: get_cached_versions_etag(request, keys))
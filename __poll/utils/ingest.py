@@ -0,0 +1,298 @@
+import django_rq
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from redis.exceptions import ResponseError
+from __poll.constants import StatusChoices
+from __poll.utils.utils import get_zone_ct_id
+from __poll.utils.etags import mark_result_sheets_changed
+from __poll.utils.collations import collate_station_positions
+from __poll.tasks import collate_batch_after_commit
+
+
+# RESULT INGEST
+# Data entry centres submit the result sheets of many stations at once. A
+# batch is checked against the stations, positions and candidates with one
+# query each, then its result sheets and results are written with one
+# statement each in a single transaction, matched on (station, position) and
+# (station, candidate) like the result form's update_or_create. Those keys
+# are not unique in the schema, so rather than relying on ON CONFLICT every
+# writer of a station/position sheet (a batch, an offline sync or the result
+# form) first takes that sheet's advisory lock. A candidate stands for one
+# position, so the lock covers the sheet's results too. Batches of different
+# sheets are written side by side. Collation then runs once for the whole
+# batch (see collate_station_positions), once the writes are committed, so
+# only the collation waits on the rebuild lock rather than the writes too.
+
+RESULT_SHEET_LOCK = 'result:sheet:'
+
+# locks taken in key order, so batches sharing sheets cannot deadlock
+RESULT_SHEET_LOCK_QUERY = '''SELECT pg_advisory_xact_lock(hashtext(%(lock)s || k.station_id || ':' || k.position_id))
+                FROM (SELECT DISTINCT station_id, position_id
+                      FROM UNNEST(%(station_ids)s::bigint[], %(position_ids)s::bigint[])
+                          AS p(station_id, position_id)
+                      ORDER BY station_id, position_id) k'''
+
+RESULT_SHEET_UPSERT_QUERY = '''WITH source AS (
+                    SELECT * FROM UNNEST(%(station_ids)s::bigint[], %(position_ids)s::bigint[],
+                                         %(total_votes)s::bigint[], %(total_valid_votes)s::bigint[],
+                                         %(total_invalid_votes)s::bigint[], %(stream_ids)s::text[])
+                        AS s(station_id, position_id, total_votes, total_valid_votes, total_invalid_votes, stream_id)
+                ),
+                updated AS (
+                    UPDATE poll_result_sheet t
+                        SET total_votes = s.total_votes,
+                            total_valid_votes = s.total_valid_votes,
+                            total_invalid_votes = s.total_invalid_votes,
+                            stream_id = COALESCE(s.stream_id, t.stream_id),
+                            station_agent_id = NULL,
+                            station_approval_at = NULL,
+                            status = %(status)s
+                        FROM source s
+                        WHERE t.station_id = s.station_id
+                            AND t.position_id = s.position_id
+                    RETURNING t.id, t.station_id, t.position_id
+                ),
+                inserted AS (
+                    INSERT INTO poll_result_sheet
+                        (station_id, position_id, total_votes, total_valid_votes, total_invalid_votes, stream_id,
+                         status, created_at)
+                    SELECT s.station_id, s.position_id, s.total_votes, s.total_valid_votes, s.total_invalid_votes,
+                           s.stream_id, %(status)s, NOW()
+                        FROM source s
+                        WHERE NOT EXISTS (SELECT 1 FROM updated u
+                                          WHERE u.station_id = s.station_id
+                                              AND u.position_id = s.position_id)
+                    RETURNING id, station_id, position_id
+                )
+                SELECT id, station_id, position_id, FALSE FROM updated
+                UNION ALL
+                SELECT id, station_id, position_id, TRUE FROM inserted'''
+
+RESULT_UPSERT_QUERY = '''WITH source AS (
+                    SELECT * FROM UNNEST(%(station_ids)s::bigint[], %(candidate_ids)s::bigint[],
+                                         %(votes)s::bigint[], %(result_sheet_ids)s::bigint[])
+                        AS s(station_id, candidate_id, votes, result_sheet_id)
+                ),
+                updated AS (
+                    UPDATE poll_result t
+                        SET votes = s.votes,
+                            result_sheet_id = s.result_sheet_id,
+                            station_agent_id = NULL,
+                            status = %(status)s
+                        FROM source s
+                        WHERE t.station_id = s.station_id
+                            AND t.candidate_id = s.candidate_id
+                    RETURNING t.station_id, t.candidate_id
+                ),
+                inserted AS (
+                    INSERT INTO poll_result (station_id, candidate_id, votes, result_sheet_id, status)
+                    SELECT s.station_id, s.candidate_id, s.votes, s.result_sheet_id, %(status)s
+                        FROM source s
+                        WHERE NOT EXISTS (SELECT 1 FROM updated u
+                                          WHERE u.station_id = s.station_id
+                                              AND u.candidate_id = s.candidate_id)
+                    RETURNING id
+                )
+                SELECT (SELECT COUNT(*) FROM updated), (SELECT COUNT(*) FROM inserted);'''
+
+
+def lock_result_sheets(station_positions):
+    '''
+    Takes the advisory lock of each (station id, position id) sheet until the
+    current transaction ends, so no other writer upserts the same sheet or
+    results meanwhile.
+    '''
+    station_positions = list(station_positions)
+    with connection.cursor() as cursor:
+        cursor.execute(RESULT_SHEET_LOCK_QUERY, dict(lock=RESULT_SHEET_LOCK,
+                                                     station_ids=[s for s, p in station_positions],
+                                                     position_ids=[p for s, p in station_positions]))
+
+
+# STREAM ORDER
+# Records queued on the write-behind stream (see __poll.utils.ingest_stream)
+# are written whenever a consumer gets to them, possibly after a newer sheet
+# was written by another consumer or directly. Every sheet keeps the id of
+# the last stream entry written to it and entries not newer than that are
+# skipped. A direct write (the result form, an offline sync, an ingest without
+# write-behind) takes the id of the stream's latest entry, so nothing queued
+# before it can overwrite it either.
+
+RESULT_INGEST_STREAM = 'result:ingest:stream'
+
+
+def get_stream_connection():
+    return django_rq.get_connection(settings.COLLATION_QUEUE)
+
+
+def get_stream_id_key(stream_id):
+    '''Sort key of a stream entry id, "<milliseconds>-<sequence>"'''
+    milliseconds, sequence = stream_id.split('-')
+    return (int(milliseconds), int(sequence))
+
+
+def get_last_stream_id():
+    '''Id of the latest entry appended to the ingest stream, None when there is none'''
+    try:
+        stream = get_stream_connection().xinfo_stream(RESULT_INGEST_STREAM)
+    except ResponseError:
+        # no stream, so nothing queued to overwrite the write
+        return None
+    except Exception as e:
+        # the sheet keeps the stream id it had
+        print(e)
+        return None
+    return stream['last-generated-id'].decode('utf-8')
+
+
+def get_newer_stream_records(records, stream_ids):
+    '''
+    The records, and their entry ids, newer than the stream id their sheet
+    holds. Called with the sheets locked.
+    '''
+    sheet_model = apps.get_model('__poll', 'ResultSheet')
+    written = dict()
+    for station_id, position_id, stream_id in sheet_model.objects \
+                                                          .filter(station_id__in={record['station'] for record in records},
+                                                                  position_id__in={record['position'] for record in records},
+                                                                  stream_id__isnull=False) \
+                                                          .values_list('station_id', 'position_id', 'stream_id'):
+        key = (station_id, position_id)
+        written[key] = max(written.get(key, stream_id), stream_id, key=get_stream_id_key)
+    newer = [(record, stream_id)
+             for record, stream_id in zip(records, stream_ids)
+             if (record['station'], record['position']) not in written
+                or get_stream_id_key(stream_id) > get_stream_id_key(written[(record['station'], record['position'])])]
+    return [record for record, _ in newer], [stream_id for _, stream_id in newer]
+
+
+def get_station_position_error(station, position, zone_ct_ids):
+    '''Why a position cannot be voted for at a station, None when it can'''
+    if position['zone_ct_id'] == zone_ct_ids['nation'] and position['zone_id'] != station['nation_id']:
+        return 'The position is not contested in the station\'s nation.'
+    if position['zone_ct_id'] == zone_ct_ids['constituency'] and position['zone_id'] != station['constituency_id']:
+        return 'The position is not contested in the station\'s constituency.'
+    return None
+
+
+def validate_result_records(records):
+    '''
+    Checks that every record's station, position and candidates exist and
+    belong together, and that no station/position is submitted twice.
+    Returns {record index: {field: [errors]}}, empty when the batch is valid.
+    '''
+    station_model = apps.get_model('__geo', 'Station')
+    position_model = apps.get_model('__poll', 'Position')
+    candidate_model = apps.get_model('__people', 'Candidate')
+    stations = {
+        station['id']: station
+        for station in station_model.objects \
+                                    .filter(pk__in={record['station'] for record in records}) \
+                                    .values('id', 'constituency_id', nation_id=F('constituency__region__nation_id'))
+    }
+    positions = {
+        position['id']: position
+        for position in position_model.objects \
+                                      .filter(pk__in={record['position'] for record in records}) \
+                                      .values('id', 'zone_ct_id', 'zone_id')
+    }
+    candidate_positions = dict(candidate_model.objects \
+                                              .filter(pk__in={result['candidate']
+                                                              for record in records
+                                                              for result in record['results']}) \
+                                              .values_list('id', 'position_id'))
+    zone_ct_ids = dict(nation=get_zone_ct_id(apps.get_model('__geo', 'Nation')),
+                       constituency=get_zone_ct_id(apps.get_model('__geo', 'Constituency')))
+
+    errors = dict()
+    seen = set()
+    for index, record in enumerate(records):
+        record_errors = dict()
+        station = stations.get(record['station'])
+        position = positions.get(record['position'])
+        if station is None:
+            record_errors['station'] = ['Unknown station.']
+        if position is None:
+            record_errors['position'] = ['Unknown position.']
+        if station is not None and position is not None:
+            error = get_station_position_error(station, position, zone_ct_ids)
+            if error is not None:
+                record_errors['position'] = [error]
+        key = (record['station'], record['position'])
+        if key in seen:
+            record_errors.setdefault('position', []).append('The station\'s sheet for this position is already in the batch.')
+        seen.add(key)
+        candidate_errors = [f'Candidate {result["candidate"]} does not stand for this position.'
+                            for result in record['results']
+                            if candidate_positions.get(result['candidate']) != record['position']]
+        if len(candidate_errors) > 0:
+            record_errors['results'] = candidate_errors
+        if len(record_errors) > 0:
+            errors[index] = record_errors
+    return errors
+
+
+def ingest_result_records(records, stream_ids=None):
+    '''
+    Upserts the result sheets and results of validated records in one
+    transaction, then collates them once. stream_ids are the ids of the
+    stream entries the records come from, records older than their sheet are
+    skipped; without them the records are written as the newest.
+    Returns the number of rows written.
+    '''
+    station_positions = [(record['station'], record['position']) for record in records]
+    sheet_ids = dict()
+    sheets_created = 0
+    results_created = 0
+    results_updated = 0
+    with transaction.atomic():
+        lock_result_sheets(station_positions)
+        if stream_ids is None:
+            written = records
+            stream_ids = [get_last_stream_id()] * len(records)
+        else:
+            written, stream_ids = get_newer_stream_records(records, stream_ids)
+        if len(written) > 0:
+            with connection.cursor() as cursor:
+                cursor.execute(RESULT_SHEET_UPSERT_QUERY,
+                               dict(station_ids=[record['station'] for record in written],
+                                    position_ids=[record['position'] for record in written],
+                                    total_votes=[record['total_votes'] for record in written],
+                                    total_valid_votes=[record['total_valid_votes'] for record in written],
+                                    total_invalid_votes=[record['total_invalid_votes'] for record in written],
+                                    stream_ids=stream_ids,
+                                    status=StatusChoices.ACTIVE))
+                for sheet_id, station_id, position_id, created in cursor.fetchall():
+                    # duplicated sheets are all updated, results point at the first
+                    key = (station_id, position_id)
+                    sheet_ids[key] = min(sheet_id, sheet_ids.get(key, sheet_id))
+                    sheets_created += 1 if created else 0
+
+                results = [(record['station'], result['candidate'], result['votes'],
+                            sheet_ids[(record['station'], record['position'])])
+                           for record in written
+                           for result in record['results']]
+                cursor.execute(RESULT_UPSERT_QUERY, dict(station_ids=[r[0] for r in results],
+                                                         candidate_ids=[r[1] for r in results],
+                                                         votes=[r[2] for r in results],
+                                                         result_sheet_ids=[r[3] for r in results],
+                                                         status=StatusChoices.ACTIVE))
+                results_updated, results_created = cursor.fetchone()
+            mark_result_sheets_changed()
+
+    # skipped records are collated too, their sheets may have been written by
+    # an earlier delivery whose collation failed
+    sheets_collated = None
+    if settings.COLLATION_ASYNC:
+        transaction.on_commit(lambda: collate_batch_after_commit(station_positions))
+    else:
+        sheets_collated = collate_station_positions(station_positions)
+    return dict(records=len(records),
+                records_skipped=len(records) - len(written),
+                result_sheets_created=sheets_created,
+                result_sheets_updated=len(sheet_ids) - sheets_created,
+                results_created=results_created,
+                results_updated=results_updated,
+                sheets_collated=sheets_collated)
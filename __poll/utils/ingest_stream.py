@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import socket
+from django.conf import settings
+from redis.exceptions import ResponseError
+from __poll.utils.ingest import (RESULT_INGEST_STREAM, get_stream_connection,
+                                 validate_result_records, ingest_result_records)
+
+
+# WRITE-BEHIND INGEST
+# With RESULT_INGEST_WRITE_BEHIND, a validated batch of the ingest endpoint is
+# appended to a Redis stream and acknowledged at once, so a surge of
+# submissions waits on Redis rather than on PostgreSQL. Consumers (see the
+# drain_result_stream command, run as many as needed) read the stream in a
+# consumer group, merge up to RESULT_INGEST_STREAM_BATCH entries, the latest
+# sheet of a station/position winning, and write them with one bulk ingest
+# and one batched collation (see __poll.utils.ingest). A sheet already
+# written from a later entry, or directly, is not overwritten by an older one
+# (see STREAM ORDER there). Entries are only acknowledged and deleted once
+# written, so the stream holds exactly what is not in the database yet, and
+# entries of a consumer that died are claimed by another after
+# RESULT_INGEST_STREAM_CLAIM_IDLE seconds. An entry delivered
+# RESULT_INGEST_STREAM_MAX_DELIVERIES times without being written, as in a
+# batch failing on every attempt, is moved to the dead stream instead.
+
+RESULT_INGEST_STREAM_GROUP = 'result-ingest'
+# records no longer valid when drained (e.g. a station deleted meanwhile),
+# and entries that could not be written
+RESULT_INGEST_DEAD_STREAM = 'result:ingest:stream:dead'
+RESULT_INGEST_STREAM_METRICS_KEY = 'result:ingest:stream:metrics'
+
+
+def get_consumer_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def get_entry_age(entry_id, now=None):
+    '''Seconds since an entry was appended, from the time in its id'''
+    milliseconds = int(entry_id.decode('utf-8').split('-')[0])
+    return max(0, (now or time.time()) - milliseconds / 1000)
+
+
+def ensure_stream_group(connection):
+    try:
+        connection.xgroup_create(RESULT_INGEST_STREAM, RESULT_INGEST_STREAM_GROUP, id='0', mkstream=True)
+    except ResponseError as e:
+        # BUSYGROUP: created by another consumer
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def append_result_records(records):
+    '''Appends validated records to the stream, returns the entry id'''
+    connection = get_stream_connection()
+    pipe = connection.pipeline()
+    pipe.xadd(RESULT_INGEST_STREAM, dict(records=json.dumps(records)))
+    pipe.hincrby(RESULT_INGEST_STREAM_METRICS_KEY, 'appended', 1)
+    pipe.hincrby(RESULT_INGEST_STREAM_METRICS_KEY, 'records_appended', len(records))
+    entry_id = pipe.execute()[0]
+    return entry_id.decode('utf-8')
+
+
+def read_stream_entries(connection, consumer, count, block=None):
+    '''Entries claimed from stalled consumers first, then new ones'''
+    claimed = connection.xautoclaim(RESULT_INGEST_STREAM, RESULT_INGEST_STREAM_GROUP, consumer,
+                                    min_idle_time=settings.RESULT_INGEST_STREAM_CLAIM_IDLE * 1000,
+                                    count=count)
+    entries = claimed[1]
+    if len(entries) < count:
+        for _, stream_entries in connection.xreadgroup(RESULT_INGEST_STREAM_GROUP, consumer,
+                                                       {RESULT_INGEST_STREAM: '>'},
+                                                       count=count - len(entries),
+                                                       block=block if len(entries) == 0 else None):
+            entries = entries + stream_entries
+    return entries
+
+
+def get_undeliverable_entries(connection, consumer, entries):
+    '''{entry id: deliveries} of the entries delivered too often to be tried again'''
+    pipe = connection.pipeline()
+    for entry_id, _ in entries:
+        pipe.xpending_range(RESULT_INGEST_STREAM, RESULT_INGEST_STREAM_GROUP,
+                            min=entry_id, max=entry_id, count=1, consumername=consumer)
+    return {
+        pending[0]['message_id']: pending[0]['times_delivered']
+        for pending in pipe.execute()
+        if len(pending) > 0 and pending[0]['times_delivered'] > settings.RESULT_INGEST_STREAM_MAX_DELIVERIES
+    }
+
+
+def drain_result_stream(consumer=None, count=None, block=None):
+    '''
+    Writes the next batch of stream entries to the database and acknowledges
+    them. Returns the number of entries drained, 0 when the stream is empty.
+    '''
+    connection = get_stream_connection()
+    ensure_stream_group(connection)
+    consumer = consumer or get_consumer_name()
+    entries = read_stream_entries(connection, consumer,
+                                  count or settings.RESULT_INGEST_STREAM_BATCH, block=block)
+    if len(entries) == 0:
+        return 0
+    undeliverable = get_undeliverable_entries(connection, consumer, entries)
+
+    # entries are in stream order, later sheets replace earlier ones
+    latest = dict()
+    for entry_id, fields in entries:
+        if entry_id in undeliverable:
+            continue
+        # fields of an entry deleted while pending are gone
+        for record in json.loads(fields[b'records']) if fields else []:
+            latest[(record['station'], record['position'])] = (record, entry_id.decode('utf-8'))
+    records = [record for record, _ in latest.values()]
+    stream_ids = [stream_id for _, stream_id in latest.values()]
+    errors = validate_result_records(records)
+    valid = [index for index in range(len(records)) if index not in errors]
+    skipped = 0
+    if len(valid) > 0:
+        # on failure the entries stay pending and are claimed again
+        summary = ingest_result_records([records[index] for index in valid],
+                                        stream_ids=[stream_ids[index] for index in valid])
+        skipped = summary['records_skipped']
+
+    now = time.time()
+    entry_ids = [entry_id for entry_id, _ in entries]
+    ages = [get_entry_age(entry_id, now) for entry_id in entry_ids]
+    pipe = connection.pipeline()
+    if len(errors) > 0:
+        pipe.xadd(RESULT_INGEST_DEAD_STREAM,
+                  dict(records=json.dumps([records[index] for index in errors]),
+                       errors=json.dumps(list(errors.values()))))
+    for entry_id, fields in entries:
+        if entry_id in undeliverable and fields:
+            # kept as they were, to be appended again once the cause is fixed
+            pipe.xadd(RESULT_INGEST_DEAD_STREAM,
+                      dict(records=fields[b'records'],
+                           errors=json.dumps([f'Not written after {undeliverable[entry_id]} deliveries.']),
+                           entry=entry_id))
+    pipe.xack(RESULT_INGEST_STREAM, RESULT_INGEST_STREAM_GROUP, *entry_ids)
+    pipe.xdel(RESULT_INGEST_STREAM, *entry_ids)
+    pipe.hincrby(RESULT_INGEST_STREAM_METRICS_KEY, 'drained', len(entries))
+    pipe.hincrby(RESULT_INGEST_STREAM_METRICS_KEY, 'records_drained', len(valid) - skipped)
+    pipe.hincrby(RESULT_INGEST_STREAM_METRICS_KEY, 'records_skipped', skipped)
+    pipe.hincrby(RESULT_INGEST_STREAM_METRICS_KEY, 'records_rejected', len(errors))
+    pipe.hincrby(RESULT_INGEST_STREAM_METRICS_KEY, 'undeliverable', len(undeliverable))
+    pipe.hincrbyfloat(RESULT_INGEST_STREAM_METRICS_KEY, 'total_lag_seconds', sum(ages))
+    pipe.hset(RESULT_INGEST_STREAM_METRICS_KEY, 'last_lag_seconds', max(ages))
+    pipe.hset(RESULT_INGEST_STREAM_METRICS_KEY, 'last_drained_at', now)
+    pipe.execute()
+    return len(entries)
+
+
+def get_result_stream_stats():
+    connection = get_stream_connection()
+    ensure_stream_group(connection)
+    metrics = {
+        k.decode('utf-8'): float(v)
+        for k, v in connection.hgetall(RESULT_INGEST_STREAM_METRICS_KEY).items()
+    }
+    oldest = connection.xrange(RESULT_INGEST_STREAM, count=1)
+    groups = [group for group in connection.xinfo_groups(RESULT_INGEST_STREAM)
+              if group['name'].decode('utf-8') == RESULT_INGEST_STREAM_GROUP]
+    drained = metrics.get('drained', 0)
+    return dict(
+        stream=RESULT_INGEST_STREAM,
+        write_behind=settings.RESULT_INGEST_WRITE_BEHIND,
+        # undrained entries, they are deleted once written
+        length=connection.xlen(RESULT_INGEST_STREAM),
+        pending=groups[0]['pending'] if len(groups) > 0 else 0,
+        consumers=groups[0]['consumers'] if len(groups) > 0 else 0,
+        lag_seconds=get_entry_age(oldest[0][0]) if len(oldest) > 0 else 0,
+        dead=connection.xlen(RESULT_INGEST_DEAD_STREAM),
+        appended=int(metrics.get('appended', 0)),
+        records_appended=int(metrics.get('records_appended', 0)),
+        drained=int(drained),
+        records_drained=int(metrics.get('records_drained', 0)),
+        records_skipped=int(metrics.get('records_skipped', 0)),
+        records_rejected=int(metrics.get('records_rejected', 0)),
+        undeliverable=int(metrics.get('undeliverable', 0)),
+        average_lag_seconds=metrics.get('total_lag_seconds', 0) / drained if drained else 0,
+        last_lag_seconds=metrics.get('last_lag_seconds', 0),
+        last_drained_at=metrics.get('last_drained_at'),
+    )
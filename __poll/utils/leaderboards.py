@@ -0,0 +1,149 @@
+from django.apps import apps
+from __poll.constants import GeoLevelChoices
+from __poll.utils.utils import get_zone_ct_id
+
+
+# LEADERBOARDS
+# poll_leaderboard_entry ranks the stations, constituencies and parties of
+# each office (and of all offices together) by their collated valid votes.
+# It is refreshed from the report rows in the same transaction that refreshes
+# them, only for the zones collation touched, and indexed by board and votes
+# so a top-N read walks N index entries whatever the size of the election.
+# A board is named <office>:<member type>, e.g. presidential:station.
+
+LEADERBOARD_ALL_OFFICES = 'all'
+
+LEADERBOARD_OFFICES = dict(
+    presidential=('__geo', 'Nation'),
+    parliamentary=('__geo', 'Constituency'),
+)
+
+LEADERBOARDS = [
+    dict(member_type='station', level=GeoLevelChoices.STATION, zone_type='station', member='r.zone_id'),
+    dict(member_type='constituency', level=GeoLevelChoices.CONSTITUENCY, zone_type='constituency', member='r.zone_id'),
+    # a party's votes add up over every nation, so its boards are always refreshed whole
+    dict(member_type='party', level=GeoLevelChoices.NATIONAL, zone_type='nation', member='r.party_id'),
+]
+
+
+def get_board(office, member_type):
+    return f'{office}:{member_type}'
+
+
+def get_office_zone_ct_ids():
+    '''{office: zone_ct_id} of the offices whose content type exists'''
+    zone_ct_ids = dict()
+    for office, (app_label, model_name) in LEADERBOARD_OFFICES.items():
+        zone_ct_id = get_zone_ct_id(apps.get_model(app_label, model_name))
+        if zone_ct_id is not None:
+            zone_ct_ids[office] = zone_ct_id
+    return zone_ct_ids
+
+
+def get_leaderboard_refresh_query(leaderboard, scoped=False):
+    '''
+    Upserts the entries of one member type on every office's board from the
+    report rows and removes the entries that no longer have any; scoped
+    limits both to the members in %(zone_ids)s
+    '''
+    def scope(field):
+        return f'AND {field} = ANY(%(zone_ids)s)' if scoped else ''
+
+    return f'''WITH totals AS (
+                    SELECT o.office, {leaderboard['member']} AS member_id,
+                           SUM(r.total_valid_votes)::bigint AS votes
+                    FROM poll_report_row r
+                        INNER JOIN UNNEST(%(zone_ct_ids)s::integer[], %(offices)s::text[])
+                            AS o(zone_ct_id, office) ON o.zone_ct_id = r.zone_ct_id
+                    WHERE r.level = %(level)s
+                        {scope('r.zone_id')}
+                    GROUP BY o.office, {leaderboard['member']}
+                ),
+                source AS (
+                    SELECT t.office || ':' || %(member_type)s AS board, t.member_id, t.votes
+                    FROM totals t
+                    UNION ALL
+                    SELECT %(all_board)s, t.member_id, SUM(t.votes)::bigint
+                    FROM totals t
+                    GROUP BY t.member_id
+                ),
+                upserted AS (
+                    INSERT INTO poll_leaderboard_entry AS e (board, member_id, votes, updated_at)
+                    SELECT board, member_id, votes, NOW()
+                    FROM source
+                    ON CONFLICT (board, member_id) DO UPDATE SET
+                        votes = EXCLUDED.votes,
+                        updated_at = EXCLUDED.updated_at
+                    WHERE e.votes IS DISTINCT FROM EXCLUDED.votes
+                    RETURNING 1
+                ),
+                removed AS (
+                    DELETE FROM poll_leaderboard_entry e
+                    WHERE e.board = ANY(%(boards)s)
+                        {scope('e.member_id')}
+                        AND NOT EXISTS (
+                            SELECT 1 FROM source s
+                            WHERE s.board = e.board
+                                AND s.member_id = e.member_id
+                        )
+                    RETURNING 1
+                )
+                SELECT (SELECT COUNT(*) FROM upserted), (SELECT COUNT(*) FROM removed);'''
+
+
+def refresh_leaderboards(cursor, zones=None):
+    '''
+    Refreshes the leaderboard entries of the given (zone type, zone id) pairs,
+    or of every zone when None, from the report rows. Runs on the cursor of
+    the report row refresh. Returns the number of entries written or removed.
+    '''
+    zone_ct_ids = get_office_zone_ct_ids()
+    offices = list(zone_ct_ids.keys())
+    total = 0
+    for leaderboard in LEADERBOARDS:
+        member_type = leaderboard['member_type']
+        params = dict(level=leaderboard['level'],
+                      member_type=member_type,
+                      zone_ct_ids=list(zone_ct_ids.values()),
+                      offices=offices,
+                      all_board=get_board(LEADERBOARD_ALL_OFFICES, member_type),
+                      boards=[get_board(office, member_type)
+                              for office in offices + [LEADERBOARD_ALL_OFFICES]])
+        scoped = False
+        if zones is not None:
+            zone_ids = list({zone_id for zone_type, zone_id in zones
+                             if zone_type == leaderboard['zone_type'] and zone_id is not None})
+            if len(zone_ids) == 0:
+                continue
+            scoped = leaderboard['member'] == 'r.zone_id'
+            params['zone_ids'] = zone_ids
+        cursor.execute(get_leaderboard_refresh_query(leaderboard, scoped=scoped), params)
+        upserted, removed = cursor.fetchone()
+        total += upserted + removed
+    return total
+
+
+def get_leaderboard(office, member_type, limit=10):
+    '''[(member id, votes)] at the top of a board, highest first; the whole board when limit is None'''
+    entry_model = apps.get_model('__poll', 'LeaderboardEntry')
+    entries = entry_model.objects \
+                         .filter(board=get_board(office, member_type)) \
+                         .order_by('-votes', 'member_id') \
+                         .values_list('member_id', 'votes')
+    if limit is not None:
+        entries = entries[:limit]
+    return list(entries)
+
+
+def get_leaderboard_votes(member_type, member_ids=None):
+    '''{office: {member id: votes}} of the given members (or all) on every board of a member type'''
+    entry_model = apps.get_model('__poll', 'LeaderboardEntry')
+    offices = list(LEADERBOARD_OFFICES.keys()) + [LEADERBOARD_ALL_OFFICES]
+    entries = entry_model.objects \
+                         .filter(board__in=[get_board(office, member_type) for office in offices])
+    if member_ids is not None:
+        entries = entries.filter(member_id__in=member_ids)
+    votes = {office: dict() for office in offices}
+    for board, member_id, member_votes in entries.values_list('board', 'member_id', 'votes'):
+        votes[board.split(':')[0]][member_id] = member_votes
+    return votes
@@ -0,0 +1,79 @@
+import json
+from django.db import connection
+from django_redis import get_redis_connection
+from __poll.utils.utils import get_content_type
+from __poll.utils.report_rows import REPORT_ROW_LEVELS
+
+
+# LIVE UPDATES
+# Every committed collation change is published on one Redis channel as a
+# compact message: the collation version and, for a delta, the party totals
+# of each zone it touched, read from the report rows it just refreshed. A
+# rebuild is a single message telling viewers to reload. The SSE endpoint
+# (see __report/live.py) fans the channel out to the connected viewers.
+
+LIVE_CHANNEL = 'collation:live'
+
+LIVE_OFFICE_TYPES = dict(
+    nation='presidential',
+    constituency='parliamentary',
+)
+
+LIVE_ZONE_LEVELS = {level['zone_type']: level['level'] for level in REPORT_ROW_LEVELS}
+
+LIVE_ZONE_TOTALS_QUERY = '''SELECT r.level, r.zone_id, p.code, r.total_valid_votes
+                            FROM poll_report_row r
+                                INNER JOIN poll_party p ON p.id = r.party_id
+                            WHERE r.zone_ct_id = %(zone_ct_id)s
+                                AND (r.level, r.zone_id) IN (
+                                    SELECT * FROM UNNEST(%(levels)s::integer[], %(zone_ids)s::integer[])
+                                )
+                            ORDER BY r.level DESC, r.zone_id, p.code'''
+
+
+def get_live_zone_totals(zone_ct_id, zones):
+    '''Party totals of (zone type, zone id) pairs as compact zone entries'''
+    zones = [(zone_type, zone_id) for zone_type, zone_id in zones if zone_type in LIVE_ZONE_LEVELS]
+    if zone_ct_id is None or len(zones) == 0:
+        return []
+    zone_types = {LIVE_ZONE_LEVELS[zone_type]: zone_type for zone_type, zone_id in zones}
+    entries = dict()
+    with connection.cursor() as cursor:
+        cursor.execute(LIVE_ZONE_TOTALS_QUERY,
+                       dict(zone_ct_id=zone_ct_id,
+                            levels=[LIVE_ZONE_LEVELS[zone_type] for zone_type, zone_id in zones],
+                            zone_ids=[zone_id for zone_type, zone_id in zones]))
+        for level, zone_id, party_code, votes in cursor.fetchall():
+            entry = entries.setdefault((level, zone_id),
+                                       dict(type=zone_types[level], id=zone_id, totals=dict()))
+            entry['totals'][party_code] = votes
+    return list(entries.values())
+
+
+def get_live_message(version, zone_ct_id=None, zones=(), rebuilt=False):
+    if rebuilt:
+        return dict(v=version, rebuilt=True)
+    content_type = get_content_type(zone_ct_id)
+    return dict(
+        v=version,
+        office=LIVE_OFFICE_TYPES.get(content_type.model) if content_type is not None else None,
+        zones=get_live_zone_totals(zone_ct_id, zones),
+    )
+
+
+def publish_collation_change(version, zone_ct_id=None, zones=(), rebuilt=False):
+    '''
+    Publishes a committed collation change to the live viewers, skipped when
+    nobody is subscribed. Returns the number of viewer processes reached.
+    '''
+    try:
+        redis = get_redis_connection('default')
+        channels = dict(redis.pubsub_numsub(LIVE_CHANNEL))
+        if channels.get(LIVE_CHANNEL.encode(), 0) == 0:
+            return 0
+        message = get_live_message(version, zone_ct_id=zone_ct_id, zones=zones, rebuilt=rebuilt)
+        return redis.publish(LIVE_CHANNEL, json.dumps(message, separators=(',', ':')))
+    except Exception as e:
+        # viewers catch up on the next change
+        print(e)
+        return 0
@@ -0,0 +1,225 @@
+from django.db import connection, transaction
+from __poll.constants import GeoLevelChoices
+from __poll.utils.leaderboards import refresh_leaderboards
+
+
+# REPORT READ MODEL
+# poll_report_row holds every report page pre-pivoted: one row per zone,
+# position type and party with its totals, seats and votes per sub-zone.
+# Collation refreshes it set-based per level, either for every zone or only
+# for the zones it touched; rows whose values did not change are not written.
+# Invalid votes are not cast for a party: every row of a zone carries the
+# zone's invalid votes, summed from its result sheets, and totals over the
+# parties of a zone take them once.
+# Refreshes are serialised so the last one to run always reads the latest sheets.
+# The leaderboards are refreshed from the new rows in the same transaction.
+
+REPORT_ROW_LOCK = 'collation:report'
+
+REPORT_ROW_LEVELS = [
+    dict(
+        level=GeoLevelChoices.NATIONAL,
+        zone_type='nation',
+        totals_table='poll_supernational_collation_sheet',
+        totals_field='nation_id',
+        cells_table='poll_national_collation_sheet',
+        cells_field='region_id',
+        column_table='geo_region',
+        column_parent='nation_id',
+        seats_zone='re.nation_id',
+    ),
+    dict(
+        level=GeoLevelChoices.REGION,
+        zone_type='region',
+        totals_table='poll_national_collation_sheet',
+        totals_field='region_id',
+        cells_table='poll_regional_collation_sheet',
+        cells_field='constituency_id',
+        column_table='geo_constituency',
+        column_parent='region_id',
+        seats_zone='co.region_id',
+    ),
+    dict(
+        level=GeoLevelChoices.CONSTITUENCY,
+        zone_type='constituency',
+        totals_table='poll_regional_collation_sheet',
+        totals_field='constituency_id',
+        cells_table='poll_constituency_collation_sheet',
+        cells_field='station_id',
+        column_table='geo_station',
+        column_parent='constituency_id',
+        seats_zone='co.id',
+    ),
+    dict(
+        level=GeoLevelChoices.STATION,
+        zone_type='station',
+        totals_table='poll_constituency_collation_sheet',
+        totals_field='station_id',
+        cells_table=None,
+        seats_zone='st.id',
+    ),
+]
+
+
+def get_report_row_refresh_query(level, scoped=False):
+    '''
+    Upserts the report rows of one level from its collation sheets and removes
+    the rows that no longer have any; scoped limits both to %(zone_ids)s
+    '''
+    def scope(field):
+        return f'AND {field} = ANY(%(zone_ids)s)' if scoped else ''
+
+    if level['cells_table'] is not None:
+        cells = f'''SELECT s.zone_ct_id, s.zone_id, s.party_id,
+                        SUM(s.votes)::bigint AS sub_zone_total_votes,
+                        SUM(s.votes_ec)::bigint AS sub_zone_total_votes_ec,
+                        JSONB_OBJECT_AGG(s.cell_id, s.votes) AS cells
+                    FROM (
+                        SELECT t.zone_ct_id, z.{level['column_parent']} AS zone_id,
+                               t.party_id, t.{level['cells_field']} AS cell_id,
+                               SUM(COALESCE(t.total_votes, 0)) AS votes,
+                               SUM(COALESCE(t.total_votes_ec, 0)) AS votes_ec
+                        FROM {level['cells_table']} t
+                            INNER JOIN {level['column_table']} z ON z.id = t.{level['cells_field']}
+                        WHERE t.zone_ct_id IS NOT NULL
+                            AND t.party_id IS NOT NULL
+                            {scope('z.' + level['column_parent'])}
+                        GROUP BY t.zone_ct_id, z.{level['column_parent']}, t.party_id, t.{level['cells_field']}
+                    ) s
+                    GROUP BY s.zone_ct_id, s.zone_id, s.party_id'''
+    else:
+        cells = '''SELECT NULL::integer AS zone_ct_id, NULL::integer AS zone_id, NULL::integer AS party_id,
+                        0::bigint AS sub_zone_total_votes, 0::bigint AS sub_zone_total_votes_ec,
+                        NULL::jsonb AS cells
+                    WHERE FALSE'''
+    station_join = 'INNER JOIN geo_station st ON st.constituency_id = co.id' \
+                    if level['zone_type'] == 'station' else ''
+    return f'''WITH invalid AS (
+                    SELECT pos.zone_ct_id, {level['seats_zone']} AS zone_id,
+                           SUM(rs.total_invalid_votes)::bigint AS total_invalid_votes
+                    FROM (
+                        -- a sheet saved twice for a station/position is counted once
+                        SELECT station_id, position_id, MAX(COALESCE(total_invalid_votes, 0)) AS total_invalid_votes
+                        FROM poll_result_sheet
+                        GROUP BY station_id, position_id
+                    ) rs
+                        INNER JOIN poll_position pos ON pos.id = rs.position_id
+                        INNER JOIN geo_station st ON st.id = rs.station_id
+                        INNER JOIN geo_constituency co ON co.id = st.constituency_id
+                        INNER JOIN geo_region re ON re.id = co.region_id
+                    WHERE pos.zone_ct_id IS NOT NULL
+                        {scope(level['seats_zone'])}
+                    GROUP BY pos.zone_ct_id, {level['seats_zone']}
+                ),
+                totals AS (
+                    SELECT t.zone_ct_id, t.{level['totals_field']} AS zone_id, t.party_id,
+                           SUM(COALESCE(t.total_votes, 0))::bigint AS total_valid_votes,
+                           SUM(COALESCE(t.total_votes_ec, 0))::bigint AS total_votes_ec
+                    FROM {level['totals_table']} t
+                    WHERE t.zone_ct_id IS NOT NULL
+                        AND t.party_id IS NOT NULL
+                        AND t.{level['totals_field']} IS NOT NULL
+                        {scope('t.' + level['totals_field'])}
+                    GROUP BY t.zone_ct_id, t.{level['totals_field']}, t.party_id
+                ),
+                cells AS ({cells}),
+                seats AS (
+                    SELECT pos.zone_ct_id, {level['seats_zone']} AS zone_id, ca.party_id,
+                           COUNT(*)::integer AS seats
+                    FROM poll_parliamentary_summary_sheet ps
+                        INNER JOIN people_candidate ca ON ca.id = ps.candidate_id
+                        INNER JOIN poll_position pos ON pos.id = ps.position_id
+                        INNER JOIN geo_constituency co ON co.id = ps.constituency_id
+                        INNER JOIN geo_region re ON re.id = co.region_id
+                        {station_join}
+                    WHERE pos.zone_ct_id IS NOT NULL
+                        AND ca.party_id IS NOT NULL
+                        {scope(level['seats_zone'])}
+                    GROUP BY pos.zone_ct_id, {level['seats_zone']}, ca.party_id
+                ),
+                source AS (
+                    SELECT k.zone_ct_id, k.zone_id, k.party_id,
+                           COALESCE(t.total_valid_votes, 0) AS total_valid_votes,
+                           COALESCE(i.total_invalid_votes, 0) AS total_invalid_votes,
+                           COALESCE(t.total_votes_ec, 0) AS total_votes_ec,
+                           COALESCE(c.sub_zone_total_votes, 0) AS sub_zone_total_votes,
+                           COALESCE(c.sub_zone_total_votes_ec, 0) AS sub_zone_total_votes_ec,
+                           COALESCE(c.cells, '{{}}'::jsonb) AS cells,
+                           COALESCE(se.seats, 0) AS seats
+                    FROM (
+                        SELECT zone_ct_id, zone_id, party_id FROM totals
+                        UNION SELECT zone_ct_id, zone_id, party_id FROM cells
+                        UNION SELECT zone_ct_id, zone_id, party_id FROM seats
+                    ) k
+                        LEFT JOIN totals t ON t.zone_ct_id = k.zone_ct_id
+                            AND t.zone_id = k.zone_id AND t.party_id = k.party_id
+                        LEFT JOIN cells c ON c.zone_ct_id = k.zone_ct_id
+                            AND c.zone_id = k.zone_id AND c.party_id = k.party_id
+                        LEFT JOIN seats se ON se.zone_ct_id = k.zone_ct_id
+                            AND se.zone_id = k.zone_id AND se.party_id = k.party_id
+                        LEFT JOIN invalid i ON i.zone_ct_id = k.zone_ct_id AND i.zone_id = k.zone_id
+                ),
+                upserted AS (
+                    INSERT INTO poll_report_row AS r (
+                        zone_ct_id, level, zone_id, party_id,
+                        total_valid_votes, total_invalid_votes, total_votes_ec,
+                        sub_zone_total_votes, sub_zone_total_votes_ec,
+                        cells, seats, updated_at
+                    )
+                    SELECT zone_ct_id, %(level)s, zone_id, party_id,
+                           total_valid_votes, total_invalid_votes, total_votes_ec,
+                           sub_zone_total_votes, sub_zone_total_votes_ec,
+                           cells, seats, NOW()
+                    FROM source
+                    ON CONFLICT (zone_ct_id, level, zone_id, party_id) DO UPDATE SET
+                        total_valid_votes = EXCLUDED.total_valid_votes,
+                        total_invalid_votes = EXCLUDED.total_invalid_votes,
+                        total_votes_ec = EXCLUDED.total_votes_ec,
+                        sub_zone_total_votes = EXCLUDED.sub_zone_total_votes,
+                        sub_zone_total_votes_ec = EXCLUDED.sub_zone_total_votes_ec,
+                        cells = EXCLUDED.cells,
+                        seats = EXCLUDED.seats,
+                        updated_at = EXCLUDED.updated_at
+                    WHERE (r.total_valid_votes, r.total_invalid_votes, r.total_votes_ec,
+                           r.sub_zone_total_votes, r.sub_zone_total_votes_ec, r.cells, r.seats)
+                        IS DISTINCT FROM
+                          (EXCLUDED.total_valid_votes, EXCLUDED.total_invalid_votes, EXCLUDED.total_votes_ec,
+                           EXCLUDED.sub_zone_total_votes, EXCLUDED.sub_zone_total_votes_ec, EXCLUDED.cells, EXCLUDED.seats)
+                    RETURNING 1
+                ),
+                removed AS (
+                    DELETE FROM poll_report_row r
+                    WHERE r.level = %(level)s
+                        {scope('r.zone_id')}
+                        AND NOT EXISTS (
+                            SELECT 1 FROM source s
+                            WHERE s.zone_ct_id = r.zone_ct_id
+                                AND s.zone_id = r.zone_id
+                                AND s.party_id = r.party_id
+                        )
+                    RETURNING 1
+                )
+                SELECT (SELECT COUNT(*) FROM upserted), (SELECT COUNT(*) FROM removed);'''
+
+
+def refresh_report_rows(zones=None):
+    '''
+    Refreshes the report rows of the given (zone type, zone id) pairs, or of
+    every zone when None. Returns the number of rows written or removed.
+    '''
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [REPORT_ROW_LOCK])
+        for level in REPORT_ROW_LEVELS:
+            params = dict(level=level['level'])
+            if zones is not None:
+                zone_ids = list({zone_id for zone_type, zone_id in zones
+                                 if zone_type == level['zone_type'] and zone_id is not None})
+                if len(zone_ids) == 0:
+                    continue
+                params['zone_ids'] = zone_ids
+            cursor.execute(get_report_row_refresh_query(level, scoped=zones is not None), params)
+            upserted, removed = cursor.fetchone()
+            total += upserted + removed
+        refresh_leaderboards(cursor, zones)
+    return total
@@ -0,0 +1,132 @@
+import io
+import hashlib
+import mimetypes
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+
+# RESULT SHEET SCANS
+# Uploaded result sheets are processed after the request, on an rq queue
+# with RESULT_SHEET_ASYNC. Each file is hashed: an upload whose content is
+# already stored is pointed at the stored file and its own copy deleted, so
+# re-uploads of the same scan cost no storage. New content gets a JPEG
+# thumbnail, a preview sized for the approval pages and tiles of the full
+# resolution scan to zoom into, next to each other under the content hash.
+# Rendering needs Pillow; without it (or for PDFs) only the hash is kept.
+
+RESULT_SHEET_SCAN_DIR = 'results/scans'
+RESULT_SHEET_THUMBNAIL_SIZE = (256, 256)
+RESULT_SHEET_PREVIEW_SIZE = (1280, 1280)
+RESULT_SHEET_TILE_SIZE = 512
+RESULT_SHEET_JPEG_QUALITY = 70
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def get_content_hash(name):
+    '''SHA-256 of a stored file, read a chunk at a time'''
+    content_hash = hashlib.sha256()
+    with default_storage.open(name, 'rb') as stored:
+        for chunk in iter(lambda: stored.read(HASH_CHUNK_SIZE), b''):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def get_scan_path(content_hash, name):
+    return f'{RESULT_SHEET_SCAN_DIR}/{content_hash[:2]}/{content_hash}/{name}'
+
+
+def save_jpeg(image, path):
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=RESULT_SHEET_JPEG_QUALITY, optimize=True)
+    return default_storage.save(path, ContentFile(output.getvalue()))
+
+
+def render_scan_images(scan):
+    '''Renders the thumbnail, preview and tiles of an image scan onto scan'''
+    from PIL import Image, ImageOps
+
+    with default_storage.open(scan.file_name, 'rb') as stored:
+        image = Image.open(stored)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    scan.width, scan.height = image.size
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail(RESULT_SHEET_THUMBNAIL_SIZE)
+    scan.thumbnail.name = save_jpeg(thumbnail, get_scan_path(scan.content_hash, 'thumbnail.jpg'))
+    preview = image.copy()
+    preview.thumbnail(RESULT_SHEET_PREVIEW_SIZE)
+    scan.preview.name = save_jpeg(preview, get_scan_path(scan.content_hash, 'preview.jpg'))
+
+    size = RESULT_SHEET_TILE_SIZE
+    columns = (scan.width + size - 1) // size
+    rows = (scan.height + size - 1) // size
+    names = dict()
+    for column in range(columns):
+        for row in range(rows):
+            box = (column * size, row * size,
+                   min((column + 1) * size, scan.width), min((row + 1) * size, scan.height))
+            names[f'{column}_{row}'] = save_jpeg(image.crop(box),
+                                                 get_scan_path(scan.content_hash, f'tiles/{column}_{row}.jpg'))
+    scan.tiles = dict(tile_size=size, columns=columns, rows=rows, names=names)
+
+
+def get_or_create_scan(content_hash, name):
+    '''The scan of a content hash, created (and rendered) from name when new'''
+    scan_model = apps.get_model('__poll', 'ResultSheetScan')
+    scan = scan_model.objects.filter(content_hash=content_hash).first()
+    if scan is not None:
+        return scan, False
+    scan = scan_model(content_hash=content_hash,
+                      file_name=name,
+                      size=default_storage.size(name),
+                      content_type=mimetypes.guess_type(name)[0] or '')
+    if scan.content_type.startswith('image/'):
+        try:
+            render_scan_images(scan)
+        except Exception as e:
+            # the sheet stays usable through its original file
+            print(e)
+            scan.error = str(e)
+    else:
+        scan.error = f'No previews for {scan.content_type or "unknown"} files'
+    scan.processed_at = timezone.now()
+    try:
+        with transaction.atomic():
+            scan.save()
+    except IntegrityError:
+        # another worker stored the same content first
+        return scan_model.objects.get(content_hash=content_hash), False
+    return scan, True
+
+
+def process_result_sheet(sheet_id):
+    '''
+    Hashes a result sheet's file and links the sheet to its scan, replacing
+    the upload by the stored file when the content is already known.
+    Returns the scan, None when the sheet has no file.
+    '''
+    sheet_model = apps.get_model('__poll', 'ResultSheet')
+    sheet = sheet_model.objects \
+                       .filter(pk=sheet_id) \
+                       .values('result_sheet', 'scan_id') \
+                       .first()
+    if sheet is None or not sheet['result_sheet']:
+        return None
+    name = sheet['result_sheet']
+    if not default_storage.exists(name):
+        print(f'Result sheet {sheet_id} file {name} is missing')
+        return None
+
+    scan, created = get_or_create_scan(get_content_hash(name), name)
+    # writes bypass the ResultSheet signals, so this never requeues itself
+    sheet_model.objects \
+               .filter(pk=sheet_id, result_sheet=name) \
+               .update(result_sheet=scan.file_name, scan=scan)
+    if scan.file_name != name and not sheet_model.objects.filter(result_sheet=name).exists():
+        # a duplicate of a stored scan, nothing refers to the upload anymore
+        default_storage.delete(name)
+    return scan
+
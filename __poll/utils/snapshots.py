@@ -0,0 +1,183 @@
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from __poll.constants import GeoLevelChoices
+
+
+# COLLATION SNAPSHOTS
+# Each snapshot appends, per level, only the per party totals that changed
+# since the previous snapshot, so the history stays compact and a zone's
+# trend is one indexed range read. The totals as of the latest snapshot are
+# kept as a running state (CollationSnapshotTotal) that every snapshot diffs
+# against and updates, so its cost does not grow with the history.
+
+SNAPSHOT_SOURCE_MANUAL = 'manual'
+SNAPSHOT_SOURCE_COLLATION = 'collation'
+SNAPSHOT_SOURCE_INTERVAL = 'interval'
+
+COLLATION_SNAPSHOT_LOCK = 'collation:snapshot'
+# set for COLLATION_SNAPSHOT_INTERVAL seconds once an interval snapshot is due
+COLLATION_SNAPSHOT_DUE_KEY = 'collation:snapshot:due'
+
+# (level, collation sheet, zone column) of the per party totals snapshotted,
+# station level totals are left out to keep every snapshot cheap
+COLLATION_SNAPSHOT_LEVELS = [
+    (GeoLevelChoices.NATIONAL, 'SupernationalCollationSheet', 'nation_id'),
+    (GeoLevelChoices.REGION, 'NationalCollationSheet', 'region_id'),
+    (GeoLevelChoices.CONSTITUENCY, 'RegionalCollationSheet', 'constituency_id'),
+]
+
+SNAPSHOT_LEVEL_NAMES = dict(
+    nation=GeoLevelChoices.NATIONAL,
+    region=GeoLevelChoices.REGION,
+    constituency=GeoLevelChoices.CONSTITUENCY,
+)
+
+
+def get_snapshot_delta_query(sheet_table, zone_field, delta_table, total_table):
+    return f'''WITH current AS (
+                    SELECT {zone_field} AS zone_id, party_id, zone_ct_id,
+                           SUM(COALESCE(total_votes, 0)) AS votes
+                        FROM {sheet_table}
+                        GROUP BY {zone_field}, party_id, zone_ct_id
+                ),
+                previous AS (
+                    SELECT id, zone_id, party_id, zone_ct_id, votes
+                        FROM {total_table}
+                        WHERE level = %(level)s
+                ),
+                changed AS (
+                    SELECT p.id AS total_id,
+                           COALESCE(c.zone_id, p.zone_id) AS zone_id,
+                           COALESCE(c.party_id, p.party_id) AS party_id,
+                           COALESCE(c.zone_ct_id, p.zone_ct_id) AS zone_ct_id,
+                           COALESCE(c.votes, 0) AS votes,
+                           COALESCE(c.votes, 0) - COALESCE(p.votes, 0) AS delta
+                    FROM current c
+                        FULL OUTER JOIN previous p
+                            ON c.zone_id = p.zone_id
+                            AND COALESCE(c.party_id, 0) = COALESCE(p.party_id, 0)
+                            AND COALESCE(c.zone_ct_id, 0) = COALESCE(p.zone_ct_id, 0)
+                    WHERE COALESCE(c.zone_id, p.zone_id) IS NOT NULL
+                        AND COALESCE(c.votes, 0) <> COALESCE(p.votes, 0)
+                ),
+                updated AS (
+                    UPDATE {total_table} t
+                        SET votes = ch.votes
+                        FROM changed ch
+                        WHERE t.id = ch.total_id
+                ),
+                created AS (
+                    INSERT INTO {total_table} (level, zone_id, party_id, zone_ct_id, votes)
+                    SELECT %(level)s, zone_id, party_id, zone_ct_id, votes
+                        FROM changed
+                        WHERE total_id IS NULL
+                )
+                INSERT INTO {delta_table} (snapshot_id, level, zone_id, party_id, zone_ct_id, votes)
+                SELECT %(snapshot_id)s, %(level)s, zone_id, party_id, zone_ct_id, delta
+                    FROM changed;'''
+
+
+def get_snapshot_total_seed_query(delta_table, total_table):
+    # for histories recorded before the running totals were kept
+    return f'''INSERT INTO {total_table} (level, zone_id, party_id, zone_ct_id, votes)
+                SELECT level, zone_id, party_id, zone_ct_id, SUM(votes)
+                    FROM {delta_table}
+                    GROUP BY level, zone_id, party_id, zone_ct_id;'''
+
+
+def take_collation_snapshot(source=SNAPSHOT_SOURCE_MANUAL, min_interval=None):
+    '''
+    Appends a snapshot of the changed collated totals. When min_interval
+    (seconds) is given, nothing is taken if the last snapshot is younger.
+    Returns the snapshot, or None when skipped.
+    '''
+    snapshot_model = apps.get_model('__poll', 'CollationSnapshot')
+    delta_model = apps.get_model('__poll', 'CollationSnapshotDelta')
+    total_model = apps.get_model('__poll', 'CollationSnapshotTotal')
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # concurrent snapshots would diff against the same history
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [COLLATION_SNAPSHOT_LOCK])
+        if min_interval:
+            since = timezone.now() - timedelta(seconds=min_interval)
+            if snapshot_model.objects.filter(created_at__gt=since).exists():
+                return None
+        if not total_model.objects.exists() and delta_model.objects.exists():
+            with connection.cursor() as cursor:
+                cursor.execute(get_snapshot_total_seed_query(delta_model._meta.db_table,
+                                                             total_model._meta.db_table))
+        snapshot = snapshot_model.objects.create(source=source)
+        total_deltas = 0
+        with connection.cursor() as cursor:
+            for level, sheet_model, zone_field in COLLATION_SNAPSHOT_LEVELS:
+                query = get_snapshot_delta_query(apps.get_model('__poll', sheet_model)._meta.db_table,
+                                                 zone_field,
+                                                 delta_model._meta.db_table,
+                                                 total_model._meta.db_table)
+                cursor.execute(query, dict(snapshot_id=snapshot.pk, level=level))
+                total_deltas += cursor.rowcount
+        snapshot.total_deltas = total_deltas
+        snapshot.save(update_fields=['total_deltas'])
+    return snapshot
+
+
+def take_interval_snapshot():
+    '''
+    Takes an interval snapshot when COLLATION_SNAPSHOT_INTERVAL seconds have
+    passed since the last one, called whenever the collated totals change.
+    '''
+    interval = settings.COLLATION_SNAPSHOT_INTERVAL
+    if interval <= 0:
+        return None
+    try:
+        # only the first change of an interval goes on to the database
+        if not cache.add(COLLATION_SNAPSHOT_DUE_KEY, 1, timeout=interval):
+            return None
+    except Exception as e:
+        print(e)
+    return take_collation_snapshot(SNAPSHOT_SOURCE_INTERVAL, min_interval=interval)
+
+
+def get_collation_trend(level, zone_id, zone_ct_id=None, start=None, end=None):
+    '''
+    Per party totals of one zone at every snapshot between start and end that
+    changed them: the totals before start are summed once, then the deltas in
+    range are accumulated in order.
+    '''
+    delta_model = apps.get_model('__poll', 'CollationSnapshotDelta')
+    party_model = apps.get_model('__people', 'Party')
+    deltas = delta_model.objects.filter(level=level, zone_id=zone_id)
+    if zone_ct_id is not None:
+        deltas = deltas.filter(zone_ct_id=zone_ct_id)
+    totals = dict()
+    if start is not None:
+        baseline = deltas.filter(snapshot__created_at__lt=start) \
+                         .values('party_id') \
+                         .annotate(total_votes=Sum('votes'))
+        for row in baseline:
+            totals[row['party_id']] = row['total_votes']
+        deltas = deltas.filter(snapshot__created_at__gte=start)
+    if end is not None:
+        deltas = deltas.filter(snapshot__created_at__lte=end)
+    deltas = deltas.values('snapshot_id', 'snapshot__created_at', 'party_id', 'votes') \
+                   .order_by('snapshot__created_at', 'snapshot_id')
+
+    points = []
+    for delta in deltas:
+        if len(points) == 0 or points[-1]['snapshot'] != delta['snapshot_id']:
+            points.append(dict(snapshot=delta['snapshot_id'],
+                               created_at=delta['snapshot__created_at'],
+                               totals=None))
+        totals[delta['party_id']] = totals.get(delta['party_id'], 0) + delta['votes']
+        points[-1]['totals'] = dict(totals)
+
+    party_codes = dict(party_model.objects.filter(pk__in=list(totals.keys())).values_list('pk', 'code'))
+    for point in points:
+        point['totals'] = {party_codes.get(party_id, party_id): votes
+                           for party_id, votes in point['totals'].items()}
+    return points
@@ -0,0 +1,124 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Max
+from __poll.constants import SyncStatusChoices
+from __poll.utils.utils import get_content_type
+from __poll.utils.collations import get_station_ancestors
+from __poll.utils.ingest import lock_result_sheets, validate_result_records, ingest_result_records
+
+
+# OFFLINE SYNC
+# Field agents queue their result sheets on the device and resend them until
+# they are acknowledged. Every submission carries a key generated on the
+# device and a sequence number per station/position sheet. Keys already seen
+# are dropped with one indexed lookup (a batch made only of retries never
+# takes the sheet locks), and a submission older than the agent's latest one
+# for the same sheet is recorded as stale instead of overwriting it. An agent
+# only reports the stations of their own zone, others are invalid. What is
+# left is written and collated as one bulk ingest (see __poll.utils.ingest).
+
+
+def get_recorded_keys(agent_id, keys):
+    submission_model = apps.get_model('__poll', 'ResultSubmission')
+    return set(submission_model.objects \
+                               .filter(agent_id=agent_id, idempotency_key__in=keys) \
+                               .values_list('idempotency_key', flat=True))
+
+
+def get_latest_sequences(agent_id, submissions):
+    '''{(station id, position id): latest sequence} of the agent's recorded submissions'''
+    submission_model = apps.get_model('__poll', 'ResultSubmission')
+    return {
+        (s['station_id'], s['position_id']): s['sequence']
+        for s in submission_model.objects \
+                                 .filter(agent_id=agent_id,
+                                         station_id__in={s['station'] for s in submissions},
+                                         position_id__in={s['position'] for s in submissions}) \
+                                 .values('station_id', 'position_id') \
+                                 .annotate(sequence=Max('sequence'))
+    }
+
+
+def is_station_in_zone(station_id, zone_ct_id, zone_id):
+    '''Whether a station is the zone (of an agent) or one of its stations'''
+    zone_ct = get_content_type(zone_ct_id)
+    if zone_ct is None or zone_id is None:
+        return False
+    if zone_ct.model == 'station':
+        return station_id == zone_id
+    ancestors = get_station_ancestors(station_id)
+    if ancestors is None:
+        return False
+    return dict(zip(['constituency', 'region', 'nation'], ancestors)).get(zone_ct.model) == zone_id
+
+
+def sync_result_submissions(agent_id, submissions, zone_ct_id=None, zone_id=None):
+    '''
+    Applies an agent's validated submissions for the stations of their zone,
+    skipping retries and older edits. Returns ({key: outcome}, ingest summary
+    or None).
+    '''
+    keys = [submission['key'] for submission in submissions]
+    outcomes = dict()
+    if get_recorded_keys(agent_id, keys) >= set(keys):
+        # only retries: nothing to lock, write or collate
+        return {key: dict(status=SyncStatusChoices.DUPLICATE) for key in keys}, None
+
+    submission_model = apps.get_model('__poll', 'ResultSubmission')
+    summary = None
+    with transaction.atomic():
+        # keys and sequences are read again once the batch's sheets are locked
+        lock_result_sheets([(submission['station'], submission['position']) for submission in submissions])
+        recorded = get_recorded_keys(agent_id, keys)
+        latest = get_latest_sequences(agent_id, submissions)
+
+        # the newest submission of each sheet wins, within the batch too
+        newest = dict()
+        for submission in submissions:
+            key = submission['key']
+            if key in outcomes:
+                # resent within the same batch
+                continue
+            if key in recorded:
+                outcomes[key] = dict(status=SyncStatusChoices.DUPLICATE)
+                continue
+            if not is_station_in_zone(submission['station'], zone_ct_id, zone_id):
+                # left unrecorded like the other invalid submissions
+                outcomes[key] = dict(status=SyncStatusChoices.INVALID,
+                                     errors=dict(station=['The station is outside the agent\'s zone.']))
+                continue
+            sheet = (submission['station'], submission['position'])
+            if sheet in latest and submission['sequence'] <= latest[sheet]:
+                outcomes[key] = dict(status=SyncStatusChoices.STALE)
+            elif sheet not in newest or submission['sequence'] > newest[sheet]['sequence']:
+                if sheet in newest:
+                    outcomes[newest[sheet]['key']] = dict(status=SyncStatusChoices.STALE)
+                newest[sheet] = submission
+                outcomes[key] = None
+            else:
+                outcomes[key] = dict(status=SyncStatusChoices.STALE)
+
+        candidates = list(newest.values())
+        errors = validate_result_records(candidates)
+        applied = [submission for index, submission in enumerate(candidates) if index not in errors]
+        for index, record_errors in errors.items():
+            # left unrecorded so a corrected resend is not dropped as a retry
+            outcomes[candidates[index]['key']] = dict(status=SyncStatusChoices.INVALID, errors=record_errors)
+        if len(applied) > 0:
+            summary = ingest_result_records(applied)
+        for submission in applied:
+            outcomes[submission['key']] = dict(status=SyncStatusChoices.APPLIED)
+
+        submission_model.objects.bulk_create([
+            submission_model(agent_id=agent_id,
+                             idempotency_key=submission['key'],
+                             station_id=submission['station'],
+                             position_id=submission['position'],
+                             sequence=submission['sequence'],
+                             status=outcomes[submission['key']]['status'],
+                             recorded_at=submission['recorded_at'])
+            for submission in submissions
+            if submission['key'] not in recorded
+                and outcomes[submission['key']]['status'] in (SyncStatusChoices.APPLIED, SyncStatusChoices.STALE)
+        ], ignore_conflicts=True)
+    return outcomes, summary
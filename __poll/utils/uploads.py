@@ -0,0 +1,99 @@
+import os
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from __poll.utils.ingest import lock_result_sheets
+
+
+# RESUMABLE UPLOADS
+# Scans of result sheets are sent from phones on unreliable links. Instead of
+# one multipart body, a client opens an upload with the file's size, then PUTs
+# chunks of at most RESULT_SHEET_UPLOAD_CHUNK_SIZE bytes, each at the offset
+# the server last acknowledged. Every chunk is a short request of its own, so
+# no web worker waits on a slow link, and after a dropped connection the
+# client asks for the offset and carries on from there. Chunks are written to
+# a part file under RESULT_SHEET_UPLOAD_DIR. The last chunk stores the file in
+# the result sheet upload path and attaches it to the station's result sheet,
+# which queues its processing (see __poll.utils.scans).
+
+
+def get_upload_part_path(upload):
+    return os.path.join(settings.RESULT_SHEET_UPLOAD_DIR, f'{upload.uid}.part')
+
+
+def get_upload_state(upload):
+    return dict(id=str(upload.uid),
+                offset=upload.offset,
+                size=upload.size,
+                chunk_size=settings.RESULT_SHEET_UPLOAD_CHUNK_SIZE,
+                result_sheet=upload.result_sheet_id,
+                completed=upload.completed_at is not None)
+
+
+def attach_upload(upload, path):
+    '''
+    Stores an assembled upload and points the station's result sheet at it.
+    Runs in a transaction, under the sheet's lock so the sheet found (or
+    created) is the one every other writer uses.
+    '''
+    sheet_model = apps.get_model('__poll', 'ResultSheet')
+    lock_result_sheets([(upload.station_id, upload.position_id)])
+    result_sheet = sheet_model.objects \
+                              .filter(station_id=upload.station_id, position_id=upload.position_id) \
+                              .first()
+    if result_sheet is None:
+        result_sheet = sheet_model(station_id=upload.station_id, position_id=upload.position_id)
+    with open(path, 'rb') as assembled:
+        # saving the sheet notices the new file and queues its processing
+        result_sheet.result_sheet.save(upload.file_name, File(assembled), save=True)
+    return result_sheet
+
+
+def append_upload_chunk(upload_id, offset, chunk):
+    '''
+    Writes a chunk at offset, attaching the file once all of it is received.
+    Returns the upload, and whether the chunk was written: an offset other
+    than the acknowledged one is refused and the client resumes from it.
+    '''
+    upload_model = apps.get_model('__poll', 'ResultSheetUpload')
+    with transaction.atomic():
+        # chunks of an upload are written one at a time
+        upload = upload_model.objects.select_for_update().get(pk=upload_id)
+        if upload.completed_at is not None or offset != upload.offset:
+            return upload, False
+        if offset + len(chunk) > upload.size:
+            raise ValueError(f'The chunk ends past the {upload.size} bytes of the upload.')
+
+        path = get_upload_part_path(upload)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+            # bytes past the offset are from a chunk that was never acknowledged
+            part.seek(offset)
+            part.write(chunk)
+            part.truncate()
+        upload.offset = offset + len(chunk)
+        if upload.offset == upload.size:
+            upload.result_sheet = attach_upload(upload, path)
+            upload.completed_at = timezone.now()
+            transaction.on_commit(lambda: os.remove(path))
+        upload.save(update_fields=['offset', 'result_sheet', 'completed_at', 'updated_at'])
+    return upload, True
+
+
+def delete_expired_uploads():
+    '''Drops uploads left unfinished for RESULT_SHEET_UPLOAD_EXPIRY hours'''
+    upload_model = apps.get_model('__poll', 'ResultSheetUpload')
+    expired = upload_model.objects \
+                          .filter(completed_at__isnull=True,
+                                  updated_at__lt=timezone.now() - timedelta(hours=settings.RESULT_SHEET_UPLOAD_EXPIRY))
+    deleted = 0
+    for upload in expired:
+        path = get_upload_part_path(upload)
+        if os.path.exists(path):
+            os.remove(path)
+        upload.delete()
+        deleted = deleted + 1
+    return deleted
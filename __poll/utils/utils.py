@@ -6,6 +6,7 @@ import json
 from datetime import datetime 
 from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError
 from typing import Optional
 from __poll.constants import TerminalColors
 from django.urls import reverse
@@ -53,6 +54,41 @@ def upload_directory_path(instance, filename, dirname='results'):
 
     return os.path.join(path, filename_reformat)
 
+# CONTENT TYPE REGISTRY
+# process-local cache of the content types (and their model classes) for the
+# geo hierarchy, people and collation models, so hot paths never query them.
+# Warmed once at app startup and cleared on post_migrate, after which it
+# refills lazily (content type ids can change when a database is rebuilt).
+
+CONTENT_TYPE_APPS = ['__geo', '__people', '__poll']
+
+content_type_registry = dict(by_model=dict(), by_id=dict())
+
+
+def register_content_type(content_type: ContentType) -> ContentType:
+    content_type_registry['by_model'][(content_type.app_label, content_type.model)] = content_type
+    content_type_registry['by_id'][content_type.pk] = content_type
+    return content_type
+
+
+def clear_content_types(**kwargs):
+    content_type_registry['by_model'].clear()
+    content_type_registry['by_id'].clear()
+
+
+def warm_content_types(verbose: Optional[bool]=False) -> int:
+    '''Loads every content type of CONTENT_TYPE_APPS in a single query'''
+    clear_content_types()
+    try:
+        for content_type in ContentType.objects.filter(app_label__in=CONTENT_TYPE_APPS):
+            register_content_type(content_type)
+    except DatabaseError as e:
+        # no database (or no tables yet) at startup, lookups fill in lazily
+        if verbose is True:
+            print(f'{TerminalColors.WARNING}Warning:{TerminalColors.ENDC} Content types not warmed\n{e}')
+    return len(content_type_registry['by_id'])
+
+
 def get_zone_ct(
         model,
         verbose: Optional[bool]=False
@@ -60,14 +96,44 @@ def get_zone_ct(
     
     # we can use settings.Debug instead of verbose
 
-    zone_ct = None
+    opts = model._meta.concrete_model._meta
+    zone_ct = content_type_registry['by_model'].get((opts.app_label, opts.model_name))
+    if zone_ct is not None:
+        return zone_ct
     try:
-        zone_ct = ContentType.objects.get_for_model(model)
+        zone_ct = register_content_type(ContentType.objects.get_for_model(model))
     except Exception as e:
         if verbose is True:
             print(f'{TerminalColors.WARNING}Warning:{TerminalColors.ENDC} Exception encountered etching content type for model: {model.__name__}\n{e}')
     return zone_ct
 
+
+def get_zone_ct_id(model) -> Optional[int]:
+    zone_ct = get_zone_ct(model)
+    return zone_ct.pk if zone_ct is not None else None
+
+
+def get_content_type(content_type_id) -> Optional[ContentType]:
+    '''Content type by id, e.g. for a zone_ct_id, without touching the zone_ct relation'''
+    if content_type_id is None:
+        return None
+    content_type = content_type_registry['by_id'].get(content_type_id)
+    if content_type is None:
+        try:
+            content_type = register_content_type(ContentType.objects.get_for_id(content_type_id))
+        except ContentType.DoesNotExist:
+            return None
+    return content_type
+
+
+def get_content_type_model(model_name, app_label='__poll'):
+    '''Model class registered under a lower case model name, e.g. "stationcollationsheet"'''
+    content_type = content_type_registry['by_model'].get((app_label, model_name))
+    if content_type is None:
+        content_type = register_content_type(ContentType.objects.get_by_natural_key(app_label, model_name))
+    return content_type.model_class()
+
+
 def print_progress_bar(
     iteration,
     total,
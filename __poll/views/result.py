@@ -4,6 +4,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.mail import send_mail, BadHeaderError
 from django.http import HttpResponse, HttpResponseRedirect
+from django.db import transaction
 from __geo.models import Station, Constituency, Region, Nation
 from __poll.models import ResultSheet, ResultSheetApproval, Result, ResultApproval, Position
 from __people.models import Party, Candidate, Agent
@@ -11,6 +12,7 @@ from __poll.serializers import ResultSerializer, PositionSerializer, PositionCol
 from __geo.serializers import StationSerializer, StationCollationSerializer
 from __people.serializers import PartySerializer, CandidateSerializer
 from __poll.utils.utils import get_zone_ct
+from __poll.utils.ingest import lock_result_sheets, get_last_stream_id
 from __poll.forms import ResultForm
 from __poll.constants import ROWS_PER_PAGE
 from django.db.models import Q, Prefetch, Value, F, Sum, IntegerField, Case, When, OuterRef, Subquery
@@ -299,6 +301,7 @@ def result_candidate_list(request, spk=None, ppk=None):
     # fetch result sheet
     result_sheet = ResultSheet.objects \
                             .filter(station__in=stations.values('pk'), position__in=positions) \
+                            .select_related('scan') \
                             .first()
 
     # fetch approving agents
@@ -427,9 +430,16 @@ def result_candidate_list(request, spk=None, ppk=None):
 
     result_sheet_approvals = None
     result_sheet_url = None
+    result_sheet_preview_url = None
+    result_sheet_thumbnail_url = None
     if result_sheet:
         if result_sheet.result_sheet:
             result_sheet_url = request.build_absolute_uri(result_sheet.result_sheet.url)
+        # rendered in the background, absent until the scan is processed
+        if result_sheet.scan is not None and result_sheet.scan.preview:
+            result_sheet_preview_url = request.build_absolute_uri(result_sheet.scan.preview.url)
+        if result_sheet.scan is not None and result_sheet.scan.thumbnail:
+            result_sheet_thumbnail_url = request.build_absolute_uri(result_sheet.scan.thumbnail.url)
         # fetch the approvals
         result_sheet_approvals = ResultSheetApproval.objects \
                                                     .filter(
@@ -506,6 +516,8 @@ def result_candidate_list(request, spk=None, ppk=None):
         parties=party_data,
         result_sheet=result_sheet,
         result_sheet_url=result_sheet_url,
+        result_sheet_preview_url=result_sheet_preview_url,
+        result_sheet_thumbnail_url=result_sheet_thumbnail_url,
         result_sheet_approvals=result_sheet_approvals,
         spk=spk,
         ppk=ppk,
@@ -554,27 +566,34 @@ def result_candidate_list(request, spk=None, ppk=None):
         if new_file_uploaded:
             defaults['result_sheet']=result_sheet_file
 
-        result_sheet, _ = ResultSheet.objects \
-                                    .update_or_create(
-                                        station_id=station,
-                                        position_id=position,
-                                        defaults=defaults)
-
-        # create results
-        for i in range(0, n):
-            # try:
-                result_vote = 0 if len(votes[i]) <= 0 else int(votes[i])
-                result_candidate = 0 if len(candidates[i]) <= 0 else int(candidates[i])
-                result, _ = Result.objects.update_or_create(
+        with transaction.atomic():
+            # bulk ingests and offline syncs of the same sheet wait for this one
+            lock_result_sheets([(station, position)])
+            # sheets queued on the ingest stream before this one are skipped
+            stream_id = get_last_stream_id()
+            if stream_id is not None:
+                defaults['stream_id'] = stream_id
+            result_sheet, _ = ResultSheet.objects \
+                                        .update_or_create(
                                             station_id=station,
-                                            candidate_id=result_candidate,
-                                            defaults=dict(
-                                                votes=result_vote,
-                                                result_sheet=result_sheet,
-                                                station_agent=None,
-                                                status=StatusChoices.ACTIVE
+                                            position_id=position,
+                                            defaults=defaults)
+
+            # create results
+            for i in range(0, n):
+                # try:
+                    result_vote = 0 if len(votes[i]) <= 0 else int(votes[i])
+                    result_candidate = 0 if len(candidates[i]) <= 0 else int(candidates[i])
+                    result, _ = Result.objects.update_or_create(
+                                                station_id=station,
+                                                candidate_id=result_candidate,
+                                                defaults=dict(
+                                                    votes=result_vote,
+                                                    result_sheet=result_sheet,
+                                                    station_agent=None,
+                                                    status=StatusChoices.ACTIVE
+                                                )
                                             )
-                                        )
             # except Exception as e:
             #     print('Exception :', e)
             #     context = {
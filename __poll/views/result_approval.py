@@ -24,7 +24,7 @@ from __poll.constants import ROWS_PER_PAGE, StatusChoices
 from __people.models import Agent
 from __geo.models import Nation, Region, Constituency, Station
 from account.models import User
-from __poll.utils.utils import get_zone_ct
+from __poll.utils.utils import get_zone_ct, get_zone_ct_id
 from django.db.models import F, Value, Q, Func, Sum
 from django.db.models.functions import Concat, Left
 
@@ -560,13 +560,13 @@ def result_approval_form(request, spk=None, ppk=None):
                                                 ).first()
 
         if agent is not None:
-            if agent.zone_ct == get_zone_ct(Nation):
+            if agent.zone_ct_id == get_zone_ct_id(Nation):
                 result_sheet_has_approvals = has_station_approval and has_constituency_approval and has_regional_approval and not has_national_approval
-            elif agent.zone_ct == get_zone_ct(Region):
+            elif agent.zone_ct_id == get_zone_ct_id(Region):
                 result_sheet_has_approvals = has_station_approval and has_constituency_approval and not (has_regional_approval and has_national_approval)
-            elif agent.zone_ct == get_zone_ct(Constituency):
+            elif agent.zone_ct_id == get_zone_ct_id(Constituency):
                 result_sheet_has_approvals = has_station_approval and not (has_constituency_approval and has_regional_approval and has_national_approval)
-            elif agent.zone_ct == get_zone_ct(Station):
+            elif agent.zone_ct_id == get_zone_ct_id(Station):
                 result_sheet_has_approvals = not (has_station_approval and has_constituency_approval and has_regional_approval and has_national_approval)
 
         if result_sheet is not None:
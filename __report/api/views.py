@@ -1,6 +1,7 @@
 import json
 import redis
 from datetime import datetime
+from django.utils.dateparse import parse_datetime
 import django_rq
 from django.urls import reverse
 from django.conf import settings
@@ -10,6 +11,16 @@ from rq.job import Job, JobStatus, cancel_job, get_current_job
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from __report.tasks import collation_task, clear_collation_task
+from __poll.tasks import get_collation_queue_stats
+from __poll.utils.ingest_stream import get_result_stream_stats
+from __report.utils import COLLATION_MODES, COLLATION_MODE_PYTHON
+from __report.cache import get_cached_dashboard
+from __report.dashboard import run_dashboard_panels
+from __poll.utils.etags import (get_cached_versions_etag, get_not_modified_response, set_response_etag,
+                                 DASHBOARD_VERSION_KEYS)
+from __report.exports import EXPORT_TABLES, EXPORT_FORMATS, iter_export, get_export_filename
+from __poll.utils.snapshots import get_collation_trend, SNAPSHOT_LEVEL_NAMES
+from __poll.utils.leaderboards import get_leaderboard, get_leaderboard_votes, LEADERBOARD_ALL_OFFICES
 from django.shortcuts import render, redirect
 from __poll.utils.utils import get_zone_ct, trim_vote_count, make_title_key
 from __geo.models import Nation, Region , Constituency, Station
@@ -21,11 +32,11 @@ from __poll.models import (
     SupernationalCollationSheet, ParliamentarySummarySheet
 )
 from django.db.models import (
-    Q, Prefetch, Sum, Count, Max,
+    Q, Prefetch, Sum, Count,
     F, Value, Func, Subquery, OuterRef, IntegerField, CharField, Case, When,
 )
 from django.db.models.functions import Concat
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, Http404
 from django.apps import apps
 
 
@@ -102,7 +113,13 @@ def enqueue_collation(request):
     context = dict(
         started=started,
     )
-    job = queue.enqueue(collation_task, context=context)
+    mode = request.GET.get('mode')
+    if mode not in COLLATION_MODES:
+        mode = None
+    partitioned = request.GET.get('partitioned', '').lower() in ['1', 'true', 'yes']
+    if partitioned and mode == COLLATION_MODE_PYTHON:
+        return Response(dict(message='Partitioned collation is set-based SQL, it cannot run in python mode.'), 400)
+    job = queue.enqueue(collation_task, context=context, mode=mode, partitioned=partitioned)
     job_key = job.key.decode("utf-8")
     response = dict(
         status=201,
@@ -166,6 +183,73 @@ def dequeue_collation(request, jid=None):
     return Response(response, 201)
 
 
+@api_view(['GET'])
+def collation_queue_stats(request):
+    response = get_collation_queue_stats()
+    return Response(response, 200)
+
+
+@api_view(['GET'])
+def result_stream_stats(request):
+    response = get_result_stream_stats()
+    return Response(response, 200)
+
+
+@api_view(['GET'])
+def collation_trend(request):
+    '''
+    Per party totals of a zone over time from the collation snapshots, e.g.
+    ?level=region&zone=3&position=presidential&start=2024-12-07T18:00:00
+    '''
+    level = SNAPSHOT_LEVEL_NAMES.get(request.GET.get('level', 'nation'))
+    zone_id = request.GET.get('zone', '')
+    start = request.GET.get('start')
+    end = request.GET.get('end')
+    try:
+        start = parse_datetime(start) if start else None
+        end = parse_datetime(end) if end else None
+    except ValueError:
+        # well formatted but impossible dates, e.g. month 13
+        start = end = None
+    position = request.GET.get('position')
+    # the totals of each office are kept apart, so one has to be picked
+    zone_ct_id = None
+    if position == 'presidential':
+        zone_ct_id = get_zone_ct(Nation).pk
+    elif position == 'parliamentary':
+        zone_ct_id = get_zone_ct(Constituency).pk
+    if level is None or not zone_id.isdigit() or zone_ct_id is None \
+            or (request.GET.get('start') and start is None) \
+            or (request.GET.get('end') and end is None):
+        response = dict(status=400,
+                        message='level (nation, region, constituency), zone, position (presidential, '
+                                'parliamentary) and ISO start/end are required.')
+        return Response(response, 400)
+    points = get_collation_trend(level, int(zone_id), zone_ct_id=zone_ct_id, start=start, end=end)
+    response = dict(
+        status=200,
+        level=request.GET.get('level', 'nation'),
+        zone=int(zone_id),
+        position=position,
+        points=points,
+    )
+    return Response(response, 200)
+
+
+@login_required
+def export_table(request, table, export_format):
+    '''
+    Streams a whole results or collation table as CSV or columnar file,
+    e.g. /export/regional_collation_sheets/csv
+    '''
+    if table not in EXPORT_TABLES or export_format not in EXPORT_FORMATS:
+        raise Http404('Unknown export')
+    response = StreamingHttpResponse(iter_export(table, export_format),
+                                     content_type=EXPORT_FORMATS[export_format]['content_type'])
+    response['Content-Disposition'] = f'attachment; filename="{get_export_filename(table, export_format)}"'
+    return response
+
+
 @api_view(['GET', 'POST'])
 def manage_items(request, *args, **kwargs):
     if request.method == 'GET':
@@ -267,84 +351,67 @@ def demo_dash(request, *args, **kwargs):
         )
     return JsonResponse(data)
 
-@login_required
-@api_view(['GET', 'POST'])
-def dashboard(request, *args, **kwargs):
-    title='Dashboard'
-    template = f'report/charts/dashboard.html'
-
-    # print([k for k, v in vars(request).items()])
-    # blue #0d6efd
-    # indigo #6610f2
-    # purple #6f42c1
-    # pink #d63384
-    # red #dc3545
-    # orange #fd7e14
-    # yellow #ffc107
-    # green #198754
-    # teal #20c997
-    # cyan #0dcaf0
-    # #696969 #808080 #A9A9A9 #C0C0C0 #D3D3D3
-
-    COLOR_COMB = [
-        # '#0d6efd',
-        'rgba(13, 110, 253, 1)',
-        'rgba(13, 110, 253, .75)',
-        'rgba(13, 110, 253, .5)',
-        'rgba(13, 110, 253, .25)',
-        # '#6610f2',
-        'rgba(102, 16, 242, 1)',
-        'rgba(102, 16, 242, .75)',
-        'rgba(102, 16, 242, .5)',
-        'rgba(102, 16, 242, .25)',
-        # '#6f42c1',
-        'rgba(111, 66, 193, 1)',
-        'rgba(111, 66, 193, .75)',
-        'rgba(111, 66, 193, .5)',
-        'rgba(111, 66, 193, .25)',
-        # '#d63384',
-        'rgba(214, 51, 132, 1)',
-        'rgba(214, 51, 132, .75)',
-        'rgba(214, 51, 132, .5)',
-        'rgba(214, 51, 132, .25)',
-        # '#dc3545',
-        'rgba(220, 53, 69, 1)',
-        'rgba(220, 53, 69, .75)',
-        'rgba(220, 53, 69, .5)',
-        'rgba(220, 53, 69, .25)',
-        # '#fd7e14',
-        'rgba(253, 126, 20, 1)',
-        'rgba(253, 126, 20, .75)',
-        'rgba(253, 126, 20, .5)',
-        'rgba(253, 126, 20, .25)',
-        # '#ffc107',
-        'rgba(255, 193, 7, 1)',
-        'rgba(255, 193, 7, .75)',
-        'rgba(255, 193, 7, .5)',
-        'rgba(255, 193, 7, .25)',
-        # '#198754',
-        'rgba(25, 135, 84, 1)',
-        'rgba(25, 135, 84, .75)',
-        'rgba(25, 135, 84, .5)',
-        'rgba(25, 135, 84, .25)',
-        # '#20c997',
-        'rgba(32, 201, 151, 1.0)',
-        'rgba(32, 201, 151, 0.75)',
-        'rgba(32, 201, 151, 0.5)',
-        'rgba(32, 201, 151, 0.25)',
-        # '#0dcaf0'
-        'rgba(13, 202, 240, 1)',
-        'rgba(13, 202, 240, .75)',
-        'rgba(13, 202, 240, .5)',
-        'rgba(13, 202, 240, .25)',
-    ]
-
-    nation_ct = get_zone_ct(Nation)
-    constituency_ct = get_zone_ct(Constituency)
-
-
-
 
+# DASHBOARD
+# The dashboard is a set of independent panels, each filling in its own
+# charts, which are run concurrently by run_dashboard_panels.
+
+COLOR_COMB = [
+    # '#0d6efd',
+    'rgba(13, 110, 253, 1)',
+    'rgba(13, 110, 253, .75)',
+    'rgba(13, 110, 253, .5)',
+    'rgba(13, 110, 253, .25)',
+    # '#6610f2',
+    'rgba(102, 16, 242, 1)',
+    'rgba(102, 16, 242, .75)',
+    'rgba(102, 16, 242, .5)',
+    'rgba(102, 16, 242, .25)',
+    # '#6f42c1',
+    'rgba(111, 66, 193, 1)',
+    'rgba(111, 66, 193, .75)',
+    'rgba(111, 66, 193, .5)',
+    'rgba(111, 66, 193, .25)',
+    # '#d63384',
+    'rgba(214, 51, 132, 1)',
+    'rgba(214, 51, 132, .75)',
+    'rgba(214, 51, 132, .5)',
+    'rgba(214, 51, 132, .25)',
+    # '#dc3545',
+    'rgba(220, 53, 69, 1)',
+    'rgba(220, 53, 69, .75)',
+    'rgba(220, 53, 69, .5)',
+    'rgba(220, 53, 69, .25)',
+    # '#fd7e14',
+    'rgba(253, 126, 20, 1)',
+    'rgba(253, 126, 20, .75)',
+    'rgba(253, 126, 20, .5)',
+    'rgba(253, 126, 20, .25)',
+    # '#ffc107',
+    'rgba(255, 193, 7, 1)',
+    'rgba(255, 193, 7, .75)',
+    'rgba(255, 193, 7, .5)',
+    'rgba(255, 193, 7, .25)',
+    # '#198754',
+    'rgba(25, 135, 84, 1)',
+    'rgba(25, 135, 84, .75)',
+    'rgba(25, 135, 84, .5)',
+    'rgba(25, 135, 84, .25)',
+    # '#20c997',
+    'rgba(32, 201, 151, 1.0)',
+    'rgba(32, 201, 151, 0.75)',
+    'rgba(32, 201, 151, 0.5)',
+    'rgba(32, 201, 151, 0.25)',
+    # '#0dcaf0'
+    'rgba(13, 202, 240, 1)',
+    'rgba(13, 202, 240, .75)',
+    'rgba(13, 202, 240, .5)',
+    'rgba(13, 202, 240, .25)',
+]
+
+
+def get_dashboard_charts():
+    '''Blank charts of every dashboard panel'''
     pie = dict(labels=[], data=[], title='Total Votes',
             color='#0dcaf0',
             colors=['#0d6efd', '#6610f2', '#6f42c1', '#d63384', '#dc3545', '#fd7e14', '#ffc107', '#198754', '#20c997', '#0dcaf0'],)
@@ -493,7 +560,38 @@ def dashboard(request, *args, **kwargs):
                         color='#20c997',
                         colors=['#0d6efd', '#6610f2', '#6f42c1', '#d63384', '#dc3545', '#fd7e14', '#ffc107', '#198754', '#20c997', '#0dcaf0'],)
 
+    presidential_map_data = {
+        'list': [],
+    }
 
+    return dict(
+        pie=pie,
+        vote_validity=vote_validity,
+        ec_variance=ec_variance,
+        regional_counts=regional_counts,
+        constituency_counts=constituency_counts,
+        station_counts=station_counts,
+        votes_by_office=votes_by_office,
+        bar=bar,
+        party_total_votes=party_total_votes,
+        party_parliametary_votes=party_parliametary_votes,
+        party_presidential_votes=party_presidential_votes,
+        station_total_votes=station_total_votes,
+        station_parliametary_votes=station_parliametary_votes,
+        station_presidential_votes=station_presidential_votes,
+        presidential_candidates=presidential_candidates,
+        parliamentary_votes_by_party=parliamentary_votes_by_party,
+        presidential_top=presidential_top,
+        parliamentary_top=parliamentary_top,
+        polling_station_counts=polling_station_counts,
+        seat_counts=seat_counts,
+        presidential_map_data=presidential_map_data,
+    )
+
+
+def presidential_top_panel(charts):
+    '''Presidential candidates by votes'''
+    presidential_top = charts['presidential_top']
     # presidential_top
     '''
     presidential_top['list'] = [
@@ -533,9 +631,15 @@ def dashboard(request, *args, **kwargs):
                             'first_name', 'last_name', 'other_names', 'photo',
                             'party__code', 'party__title',
                         )
+    # the votes of every candidate in one query rather than one per candidate
+    candidate_votes = dict(Result.objects \
+                                 .filter(candidate__in=[candidate['id'] for candidate in chart_candidates]) \
+                                 .values('candidate') \
+                                 .annotate(votes=Sum('votes')) \
+                                 .values_list('candidate', 'votes'))
     total_votes = 0
     for candidate in chart_candidates:
-        candidate['votes'] = Result.objects.filter(candidate=candidate['id']).aggregate(Sum('votes'))['votes__sum']
+        candidate['votes'] = candidate_votes.get(candidate['id'])
         candidate['votes_display'] = trim_vote_count(candidate['votes'])
         candidate['party'] = candidate['party__code']
         del candidate['party__code']
@@ -556,6 +660,10 @@ def dashboard(request, *args, **kwargs):
         i += 1
 
 
+def parliamentary_top_panel(charts):
+    '''Party seats and parliamentary votes'''
+    parliamentary_top = charts['parliamentary_top']
+    parliamentary_votes_by_party = charts['parliamentary_votes_by_party']
     # parliamentary_top
     '''
     parliamentary_top['list'] = [
@@ -618,7 +726,9 @@ def dashboard(request, *args, **kwargs):
         i += 1
 
 
-
+def polling_station_counts_panel(charts):
+    '''Declared and outstanding polling stations'''
+    polling_station_counts = charts['polling_station_counts']
     # polling_station_counts
     all_polling_stations = Station.objects.values('pk')
     declared_polling_stations = Result.objects \
@@ -636,6 +746,9 @@ def dashboard(request, *args, **kwargs):
         polling_station_counts['data'].append(item['seats'])
 
 
+def seat_counts_panel(charts):
+    '''Won, declared and outstanding seats'''
+    seat_counts = charts['seat_counts']
     # seat_counts
     seats_declared = ParliamentarySummarySheet.objects.count()
     seats_total = Constituency.objects.count()
@@ -659,6 +772,9 @@ def dashboard(request, *args, **kwargs):
         seat_counts['data'].append(item['seats'])
 
 
+def pie_panel(charts):
+    '''Top results'''
+    pie = charts['pie']
     # pie
     queryset = Result.objects.order_by('-votes')[:5]
     for result in queryset:
@@ -666,6 +782,9 @@ def dashboard(request, *args, **kwargs):
         pie['data'].append(result.votes)
 
 
+def vote_validity_panel(charts):
+    '''Valid and invalid votes'''
+    vote_validity = charts['vote_validity']
     # vote_validity
     sheets = SupernationalCollationSheet.objects.order_by('-total_votes')
     total_valid = 0
@@ -685,6 +804,9 @@ def dashboard(request, *args, **kwargs):
     ]
 
 
+def ec_variance_panel(charts):
+    '''Collated and EC votes'''
+    ec_variance = charts['ec_variance']
     # ec_variance
     sheets = SupernationalCollationSheet.objects.order_by('-total_votes')
     total_valid = 0
@@ -695,6 +817,9 @@ def dashboard(request, *args, **kwargs):
     ec_variance['data'] = [total_valid, total_ec]
 
 
+def constituency_counts_panel(charts):
+    '''Votes by constituency'''
+    constituency_counts = charts['constituency_counts']
     # constituency_counts
     constituency_collations = {}
     sheets = RegionalCollationSheet.objects \
@@ -722,6 +847,9 @@ def dashboard(request, *args, **kwargs):
             i += 1
 
 
+def station_counts_panel(charts):
+    '''Votes by station'''
+    station_counts = charts['station_counts']
     # station_counts
     station_collations = {}
     sheets = ConstituencyCollationSheet.objects \
@@ -749,6 +877,10 @@ def dashboard(request, *args, **kwargs):
             i += 1
 
 
+def regional_counts_panel(charts):
+    '''Votes by region and by position'''
+    regional_counts = charts['regional_counts']
+    votes_by_office = charts['votes_by_office']
     # regional_counts
     # votes_by_office
     sheets = NationalCollationSheet.objects \
@@ -792,96 +924,66 @@ def dashboard(request, *args, **kwargs):
             i += 1
 
 
+def get_station_leaders(limit=10):
+    '''The stations with the most votes over all offices, highest first'''
+    leaders = get_leaderboard(LEADERBOARD_ALL_OFFICES, 'station', limit=limit)
+    stations = Station.objects \
+                      .filter(pk__in=[station_id for station_id, votes in leaders]) \
+                      .in_bulk()
+    return [dict(station_id=station_id,
+                 station_code=stations[station_id].code,
+                 station_title=stations[station_id].title,
+                 total_votes=votes)
+            for station_id, votes in leaders if station_id in stations]
+
+
+def bar_panel(charts):
+    '''Top stations by votes'''
+    bar = charts['bar']
     # bar
-    queryset = Result.objects \
-                    .values('station__code') \
-                    .annotate(station_votes=Sum('votes'))[:10]
-                    #  \
-                    # .order_by('-station_votes') \
-    for entry in queryset:
-        bar['labels'].append(entry['station__code'])
-        bar['data'].append(entry['station_votes'])
+    for leader in get_station_leaders(limit=10):
+        bar['labels'].append(leader['station_code'])
+        bar['data'].append(leader['total_votes'])
 
 
+def station_votes_panel(charts):
+    '''Top stations by votes per position'''
+    station_total_votes = charts['station_total_votes']
+    station_parliametary_votes = charts['station_parliametary_votes']
+    station_presidential_votes = charts['station_presidential_votes']
     # station_total_votes, station_parliametary_votes, station_presidential_votes
-    cursor = connection.cursor()
-    fields = [
-        'station_id', 'station_code', 'station_title',
-        'total_votes',
-    ]
-    reports = []
-    col_table = 'poll_constituency_collation_sheet'
-    query = f'''SELECT
-                    s.id, s.code, s.title,
-                    SUM(c.total_votes) AS votes
-                FROM
-                    geo_station AS s
-                    INNER JOIN {col_table} AS c ON c.station_id = s.id
-                GROUP BY s.id
-                ORDER BY votes DESC
-                LIMIT 10 OFFSET 0;'''
-    try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            row = dict(zip(fields, row))
-            if row['total_votes'] is not None:
-                reports.append(row)
-    except Exception as e:
-        print("There was an error running raw query", e)
-    for report in reports:
-        station_id = report['station_id']
-        
-        pre_sheets = ConstituencyCollationSheet.objects \
-                                    .filter(
-                                        station_id=station_id,
-                                        zone_ct=nation_ct
-                                    ).values('total_votes')
-        par_sheets = ConstituencyCollationSheet.objects \
-                                    .filter(
-                                        station_id=station_id,
-                                        zone_ct=constituency_ct
-                                    ).values('total_votes')
-        
-        label = report['station_code']
-        total_count = int(report['total_votes']) if report['total_votes'] is not None else 0
-        
-        par_count = 0
-        for sheet in pre_sheets:
-            if sheet is not None:
-                if sheet.get('total_votes', 0) > 0:
-                    par_count += sheet.get('total_votes', 0)
-
-        pre_count = 0
-        for sheet in par_sheets:
-            if sheet is not None:
-                if sheet.get('total_votes', 0) > 0:
-                    pre_count += sheet.get('total_votes', 0)
-
+    leaders = get_station_leaders(limit=10)
+    votes = get_leaderboard_votes('station', [leader['station_id'] for leader in leaders])
+    for leader in leaders:
+        label = leader['station_code']
         station_total_votes['labels'].append(label)
         station_presidential_votes['labels'].append(label)
         station_parliametary_votes['labels'].append(label)
 
-        station_total_votes['data'].append(total_count)
-        station_presidential_votes['data'].append(par_count)
-        station_parliametary_votes['data'].append(pre_count)
+        station_total_votes['data'].append(leader['total_votes'])
+        station_presidential_votes['data'].append(votes['presidential'].get(leader['station_id'], 0))
+        station_parliametary_votes['data'].append(votes['parliamentary'].get(leader['station_id'], 0))
 
 
+def party_votes_panel(charts):
+    '''Votes by party per position'''
+    party_total_votes = charts['party_total_votes']
+    party_parliametary_votes = charts['party_parliametary_votes']
+    party_presidential_votes = charts['party_presidential_votes']
     # party_total_votes, party_parliametary_votes, party_presidential_votes
-    qs = Party.objects.all()
-    for party in qs:
-        party_total_votes['labels'].append(party.code)
-        party_total_votes['data'].append(party.result_votes)
-        party_parliametary_votes['labels'].append(party.code)
-        party_parliametary_votes['data'].append(party.total_parliamentary_votes)
-        party_presidential_votes['labels'].append(party.code)
-        party_presidential_votes['data'].append(party.total_presidential_votes)
-
-
-    # map_data
-    presidential_map_data = {
-        'list': [],
-    }
+    votes = get_leaderboard_votes('party')
+    for party_id, code in Party.objects.values_list('pk', 'code'):
+        party_total_votes['labels'].append(code)
+        party_total_votes['data'].append(votes[LEADERBOARD_ALL_OFFICES].get(party_id, 0))
+        party_parliametary_votes['labels'].append(code)
+        party_parliametary_votes['data'].append(votes['parliamentary'].get(party_id, 0))
+        party_presidential_votes['labels'].append(code)
+        party_presidential_votes['data'].append(votes['presidential'].get(party_id, 0))
+
+
+def presidential_map_panel(charts):
+    '''Presidential wins per region'''
+    presidential_map_data = charts['presidential_map_data']
     c = 0
     colors = {}
     title = 'Presidential Wins'
@@ -903,17 +1005,18 @@ def dashboard(request, *args, **kwargs):
                     .all()
     c = 0
     party_colors = {}
-    for zone in zones:
-        candidates = Candidate.objects \
-                            .filter(party__pk=OuterRef('party__pk')) \
-                            .annotate(
-                                candidate_full_name=Concat(F('prefix'), Value(' '), F('first_name'), Value(' '), F('last_name'))
-                            ) \
-                            .values('candidate_full_name') \
-                            .all()[:1]
-
-        # TECH NOTE: Concat the names of all candidate (from above) into the candidates field below
-        results = collation_sheet.objects \
+    candidates = Candidate.objects \
+                        .filter(party__pk=OuterRef('party__pk')) \
+                        .annotate(
+                            candidate_full_name=Concat(F('prefix'), Value(' '), F('first_name'), Value(' '), F('last_name'))
+                        ) \
+                        .values('candidate_full_name') \
+                        .all()[:1]
+
+    # TECH NOTE: Concat the names of all candidate (from above) into the candidates field below
+    # the sheets of every zone in one query, grouped per zone below
+    zone_results = dict()
+    for result in collation_sheet.objects \
                                         .values(
                                                 'party__pk',
                                                 'party__code',
@@ -932,32 +1035,21 @@ def dashboard(request, *args, **kwargs):
                                             total_variance=F('total_votes_ec') - F('total_votes')
                                         ) \
                                         .filter(**{
-                                                f'{zone_name}__pk': zone['id'],
+                                                f'{zone_name}__pk__in': [zone['id'] for zone in zones],
                                                 'zone_ct': zone_ct,
                                             }) \
-                                        .all().order_by('party__code')
+                                        .all().order_by('party__code'):
+        zone_results.setdefault(result['region__pk'], []).append(result)
+
+    for zone in zones:
+        results = zone_results.get(zone['id'], [])
 
         # find records with the max votes
-        max_results = results.annotate(
-                                    max_collated_votes=Max(F('total_votes')),
-                                    ) \
-                             .values_list('max_collated_votes')
-        max_results = [item[0] for item in max_results]
         max_result = 0
-        if max_results is not None:
-            if len(max_results) > 0:
-                max_result = max(max_results)
-
-        # find records with the percentage
-        # total_results = results.annotate(
-        #                             sum_collated_votes=F('total_votes'),
-        #                             ) \
-        #                      .values_list('sum_collated_votes')
-        # total_results = sum([item[0] for item in total_results])
-        # filter in only the parties with the max votes
-
-        # presidential_map_data['list'].extend([v for v in results if v['total_votes'] == max_result and max_result > 0])
+        if len(results) > 0:
+            max_result = max([result['total_votes'] or 0 for result in results])
 
+        # filter in only the parties with the max votes
         for result in results:
             if result['total_votes'] == max_result and max_result > 0:
                 color = party_colors.get(result['party__pk'], None)
@@ -981,88 +1073,96 @@ def dashboard(request, *args, **kwargs):
     #     percentage = round(100 * len(map_data) / zones.count(), 0)
 
 
-    foo = 'foo'
-    if foo == 'bar':
-        # DEBUG NOTES: Segment still too slow
-
-        # presidential_candidates
-        candidates = Candidate.objects \
-                            .filter(
-                                position__in=Position.objects \
-                                    .filter(zone_ct=nation_ct) \
-                                    .all()
-                            ).all()
-        charts = dict()
-        for candidate in candidates:
-            if candidate.total_votes > 0:
-                label = f'{candidate.first_name[0]}.  {candidate.last_name} ({candidate.party.code})'
-                value = candidate.total_votes
-                charts[label] = value
-        charts = {k: v for k, v in sorted(charts.items(), key=lambda item: item[1], reverse=True)}
-        for label, value in charts.items():
-            presidential_candidates['labels'].append(label)
-            presidential_candidates['data'].append(value)
-
-
-        # parliamentary_votes_by_party
-        candidates = StationCollationSheet.objects \
-                                        .filter(
-                                            candidate__position__in=Position.objects \
-                                                .filter(zone_ct=constituency_ct) \
-                                                .all()
-                                        ) \
-                                        .values('candidate', 'candidate__prefix', 'candidate__first_name', 'candidate__last_name', 'candidate__party__code', 'candidate__party__title') \
-                                        .annotate(candidate_count=Count('total_votes')) \
-                                        .annotate(total_votes=Sum('total_votes')) \
-                                        .order_by('-total_votes')[:10]
-        charts = dict()
-        for candidate in candidates:
-            print(candidate)
-            print("::::::::::::::::::::::::::::::::::::::::::::")
-            if candidate.get('total_votes', 0) > 0:
-                first_name = candidate.get('candidate__first_name', '')
-                last_name = candidate.get('candidate__last_name', '')
-                party_code = candidate.get('candidate__party__code', '')
-                label = f'{first_name[0]}.  {last_name} ({party_code})'
-                value = candidate.get('total_votes', 0)
-                charts[label] = value
-        charts = {k: v for k, v in sorted(charts.items(), key=lambda item: item[1], reverse=True)}
-        for label, value in charts.items():
-            parliamentary_votes_by_party['labels'].append(label)
-            parliamentary_votes_by_party['data'].append(value)
-
-
-
-    context = dict(
-        title=title,
-        pie=pie,
-        vote_validity=vote_validity,
-        ec_variance=ec_variance,
-        regional_counts=regional_counts,
-        constituency_counts=constituency_counts,
-        station_counts=station_counts,
-        votes_by_office=votes_by_office,
-        bar=bar,
-
-        party_total_votes=party_total_votes,
-        party_parliametary_votes=party_parliametary_votes,
-        party_presidential_votes=party_presidential_votes,
-
-        station_total_votes=station_total_votes,
-        station_parliametary_votes=station_parliametary_votes,
-        station_presidential_votes=station_presidential_votes,
-
-        presidential_candidates=presidential_candidates,
-        parliamentary_votes_by_party=parliamentary_votes_by_party,
+def candidate_votes_panel(charts):
+    '''Votes per presidential and parliamentary candidate'''
+    # DEBUG NOTES: Segment still too slow, left out of DASHBOARD_PANELS
+    presidential_candidates = charts['presidential_candidates']
+    parliamentary_votes_by_party = charts['parliamentary_votes_by_party']
+    nation_ct = get_zone_ct(Nation)
+    constituency_ct = get_zone_ct(Constituency)
+    # DEBUG NOTES: Segment still too slow
 
-        presidential_top=presidential_top,
-        parliamentary_top=parliamentary_top,
-        polling_station_counts=polling_station_counts,
-        seat_counts=seat_counts,
+    # presidential_candidates
+    candidates = Candidate.objects \
+                        .filter(
+                            position__in=Position.objects \
+                                .filter(zone_ct=nation_ct) \
+                                .all()
+                        ).all()
+    charts = dict()
+    for candidate in candidates:
+        if candidate.total_votes > 0:
+            label = f'{candidate.first_name[0]}.  {candidate.last_name} ({candidate.party.code})'
+            value = candidate.total_votes
+            charts[label] = value
+    charts = {k: v for k, v in sorted(charts.items(), key=lambda item: item[1], reverse=True)}
+    for label, value in charts.items():
+        presidential_candidates['labels'].append(label)
+        presidential_candidates['data'].append(value)
+
+
+    # parliamentary_votes_by_party
+    candidates = StationCollationSheet.objects \
+                                    .filter(
+                                        candidate__position__in=Position.objects \
+                                            .filter(zone_ct=constituency_ct) \
+                                            .all()
+                                    ) \
+                                    .values('candidate', 'candidate__prefix', 'candidate__first_name', 'candidate__last_name', 'candidate__party__code', 'candidate__party__title') \
+                                    .annotate(candidate_count=Count('total_votes')) \
+                                    .annotate(total_votes=Sum('total_votes')) \
+                                    .order_by('-total_votes')[:10]
+    charts = dict()
+    for candidate in candidates:
+        if candidate.get('total_votes', 0) > 0:
+            first_name = candidate.get('candidate__first_name', '')
+            last_name = candidate.get('candidate__last_name', '')
+            party_code = candidate.get('candidate__party__code', '')
+            label = f'{first_name[0]}.  {last_name} ({party_code})'
+            value = candidate.get('total_votes', 0)
+            charts[label] = value
+    charts = {k: v for k, v in sorted(charts.items(), key=lambda item: item[1], reverse=True)}
+    for label, value in charts.items():
+        parliamentary_votes_by_party['labels'].append(label)
+        parliamentary_votes_by_party['data'].append(value)
+
+
+DASHBOARD_PANELS = [
+    (['presidential_top'], presidential_top_panel),
+    (['parliamentary_top', 'parliamentary_votes_by_party'], parliamentary_top_panel),
+    (['polling_station_counts'], polling_station_counts_panel),
+    (['seat_counts'], seat_counts_panel),
+    (['pie'], pie_panel),
+    (['vote_validity'], vote_validity_panel),
+    (['ec_variance'], ec_variance_panel),
+    (['constituency_counts'], constituency_counts_panel),
+    (['station_counts'], station_counts_panel),
+    (['regional_counts', 'votes_by_office'], regional_counts_panel),
+    (['bar'], bar_panel),
+    (['station_total_votes', 'station_parliametary_votes', 'station_presidential_votes'], station_votes_panel),
+    (['party_total_votes', 'party_parliametary_votes', 'party_presidential_votes'], party_votes_panel),
+    (['presidential_map_data'], presidential_map_panel),
+]
+
+
+def get_dashboard_context():
+    charts, failed_panels = run_dashboard_panels(get_dashboard_charts, DASHBOARD_PANELS)
+    # panels that failed or timed out are left blank
+    return dict(title='Dashboard', failed_panels=failed_panels, **charts)
 
-        presidential_map_data=presidential_map_data,
 
-    )
 
-    return JsonResponse(context)
+@login_required
+@api_view(['GET', 'POST'])
+def dashboard(request, *args, **kwargs):
+    etag = get_cached_versions_etag(request, DASHBOARD_VERSION_KEYS)
+    response = get_not_modified_response(request, etag)
+    if response is not None:
+        return response
+    # computed once per collation version, see __report/cache.py
+    context = get_cached_dashboard(get_dashboard_context)
+    if len(context.get('failed_panels', [])) > 0:
+        # a partial dashboard is recomputed on the next request
+        etag = None
+    return set_response_etag(request, JsonResponse(context), etag)
 
@@ -0,0 +1,10 @@
+from django.urls import path, include
+from kabanga.urls import urlpatterns as kabanga_urlpatterns
+
+
+# the report and geo API routes the benchmarks request, mounted at the paths
+# their templates and links use
+urlpatterns = kabanga_urlpatterns + [
+    path('reports/', include('__report.urls')),
+    path('geo/api/', include('__geo.api.urls')),
+]
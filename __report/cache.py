@@ -0,0 +1,128 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from __geo.helpers.hierarchy import GEO_HIERARCHY_VERSION_KEY
+from __poll.utils.collations import (
+    COLLATION_VERSION_KEY, COLLATION_EPOCH_KEY, get_collation_zone_version_key,
+)
+from __poll.utils.utils import get_zone_ct_id
+from __report.engine import REPORT_OFFICE_TYPES, get_report
+
+
+# REPORT CACHE
+# Report pages and dashboard payloads are cached under the collation versions
+# they were computed from (see mark_collation_changed), so a cached entry is
+# valid until the sheets behind it change and never needs deleting. On a miss
+# a single caller recomputes while the others are served the previous entry,
+# so a spike of viewers costs one computation. Callers with no previous entry
+# to serve wait for the computation (up to REPORT_CACHE_WAIT seconds) and only
+# compute it themselves when it does not come in time.
+
+REPORT_CACHE_KEY = 'report:{}:{}:{}'
+REPORT_CACHE_LATEST_KEY = 'report:{}:{}:latest'
+DASHBOARD_CACHE_KEY = 'dashboard:{}'
+DASHBOARD_CACHE_LATEST_KEY = 'dashboard:latest'
+# seconds a computation may hold the lock before another caller takes over
+REPORT_CACHE_LOCK_TIMEOUT = 60
+# seconds between the checks of a caller waiting for a computation
+REPORT_CACHE_POLL_INTERVAL = 0.05
+
+
+def wait_for_cached(key, latest_key, lock_key):
+    '''
+    Polls for the value another caller is computing under lock_key, for up
+    to REPORT_CACHE_WAIT seconds. None when it did not come in time or the
+    computation gave up the lock without storing one.
+    '''
+    deadline = time.monotonic() + settings.REPORT_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REPORT_CACHE_POLL_INTERVAL)
+        values = cache.get_many([key, latest_key, lock_key])
+        value = values.get(key, values.get(latest_key))
+        if value is not None:
+            return value
+        if lock_key not in values:
+            break
+    return None
+
+
+def get_cached(key, latest_key, compute, timeout=None, is_complete=None):
+    '''
+    Returns the cached value of key, computing it with compute() on a miss.
+    Only the caller holding the key's lock computes, the others get the value
+    last stored under latest_key, or wait for the computation when there is
+    none (see wait_for_cached) and compute too if it times out. A value failing
+    is_complete(value) is only stored as the latest, so the next caller
+    computes it again.
+    '''
+    timeout = settings.REPORT_CACHE_TIMEOUT if timeout is None else timeout
+    lock_key = f'{key}:lock'
+    locked = False
+    try:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        locked = cache.add(lock_key, 1, timeout=REPORT_CACHE_LOCK_TIMEOUT)
+        if not locked:
+            value = cache.get(latest_key)
+            if value is None:
+                value = wait_for_cached(key, latest_key, lock_key)
+            if value is not None:
+                return value
+    except Exception as e:
+        # without the cache every caller computes
+        print(e)
+        return compute()
+    value = None
+    try:
+        value = compute()
+    finally:
+        try:
+            if value is not None and is_complete is not None and not is_complete(value):
+                cache.set(latest_key, value, timeout=timeout)
+            elif value is not None:
+                cache.set_many({key: value, latest_key: value}, timeout=timeout)
+            if locked:
+                cache.delete(lock_key)
+        except Exception as e:
+            print(e)
+    return value
+
+
+def get_report_version(office_type, zone_type, zone_id=None):
+    '''Version string of the sheets and geo behind a report page'''
+    keys = [GEO_HIERARCHY_VERSION_KEY, COLLATION_EPOCH_KEY]
+    if zone_type == 'nation':
+        # every delta reaches the national totals
+        keys.append(COLLATION_VERSION_KEY)
+    else:
+        zone_ct_id = get_zone_ct_id(REPORT_OFFICE_TYPES[office_type])
+        keys.append(get_collation_zone_version_key(zone_ct_id, zone_type, zone_id))
+    versions = cache.get_many(keys)
+    return '.'.join([str(versions.get(key, 0)) for key in keys])
+
+
+def get_cached_report(office_type, zone_type, zone_id=None, version=None):
+    '''get_report() served from the report cache, version is get_report_version() if known'''
+    try:
+        if version is None:
+            version = get_report_version(office_type, zone_type, zone_id)
+    except Exception as e:
+        print(e)
+        return get_report(office_type, zone_type, zone_id)
+    zone = zone_id if zone_id is not None else '-'
+    return get_cached(REPORT_CACHE_KEY.format(office_type, f'{zone_type}:{zone}', version),
+                      REPORT_CACHE_LATEST_KEY.format(office_type, f'{zone_type}:{zone}'),
+                      lambda: get_report(office_type, zone_type, zone_id))
+
+
+def get_cached_dashboard(compute):
+    '''Dashboard payload from compute() served from the report cache'''
+    try:
+        versions = cache.get_many([GEO_HIERARCHY_VERSION_KEY, COLLATION_VERSION_KEY])
+    except Exception as e:
+        print(e)
+        return compute()
+    version = f'{versions.get(GEO_HIERARCHY_VERSION_KEY, 0)}.{versions.get(COLLATION_VERSION_KEY, 0)}'
+    return get_cached(DASHBOARD_CACHE_KEY.format(version), DASHBOARD_CACHE_LATEST_KEY, compute,
+                      is_complete=lambda context: len(context.get('failed_panels', [])) == 0)
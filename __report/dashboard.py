@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.db import connection
+
+
+# DASHBOARD PANELS
+# A dashboard panel is a (chart keys, fill function) pair: the function fills
+# in those charts of a blank set and shares nothing with the other panels, so
+# the panels run side by side on their own connections and the dashboard
+# takes as long as its slowest panel. A panel that fails or runs out of time
+# is left blank instead of failing the whole dashboard.
+
+def run_dashboard_panel(get_charts, keys, fill, statement_timeout=None):
+    '''Fills a blank set of charts with one panel, returns the panel's charts'''
+    if statement_timeout is not None:
+        with connection.cursor() as cursor:
+            # a panel past its deadline stops querying too
+            cursor.execute('SET statement_timeout = %s', [int(statement_timeout * 1000)])
+    charts = get_charts()
+    fill(charts)
+    return {key: charts[key] for key in keys}
+
+
+def run_dashboard_panel_thread(get_charts, keys, fill, statement_timeout=None):
+    try:
+        return run_dashboard_panel(get_charts, keys, fill, statement_timeout=statement_timeout)
+    finally:
+        # every worker thread opens its own connection
+        connection.close()
+
+
+def run_dashboard_panels(get_charts, panels, workers=None, timeout=None):
+    '''
+    Runs every panel and returns the charts with the names of the panels
+    that failed or did not finish within timeout seconds. Panels run in the
+    calling thread when workers is 1, or inside a transaction, whose
+    uncommitted rows other connections cannot see.
+    '''
+    workers = settings.DASHBOARD_PANEL_WORKERS if workers is None else workers
+    timeout = settings.DASHBOARD_PANEL_TIMEOUT if timeout is None else timeout
+    charts = get_charts()
+    failed_panels = []
+    if workers <= 1 or connection.in_atomic_block:
+        for keys, fill in panels:
+            try:
+                charts.update(run_dashboard_panel(get_charts, keys, fill))
+            except Exception as e:
+                print(e)
+                failed_panels.append(fill.__name__)
+        return charts, failed_panels
+
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(panels)))
+    try:
+        futures = {
+            executor.submit(run_dashboard_panel_thread, get_charts, keys, fill, statement_timeout=timeout): fill
+            for keys, fill in panels
+        }
+        done, not_done = wait(futures, timeout=timeout)
+    finally:
+        # a panel past the deadline finishes on its own, nobody waits for it
+        executor.shutdown(wait=False, cancel_futures=True)
+    for future, fill in futures.items():
+        if future not in done:
+            print(f'Dashboard panel {fill.__name__} timed out')
+            failed_panels.append(fill.__name__)
+            continue
+        try:
+            charts.update(future.result())
+        except Exception as e:
+            print(e)
+            failed_panels.append(fill.__name__)
+    return charts, failed_panels
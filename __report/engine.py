@@ -0,0 +1,203 @@
+import json
+from django.db import connection
+from django.db.models import F, Value, Func
+from django.db.models.functions import Replace
+from __geo.models import Nation, Region, Constituency, Station
+from __poll.constants import GeoLevelChoices
+from __poll.utils.utils import get_zone_ct_id
+
+
+# REPORT ENGINE
+# Every report page is a (office type, zone level, zone id) triple: the rows
+# are parties, the columns are the sub-zones of the zone. The party totals,
+# seat counts and votes per sub-zone are read from the report rows collation
+# keeps up to date (see __poll.utils.report_rows): one indexed lookup per
+# page, whatever the number of parties and sub-zones.
+
+REPORT_OFFICE_TYPES = dict(
+    presidential=Nation,
+    parliamentary=Constituency,
+)
+
+REPORT_LEVELS = dict(
+    nation=dict(
+        level=GeoLevelChoices.NATIONAL,
+        page_model=Nation,
+        super_zone_field=None,
+        # sub-zone columns
+        column_model=Region,
+        column_fields=['id', 'title'],
+        column_key_field='title',
+        column_parent_field='nation',
+    ),
+    region=dict(
+        level=GeoLevelChoices.REGION,
+        page_model=Region,
+        super_zone_field='nation',
+        column_model=Constituency,
+        column_fields=['id', 'title'],
+        column_key_field='title',
+        column_parent_field='region',
+    ),
+    constituency=dict(
+        level=GeoLevelChoices.CONSTITUENCY,
+        page_model=Constituency,
+        super_zone_field='region',
+        column_model=Station,
+        column_fields=['id', 'code', 'title'],
+        column_key_field='code',
+        column_parent_field='constituency',
+    ),
+    station=dict(
+        level=GeoLevelChoices.STATION,
+        page_model=Station,
+        super_zone_field='constituency',
+        column_model=None,
+    ),
+)
+
+REPORT_QUERY = '''SELECT p.id, p.code, p.title,
+                         COALESCE(r.total_valid_votes, 0),
+                         COALESCE(r.total_invalid_votes, 0),
+                         COALESCE(r.total_votes_ec, 0),
+                         COALESCE(r.sub_zone_total_votes, 0),
+                         COALESCE(r.sub_zone_total_votes_ec, 0),
+                         r.cells,
+                         COALESCE(r.seats, 0)
+                  FROM poll_party p
+                      LEFT JOIN poll_report_row r ON r.party_id = p.id
+                          AND r.zone_ct_id = %(zone_ct_id)s
+                          AND r.level = %(level)s
+                          AND r.zone_id = %(zone_id)s
+                  ORDER BY p.code, p.id'''
+
+
+def get_report_zone(plan, zone_id=None):
+    page_model = plan['page_model']
+    zones = page_model.objects.all()
+    if plan['super_zone_field'] is not None:
+        zones = zones.select_related(plan['super_zone_field'])
+    if zone_id is None and page_model is Nation:
+        return zones.first()
+    return zones.filter(pk=zone_id).first()
+
+
+def get_report_columns(plan, zone):
+    if plan['column_model'] is None:
+        return []
+    return plan['column_model'].objects.values(*plan['column_fields']) \
+                    .annotate(key=Replace(
+                                    Func(F(plan['column_key_field']), function='LOWER'),
+                                    Value(' '),
+                                    Value('_')
+                                )) \
+                    .filter(**{plan['column_parent_field']: zone}) \
+                    .order_by('title')
+
+
+def get_blank_totals_row():
+    return [
+        dict(party_code='', party_title=party_title, lead=0, seats=0,
+             total_votes=0, total_votes_ec=0, total_ec_variance=0,
+             total_valid_votes=0, total_invalid_votes=0)
+        for party_title in ['Total Valid Votes', 'Total Invalid Votes', 'Total Votes']
+    ]
+
+
+def get_report(office_type, zone_type, zone_id=None):
+    '''
+    Report of one zone for an office type ("presidential" or "parliamentary"):
+    the zone and its super zone, the sub-zone columns, a row per party with its
+    votes in every sub-zone, the valid/invalid/total rows and the lead votes.
+    Runs three queries: the zone, its sub-zones and the party report rows.
+    '''
+    plan = REPORT_LEVELS[zone_type]
+    with_seats = office_type == 'parliamentary'
+    zone_ct_id = get_zone_ct_id(REPORT_OFFICE_TYPES[office_type])
+    zone = get_report_zone(plan, zone_id)
+    super_zone = None
+    if zone is not None and plan['super_zone_field'] is not None:
+        super_zone = getattr(zone, plan['super_zone_field'])
+    columns = list(get_report_columns(plan, zone)) if zone is not None else []
+    column_keys = {column['id']: column['key'] for column in columns}
+
+    rows = []
+    if zone is not None:
+        with connection.cursor() as cursor:
+            cursor.execute(REPORT_QUERY, dict(zone_ct_id=zone_ct_id, level=plan['level'], zone_id=zone.pk))
+            rows = cursor.fetchall()
+
+    reports = []
+    valid_row, invalid_row, total_row = get_blank_totals_row()
+    # every party row carries the zone's invalid votes, they are counted once
+    zone_invalid_votes = 0
+    for (party_id, party_code, party_title, total_valid_votes, total_invalid_votes, total_votes_ec,
+         sub_zone_total_votes, sub_zone_total_votes_ec, cells, seats) in rows:
+        total_votes = total_valid_votes + total_invalid_votes
+        report = dict(
+            party_id=party_id,
+            party_code=party_code,
+            party_title=party_title,
+            lead=0,
+            seats=seats,
+            total_votes=total_votes,
+            total_votes_ec=total_votes_ec,
+            total_valid_votes=total_valid_votes,
+            total_ec_variance=total_votes - total_votes_ec,
+            total_invalid_votes=total_invalid_votes,
+            sub_zone_total_votes_ec=sub_zone_total_votes_ec,
+            sub_zone_total_ec_variance=sub_zone_total_votes - sub_zone_total_votes_ec,
+        )
+        if isinstance(cells, str):
+            # raw cursors hand jsonb back undecoded
+            cells = json.loads(cells)
+        cells = cells or dict()
+        for column_id, key in column_keys.items():
+            report[key] = cells.get(str(column_id), 0)
+            valid_row[key] = valid_row.get(key, 0) + report[key]
+            invalid_row[key] = 0
+            total_row[key] = total_row.get(key, 0) + report[key]
+        valid_row['seats'] += seats
+        valid_row['total_votes'] += total_valid_votes
+        valid_row['total_valid_votes'] += total_valid_votes
+        valid_row['total_votes_ec'] += total_votes_ec
+        valid_row['total_ec_variance'] += report['total_ec_variance']
+        zone_invalid_votes = max(zone_invalid_votes, total_invalid_votes)
+        total_row['total_votes'] += total_valid_votes
+        total_row['total_valid_votes'] += total_valid_votes
+        total_row['total_votes_ec'] += total_votes_ec
+        reports.append(report)
+    invalid_row['total_votes'] = zone_invalid_votes
+    invalid_row['total_invalid_votes'] = zone_invalid_votes
+    total_row['total_votes'] += zone_invalid_votes
+    total_row['total_invalid_votes'] = zone_invalid_votes
+
+    for column in columns:
+        if total_row.get(column['key'], 0) > 0:
+            column['has_votes'] = 1
+
+    # the lead goes to the most seats in parliamentary reports, else the most votes
+    max_votes = 0
+    lead = None
+    for report in reports:
+        votes = report['seats'] if with_seats else report['total_valid_votes']
+        if votes > max_votes:
+            max_votes = votes
+            lead = report
+    if lead is not None:
+        lead['lead'] = 1
+
+    # shares of the valid votes, invalid votes are not cast for any party
+    total_valid_votes = valid_row['total_valid_votes']
+    if total_valid_votes > 0:
+        for report in reports:
+            report['percentage'] = round(100 * report['total_valid_votes'] / total_valid_votes, 20)
+
+    return dict(
+        zone=zone,
+        super_zone=super_zone,
+        columns=columns,
+        reports=reports,
+        totals_row=[valid_row, invalid_row, total_row],
+        max_votes=max_votes,
+    )
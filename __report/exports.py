@@ -0,0 +1,107 @@
+import io
+import csv
+import json
+import zlib
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+
+# EXPORTS
+# Results, result sheets and every collation level are exported as CSV or as
+# a compact columnar file, streamed from a server-side cursor a chunk at a
+# time so memory stays bounded whatever the size of the table.
+# The columnar file is gzipped JSON lines: a header line with the table and
+# column names, then one line per chunk of rows holding one list per column.
+
+EXPORT_FORMAT_CSV = 'csv'
+EXPORT_FORMAT_COLUMNAR = 'columnar'
+EXPORT_FORMATS = {
+    EXPORT_FORMAT_CSV: dict(extension='csv', content_type='text/csv'),
+    EXPORT_FORMAT_COLUMNAR: dict(extension='columns.jsonl.gz', content_type='application/gzip'),
+}
+
+EXPORT_TABLES = dict(
+    results='Result',
+    result_sheets='ResultSheet',
+    station_collation_sheets='StationCollationSheet',
+    constituency_collation_sheets='ConstituencyCollationSheet',
+    regional_collation_sheets='RegionalCollationSheet',
+    national_collation_sheets='NationalCollationSheet',
+    supernational_collation_sheets='SupernationalCollationSheet',
+)
+
+# rows fetched per round trip of the server-side cursor, and per column chunk
+EXPORT_CHUNK_SIZE = 5000
+
+
+def get_export_columns(table):
+    model = apps.get_model('__poll', EXPORT_TABLES[table])
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def iter_export_chunks(table, chunk_size=EXPORT_CHUNK_SIZE):
+    '''Rows of an export table in chunks of chunk_size, read with a server-side cursor'''
+    model = apps.get_model('__poll', EXPORT_TABLES[table])
+    rows = model.objects \
+                .values_list(*get_export_columns(table)) \
+                .order_by('pk') \
+                .iterator(chunk_size=chunk_size)
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def iter_export_csv(table, chunk_size=EXPORT_CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(get_export_columns(table))
+    for chunk in iter_export_chunks(table, chunk_size=chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell() > 0:
+        # a table without rows is just its header
+        yield buffer.getvalue().encode()
+
+
+def iter_export_columnar(table, chunk_size=EXPORT_CHUNK_SIZE):
+    columns = get_export_columns(table)
+    # gzip container, so the file opens with any gzip reader
+    compressor = zlib.compressobj(wbits=31)
+
+    def get_line(value):
+        return compressor.compress((json.dumps(value, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n').encode())
+
+    yield get_line(dict(table=table, columns=columns))
+    for chunk in iter_export_chunks(table, chunk_size=chunk_size):
+        yield get_line([list(column) for column in zip(*chunk)])
+    yield compressor.flush()
+
+
+def iter_export(table, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    if export_format == EXPORT_FORMAT_COLUMNAR:
+        return iter_export_columnar(table, chunk_size=chunk_size)
+    return iter_export_csv(table, chunk_size=chunk_size)
+
+
+def get_export_filename(table, export_format):
+    return f'{table}.{EXPORT_FORMATS[export_format]["extension"]}'
+
+
+def set_export_snapshot():
+    '''
+    Makes the current transaction read every table from one snapshot, so an
+    export of several tables is consistent; must run before any query in it
+    '''
+    if len(connection.savepoint_ids) > 0:
+        # nested in an outer transaction, which has already started reading
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
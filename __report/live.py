@@ -0,0 +1,172 @@
+import json
+import asyncio
+from importlib import import_module
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from redis import asyncio as aioredis
+from __poll.utils.live import LIVE_CHANNEL
+
+
+# LIVE EVENTS
+# Server-sent events of the collation changes published on LIVE_CHANNEL.
+# Each process holds a single Redis subscription and copies every message
+# to the queue of each connected viewer, so a viewer costs an open socket
+# and no queries. Viewers may pass zone=<type>:<id> (repeatable) to only get
+# those zones; a viewer that falls behind is told to reload instead.
+
+LIVE_EVENTS_PATH = '/reports/live/'
+# seconds between keep-alive comments on an idle stream
+LIVE_HEARTBEAT = 15
+# messages a viewer may fall behind before it is told to reload
+LIVE_QUEUE_SIZE = 100
+# milliseconds before a dropped viewer reconnects
+LIVE_RETRY = 5000
+
+
+class LiveBroadcaster:
+    '''One Redis subscription per process, copied to every viewer queue'''
+
+    def __init__(self):
+        self.queues = set()
+        self.task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.queues.add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self.listen())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.queues.discard(queue)
+
+    def broadcast(self, message):
+        for queue in list(self.queues):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # drop the backlog, the viewer reloads the latest totals
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(dict(reload=True))
+
+    async def listen(self):
+        while len(self.queues) > 0:
+            client = aioredis.Redis(host=settings.REDIS_HOST,
+                                    port=int(settings.REDIS_PORT),
+                                    db=int(settings.REDIS_DB))
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(LIVE_CHANNEL)
+                    async for item in pubsub.listen():
+                        if item['type'] != 'message':
+                            continue
+                        self.broadcast(json.loads(item['data']))
+            except Exception as e:
+                print(e)
+                # messages missed meanwhile are caught up by reloading
+                self.broadcast(dict(reload=True))
+                await asyncio.sleep(LIVE_RETRY / 1000)
+            finally:
+                await client.close()
+
+
+broadcaster = LiveBroadcaster()
+
+
+def get_session_user_id(cookies):
+    session_key = cookies.get(settings.SESSION_COOKIE_NAME)
+    if session_key is None:
+        return None
+    engine = import_module(settings.SESSION_ENGINE)
+    return engine.SessionStore(session_key).get('_auth_user_id')
+
+
+def get_scope_cookies(scope):
+    cookies = dict()
+    for name, value in scope.get('headers', []):
+        if name == b'cookie':
+            for cookie in value.decode('latin-1').split(';'):
+                key, _, cookie_value = cookie.strip().partition('=')
+                cookies[key] = cookie_value
+    return cookies
+
+
+def get_scope_zones(scope):
+    '''(zone type, zone id) pairs of the zone query parameters, None for all'''
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    zones = set()
+    for zone in query.get('zone', []):
+        zone_type, _, zone_id = zone.partition(':')
+        if zone_id.isdigit():
+            zones.add((zone_type, int(zone_id)))
+    return zones if len(zones) > 0 else None
+
+
+def get_live_event(message, zones=None):
+    '''SSE event of a message filtered down to zones, None when nothing is left'''
+    if zones is not None and 'zones' in message:
+        message = dict(message, zones=[zone for zone in message['zones']
+                                       if (zone['type'], zone['id']) in zones])
+        if len(message['zones']) == 0:
+            return None
+    event = f'data: {json.dumps(message, separators=(",", ":"))}\n\n'
+    if 'v' in message:
+        event = f'id: {message["v"]}\n{event}'
+    return event.encode()
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def stream_live_events(scope, receive, send):
+    user_id = await sync_to_async(get_session_user_id)(get_scope_cookies(scope))
+    if user_id is None:
+        await send(dict(type='http.response.start', status=403,
+                        headers=[(b'content-type', b'text/plain')]))
+        await send(dict(type='http.response.body', body=b'Forbidden'))
+        return
+    zones = get_scope_zones(scope)
+    await send(dict(type='http.response.start', status=200, headers=[
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        # keep proxies from buffering the stream
+        (b'x-accel-buffering', b'no'),
+    ]))
+    await send(dict(type='http.response.body', body=f'retry: {LIVE_RETRY}\n\n'.encode(), more_body=True))
+    queue = broadcaster.subscribe()
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        while not disconnect.done():
+            message = asyncio.ensure_future(queue.get())
+            done, pending = await asyncio.wait({message, disconnect},
+                                               timeout=LIVE_HEARTBEAT,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if message in done:
+                event = get_live_event(message.result(), zones)
+            else:
+                message.cancel()
+                event = b': keep-alive\n\n' if not disconnect.done() else None
+            if event is not None:
+                await send(dict(type='http.response.body', body=event, more_body=True))
+    finally:
+        broadcaster.unsubscribe(queue)
+        disconnect.cancel()
+
+
+class LiveEventsApp:
+    '''ASGI app serving the live events path and handing the rest to Django'''
+
+    def __init__(self, application, path=LIVE_EVENTS_PATH):
+        self.application = application
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == self.path:
+            return await stream_live_events(scope, receive, send)
+        return await self.application(scope, receive, send)
@@ -0,0 +1,75 @@
+import json
+from django.db import connection
+from __report.benchmarks import (BENCHMARK_SCALE, seed_benchmark_country,
+                                 run_benchmarks, get_benchmark_names)
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class Command(BaseCommand):
+    '''Time the collation, report, dashboard and station API paths against a synthetic country'''
+    help = 'Time the collation, report, dashboard and station API paths against a synthetic country'
+
+    def add_arguments(self, parser):
+        for scale, default in BENCHMARK_SCALE.items():
+            parser.add_argument(f'--{scale}',
+                                type=int,
+                                default=default,
+                                help=f'{scale} seeded (default {default}, constituencies per region and stations per constituency)')
+        parser.add_argument('--repeat',
+                            type=int,
+                            default=3,
+                            help='runs per benchmark, each on a cold cache')
+        parser.add_argument('--only',
+                            nargs='+',
+                            choices=get_benchmark_names(),
+                            help='only run the given benchmarks')
+        parser.add_argument('--output',
+                            type=str,
+                            help='write the benchmark report to this JSON file')
+
+    def handle(self, *args, **kwargs):
+        for scale in list(BENCHMARK_SCALE.keys()) + ['repeat']:
+            if kwargs[scale] < 1:
+                raise CommandError(f'--{scale} must be at least 1')
+
+        # the synthetic country is seeded in a throwaway test database, never
+        # in the configured one
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            country = seed_benchmark_country(**{scale: kwargs[scale] for scale in BENCHMARK_SCALE.keys()})
+            report = run_benchmarks(country, names=kwargs['only'], repeat=kwargs['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if kwargs['output']:
+            try:
+                with open(kwargs['output'], 'w') as output:
+                    json.dump(report, output, cls=DjangoJSONEncoder, indent=2)
+            except OSError as e:
+                raise CommandError(f'Could not write report to {kwargs["output"]}: {e}')
+
+        counts = ', '.join([f'{name}: {count}' for name, count in report['counts'].items()])
+        self.stdout.write(f'Seeded {counts}')
+        for result in report['benchmarks']:
+            budget = f'/{result["budget"]}' if result['budget'] is not None else ''
+            line = f'{result["name"]}: {result["median_seconds"]}s median, {result["queries"]}{budget} queries'
+            if result['error'] is not None:
+                self.stdout.write(self.style.ERROR(f'{result["name"]}: {result["error"]}'))
+            elif result['over_budget'] and result['known_failure'] is not None:
+                self.stdout.write(self.style.WARNING(f'{line} (known failure, {result["known_failure"]})'))
+            elif result['over_budget']:
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if len(report['unexpected_passes']) > 0:
+            raise CommandError(f'Within budget but marked as known failures, drop the mark: '
+                               f'{", ".join(report["unexpected_passes"])}')
+        failed = report['over_budget'] + report['errors']
+        if len(failed) > 0:
+            raise CommandError(f'Over query budget or failed: {", ".join(failed)}')
+        known = f', {len(report["known_failures"])} known failures' if len(report['known_failures']) > 0 else ''
+        self.stdout.write(self.style.SUCCESS(f'{len(report["benchmarks"])} benchmarks within budget{known} '
+                                             f'in {report["elapsed"]} seconds'))
@@ -1,5 +1,7 @@
 import time
-from __report.utils import collate_results, collate_seats
+from __report.utils import (collate_results, collate_results_sql, collate_results_partitioned,
+                            collate_seats, COLLATION_MODES, COLLATION_MODE_PYTHON, COLLATION_MODE_SQL)
+from __poll.utils.snapshots import take_collation_snapshot, SNAPSHOT_SOURCE_COLLATION
 from django.core.management.base import BaseCommand, CommandError
 
 
@@ -8,11 +10,6 @@ class Command(BaseCommand):
     help = 'Collate results for all the levels and positions'
 
     def add_arguments(self, parser):
-        parser.add_argument(
-            '--clear',
-            action='store_true',
-            help='clear all exisitng collations',
-        )
         parser.add_argument(
             '--quiet',
             action='store_true',
@@ -21,6 +18,17 @@ class Command(BaseCommand):
         parser.add_argument('--verbose',
                             action='store_true',
                             help='more noisy')
+        parser.add_argument('--mode',
+                            choices=COLLATION_MODES,
+                            help='python (default): aggregate results in memory, sql: aggregate each level in PostgreSQL')
+        parser.add_argument('--workers',
+                            type=int,
+                            default=1,
+                            help='collate regions in parallel over N processes (set-based SQL per region)')
+        parser.add_argument('--region',
+                            type=int,
+                            nargs='+',
+                            help='only recollate the given region ids, then merge the national totals')
         # parser.add_argument('-models', '--models', type=str, nargs='+', help='The model to run if empty, then all models will be populated')
         # parser.add_argument('-verbose', '--verbose', type=int, nargs='+', help='Run the population showing each line from the scripts')
 
@@ -32,20 +40,30 @@ class Command(BaseCommand):
         # if kwargs['quiet']:
         #     is_verbose = False
                 
-        # clear collations
-        can_clear = False
-        if kwargs['clear']:
-            can_clear = True
-
         total = 0
         start = time.time()
 
+        if kwargs['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        partitioned = kwargs['workers'] > 1 or kwargs['region']
+        if partitioned and kwargs['mode'] == COLLATION_MODE_PYTHON:
+            raise CommandError('--workers and --region collate with set-based SQL, they cannot be used with --mode python')
+
         # collate results
-        total += collate_results(use_verbose=use_verbose)
+        if partitioned:
+            total += collate_results_partitioned(workers=kwargs['workers'],
+                                                 region_ids=kwargs['region'],
+                                                 use_verbose=use_verbose)
+        elif kwargs['mode'] == COLLATION_MODE_SQL:
+            total += collate_results_sql(use_verbose=use_verbose)
+        else:
+            total += collate_results(use_verbose=use_verbose)
 
         # collate seats
-        total += collate_seats(can_clear=can_clear,
-                               use_verbose=use_verbose)
+        total += collate_seats(use_verbose=use_verbose)
+
+        # record how the totals moved
+        take_collation_snapshot(SNAPSHOT_SOURCE_COLLATION)
 
         end = time.time()
         print(f'Time elapsed {end - start} seconds')
@@ -0,0 +1,16 @@
+from __report.utils import dedupe_collations
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    '''Merge collation sheets that share a natural key, before the unique constraints are migrated'''
+    help = 'Merge collation sheets that share a natural key, before the unique constraints are migrated'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose',
+                            action='store_true',
+                            help='more noisy')
+
+    def handle(self, *args, **kwargs):
+        total = dedupe_collations(use_verbose=kwargs['verbose'])
+        self.stdout.write(self.style.SUCCESS(f'{total} collation sheets rewritten'))
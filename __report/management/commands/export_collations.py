@@ -0,0 +1,56 @@
+import os
+import time
+from django.db import transaction
+from __report.exports import (EXPORT_TABLES, EXPORT_FORMATS, EXPORT_CHUNK_SIZE,
+                              iter_export, get_export_filename, set_export_snapshot)
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    '''Export the results, result sheets and collation sheets to files'''
+    help = 'Export the results, result sheets and collation sheets to files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output',
+                            type=str,
+                            default='.',
+                            help='directory the export files are written to')
+        parser.add_argument('--tables',
+                            nargs='+',
+                            choices=list(EXPORT_TABLES.keys()),
+                            default=list(EXPORT_TABLES.keys()),
+                            help='tables to export (all by default)')
+        parser.add_argument('--format',
+                            nargs='+',
+                            dest='formats',
+                            choices=list(EXPORT_FORMATS.keys()),
+                            default=list(EXPORT_FORMATS.keys()),
+                            help='file formats written (all by default)')
+        parser.add_argument('--chunk-size',
+                            type=int,
+                            default=EXPORT_CHUNK_SIZE,
+                            help='rows read per round trip')
+
+    def handle(self, *args, **kwargs):
+        output = kwargs['output']
+        if not os.path.isdir(output):
+            raise CommandError(f'{output} is not a directory')
+        if kwargs['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        start = time.time()
+        with transaction.atomic():
+            # every table is read from the same snapshot
+            set_export_snapshot()
+            for table in kwargs['tables']:
+                for export_format in kwargs['formats']:
+                    table_start = time.time()
+                    path = os.path.join(output, get_export_filename(table, export_format))
+                    try:
+                        with open(path, 'wb') as export_file:
+                            for chunk in iter_export(table, export_format, chunk_size=kwargs['chunk_size']):
+                                export_file.write(chunk)
+                    except OSError as e:
+                        raise CommandError(f'Could not write {path}: {e}')
+                    self.stdout.write(f'{path} ({round(time.time() - table_start, 3)}s)')
+        self.stdout.write(self.style.SUCCESS(f'Export complete in {round(time.time() - start, 3)} seconds'))
@@ -0,0 +1,30 @@
+import time
+from __poll.utils.snapshots import (take_collation_snapshot, SNAPSHOT_SOURCE_MANUAL,
+                                    SNAPSHOT_SOURCE_INTERVAL)
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    '''Snapshot the collated totals that changed since the last snapshot'''
+    help = 'Snapshot the collated totals that changed since the last snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval',
+                            type=int,
+                            help='keep taking a snapshot every N seconds until stopped')
+
+    def handle(self, *args, **kwargs):
+        interval = kwargs['interval']
+        if interval is not None and interval < 1:
+            raise CommandError('--interval must be at least 1 second')
+
+        source = SNAPSHOT_SOURCE_MANUAL if interval is None else SNAPSHOT_SOURCE_INTERVAL
+        while True:
+            start = time.time()
+            snapshot = take_collation_snapshot(source)
+            self.stdout.write(self.style.SUCCESS(
+                f'Snapshot {snapshot.pk}: {snapshot.total_deltas} totals changed '
+                f'({round(time.time() - start, 3)}s)'))
+            if interval is None:
+                break
+            time.sleep(max(0, interval - (time.time() - start)))
@@ -0,0 +1,48 @@
+import json
+from __report.utils import verify_collations
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class Command(BaseCommand):
+    '''Verify the collation sheets of every level against the results'''
+    help = 'Verify the collation sheets of every level against the results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair',
+                            action='store_true',
+                            help='rewrite only the collation sheets that differ')
+        parser.add_argument('--verbose',
+                            action='store_true',
+                            help='more noisy')
+        parser.add_argument('--output',
+                            type=str,
+                            help='write the discrepancy report to this JSON file')
+        parser.add_argument('--limit',
+                            type=int,
+                            default=100,
+                            help='discrepancy rows kept per level in the report')
+
+    def handle(self, *args, **kwargs):
+        report = verify_collations(repair=kwargs['repair'],
+                                   use_verbose=kwargs['verbose'],
+                                   limit=kwargs['limit'])
+
+        if kwargs['output']:
+            try:
+                with open(kwargs['output'], 'w') as output:
+                    json.dump(report, output, cls=DjangoJSONEncoder, indent=2)
+            except OSError as e:
+                raise CommandError(f'Could not write report to {kwargs["output"]}: {e}')
+
+        for level in report['levels']:
+            counts = ', '.join([f'{kind}: {count}' for kind, count in level['discrepancies'].items()])
+            self.stdout.write(f'{level["title"]}: {level["total"]} ({counts})')
+
+        message = f'{report["total_discrepancies"]} discrepancies found in {report["elapsed"]} seconds'
+        if kwargs['repair']:
+            message = f'{message}, {report["total_repaired"]} rows repaired'
+        if report['total_discrepancies'] > 0 and not kwargs['repair']:
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,142 @@
+import json
+from collections import namedtuple
+from functools import lru_cache
+from django.conf import settings
+from django.db import connection
+from __poll.constants import GeoLevelChoices
+
+
+# PREPARED STATEMENTS
+# The raw report pages read the report rows (see __poll.utils.report_rows)
+# through fixed statements whose values are always bound parameters, written
+# with %(name)s placeholders. Each statement is prepared once per database
+# session under its own name and then only executed, so PostgreSQL parses and
+# plans it once for as long as the connection lives (see CONN_MAX_AGE) rather
+# than on every request. With RAW_REPORT_PREPARED_STATEMENTS off, e.g. behind
+# a pooler sharing sessions between clients, the same SQL runs unprepared.
+# Rows come back as named tuples that templates can read like the dicts they
+# replace.
+
+RAW_REPORT_STATEMENTS = dict(
+    # a row per party in one zone, with its candidates for the given positions
+    raw_report_rows=dict(
+        params=[('zone_ct_id', 'integer'), ('level', 'integer'),
+                ('zone_id', 'integer'), ('position_ids', 'integer[]')],
+        fields=['party_id', 'party_code', 'candidates',
+                'votes', 'invalid_votes', 'seats', 'cells'],
+        sql='''SELECT p.id, p.code,
+                      (SELECT STRING_AGG(DISTINCT CONCAT(ca.prefix, ' ', ca.first_name, ' ', ca.last_name), ', ')
+                       FROM people_candidate ca
+                       WHERE ca.party_id = p.id
+                           AND ca.position_id = ANY(%(position_ids)s)) AS candidates,
+                      r.total_valid_votes, r.total_invalid_votes, r.seats, r.cells
+               FROM poll_report_row r
+                   INNER JOIN poll_party p ON p.id = r.party_id
+               WHERE r.zone_ct_id = %(zone_ct_id)s
+                   AND r.level = %(level)s
+                   AND r.zone_id = %(zone_id)s
+               ORDER BY p.code, p.id''',
+    ),
+    # valid and invalid votes of each of the given zones of one level
+    # (every party row of a zone carries the zone's invalid votes)
+    raw_report_zone_totals=dict(
+        params=[('zone_ct_id', 'integer'), ('level', 'integer'), ('zone_ids', 'integer[]')],
+        fields=['zone_id', 'valid_votes', 'invalid_votes'],
+        sql='''SELECT r.zone_id,
+                      SUM(r.total_valid_votes)::bigint,
+                      MAX(r.total_invalid_votes)::bigint
+               FROM poll_report_row r
+               WHERE r.zone_ct_id = %(zone_ct_id)s
+                   AND r.level = %(level)s
+                   AND r.zone_id = ANY(%(zone_ids)s)
+               GROUP BY r.zone_id''',
+    ),
+    # the declared seats inside a nation, region or constituency
+    raw_report_seats=dict(
+        params=[('level', 'integer'), ('zone_id', 'integer')],
+        fields=['constituency_id', 'constituency', 'party_id', 'party_code', 'party_title',
+                'candidate_id', 'candidates', 'votes', 'seats'],
+        sql=f'''SELECT c.id, c.title, pa.id, pa.code, pa.title, ca.id,
+                       CONCAT(ca.prefix, ' ', ca.first_name, ' ', ca.last_name) AS candidates,
+                       ps.votes, 1
+                FROM poll_parliamentary_summary_sheet ps
+                    INNER JOIN geo_constituency c ON c.id = ps.constituency_id
+                    INNER JOIN geo_region r ON r.id = c.region_id
+                    INNER JOIN people_candidate ca ON ca.id = ps.candidate_id
+                    INNER JOIN poll_party pa ON pa.id = ca.party_id
+                WHERE (CASE %(level)s
+                           WHEN {int(GeoLevelChoices.NATIONAL)} THEN r.nation_id
+                           WHEN {int(GeoLevelChoices.REGION)} THEN r.id
+                           ELSE c.id
+                       END) = %(zone_id)s
+                ORDER BY candidates DESC''',
+    ),
+)
+
+
+def get_row_item(row, key, default=None):
+    '''Dict style lookup on a row, falling back to its cells'''
+    if key in row._fields:
+        return getattr(row, key)
+    cells = getattr(row, 'cells', None)
+    if isinstance(cells, dict):
+        return cells.get(key, default)
+    return default
+
+
+@lru_cache(maxsize=None)
+def get_row_type(name, fields):
+    '''Named tuple type of rows, readable by templates with get_item'''
+    row_type = namedtuple(name, fields)
+    row_type.get = get_row_item
+    return row_type
+
+
+def get_statement_row_type(name):
+    return get_row_type(f'{name.title().replace("_", "")}Row', tuple(RAW_REPORT_STATEMENTS[name]['fields']))
+
+
+def get_prepare_query(name):
+    '''PREPARE of a statement, its %(name)s placeholders numbered in params order'''
+    statement = RAW_REPORT_STATEMENTS[name]
+    sql = statement['sql']
+    for position, (param, param_type) in enumerate(statement['params'], start=1):
+        sql = sql.replace(f'%({param})s', f'${position}')
+    param_types = ', '.join([param_type for param, param_type in statement['params']])
+    return f'PREPARE {name} ({param_types}) AS {sql}'
+
+
+def get_prepared_statements():
+    '''Names of the statements prepared on the current database session'''
+    session = connection.connection
+    prepared = getattr(connection, 'prepared_statements', None)
+    if prepared is None or prepared[0] is not session:
+        # a new session starts without any
+        prepared = (session, set())
+        connection.prepared_statements = prepared
+    return prepared[1]
+
+
+def execute_statement(name, **params):
+    '''Rows of a raw report statement for the given parameters'''
+    statement = RAW_REPORT_STATEMENTS[name]
+    values = [params[param] for param, param_type in statement['params']]
+    with connection.cursor() as cursor:
+        if settings.RAW_REPORT_PREPARED_STATEMENTS:
+            prepared = get_prepared_statements()
+            if name not in prepared:
+                cursor.execute(get_prepare_query(name))
+                prepared.add(name)
+            cursor.execute(f'EXECUTE {name} ({", ".join(["%s"] * len(values))})', values)
+        else:
+            cursor.execute(statement['sql'], params)
+        rows = cursor.fetchall()
+    row_type = get_statement_row_type(name)
+    return [row_type._make(row) for row in rows]
+
+
+def get_cells(cells):
+    if isinstance(cells, str):
+        # raw cursors hand jsonb back undecoded
+        cells = json.loads(cells)
+    return cells or dict()
@@ -1,13 +1,27 @@
+import django_rq
 from django_rq import job     
-from __report.utils import collate_results, collate_seats, clear_collated_results
+from __geo.models import Region
+from __poll.utils.snapshots import (take_collation_snapshot, SNAPSHOT_SOURCE_COLLATION,
+                                    SNAPSHOT_SOURCE_INTERVAL)
+from __report.utils import (collate_results, collate_results_sql, collate_seats,
+                            collate_region_sql, merge_region_collations, verify_collations,
+                            clear_collated_results, COLLATION_MODE_PYTHON, COLLATION_MODE_SQL)
 
 
 @job # ("high", timeout=600) # timeout is optional
-def collation_task(context=None):
+def collation_task(context=None, mode=None, partitioned=False, region_ids=None):
     # print(f'running job ... {context}')
+    if partitioned or region_ids:
+        if mode == COLLATION_MODE_PYTHON:
+            raise ValueError('Partitioned collation is set-based SQL, it cannot run in python mode')
+        return enqueue_partitioned_collation(region_ids=region_ids)
     total = 0
-    total += collate_results()
+    if mode == COLLATION_MODE_SQL:
+        total += collate_results_sql()
+    else:
+        total += collate_results()
     total += collate_seats()
+    take_collation_snapshot(SNAPSHOT_SOURCE_COLLATION)
     print(f'{total} records collated')
     print('::::::::::::::::::::::::::::::::::::::')
     return "Response from async method"
@@ -15,3 +29,43 @@ def collation_task(context=None):
 @job
 def clear_collation_task():
     return clear_collated_results()
+
+
+@job
+def snapshot_collations_task(min_interval=None):
+    snapshot = take_collation_snapshot(SNAPSHOT_SOURCE_INTERVAL, min_interval=min_interval)
+    return None if snapshot is None else dict(snapshot=snapshot.pk, total_deltas=snapshot.total_deltas)
+
+
+@job
+def verify_collations_task(repair=False, limit=100):
+    report = verify_collations(repair=repair, limit=limit)
+    return report
+
+
+@job
+def collate_region_task(region_id):
+    partition = collate_region_sql(region_id)
+    return partition
+
+
+@job
+def merge_collation_task(seats=True):
+    total = merge_region_collations()
+    if seats:
+        total += collate_seats()
+    take_collation_snapshot(SNAPSHOT_SOURCE_COLLATION)
+    return total
+
+
+def enqueue_partitioned_collation(region_ids=None, queue_name='default'):
+    '''Fans collation out as one job per region, merged once they all finish'''
+    queue = django_rq.get_queue(queue_name, default_timeout=3600)
+    regions = Region.objects.all()
+    if region_ids:
+        regions = regions.filter(pk__in=region_ids)
+    region_jobs = [queue.enqueue(collate_region_task, region_id)
+                   for region_id in regions.values_list('pk', flat=True)]
+    merge_job = queue.enqueue(merge_collation_task, depends_on=region_jobs)
+    return dict(regions=[region_job.id for region_job in region_jobs],
+                merge=merge_job.id)
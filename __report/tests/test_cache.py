@@ -0,0 +1,93 @@
+import threading
+import time
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from __poll.models import Result
+from __poll.factories import PositionFactory
+from __poll.utils.utils import warm_content_types
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+from __report.cache import get_cached, get_cached_report, get_report_version
+
+
+# results are collated and changes refreshed inline rather than by queued jobs
+@override_settings(COLLATION_ASYNC=False, REPORT_REFRESH_ASYNC=False)
+class ReportCacheTest(TestCase):
+    def setUp(self):
+        position = PositionFactory.create_with_zone(zone_name='nation')
+        self.candidate = CandidateFactory(position=position, party=PartyFactory(code='AAA'))
+        self.region = RegionFactory(nation=position.zone)
+        self.other_region = RegionFactory(nation=position.zone)
+        self.station = StationFactory(constituency=ConstituencyFactory(region=self.region))
+        warm_content_types()
+
+    def test_result_bumps_only_its_zones(self):
+        region_version = get_report_version('presidential', 'region', self.region.pk)
+        other_version = get_report_version('presidential', 'region', self.other_region.pk)
+        nation_version = get_report_version('presidential', 'nation')
+        parliamentary_version = get_report_version('parliamentary', 'region', self.region.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        self.assertNotEqual(get_report_version('presidential', 'region', self.region.pk), region_version)
+        self.assertNotEqual(get_report_version('presidential', 'nation'), nation_version)
+        self.assertEqual(get_report_version('presidential', 'region', self.other_region.pk), other_version)
+        self.assertEqual(get_report_version('parliamentary', 'region', self.region.pk), parliamentary_version)
+
+    def test_cached_report_follows_collation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        report = get_cached_report('presidential', 'region', self.region.pk)
+        self.assertEqual(report['reports'][0]['total_votes'], 10)
+        with self.assertNumQueries(0):
+            get_cached_report('presidential', 'region', self.region.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            result.votes = 25
+            result.save()
+        report = get_cached_report('presidential', 'region', self.region.pk)
+        self.assertEqual(report['reports'][0]['total_votes'], 25)
+
+    def test_concurrent_miss_serves_latest(self):
+        key = f'test:report:{self.station.pk}'
+        cache.set(f'{key}:latest', 'previous')
+        # another caller is computing the new value
+        cache.set(f'{key}:lock', 1)
+        try:
+            self.assertEqual(get_cached(key, f'{key}:latest', lambda: 'computed'), 'previous')
+        finally:
+            cache.delete_many([f'{key}:lock', f'{key}:latest'])
+        self.assertEqual(get_cached(key, f'{key}:latest', lambda: 'computed'), 'computed')
+        self.assertEqual(get_cached(key, f'{key}:latest', lambda: 'recomputed'), 'computed')
+        cache.delete_many([key, f'{key}:latest'])
+
+    def test_concurrent_miss_without_latest_waits(self):
+        key = f'test:report:{self.station.pk}'
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.3)
+            return 'computed'
+
+        values = []
+        callers = [threading.Thread(target=lambda: values.append(get_cached(key, f'{key}:latest', compute)))
+                   for _ in range(4)]
+        try:
+            for caller in callers:
+                caller.start()
+            for caller in callers:
+                caller.join(10)
+        finally:
+            cache.delete_many([key, f'{key}:lock', f'{key}:latest'])
+        self.assertEqual((len(calls), values), (1, ['computed'] * 4))
+
+    @override_settings(REPORT_CACHE_WAIT=0.2)
+    def test_concurrent_miss_without_latest_computes(self):
+        key = f'test:report:{self.station.pk}'
+        cache.set(f'{key}:lock', 1)
+        try:
+            self.assertEqual(get_cached(key, f'{key}:latest', lambda: 'computed'), 'computed')
+            # the lock stays with the caller that took it
+            self.assertEqual(cache.get(f'{key}:lock'), 1)
+            self.assertEqual(get_cached(key, f'{key}:latest', lambda: 'recomputed'), 'computed')
+        finally:
+            cache.delete_many([key, f'{key}:lock', f'{key}:latest'])
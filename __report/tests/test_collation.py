@@ -0,0 +1,229 @@
+import threading
+import django_rq
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from redis.exceptions import ConnectionError
+from __poll.models import (Result, StationCollationSheet, ConstituencyCollationSheet,
+                           NationalCollationSheet, SupernationalCollationSheet, ParliamentarySummarySheet)
+from __poll.factories import PositionFactory
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+from __report.utils import (dedupe_collations, collate_results_sql, collate_results_partitioned,
+                            collate_region_sql, merge_region_collations, collate_seats,
+                            verify_collations, find_collation_discrepancies, repair_collation_discrepancies,
+                            SQL_COLLATION_LEVELS)
+from __report.tasks import enqueue_partitioned_collation, collate_region_task, merge_collation_task
+
+
+class CollationFixtureMixin:
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.nation = self.position.zone
+        self.party_a = PartyFactory(code='AAA')
+        self.party_b = PartyFactory(code='BBB')
+        self.candidate_a = CandidateFactory(position=self.position, party=self.party_a)
+        self.candidate_b = CandidateFactory(position=self.position, party=self.party_b)
+        self.north = RegionFactory(nation=self.nation, title='North')
+        self.south = RegionFactory(nation=self.nation, title='South')
+        self.north_station = StationFactory(constituency=ConstituencyFactory(region=self.north))
+        self.south_station = StationFactory(constituency=ConstituencyFactory(region=self.south))
+        Result.objects.create(station=self.north_station, candidate=self.candidate_a, votes=30)
+        Result.objects.create(station=self.north_station, candidate=self.candidate_b, votes=10)
+        Result.objects.create(station=self.south_station, candidate=self.candidate_b, votes=50)
+
+    def get_party_votes(self, party):
+        return SupernationalCollationSheet.objects.get(party=party, zone_ct=self.position.zone_ct).total_votes
+
+
+# results are collated on save rather than by a queued job
+@override_settings(COLLATION_ASYNC=False)
+class CollationTestCase(CollationFixtureMixin, TestCase):
+    pass
+
+
+class DedupeCollationsTest(CollationTestCase):
+    def test_duplicated_sheets_are_merged(self):
+        # sheets from before the natural key constraints
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('ALTER TABLE poll_station_collation_sheet DROP CONSTRAINT poll_station_collation_sheet_unique')
+        sheet = StationCollationSheet.objects.get(station=self.north_station, candidate=self.candidate_a)
+        StationCollationSheet.objects.create(station=self.north_station, candidate=self.candidate_a,
+                                             zone_ct=sheet.zone_ct, total_votes=30)
+        self.assertEqual(dedupe_collations(), 2)
+        self.assertEqual(StationCollationSheet.objects.get(station=self.north_station, candidate=self.candidate_a).pk,
+                         sheet.pk)
+        self.assertEqual(StationCollationSheet.objects.get(pk=sheet.pk).total_votes, 30)
+        self.assertEqual(dedupe_collations(), 0)
+
+
+class CollateResultsSqlTest(CollationTestCase):
+    def test_rebuild_matches_results(self):
+        # drifted, missing and stale sheets
+        SupernationalCollationSheet.objects.filter(party=self.party_b).update(total_votes=7)
+        NationalCollationSheet.objects.filter(region=self.south).delete()
+        stale_station = StationFactory(constituency=self.north_station.constituency)
+        StationCollationSheet.objects.create(station=stale_station, candidate=self.candidate_a,
+                                             zone_ct=self.position.zone_ct, total_votes=5)
+        collate_results_sql()
+        self.assertEqual((self.get_party_votes(self.party_a), self.get_party_votes(self.party_b)), (30, 60))
+        self.assertEqual(NationalCollationSheet.objects.get(region=self.south, party=self.party_b).total_votes, 50)
+        self.assertFalse(StationCollationSheet.objects.filter(station=stale_station).exists())
+        self.assertEqual(ConstituencyCollationSheet.objects.count(), 3)
+
+    def test_rebuild_keeps_sheet_ids(self):
+        ids = set(SupernationalCollationSheet.objects.values_list('pk', flat=True))
+        collate_results_sql()
+        collate_results_sql()
+        self.assertEqual(set(SupernationalCollationSheet.objects.values_list('pk', flat=True)), ids)
+        self.assertEqual(StationCollationSheet.objects.count(), 3)
+
+
+class CollateResultsPartitionedTest(CollationTestCase):
+    def test_partitions_are_merged(self):
+        SupernationalCollationSheet.objects.update(total_votes=0)
+        NationalCollationSheet.objects.filter(region=self.north).update(total_votes=0)
+        collate_results_partitioned()
+        self.assertEqual((self.get_party_votes(self.party_a), self.get_party_votes(self.party_b)), (30, 60))
+
+    def test_only_the_given_regions_are_recollated(self):
+        NationalCollationSheet.objects.update(total_votes=0)
+        collate_results_partitioned(region_ids=[self.south.pk])
+        self.assertEqual(NationalCollationSheet.objects.get(region=self.south, party=self.party_b).total_votes, 50)
+        self.assertEqual(NationalCollationSheet.objects.get(region=self.north, party=self.party_b).total_votes, 0)
+        # the merge sums the regions as they are
+        self.assertEqual(self.get_party_votes(self.party_b), 50)
+
+    def test_partitioned_command_rejects_python_mode(self):
+        with self.assertRaises(CommandError):
+            call_command('collate', '--workers', '2', '--mode', 'python')
+
+    def test_regions_are_enqueued_before_the_merge(self):
+        queue = django_rq.get_queue('default')
+        try:
+            queue.connection.ping()
+        except ConnectionError:
+            self.skipTest('Redis is not available')
+        jobs = enqueue_partitioned_collation()
+        region_jobs = [queue.fetch_job(job_id) for job_id in jobs['regions']]
+        merge_job = queue.fetch_job(jobs['merge'])
+        self.addCleanup(lambda: [job.delete() for job in region_jobs + [merge_job]])
+        self.assertEqual(sorted([job.args[0] for job in region_jobs]), sorted([self.north.pk, self.south.pk]))
+        self.assertTrue(all(job.func == collate_region_task for job in region_jobs))
+        self.assertEqual(merge_job.func, merge_collation_task)
+        self.assertEqual(merge_job.get_status(), 'deferred')
+
+
+class VerifyCollationsTest(CollationTestCase):
+    def corrupt(self):
+        StationCollationSheet.objects.filter(station=self.north_station, candidate=self.candidate_a) \
+                                     .update(total_votes=3)
+        NationalCollationSheet.objects.filter(region=self.south).delete()
+        stale_station = StationFactory(constituency=self.south_station.constituency)
+        ConstituencyCollationSheet.objects.create(station=stale_station, party=self.party_a,
+                                                  zone_ct=self.position.zone_ct, total_votes=4)
+
+    def get_discrepancies(self, report):
+        return {level['title']: {kind: count for kind, count in level['discrepancies'].items() if count > 0}
+                for level in report['levels'] if level['total'] > 0}
+
+    def test_verify_repair_verify(self):
+        self.assertEqual(verify_collations()['total_discrepancies'], 0)
+        self.corrupt()
+        report = verify_collations()
+        self.assertEqual(self.get_discrepancies(report),
+                         {'Stations': {'mismatch': 1}, 'Constituencies': {'stale': 1}, 'Nations': {'missing': 1}})
+        # verifying alone writes nothing
+        self.assertEqual(verify_collations()['total_discrepancies'], 3)
+        self.assertEqual(verify_collations(repair=True)['total_repaired'], 3)
+        self.assertEqual(verify_collations()['total_discrepancies'], 0)
+        self.assertEqual(StationCollationSheet.objects.get(station=self.north_station,
+                                                           candidate=self.candidate_a).total_votes, 30)
+        self.assertEqual(NationalCollationSheet.objects.get(region=self.south, party=self.party_b).total_votes, 50)
+
+    def test_repair_rewrites_only_the_discrepancies(self):
+        self.corrupt()
+        level = SQL_COLLATION_LEVELS[0]
+        untouched = StationCollationSheet.objects.get(station=self.south_station)
+        discrepancies = find_collation_discrepancies(level)
+        self.assertEqual([(d['type'], d['expected'], d['stored']) for d in discrepancies], [('mismatch', 30, 3)])
+        self.assertEqual(repair_collation_discrepancies(level, discrepancies), 1)
+        self.assertEqual(find_collation_discrepancies(level), [])
+        self.assertEqual(StationCollationSheet.objects.get(pk=untouched.pk).total_votes, untouched.total_votes)
+
+
+class SeatCollationTest(CollationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.north_constituency = self.north_station.constituency
+        self.south_constituency = self.south_station.constituency
+        self.north_seat = PositionFactory(zone=self.north_constituency)
+        self.south_seat = PositionFactory(zone=self.south_constituency)
+        self.north_a = CandidateFactory(position=self.north_seat, party=self.party_a)
+        self.north_b = CandidateFactory(position=self.north_seat, party=self.party_b)
+        CandidateFactory(position=self.south_seat, party=self.party_b)
+
+    def test_ties_go_to_the_first_candidate(self):
+        # the later candidate leads, then draws
+        Result.objects.create(station=self.north_station, candidate=self.north_a, votes=20)
+        Result.objects.create(station=self.north_station, candidate=self.north_b, votes=25)
+        collate_seats()
+        self.assertEqual(ParliamentarySummarySheet.objects.get(position=self.north_seat).candidate, self.north_b)
+        Result.objects.filter(candidate=self.north_b).update(votes=20)
+        collate_seats()
+        seat = ParliamentarySummarySheet.objects.get(position=self.north_seat)
+        self.assertEqual((seat.candidate, seat.constituency, seat.votes, seat.total_votes),
+                         (self.north_a, self.north_constituency, 20, 40))
+
+    def test_seats_without_results_are_not_declared(self):
+        Result.objects.create(station=self.north_station, candidate=self.north_a, votes=20)
+        # declared before its results were withdrawn
+        ParliamentarySummarySheet.objects.create(position=self.south_seat, constituency=self.south_constituency,
+                                                 votes=5, total_votes=5)
+        self.assertEqual(collate_seats(), 1)
+        self.assertFalse(ParliamentarySummarySheet.objects.filter(position=self.south_seat).exists())
+        self.assertEqual(ParliamentarySummarySheet.objects.get(position=self.north_seat).candidate, self.north_a)
+
+
+# results are collated on save rather than by a queued job
+@override_settings(COLLATION_ASYNC=False)
+class RegionCollationLockTest(CollationFixtureMixin, TransactionTestCase):
+    def run_in_thread(self, target):
+        def run():
+            try:
+                target()
+            finally:
+                connections.close_all()
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_region_swap_waits_for_deltas(self):
+        with transaction.atomic():
+            result = Result.objects.get(station=self.north_station, candidate=self.candidate_b)
+            result.votes = 25
+            result.save()
+            # the swap would read the results before the delta commits
+            swap = self.run_in_thread(lambda: collate_region_sql(self.north.pk))
+            swap.join(0.5)
+            self.assertTrue(swap.is_alive())
+        swap.join(10)
+        self.assertFalse(swap.is_alive())
+        merge_region_collations()
+        self.assertEqual(NationalCollationSheet.objects.get(region=self.north, party=self.party_b).total_votes, 25)
+        self.assertEqual(self.get_party_votes(self.party_b), 75)
+
+    def test_deltas_wait_for_region_swap(self):
+        with transaction.atomic():
+            collate_region_sql(self.north.pk)
+            delta = self.run_in_thread(lambda: Result.objects.filter(station=self.north_station,
+                                                                     candidate=self.candidate_a)
+                                                             .update_or_create(defaults=dict(votes=35)))
+            delta.join(0.5)
+            self.assertTrue(delta.is_alive())
+        delta.join(10)
+        self.assertFalse(delta.is_alive())
+        self.assertEqual(NationalCollationSheet.objects.get(region=self.north, party=self.party_a).total_votes, 35)
+        self.assertEqual(self.get_party_votes(self.party_a), 35)
@@ -0,0 +1,63 @@
+import time
+from django.test import TestCase, TransactionTestCase, override_settings
+from __poll.models import Result
+from __poll.factories import PositionFactory
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+from __report.api.views import get_dashboard_context
+from __report.dashboard import run_dashboard_panels
+
+
+def get_charts():
+    return dict(fast=dict(data=[]), slow=dict(data=[]), broken=dict(data=[]))
+
+
+def fast_panel(charts):
+    charts['fast']['data'].append(1)
+
+
+def slow_panel(charts):
+    time.sleep(2)
+    charts['slow']['data'].append(1)
+
+
+def broken_panel(charts):
+    raise ValueError('broken panel')
+
+
+class DashboardPanelsTest(TransactionTestCase):
+    def test_panels_fall_back_to_blank(self):
+        start = time.time()
+        charts, failed_panels = run_dashboard_panels(get_charts,
+                                                     [(['fast'], fast_panel),
+                                                      (['slow'], slow_panel),
+                                                      (['broken'], broken_panel)],
+                                                     workers=3,
+                                                     timeout=0.5)
+        self.assertLess(time.time() - start, 1.5)
+        self.assertEqual(charts['fast']['data'], [1])
+        self.assertEqual(charts['slow']['data'], [])
+        self.assertEqual(failed_panels, ['slow_panel', 'broken_panel'])
+
+
+# results are collated on save rather than by a queued job
+@override_settings(COLLATION_ASYNC=False)
+class DashboardContextTest(TestCase):
+    def setUp(self):
+        position = PositionFactory.create_with_zone(zone_name='nation')
+        candidate = CandidateFactory(position=position, party=PartyFactory(code='AAA'))
+        self.region = RegionFactory(nation=position.zone)
+        station = StationFactory(constituency=ConstituencyFactory(region=self.region))
+        Result.objects.create(station=station, candidate=candidate, votes=30)
+
+    # mounts the report routes the map links to
+    @override_settings(ROOT_URLCONF='__report.benchmark_urls')
+    def test_dashboard_context(self):
+        context = get_dashboard_context()
+        self.assertNotIn('presidential_top_panel', context['failed_panels'])
+        self.assertEqual(context['presidential_top']['data'], [30])
+        self.assertEqual(context['vote_validity']['data'][0], 30)
+        self.assertNotIn('presidential_map_panel', context['failed_panels'])
+        self.assertEqual([(row['region__pk'], row['party__code'], row['total_votes'])
+                          for row in context['presidential_map_data']['list']],
+                         [(self.region.pk, 'AAA', 30)])
@@ -0,0 +1,101 @@
+from django.test import TestCase, override_settings
+from __poll.models import Result, ResultSheet, ParliamentarySummarySheet
+from __poll.factories import PositionFactory
+from __poll.utils.utils import warm_content_types
+from __poll.utils.report_rows import refresh_report_rows
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+from __report.engine import get_report
+
+
+# results are collated on save rather than by a queued job
+@override_settings(COLLATION_ASYNC=False)
+class PresidentialReportTest(TestCase):
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.nation = self.position.zone
+        self.party_a = PartyFactory(code='AAA')
+        self.party_b = PartyFactory(code='BBB')
+        candidate_a = CandidateFactory(position=self.position, party=self.party_a)
+        candidate_b = CandidateFactory(position=self.position, party=self.party_b)
+        self.north = RegionFactory(nation=self.nation, title='North East')
+        self.south = RegionFactory(nation=self.nation, title='South')
+        self.station = StationFactory(constituency=ConstituencyFactory(region=self.north))
+        south_station = StationFactory(constituency=ConstituencyFactory(region=self.south))
+        Result.objects.create(station=self.station, candidate=candidate_a, votes=30)
+        Result.objects.create(station=self.station, candidate=candidate_b, votes=10)
+        Result.objects.create(station=south_station, candidate=candidate_b, votes=50)
+        self.south_station = south_station
+        refresh_report_rows()
+        warm_content_types()
+
+    def test_nation_report(self):
+        with self.assertNumQueries(3):
+            report = get_report('presidential', 'nation')
+        self.assertEqual(report['zone'], self.nation)
+        self.assertEqual([column['key'] for column in report['columns']], ['north_east', 'south'])
+        party_a, party_b = report['reports'][:2]
+        self.assertEqual((party_a['north_east'], party_a['south']), (30, 0))
+        self.assertEqual((party_b['north_east'], party_b['south']), (10, 50))
+        self.assertEqual(party_b['total_valid_votes'], 60)
+        self.assertEqual((party_a['lead'], party_b['lead']), (0, 1))
+        self.assertEqual(report['max_votes'], 60)
+        valid_row = report['totals_row'][0]
+        self.assertEqual((valid_row['north_east'], valid_row['south'], valid_row['total_votes']), (40, 50, 90))
+
+    def test_percentages_are_shares_of_valid_votes(self):
+        ResultSheet.objects.create(station=self.station, position=self.position, total_invalid_votes=30)
+        refresh_report_rows()
+        report = get_report('presidential', 'nation')
+        party_a, party_b = report['reports'][:2]
+        self.assertEqual(party_b['total_votes'], 90)
+        self.assertEqual((round(party_a['percentage'], 2), round(party_b['percentage'], 2)), (33.33, 66.67))
+
+    def test_invalid_votes_are_counted_once(self):
+        ResultSheet.objects.create(station=self.station, position=self.position, total_invalid_votes=4)
+        ResultSheet.objects.create(station=self.south_station, position=self.position, total_invalid_votes=6)
+        refresh_report_rows()
+        valid_row, invalid_row, total_row = get_report('presidential', 'nation')['totals_row']
+        self.assertEqual((invalid_row['total_votes'], invalid_row['total_invalid_votes']), (10, 10))
+        self.assertEqual((total_row['total_valid_votes'], total_row['total_invalid_votes'],
+                          total_row['total_votes']), (90, 10, 100))
+        invalid_row = get_report('presidential', 'region', self.north.pk)['totals_row'][1]
+        self.assertEqual(invalid_row['total_invalid_votes'], 4)
+
+    def test_station_report(self):
+        report = get_report('presidential', 'station', self.station.pk)
+        self.assertEqual(report['super_zone'], self.station.constituency)
+        self.assertEqual(report['columns'], [])
+        self.assertEqual([row['total_votes'] for row in report['reports'][:2]], [30, 10])
+
+    def test_missing_zone(self):
+        report = get_report('presidential', 'region', 0)
+        self.assertIsNone(report['zone'])
+        self.assertEqual(report['reports'], [])
+
+
+# results are collated on save rather than by a queued job
+@override_settings(COLLATION_ASYNC=False)
+class ParliamentaryReportTest(TestCase):
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='constituency')
+        self.constituency = self.position.zone
+        self.party = PartyFactory(code='AAA')
+        self.candidate = CandidateFactory(position=self.position, party=self.party)
+        station = StationFactory(constituency=self.constituency)
+        Result.objects.create(station=station, candidate=self.candidate, votes=20)
+        ParliamentarySummarySheet.objects.create(position=self.position,
+                                                 candidate=self.candidate,
+                                                 constituency=self.constituency,
+                                                 votes=20)
+        refresh_report_rows()
+        warm_content_types()
+
+    def test_region_report_counts_seats(self):
+        with self.assertNumQueries(3):
+            report = get_report('parliamentary', 'region', self.constituency.region_id)
+        party = [row for row in report['reports'] if row['party_id'] == self.party.pk][0]
+        self.assertEqual(party['seats'], 1)
+        self.assertEqual(party['lead'], 1)
+        self.assertEqual(party[report['columns'][0]['key']], 20)
+        self.assertEqual(report['totals_row'][0]['seats'], 1)
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
+from __poll.models import Result, ResultSheet
+from __poll.factories import PositionFactory
+from __people.factories import AgentFactory, CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+from __geo.api.views.station import station_list
+from __poll.utils.etags import GEO_LIST_VERSION_KEYS, CACHE_EPOCH_KEY
+from __report.views.report import region_presidential_report
+
+
+# results are collated and changes refreshed inline rather than by queued jobs
+@override_settings(COLLATION_ASYNC=False, REPORT_REFRESH_ASYNC=False)
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.candidate = CandidateFactory(position=self.position, party=PartyFactory(code='AAA'))
+        self.region = RegionFactory(nation=self.position.zone)
+        self.station = StationFactory(constituency=ConstituencyFactory(region=self.region))
+        self.user = get_user_model().objects.create_user(username='viewer', password='secret')
+
+    def get(self, view, path, etag=None, **kwargs):
+        headers = dict(HTTP_IF_NONE_MATCH=etag) if etag is not None else dict()
+        request = RequestFactory().get(path, **headers)
+        SessionMiddleware(lambda request: None).process_request(request)
+        request.user = self.user
+        return view(request, **kwargs)
+
+    def test_report_not_modified_until_collation_changes(self):
+        path = f'/reports/presidential/region/{self.region.pk}'
+        response = self.get(region_presidential_report, path, rpk=self.region.pk)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.get(region_presidential_report, path, etag=etag, rpk=self.region.pk)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        response = self.get(region_presidential_report, path, etag=etag, rpk=self.region.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_station_list_not_modified_until_result_sheets_change(self):
+        response = self.get(station_list, '/geo/api/stations/')
+        response.render()
+        etag = response['ETag']
+        self.assertEqual(self.get(station_list, '/geo/api/stations/', etag=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ResultSheet.objects.create(station=self.station, position=self.position, total_valid_votes=10)
+        self.assertEqual(self.get(station_list, '/geo/api/stations/', etag=etag).status_code, 200)
+
+    def test_station_list_not_modified_until_agents_change(self):
+        agent = AgentFactory(zone=self.station)
+        response = self.get(station_list, '/geo/api/stations/')
+        response.render()
+        etag = response['ETag']
+        self.assertEqual(self.get(station_list, '/geo/api/stations/', etag=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            agent.phone = '0200000000'
+            agent.save()
+        self.assertEqual(self.get(station_list, '/geo/api/stations/', etag=etag).status_code, 200)
+
+    def test_etags_do_not_repeat_after_a_cache_flush(self):
+        cache.delete_many(GEO_LIST_VERSION_KEYS)
+        response = self.get(station_list, '/geo/api/stations/')
+        response.render()
+        etag = response['ETag']
+        # the versions start over from nothing
+        cache.delete_many(GEO_LIST_VERSION_KEYS + [CACHE_EPOCH_KEY])
+        self.assertEqual(self.get(station_list, '/geo/api/stations/', etag=etag).status_code, 200)
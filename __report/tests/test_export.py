@@ -0,0 +1,60 @@
+import csv
+import gzip
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, RequestFactory, override_settings
+from __poll.models import Result, RegionalCollationSheet
+from __poll.factories import PositionFactory
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+from __report.api.views import export_table
+from __report.exports import iter_export
+
+
+# results are collated on save rather than by a queued job
+@override_settings(COLLATION_ASYNC=False)
+class ExportTest(TestCase):
+    def setUp(self):
+        position = PositionFactory.create_with_zone(zone_name='nation')
+        candidate = CandidateFactory(position=position, party=PartyFactory(code='AAA'))
+        region = RegionFactory(nation=position.zone)
+        for votes in [10, 20, 30]:
+            station = StationFactory(constituency=ConstituencyFactory(region=region))
+            Result.objects.create(station=station, candidate=candidate, votes=votes)
+
+    def test_csv_export(self):
+        content = b''.join(iter_export('results', 'csv', chunk_size=2)).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([row['votes'] for row in rows], ['10', '20', '30'])
+
+    def test_columnar_export(self):
+        lines = gzip.decompress(b''.join(iter_export('regional_collation_sheets', 'columnar', chunk_size=2))) \
+                    .decode().splitlines()
+        header = json.loads(lines[0])
+        self.assertEqual(header['table'], 'regional_collation_sheets')
+        chunks = [json.loads(line) for line in lines[1:]]
+        self.assertEqual([len(chunk[0]) for chunk in chunks], [2, 1])
+        total_votes = header['columns'].index('total_votes')
+        self.assertEqual(sum([sum(chunk[total_votes]) for chunk in chunks]), 60)
+        self.assertEqual(RegionalCollationSheet.objects.count(), 3)
+
+    def test_export_view_streams(self):
+        request = RequestFactory().get('/reports/export/results/csv')
+        request.user = get_user_model().objects.create_user(username='exporter', password='secret')
+        response = export_table(request, 'results', 'csv')
+        self.assertTrue(response.streaming)
+        self.assertIn('results.csv', response['Content-Disposition'])
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 4)
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as output:
+            call_command('export_collations', output=output, tables=['results', 'national_collation_sheets'],
+                         stdout=StringIO())
+            self.assertEqual(sorted([path.name for path in Path(output).iterdir()]), [
+                'national_collation_sheets.columns.jsonl.gz', 'national_collation_sheets.csv',
+                'results.columns.jsonl.gz', 'results.csv',
+            ])
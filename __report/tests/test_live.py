@@ -0,0 +1,74 @@
+import json
+import asyncio
+from asgiref.testing import ApplicationCommunicator
+from django.test import SimpleTestCase, TestCase, override_settings
+from django_redis import get_redis_connection
+from __poll.models import Result
+from __poll.factories import PositionFactory
+from __poll.utils.live import LIVE_CHANNEL
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+from __report.live import LiveEventsApp, LiveBroadcaster, get_live_event, LIVE_QUEUE_SIZE
+
+
+# results are collated and changes refreshed inline rather than by queued jobs
+@override_settings(COLLATION_ASYNC=False, REPORT_REFRESH_ASYNC=False)
+class LivePublishTest(TestCase):
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.candidate = CandidateFactory(position=self.position, party=PartyFactory(code='AAA'))
+        self.region = RegionFactory(nation=self.position.zone)
+        self.station = StationFactory(constituency=ConstituencyFactory(region=self.region))
+        self.pubsub = get_redis_connection('default').pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(LIVE_CHANNEL)
+
+    def get_message(self):
+        for i in range(10):
+            item = self.pubsub.get_message(timeout=1)
+            if item is not None:
+                return item
+        return None
+
+    def tearDown(self):
+        self.pubsub.close()
+
+    def test_delta_publishes_zone_totals(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Result.objects.create(station=self.station, candidate=self.candidate, votes=10)
+        message = json.loads(self.get_message()['data'])
+        self.assertEqual(message['office'], 'presidential')
+        zones = {(zone['type'], zone['id']): zone['totals'] for zone in message['zones']}
+        self.assertEqual(zones[('nation', self.position.zone.pk)], dict(AAA=10))
+        self.assertEqual(zones[('region', self.region.pk)], dict(AAA=10))
+
+
+class LiveEventsTest(SimpleTestCase):
+    def test_event_is_filtered_by_zone(self):
+        message = dict(v=3, office='presidential', zones=[dict(type='region', id=1, totals=dict(AAA=1)),
+                                                          dict(type='region', id=2, totals=dict(AAA=2))])
+        event = get_live_event(message, zones={('region', 2)})
+        self.assertTrue(event.startswith(b'id: 3\n'))
+        self.assertIn(b'"id":2', event)
+        self.assertNotIn(b'"id":1', event)
+        self.assertIsNone(get_live_event(message, zones={('region', 3)}))
+        self.assertIsNotNone(get_live_event(dict(v=4, rebuilt=True), zones={('region', 3)}))
+
+    def test_slow_viewer_is_told_to_reload(self):
+        async def overflow():
+            broadcaster = LiveBroadcaster()
+            queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+            broadcaster.queues.add(queue)
+            for version in range(LIVE_QUEUE_SIZE + 1):
+                broadcaster.broadcast(dict(v=version))
+            return [queue.get_nowait() for i in range(queue.qsize())]
+        self.assertEqual(asyncio.run(overflow()), [dict(reload=True)])
+
+    def test_stream_requires_login(self):
+        async def request():
+            async def django_application(scope, receive, send):
+                raise AssertionError('not a django request')
+            communicator = ApplicationCommunicator(LiveEventsApp(django_application),
+                                                   dict(type='http', path='/reports/live/', headers=[]))
+            await communicator.send_input(dict(type='http.request'))
+            return await communicator.receive_output(timeout=5)
+        self.assertEqual(asyncio.run(request())['status'], 403)
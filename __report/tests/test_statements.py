@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, RequestFactory, override_settings
+from __poll.constants import GeoLevelChoices
+from __poll.models import Result
+from __poll.factories import PositionFactory
+from __poll.utils.utils import get_zone_ct_id, warm_content_types
+from __poll.utils.report_rows import refresh_report_rows
+from __people.factories import CandidateFactory, PartyFactory
+from __geo.factories import RegionFactory, ConstituencyFactory, StationFactory
+from __geo.models import Nation
+from __report.statements import execute_statement, get_prepare_query
+from __report.views.report import nation_presidential_report_raw
+
+
+# results are collated on save rather than by a queued job
+@override_settings(COLLATION_ASYNC=False)
+class RawReportStatementTest(TestCase):
+    def setUp(self):
+        self.position = PositionFactory.create_with_zone(zone_name='nation')
+        self.nation = self.position.zone
+        party = PartyFactory(code='AAA')
+        CandidateFactory(position=self.position, party=party, prefix='Dr.', first_name='Ama', last_name='Mensah')
+        candidate = self.position.candidates.first()
+        self.north = RegionFactory(nation=self.nation, title='North East')
+        station = StationFactory(constituency=ConstituencyFactory(region=self.north))
+        Result.objects.create(station=station, candidate=candidate, votes=30)
+        refresh_report_rows()
+        warm_content_types()
+        self.params = dict(zone_ct_id=get_zone_ct_id(Nation), level=GeoLevelChoices.NATIONAL,
+                           zone_id=self.nation.pk, position_ids=[self.position.pk])
+
+    def test_prepared_once_per_session(self):
+        connection.prepared_statements = None
+        with self.assertNumQueries(2):
+            rows = execute_statement('raw_report_rows', **self.params)
+        with self.assertNumQueries(1):
+            self.assertEqual(execute_statement('raw_report_rows', **self.params), rows)
+        row = rows[0]
+        self.assertIsInstance(row, tuple)
+        self.assertEqual((row.party_code, row.votes, row.candidates), ('AAA', 30, 'Dr. Ama Mensah'))
+        self.assertEqual(row.get('votes'), 30)
+
+    @override_settings(RAW_REPORT_PREPARED_STATEMENTS=False)
+    def test_unprepared(self):
+        rows = execute_statement('raw_report_rows', **self.params)
+        self.assertEqual([row.votes for row in rows], [30])
+
+    def test_values_are_bound(self):
+        self.assertNotIn('%(', get_prepare_query('raw_report_rows'))
+        with self.assertRaises(Exception):
+            execute_statement('raw_report_zone_totals', zone_ct_id='1 OR 1=1', level=1, zone_ids=[1])
+
+    def test_raw_report_view(self):
+        request = RequestFactory().get('/reports/presidential/nation/raw')
+        request.user = get_user_model().objects.create_user(username='viewer', password='secret')
+        response = nation_presidential_report_raw(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'AAA')
@@ -10,6 +10,10 @@ urlpatterns = [
     url(r'^enqueue/$', api_views.enqueue_collation, name="enqueue"),
     url(r'^dequeue/(?P<jid>rq:job:[0-9a-zA-Z]+-[0-9a-zA-Z]+-[0-9a-zA-Z]+-[0-9a-zA-Z]+-[0-9a-zA-Z]+)$', api_views.dequeue_collation, name="dequeue"),
 
+    url(r'^collate/stats$', api_views.collation_queue_stats, name="collation_queue_stats"),
+    url(r'^ingest/stats$', api_views.result_stream_stats, name="result_stream_stats"),
+    url(r'^collate/trend$', api_views.collation_trend, name="collation_trend"),
+    url(r'^export/(?P<table>[a-z_]+)/(?P<export_format>csv|columnar)$', api_views.export_table, name="export_table"),
     url(r'^collate/items$', api_views.manage_items, name="items"),
     url(r'^collate/items/<slug:key>$', api_views.manage_item, name="single_item"),
 
@@ -1,19 +1,26 @@
 import time
-from poll.utils.utils import intify
-from poll.models import (Position, Result, ResultSheet, SupernationalCollationSheet,
+from concurrent.futures import ProcessPoolExecutor
+from __poll.utils.utils import intify
+from __poll.models import (Position, Result, ResultSheet, SupernationalCollationSheet,
                          NationalCollationSheet, RegionalCollationSheet,
                          ConstituencyCollationSheet, StationCollationSheet,
                          ParliamentarySummarySheet)
-from people.models import Candidate
-from geo.models import Nation, Region, Constituency, Station
-from poll.constants import TerminalColors
-from django.db import connection
-from poll.utils.utils import get_zone_ct, merge_column_excludes, make_title_key
+from __people.models import Candidate
+from __geo.models import Nation, Region, Constituency, Station
+from __poll.constants import TerminalColors, StatusChoices
+from django.db import connection, connections, transaction
+from __poll.utils.utils import get_zone_ct, merge_column_excludes, make_title_key
+from __poll.utils.collations import (lock_collation_rebuild, lock_region_collation,
+                                    get_station_ancestors, mark_collation_changed)
 from django.core.exceptions import ValidationError
 
 
 ROWSTART = ''
 
+COLLATION_MODE_PYTHON = 'python'
+COLLATION_MODE_SQL = 'sql'
+COLLATION_MODES = [COLLATION_MODE_PYTHON, COLLATION_MODE_SQL]
+
 def clear_collated_results():
     supernation_collations = SupernationalCollationSheet.objects.all()
     nation_collations = NationalCollationSheet.objects.all()
@@ -33,6 +40,7 @@ def clear_collated_results():
     region_collations.delete()
     constituency_collations.delete()
     station_collations.delete()
+    mark_collation_changed(rebuilt=True)
     return total_records
 
 
@@ -221,7 +229,32 @@ def bulk_upsert_collation(collation_totals,
                 print(f'{TerminalColors.WARNING}Error: {e}{TerminalColors.ENDC}')
 
 
+def with_station_ancestors(results):
+    '''Adds the station ancestor ids the collation keys use to each result row'''
+    for result in results:
+        ancestors = get_station_ancestors(result['station_id']) \
+                        if result['station_id'] is not None else None
+        constituency_id, region_id, nation_id = ancestors or (None, None, None)
+        result['station__id'] = result['station_id']
+        result['station__constituency__id'] = constituency_id
+        result['station__constituency__region__id'] = region_id
+        result['station__constituency__region__nation__id'] = nation_id
+        yield result
+
+
 def collate_results(use_verbose=False):
+    '''
+    Rebuilds every collation sheet in a single transaction. Readers keep
+    seeing the previous committed sheets until the rebuilt ones replace them
+    on commit, so reports never show a blank window mid-collation.
+    '''
+    with transaction.atomic():
+        lock_collation_rebuild()
+        mark_collation_changed(rebuilt=True)
+        return rebuild_collated_results(use_verbose=use_verbose)
+
+
+def rebuild_collated_results(use_verbose=False):
     # fetch all results, and prune only the required
     # rows to save on memory and processing
 
@@ -236,17 +269,10 @@ def collate_results(use_verbose=False):
                         'candidate__party__code',
                         'candidate__position__zone_ct_id',
                         'station_id',
-                        'station__id',
-                        'station__code',
-                        'station__constituency__id',
-                        'station__constituency__title',
-                        'station__constituency__region__id',
-                        'station__constituency__region__title',
-                        'station__constituency__region__nation__id',
-                        'station__constituency__region__nation__title',
                         # 'result_sheet__total_invalid_votes',
                     ) \
                     # .annotate( n=F('m'), a=F('b') )
+    # the station's ancestors come from the geo hierarchy index, not joins
     print(f'{ROWSTART}Collating Results... \t\t\t')
     if use_verbose:
         print('+----------------------------------------------------------+')
@@ -320,7 +346,7 @@ def collate_results(use_verbose=False):
     total = results.count()
 
 
-    for result in results:
+    for result in with_station_ancestors(results):
         if result.get('station_id', None) is not None \
             and result.get('candidate_id', None) is not None:
 
@@ -670,94 +696,503 @@ def collate_results(use_verbose=False):
     return total_tables
 
 
-def collate_seats(can_clear=True, use_verbose=False):
-    print('Collating Seats...')
+# SET-BASED (SQL) COLLATION
+# Each level is aggregated from the level below it inside PostgreSQL with a
+# single statement: matching sheets are updated, missing ones inserted and
+# sheets that no longer have votes behind them removed. Keys holding a NULL
+# never conflict on the natural key constraints, so rows are matched
+# explicitly rather than with ON CONFLICT; existing sheets are never blanked
+# while collating.
+# region_scope limits a level to the sheets of one region (alias t, parameter
+# region_id) for partitioned collation; levels without it merge the regions.
+
+SQL_COLLATION_LEVELS = [
+    dict(
+        title='Stations',
+        model=StationCollationSheet,
+        key_fields=['candidate_id', 'station_id', 'zone_ct_id'],
+        source='''SELECT
+                    r.candidate_id, r.station_id, pos.zone_ct_id,
+                    SUM(r.votes) AS total_votes
+                FROM poll_result r
+                    INNER JOIN people_candidate ca ON ca.id = r.candidate_id
+                    LEFT JOIN poll_position pos ON pos.id = ca.position_id
+                GROUP BY r.candidate_id, r.station_id, pos.zone_ct_id''',
+        region_scope='''t.station_id IN (SELECT st.id FROM geo_station st INNER JOIN geo_constituency co ON co.id = st.constituency_id WHERE co.region_id = %(region_id)s)''',
+    ),
+    dict(
+        title='Constituencies',
+        model=ConstituencyCollationSheet,
+        key_fields=['party_id', 'station_id', 'zone_ct_id'],
+        source='''SELECT
+                    ca.party_id, s.station_id, s.zone_ct_id,
+                    SUM(s.total_votes) AS total_votes
+                FROM {station_table} s
+                    INNER JOIN people_candidate ca ON ca.id = s.candidate_id
+                GROUP BY ca.party_id, s.station_id, s.zone_ct_id''',
+        region_scope='''t.station_id IN (SELECT st.id FROM geo_station st INNER JOIN geo_constituency co ON co.id = st.constituency_id WHERE co.region_id = %(region_id)s)''',
+    ),
+    dict(
+        title='Regions',
+        model=RegionalCollationSheet,
+        key_fields=['party_id', 'constituency_id', 'zone_ct_id'],
+        source='''SELECT
+                    c.party_id, st.constituency_id, c.zone_ct_id,
+                    SUM(c.total_votes) AS total_votes
+                FROM {constituency_table} c
+                    INNER JOIN geo_station st ON st.id = c.station_id
+                GROUP BY c.party_id, st.constituency_id, c.zone_ct_id''',
+        region_scope='''t.constituency_id IN (SELECT co.id FROM geo_constituency co WHERE co.region_id = %(region_id)s)''',
+    ),
+    dict(
+        title='Nations',
+        model=NationalCollationSheet,
+        key_fields=['party_id', 'region_id', 'zone_ct_id'],
+        source='''SELECT
+                    rc.party_id, co.region_id, rc.zone_ct_id,
+                    SUM(rc.total_votes) AS total_votes
+                FROM {regional_table} rc
+                    INNER JOIN geo_constituency co ON co.id = rc.constituency_id
+                GROUP BY rc.party_id, co.region_id, rc.zone_ct_id''',
+        region_scope='''t.region_id = %(region_id)s''',
+    ),
+    dict(
+        title='Supernations',
+        model=SupernationalCollationSheet,
+        key_fields=['party_id', 'nation_id', 'zone_ct_id'],
+        source='''SELECT
+                    nc.party_id, re.nation_id, nc.zone_ct_id,
+                    SUM(nc.total_votes) AS total_votes
+                FROM {national_table} nc
+                    INNER JOIN geo_region re ON re.id = nc.region_id
+                GROUP BY nc.party_id, re.nation_id, nc.zone_ct_id''',
+        region_scope=None,
+    ),
+]
+
+
+def get_collation_tables():
+    return dict(
+        station_table=StationCollationSheet._meta.db_table,
+        constituency_table=ConstituencyCollationSheet._meta.db_table,
+        regional_table=RegionalCollationSheet._meta.db_table,
+        national_table=NationalCollationSheet._meta.db_table,
+        supernational_table=SupernationalCollationSheet._meta.db_table,
+    )
+
+
+def get_collation_upsert_query(table, key_fields, source, scope=None):
+    keys = ', '.join(key_fields)
+    match = ' AND '.join([f't.{key} IS NOT DISTINCT FROM s.{key}' for key in key_fields])
+    scope = 'TRUE' if scope is None else scope
+    return f'''WITH totals AS (
+                    SELECT * FROM (
+                        {source}
+                    ) t WHERE {scope}
+                ),
+                updated AS (
+                    UPDATE {table} t
+                        SET total_votes = s.total_votes
+                        FROM totals s
+                        WHERE {match}
+                    RETURNING t.id
+                ),
+                inserted AS (
+                    INSERT INTO {table}
+                        ({keys}, total_votes, total_invalid_votes, total_votes_ec, status, created_at)
+                    SELECT {keys}, total_votes, 0, 0, %(status)s, NOW()
+                        FROM totals s
+                        WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE {match})
+                    RETURNING id
+                ),
+                removed AS (
+                    DELETE FROM {table} t
+                        WHERE {scope}
+                        AND NOT EXISTS (SELECT 1 FROM updated u WHERE u.id = t.id)
+                    RETURNING id
+                )
+                SELECT
+                    (SELECT COUNT(*) FROM updated) + (SELECT COUNT(*) FROM inserted),
+                    (SELECT COUNT(*) FROM removed);'''
+
+
+def execute_collation_levels(levels, region_id=None, use_verbose=False):
+    '''Runs the set-based statement of each level, scoped to region_id when given'''
+    total_tables = 0
+    tables = get_collation_tables()
+    params = dict(status=StatusChoices.ACTIVE, region_id=region_id)
+    with connection.cursor() as cursor:
+        for level in levels:
+            start = time.time()
+            scope = None if region_id is None else level['region_scope']
+            query = get_collation_upsert_query(level['model']._meta.db_table,
+                                               level['key_fields'],
+                                               level['source'].format(**tables),
+                                               scope=scope)
+            cursor.execute(query, params)
+            upserted, removed = cursor.fetchone()
+            if upserted > 0:
+                total_tables += 1
+            if use_verbose:
+                print(f'{level["title"]} (Upserted)\t\t{TerminalColors.OKGREEN}{upserted}\tOK{TerminalColors.ENDC}'
+                      f'\t(removed {removed}, {round(time.time() - start, 3)}s)')
+    return total_tables
+
+
+def collate_results_sql(use_verbose=False, levels=None):
+    '''Collates all results level by level with set-based SQL, see SQL_COLLATION_LEVELS'''
+    levels = SQL_COLLATION_LEVELS if levels is None else levels
+    print(f'{ROWSTART}Collating Results (SQL)... \t\t')
+    if use_verbose:
+        print('+----------------------------------------------------------+')
+    with transaction.atomic():
+        lock_collation_rebuild()
+        mark_collation_changed(rebuilt=True)
+        total_tables = execute_collation_levels(levels, use_verbose=use_verbose)
+    if use_verbose:
+        print('+----------------------------------------------------------+')
+    print(f'{ROWSTART}Result Collation Complete\t\t\t%')
+    return total_tables
+
+
+# PARTITIONED COLLATION
+# Stations, constituencies, regions and the per-region national sheets only
+# depend on results within one region, so each region is collated on its own
+# (in a worker process or rq job) and the supernational totals are merged
+# from the national sheets once every region is done.
+
+def get_region_collation_levels():
+    return [level for level in SQL_COLLATION_LEVELS if level['region_scope'] is not None]
+
+
+def get_merge_collation_levels():
+    return [level for level in SQL_COLLATION_LEVELS if level['region_scope'] is None]
+
+
+def collate_region_sql(region_id):
+    '''Collates the station to national sheets of a single region, returns its timing'''
+    start = time.time()
+    with transaction.atomic():
+        # other regions carry on alongside a partition, deltas into it wait
+        lock_collation_rebuild(shared=True)
+        lock_region_collation(region_id)
+        # the report rows are refreshed once, by the merge
+        mark_collation_changed(rebuilt=True, refresh=False)
+        total_tables = execute_collation_levels(get_region_collation_levels(), region_id=region_id)
+    return dict(region_id=region_id,
+                total_tables=total_tables,
+                elapsed=round(time.time() - start, 3))
+
+
+def merge_region_collations(use_verbose=False):
+    '''Rolls the per-region national sheets up into the supernational sheets'''
+    with transaction.atomic():
+        # every delta writes a supernational sheet, none may run during the merge
+        lock_collation_rebuild()
+        mark_collation_changed(rebuilt=True)
+        return execute_collation_levels(get_merge_collation_levels(), use_verbose=use_verbose)
+
+
+def init_collation_worker():
+    # spawned (non-forked) workers need the app registry loaded
+    import django
+    django.setup()
+
+
+def collate_results_partitioned(workers=1, region_ids=None, use_verbose=False):
+    '''
+    Collates results region by region across up to `workers` processes, then
+    merges the supernational totals. Only the given region_ids are recollated
+    when provided, leaving the other regions' sheets as they are.
+    '''
+    regions = Region.objects.all()
+    if region_ids:
+        regions = regions.filter(pk__in=region_ids)
+    region_titles = dict(regions.values_list('pk', 'title'))
+    print(f'{ROWSTART}Collating Results ({len(region_titles)} regions, {workers} workers)... \t\t')
+    if use_verbose:
+        print('+----------------------------------------------------------+')
+    if workers > 1 and len(region_titles) > 1:
+        # forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_collation_worker) as executor:
+            partitions = list(executor.map(collate_region_sql, region_titles.keys()))
+    else:
+        partitions = [collate_region_sql(region_id) for region_id in region_titles.keys()]
+    total_tables = 0
+    for partition in partitions:
+        total_tables += partition['total_tables']
+        # the per region timing shows which partition holds the others up
+        print(f'{region_titles[partition["region_id"]]}\t\t{TerminalColors.OKGREEN}'
+              f'{partition["total_tables"]}\tOK{TerminalColors.ENDC}\t({partition["elapsed"]}s)')
+    total_tables += merge_region_collations(use_verbose=use_verbose)
+    if use_verbose:
+        print('+----------------------------------------------------------+')
+    print(f'{ROWSTART}Result Collation Complete\t\t\t%')
+    return total_tables
+
+
+# COLLATION VERIFICATION
+# Every level's totals are recomputed straight from the results (never from
+# the stored level below, so drift cannot hide) and diffed against the stored
+# sheets grouped by their natural key. Discrepancies are missing sheets,
+# stale sheets (votes without results behind them), mismatched totals and
+# duplicate sheets for one key; repair only rewrites those rows.
+
+VERIFY_COLLATION_SOURCE = '''SELECT
+                    r.candidate_id, ca.party_id, r.station_id, st.constituency_id,
+                    co.region_id, re.nation_id, pos.zone_ct_id, r.votes
+                FROM poll_result r
+                    INNER JOIN people_candidate ca ON ca.id = r.candidate_id
+                    LEFT JOIN poll_position pos ON pos.id = ca.position_id
+                    INNER JOIN geo_station st ON st.id = r.station_id
+                    INNER JOIN geo_constituency co ON co.id = st.constituency_id
+                    INNER JOIN geo_region re ON re.id = co.region_id'''
+
+DISCREPANCY_MISSING = 'missing'
+DISCREPANCY_STALE = 'stale'
+DISCREPANCY_MISMATCH = 'mismatch'
+DISCREPANCY_DUPLICATE = 'duplicate'
+DISCREPANCY_TYPES = [DISCREPANCY_MISSING, DISCREPANCY_STALE, DISCREPANCY_MISMATCH, DISCREPANCY_DUPLICATE]
+
+
+def get_collation_verify_query(table, key_fields):
+    keys = ', '.join(key_fields)
+    selected = ', '.join([f'COALESCE(e.{key}, s.{key})' for key in key_fields])
+    # ids are positive, so 0 stands in for NULL keys in the hash joinable match
+    match = ' AND '.join([f'COALESCE(e.{key}, 0) = COALESCE(s.{key}, 0)' for key in key_fields])
+    return f'''WITH results AS (
+                    {VERIFY_COLLATION_SOURCE}
+                ),
+                expected AS (
+                    SELECT {keys}, SUM(votes) AS total_votes
+                        FROM results
+                        GROUP BY {keys}
+                ),
+                stored AS (
+                    SELECT {keys}, SUM(COALESCE(total_votes, 0)) AS total_votes,
+                           ARRAY_AGG(id ORDER BY id) AS ids
+                        FROM {table}
+                        GROUP BY {keys}
+                )
+                SELECT {selected}, e.total_votes, s.total_votes, s.ids
+                FROM expected e
+                    FULL OUTER JOIN stored s ON {match}
+                WHERE (e.total_votes IS DISTINCT FROM s.total_votes
+                       AND NOT (e.total_votes IS NULL AND s.total_votes = 0))
+                    OR CARDINALITY(s.ids) > 1;'''
+
+
+def get_discrepancy_type(expected, stored, ids):
+    if stored is None:
+        return DISCREPANCY_MISSING
+    if len(ids) > 1:
+        return DISCREPANCY_DUPLICATE
+    if expected is None:
+        return DISCREPANCY_STALE
+    return DISCREPANCY_MISMATCH
+
+
+def find_collation_discrepancies(level):
+    '''Diffs one level's stored sheets against totals recomputed from results'''
+    key_fields = level['key_fields']
+    query = get_collation_verify_query(level['model']._meta.db_table, key_fields)
+    discrepancies = []
+    with connection.cursor() as cursor:
+        cursor.execute(query)
+        for row in cursor.fetchall():
+            keys = dict(zip(key_fields, row[:len(key_fields)]))
+            expected, stored, ids = row[len(key_fields):]
+            discrepancies.append(dict(**keys,
+                                      type=get_discrepancy_type(expected, stored, ids),
+                                      expected=int(expected or 0),
+                                      stored=None if stored is None else int(stored),
+                                      ids=ids or []))
+    return discrepancies
+
+
+def repair_collation_discrepancies(level, discrepancies, batch_size=2000):
+    '''Rewrites only the sheets that differ, returns the number of rows written'''
+    model = level['model']
+    created = []
+    updated = []
+    removed = []
+    for discrepancy in discrepancies:
+        if discrepancy['type'] == DISCREPANCY_MISSING:
+            created.append(model(**{key: discrepancy[key] for key in level['key_fields']},
+                                 total_votes=discrepancy['expected'],
+                                 total_invalid_votes=0,
+                                 total_votes_ec=0))
+        else:
+            # the oldest sheet of a key carries the total, copies are removed
+            keep_id, *extra_ids = discrepancy['ids']
+            updated.append(model(id=keep_id, total_votes=discrepancy['expected']))
+            removed += extra_ids
+    model.objects.bulk_create(created, batch_size=batch_size)
+    model.objects.bulk_update(updated, fields=['total_votes'], batch_size=batch_size)
+    model.objects.filter(pk__in=removed).delete()
+    return len(created) + len(updated) + len(removed)
+
+
+def verify_collations(repair=False, use_verbose=False, limit=100):
+    '''
+    Checks every collation level against the results and returns a compact
+    report: per level counts by discrepancy type (and rows repaired), plus up
+    to `limit` discrepancy rows per level.
+    '''
+    start = time.time()
+    report = dict(repair=repair, levels=[], total_discrepancies=0, total_repaired=0)
+    print(f'{ROWSTART}Verifying Collations... \t\t')
+    if use_verbose:
+        print('+----------------------------------------------------------+')
+    with transaction.atomic():
+        if repair:
+            # repairs must not interleave with deltas or a rebuild
+            lock_collation_rebuild()
+            mark_collation_changed(rebuilt=True)
+        for level in SQL_COLLATION_LEVELS:
+            level_start = time.time()
+            discrepancies = find_collation_discrepancies(level)
+            counts = {kind: 0 for kind in DISCREPANCY_TYPES}
+            for discrepancy in discrepancies:
+                counts[discrepancy['type']] += 1
+            repaired = repair_collation_discrepancies(level, discrepancies) if repair else 0
+            report['levels'].append(dict(title=level['title'],
+                                         discrepancies=counts,
+                                         total=len(discrepancies),
+                                         repaired=repaired,
+                                         rows=discrepancies[:limit],
+                                         elapsed=round(time.time() - level_start, 3)))
+            report['total_discrepancies'] += len(discrepancies)
+            report['total_repaired'] += repaired
+            if use_verbose:
+                colour = TerminalColors.OKGREEN if len(discrepancies) == 0 else TerminalColors.WARNING
+                summary = ', '.join([f'{kind} {count}' for kind, count in counts.items() if count > 0])
+                print(f'{level["title"]}\t\t{colour}{len(discrepancies)}{TerminalColors.ENDC}'
+                      f'\t{summary}{" (repaired " + str(repaired) + ")" if repair else ""}')
+    report['elapsed'] = round(time.time() - start, 3)
+    if use_verbose:
+        print('+----------------------------------------------------------+')
+    print(f'{ROWSTART}Verification Complete\t\t\t{report["total_discrepancies"]} discrepancies')
+    return report
+
+
+
+def dedupe_collations(use_verbose=False):
+    '''
+    Merges the collation sheets sharing a natural key (left by collations
+    from before the unique constraints) into their oldest sheet, holding the
+    total recomputed from the results. Run before the constraints are added;
+    tables that do not exist yet are skipped. Returns the rows written.
+    '''
+    tables = connection.introspection.table_names()
     total = 0
-    # percollate all seats per candidate per station
+    with transaction.atomic():
+        lock_collation_rebuild()
+        for level in SQL_COLLATION_LEVELS:
+            if level['model']._meta.db_table not in tables:
+                continue
+            duplicates = [discrepancy
+                          for discrepancy in find_collation_discrepancies(level)
+                          if discrepancy['type'] == DISCREPANCY_DUPLICATE]
+            repaired = repair_collation_discrepancies(level, duplicates)
+            total += repaired
+            if use_verbose:
+                print(f'{level["title"]}\t\t{len(duplicates)} duplicated keys\t(rewrote {repaired})')
+        if total > 0:
+            mark_collation_changed(rebuilt=True)
+    return total
+
+
+# SEAT COLLATION
+# One statement ranks every parliamentary candidate within their position by
+# their summed station votes, upserts the winner of each position into the
+# summary sheet (position is unique there) and removes seats without votes.
+
+SEAT_COLLATION_QUERY = '''WITH candidate_votes AS (
+                    SELECT
+                        ca.id AS candidate_id, ca.position_id, pos.zone_id AS constituency_id,
+                        SUM(r.votes) AS votes
+                    FROM poll_result r
+                        INNER JOIN people_candidate ca ON ca.id = r.candidate_id
+                        INNER JOIN poll_position pos ON pos.id = ca.position_id
+                    WHERE pos.zone_ct_id = %(zone_ct_id)s
+                    GROUP BY ca.id, ca.position_id, pos.zone_id
+                ),
+                ranked AS (
+                    SELECT
+                        cv.*,
+                        SUM(cv.votes) OVER (PARTITION BY cv.position_id) AS total_votes,
+                        ROW_NUMBER() OVER (PARTITION BY cv.position_id
+                                           ORDER BY cv.votes DESC, cv.candidate_id) AS seat_rank
+                    FROM candidate_votes cv
+                ),
+                winners AS (
+                    SELECT * FROM ranked WHERE seat_rank = 1 AND total_votes > 0
+                ),
+                upserted AS (
+                    INSERT INTO poll_parliamentary_summary_sheet
+                        (position_id, candidate_id, constituency_id, votes, total_votes, status, created_at)
+                    SELECT position_id, candidate_id, constituency_id, votes, total_votes, %(status)s, NOW()
+                        FROM winners
+                    ON CONFLICT (position_id)
+                    DO UPDATE SET candidate_id = EXCLUDED.candidate_id,
+                                  constituency_id = EXCLUDED.constituency_id,
+                                  votes = EXCLUDED.votes,
+                                  total_votes = EXCLUDED.total_votes
+                    RETURNING position_id, candidate_id, constituency_id, votes, total_votes
+                ),
+                removed AS (
+                    DELETE FROM poll_parliamentary_summary_sheet ps
+                        WHERE NOT EXISTS (SELECT 1 FROM winners w WHERE w.position_id = ps.position_id)
+                    RETURNING ps.id
+                )
+                SELECT
+                    CONCAT_WS(' ', ca.first_name, ca.last_name), u.votes, u.total_votes, pa.code, co.title,
+                    (SELECT COUNT(*) FROM removed)
+                FROM upserted u
+                    INNER JOIN people_candidate ca ON ca.id = u.candidate_id
+                    INNER JOIN poll_party pa ON pa.id = ca.party_id
+                    LEFT JOIN geo_constituency co ON co.id = u.constituency_id
+                ORDER BY co.title;'''
+
+
+@transaction.atomic
+def collate_seats(use_verbose=False):
+    # the summary is refreshed in one transaction so the
+    # dashboard keeps the previous seat counts until it commits
+    print('Collating Seats...')
+    start = time.time()
     total_seats = Constituency.objects.count()
     total_seats_won = 0
-    total_seats_declared = 0
-    total_seats_outstanding = 0
     total_votes = 0
-    sheets = dict()
-    ParliamentarySummarySheet.objects.all().delete()
     zone_ct = get_zone_ct(Constituency)
-    # get all candates with results
-    candidates_with_results = [r.candidate_id for r in Result.objects.all()]
-    # get all parliamentary positons
-    parliamentary_positions = Position.objects.filter(zone_ct=zone_ct).all()
-    # get all the canididates for parliamentary positons
-    parliamentary_candidates = Candidate.objects \
-                                        .filter(
-                                            pk__in=candidates_with_results,
-                                            position__in=parliamentary_positions,
-                                        ).all()
-    max_sheets = dict()
-    for candidate in parliamentary_candidates:
-        position_id = candidate.position.pk
-        # get the sheet for the position the candidate is vieing for
-        max_sheet = max_sheets.get(position_id, dict())
-        # find the vote for the winning candidate
-        max_votes = max_sheet.get('votes', 0)
-        # find the winning candidate for the position
-        max_candidate = max_sheet.get('candidate', None)
-        # get the total votes for this position
-        total_votes = max_sheet.get('total_votes', 0)
-        # sum the votes for current candidate from all stations
-        votes = sum([r.votes for r in candidate.results.all()])
-        # add total votes
-        total_votes += votes
-        # find the max votes and winning candidate
-        if max_votes < votes:
-            max_votes = votes
-            max_candidate = candidate
-            max_sheet['votes'] = max_votes
-            max_sheet['candidate'] = max_candidate
-        # put the max sheet back into the pile with the total votes
-        if total_votes > 0:
-            max_sheet['total_votes'] = total_votes
-            max_sheets[position_id] = max_sheet
-            # print(position_id, max_sheet)
-    # crate new records
-    for position_id, sheet in max_sheets.items():
-        candidate = sheet['candidate']
-        constituency_id = candidate.position.zone_id
-        votes = sheet['votes']
-        total_votes = sheet['total_votes']
-
-        constituency = Constituency.objects.filter(pk=constituency_id).first()
-        position = Position.objects.filter(pk=position_id).first()
-
-        s, _ = ParliamentarySummarySheet.objects \
-                                        .update_or_create(
-                                            position=position,
-                                            defaults=dict(
-                                                candidate=candidate,
-                                                constituency=constituency,
-                                                votes=votes,
-                                                total_votes=total_votes,
-                                            )
-                                        )
+    mark_collation_changed(rebuilt=True)
+    with connection.cursor() as cursor:
+        cursor.execute(SEAT_COLLATION_QUERY, dict(zone_ct_id=zone_ct.pk, status=StatusChoices.ACTIVE))
+        seats = cursor.fetchall()
+    total_seats_declared = len(seats)
+    for candidate, votes, position_votes, party_code, constituency, _ in seats:
+        total_votes += position_votes
         if use_verbose:
             print('+----------------------------------------------------------+')
-        total_seats_declared += 1
-        if use_verbose:
-            # print(f'Position: \t\t\t{TerminalColors.OKBLUE}{position}{TerminalColors.ENDC}')
-            print(f'Candidate \t{TerminalColors.OKBLUE}{candidate} ({candidate.party.code}){TerminalColors.ENDC}')
+            print(f'Candidate \t{TerminalColors.OKBLUE}{candidate} ({party_code}){TerminalColors.ENDC}')
             print(f'Constituency: \t{TerminalColors.OKBLUE}{constituency}{TerminalColors.ENDC}')
             print(f'Votes: \t\t{TerminalColors.OKBLUE}{votes}{TerminalColors.ENDC}')
-        if candidate.party.code == 'NDC':
+        if party_code == 'NDC':
             if use_verbose:
                 print(f'NDC Won: \t\t{TerminalColors.OKBLUE}YES{TerminalColors.ENDC}')
             total_seats_won += 1
     total_seats_outstanding = total_seats - total_seats_declared
-    total += ParliamentarySummarySheet.objects.all().count()
+    total = total_seats_declared
     if use_verbose:
         print('+----------------------------------------------------------+')
         print(f'Total Seats Won: \t\t{TerminalColors.OKBLUE}{total_seats_won}{TerminalColors.ENDC}')
         print(f'Total Seats Declared: \t\t{TerminalColors.OKBLUE}{total_seats_declared}{TerminalColors.ENDC}')
         print(f'Total Seats Outstanding: \t{TerminalColors.OKBLUE}{total_seats_outstanding}{TerminalColors.ENDC}')
         print(f'Total Votes: \t\t\t{TerminalColors.OKBLUE}{total_votes}{TerminalColors.ENDC}')
+        print(f'Removed Seats: \t\t\t{TerminalColors.OKBLUE}{seats[0][5] if seats else 0}{TerminalColors.ENDC}')
+        print(f'Time elapsed: \t\t\t{TerminalColors.OKBLUE}{round(time.time() - start, 3)}s{TerminalColors.ENDC}')
         print('+----------------------------------------------------------+')
     print('Seats Collating... \t\t\tDONE')
     return total
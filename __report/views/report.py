@@ -2,12 +2,12 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.mail import send_mail, BadHeaderError
 from django.http import HttpResponse, HttpResponseRedirect
-from people.models import Party, Candidate
-from people.serializers import PartySerializer
-from geo.models import Nation, Region, Constituency, Station
-from geo.serializers import RegionSerializer, StationSerializer
-from poll.forms import OfficeForm
-from poll.constants import ROWS_PER_PAGE
+from __people.models import Party, Candidate
+from __people.serializers import PartySerializer
+from __geo.models import Nation, Region, Constituency, Station
+from __geo.serializers import RegionSerializer, StationSerializer
+from __poll.forms import OfficeForm
+from __poll.constants import ROWS_PER_PAGE
 from itertools import chain
 from django.apps import apps
 from django.db.models import (
@@ -15,11 +15,11 @@ from django.db.models import (
     F, Value, Func, Subquery, OuterRef, IntegerField, CharField, Case, When,
 )
 from django.db.models.functions import Concat
-from poll.utils.utils import snakeify, get_zone_ct
+from __poll.utils.utils import snakeify, get_zone_ct, get_zone_ct_id
 from django.contrib.auth.decorators import login_required
-from poll.constants import StatusChoices, GeoLevelChoices, NameTitleChoices, TerminalColors
+from __poll.constants import StatusChoices, GeoLevelChoices, NameTitleChoices, TerminalColors
 from django.db import connection
-from poll.models import (
+from __poll.models import (
     Event, Office, Position, ResultSheet, Result, ResultApproval,
     SupernationalCollationSheet, NationalCollationSheet, RegionalCollationSheet,
     ConstituencyCollationSheet, StationCollationSheet,
@@ -29,6 +29,11 @@ from django.http import JsonResponse
 from django.urls import reverse
 from django.contrib import messages
 from django.db.models.functions import Replace
+from __report.cache import get_cached_report, get_report_version
+from __report.engine import REPORT_LEVELS, REPORT_OFFICE_TYPES, get_report_zone, get_report_columns
+from __report.statements import execute_statement, get_row_type, get_cells
+from __poll.utils.etags import get_version_etag, get_not_modified_response, set_response_etag
+from __poll.utils.leaderboards import get_leaderboard, LEADERBOARD_ALL_OFFICES
 
 
 # HELPER FUNCTIONS: EXPORT TO UTILS
@@ -92,43 +97,6 @@ def index_view(request):
     }
     return render(request, "home.html", context)
 
-def get_blank_total_sheets():
-    return dict(
-        valid=dict(
-            party_code='',
-            party_title='Total Valid Votes',
-            lead=0,
-            seats=0,
-            total_votes=0,
-            total_votes_ec=0,
-            total_ec_variance=0,
-            total_valid_votes=0,
-            total_invalid_votes=0,
-        ),
-        invalid=dict(
-            party_code='',
-            party_title='Total Invalid Votes',
-            lead=0,
-            seats=0,
-            total_votes=0,
-            total_votes_ec=0,
-            total_ec_variance=0,
-            total_valid_votes=0,
-            total_invalid_votes=0,
-        ),
-        total=dict(
-            party_code='',
-            party_title='Total Votes',
-            lead=0,
-            seats=0,
-            total_votes=0,
-            total_votes_ec=0,
-            total_ec_variance=0,
-            total_valid_votes=0,
-            total_invalid_votes=0,
-        )
-    )
-
 # HELPER FUNCTIONS: EXPORT TO UTILS
 
 @login_required
@@ -274,2621 +242,269 @@ def parliamentary_seat_report(request, pk=None):
     return render(request, template, context)
 
 
-@login_required
-def nation_presidential_report(request, npk=None):
-    level = GeoLevelChoices.NATIONAL
-    zone_ct_model = Nation
-    zone_ct = get_zone_ct(zone_ct_model)
-    report_title = f'Presidential Collation Results (National)'
-    template = f'report/report.html'
-    zone_type='nation'
-    sub_zone_type='region'
-    sub_zone_type_plural = 'regions'
-    sub_zone_type_1='constituency'
-    sub_zone_type_2='station'
-    sub_zone_link=f'/reports/presidential/region/'
-    super_zone=None
-    super_zone_link='#'
-    sheet_model = NationalCollationSheet
-    column_model = Region
-    page_model = Nation
-    zone = page_model.objects.first()
-    key_field = 'title'
-    rid=1
-    office_type='presidential'
-
-    # find all parties and stats for each (y-axis)
-
-    totals_row = dict(
-                    valid={},
-                    invalid={},
-                    total={},
-                )
-    reports = []
-    max_votes = 0
-    max_votes_party = None
-    p = 0
-    total_sheets = get_blank_total_sheets()
-
-    xfields = ['id', 'code', 'title',
-                'total_votes',
-                'total_valid_votes',
-                'total_votes_ec',
-                'total_ec_variance',
-                'total_invalid_votes',
-                'sub_zone_total_votes_ec',
-                'sub_zone_total_ec_variance',
-              ]
-
-    # report columns (regions for national page)
-    columns = column_model.objects.values('id', 'title') \
-                    .annotate(key=Replace(
-                                    Func(F(key_field), function='LOWER'),
-                                    Value(' '),
-                                    Value('_')
-                    )).filter(nation=zone) \
-                    .order_by('title').all()
-
-    sub_xannotates = dict(
-                # sum all total_votes (col) in the collation table
-                sub_total_valid_votes=Sum(
-                                        F('national_collation_sheets__total_votes'),
-                                        filter=Q(national_collation_sheets__zone_ct=zone_ct)
-                                    ),
-                # sum all total_votes_ec (col) in the collation table
-                sub_total_votes_ec=Sum(
-                                    F('national_collation_sheets__total_votes_ec'),
-                                    filter=Q(national_collation_sheets__zone_ct=zone_ct)
-                                ),
-                sub_total_ec_variance=F('sub_total_valid_votes') - F('sub_total_votes_ec'),
-    )
-    parties_sub_counts = Party.objects \
-                    .filter(pk=OuterRef('pk')) \
-                    .annotate(**sub_xannotates) \
-                    .order_by('code')
-    # run sub queries to include additional columns (national collation sheet)
-    parties_sub_counts_votes = parties_sub_counts \
-                    .values(*['sub_total_valid_votes'])
-    parties_sub_counts_votes_ec = parties_sub_counts \
-                    .values(*['sub_total_votes_ec'])[:1]
-    parties_sub_counts_variance = parties_sub_counts \
-                    .values(*['sub_total_ec_variance'])[:1]
-
-    xannotates = dict(
-                # sum all total_votes (col) in the collation table
-                total_valid_votes=Sum(
-                                        F('supernational_collation_sheets__total_votes'),
-                                        filter=Q(supernational_collation_sheets__zone_ct=zone_ct)
-                                    ),
-                # sum all total_votes_ec (col) in the collation table
-                total_votes_ec=Sum(
-                                    F('supernational_collation_sheets__total_votes_ec'),
-                                    filter=Q(supernational_collation_sheets__zone_ct=zone_ct)
-                                ),
-                # sum all total_invalid_votes (col) in the collation table
-                total_invalid_votes=Sum(
-                                            F('supernational_collation_sheets__total_invalid_votes'),
-                                            filter=Q(supernational_collation_sheets__zone_ct=zone_ct)
-                                        ),
-                total_votes=F('total_valid_votes') + F('total_invalid_votes'),
-                total_ec_variance=F('total_votes') - F('total_votes_ec'),
-                sub_zone_total_votes_ec=Subquery(parties_sub_counts_votes_ec, output_field=IntegerField()),
-                sub_zone_total_ec_variance=Subquery(parties_sub_counts_variance, output_field=IntegerField()),
-            )
-
-    parties = Party.objects \
-                    .annotate(**xannotates) \
-                    .values(*xfields) \
-                    .order_by('code').all()
-
-
-    # loop through the parties (report rows)
-    for party in parties:
-        yid = party['id']
-        # define an "empty" report row
-        total_votes = safe_get(party, 'total_votes', default=0, force='int')
-        total_votes_ec = safe_get(party, 'total_votes_ec', default=0, force='int')
-        total_valid_votes = safe_get(party, 'total_valid_votes', default=0, force='int')
-        total_ec_variance = safe_get(party, 'total_ec_variance', default=0, force='int')
-        total_invalid_votes = safe_get(party, 'total_invalid_votes', default=0, force='int')
-        sub_zone_total_votes_ec = safe_get(party, 'sub_zone_total_votes_ec', default=0, force='int')
-        sub_zone_total_ec_variance = safe_get(party, 'sub_zone_total_ec_variance', default=0, force='int')
-        report_sheet = dict(
-            party_id=party['id'],
-            party_code=party['code'],
-            party_title=party['title'],
-            lead=0,
-            seats=0,
-            total_votes=total_votes,
-            total_votes_ec=total_votes_ec,
-            total_valid_votes=total_valid_votes,
-            total_ec_variance=total_ec_variance,
-            total_invalid_votes=total_invalid_votes,
-            sub_zone_total_votes_ec=sub_zone_total_votes_ec,
-            sub_zone_total_ec_variance=sub_zone_total_ec_variance,
-        )
-        # find the leading party
-        if max_votes <= report_sheet['total_votes']:
-            max_votes = report_sheet['total_votes']
-            max_votes_party = p
-        # loop through the report columns
-        for column in columns:
-            xid = column['id']
-            xcode = column['key']
-            # fetch the collation sheet for each column
-            party_sheet = sheet_model.objects \
-                                    .annotate(total_ec_variance=F('total_votes') - F('total_votes_ec')) \
-                                    .values('total_votes', 'total_votes_ec', 'total_ec_variance') \
-                                    .filter(
-                                        region_id=xid,
-                                        party_id=yid,
-                                        zone_ct=zone_ct,
-                                    ).first()
-            party_votes = safe_get(party_sheet, 'total_votes', default=0, force='int')
-            party_votes_ec = safe_get(party_sheet, 'total_votes_ec', default=0, force='int')
-            party_ec_variance = safe_get(party_sheet, 'total_ec_variance', default=0, force='int')
-            party_valid_votes = party_votes
-            # set the total votes and ec
-            report_sheet[xcode] = party_votes
-            count = total_sheets['invalid'].get(xcode, 0)
-            count += 0
-            total_sheets['invalid'][xcode] = count
-            count = total_sheets['valid'].get(xcode, 0)
-            count += party_valid_votes
-            total_sheets['valid'][xcode] = count
-            count = total_sheets['total'].get(xcode, 0)
-            count += party_valid_votes
-            total_sheets['total'][xcode] = count
-            total_sheets['total']['total_votes_ec'] += party_votes_ec
-            total_sheets['total']['total_valid_votes'] += party_valid_votes
-            total_sheets['total']['total_votes'] += party_votes
-            total_sheets['valid']['total_votes_ec'] += party_votes_ec
-            total_sheets['valid']['total_votes'] += party_votes
-            total_sheets['valid']['total_valid_votes'] += party_valid_votes
-            total_sheets['valid']['total_ec_variance'] += party_ec_variance
-            total_sheets['invalid']['total_votes_ec'] += 0
-            total_sheets['invalid']['total_votes'] += 0
-            if total_sheets['total'][xcode] > 0:
-                column['has_votes'] = 1
+# REPORT PAGES
+# Each page only holds its titles and links, the rows come from the report
+# engine (see __report/engine.py) through the report cache.
 
-        reports.append(report_sheet)
-        p += 1
-    # set the leading party
-    if max_votes_party is not None:
-        reports[max_votes_party]['lead'] = 1
-    
-    totals_row = [
-                    total_sheets['valid'],
-                    total_sheets['invalid'],
-                    total_sheets['total']
-                ]
-    total_votes = totals_row[0]['total_votes']
-    if total_votes > 0:
-        for report in reports:
-            report['percentage'] = round(100 * report['total_votes'] / total_votes, 20)
+REPORT_PAGES = dict(
+    nation=dict(
+        title='National',
+        sub_zone_type='region',
+        sub_zone_type_plural='regions',
+        super_zone_type=None,
+    ),
+    region=dict(
+        title='Regional',
+        sub_zone_type='constituency',
+        sub_zone_type_plural='constituencies',
+        super_zone_type='nation',
+    ),
+    constituency=dict(
+        title='Constituency',
+        sub_zone_type='station',
+        sub_zone_type_plural='stations',
+        super_zone_type='region',
+    ),
+    station=dict(
+        title='Station',
+        sub_zone_type=None,
+        sub_zone_type_plural=None,
+        super_zone_type='constituency',
+    ),
+)
+
+
+def render_report(request, office_type, zone_type, zone_id=None, rid=None):
+    page = REPORT_PAGES[zone_type]
+    if office_type == 'parliamentary':
+        level = GeoLevelChoices.CONSTITUENCY
+    else:
+        level = GeoLevelChoices.NATIONAL
+    sub_zone_type = page['sub_zone_type']
+    sub_zone_link = f'/reports/{office_type}/{sub_zone_type}/' if sub_zone_type is not None else '#'
+    super_zone_type = page['super_zone_type']
+    super_zone_link = f'/reports/{office_type}/{super_zone_type}/' if super_zone_type is not None else '#'
+    try:
+        version = get_report_version(office_type, zone_type, zone_id)
+    except Exception as e:
+        print(e)
+        version = None
+    # unchanged since the client's copy: answered before reading the report
+    etag = get_version_etag(request, office_type, version) if version is not None else None
+    response = get_not_modified_response(request, etag)
+    if response is not None:
+        return response
+    report = get_cached_report(office_type, zone_type, zone_id, version=version)
     context = dict(
-        title=report_title,
+        title=f'{office_type.title()} Collation Results ({page["title"]})',
         level=level,
-        columns=columns,
-        reports=reports,
-        zone=zone,
-        rid=rid,
+        columns=report['columns'],
+        reports=report['reports'],
+        totals_row=report['totals_row'],
+        seats=report['totals_row'][0]['seats'],
+        zone=report['zone'],
+        rid=rid if rid is not None else zone_id,
         office_type=office_type,
         zone_type=zone_type,
-        totals_row=totals_row,
         sub_zone_type=sub_zone_type,
-        sub_zone_type_plural=sub_zone_type_plural,
-        sub_zone_type_1=sub_zone_type_1,
-        sub_zone_type_2=sub_zone_type_2,
-        super_zone=super_zone,
+        sub_zone_type_plural=page['sub_zone_type_plural'],
+        super_zone=report['super_zone'],
         super_zone_link=super_zone_link,
         sub_zone_link=sub_zone_link,
-    )   
-    return render(request, template, context)
+    )
+    if zone_type == 'nation':
+        context.update(sub_zone_type_1='constituency', sub_zone_type_2='station')
+    return set_response_etag(request, render(request, 'report/report.html', context), etag)
 
 @login_required
-def region_presidential_report(request, rpk=None):
-    level = GeoLevelChoices.NATIONAL
-    zone_ct_model = Nation
-    zone_ct = get_zone_ct(zone_ct_model)
-    report_title = f'Presidential Collation Results (Regional)'
-    template = f'report/report.html'
-    zone_type = 'region'
-    sub_zone_type = 'constituency'
-    sub_zone_type_plural = 'constituencies'
-    sub_zone_link=f'/reports/presidential/constituency/'
-    super_zone_link='/reports/presidential/nation/'
-    sheet_model = RegionalCollationSheet
-    column_model = Constituency
-    page_model = Region
-    zone = page_model.objects.filter(pk=rpk).first()
-    super_zone = zone.nation if zone is not None else None
-    key_field = 'title'
-    rid=rpk
-    office_type='presidential'
-
-    # find all parties and stats for each (y-axis)
-    xfields = ['id', 'code', 'title',
-                'total_votes',
-                'total_valid_votes',
-                'total_votes_ec',
-                'total_ec_variance',
-                'total_invalid_votes',
-                'sub_zone_total_votes_ec',
-                'sub_zone_total_ec_variance',
-                ]
-    sub_xannotates = dict(
-                # sum all total_votes (col) in the collation table
-                sub_total_valid_votes=Sum(
-                                        F('regional_collation_sheets__total_votes'),
-                                        filter=Q(regional_collation_sheets__zone_ct=zone_ct)
-                                                & Q(regional_collation_sheets__constituency__region_id=rpk)
-                                    ),
-                # sum all total_votes_ec (col) in the collation table
-                sub_total_votes_ec=Sum(
-                                    F('regional_collation_sheets__total_votes_ec'),
-                                    filter=Q(regional_collation_sheets__zone_ct=zone_ct)
-                                            & Q(regional_collation_sheets__constituency__region_id=rpk)
-
-                                ),
-                sub_total_ec_variance=F('sub_total_valid_votes') - F('sub_total_votes_ec'),
-    )
-    parties_sub_counts = Party.objects \
-                    .filter(pk=OuterRef('pk')) \
-                    .annotate(**sub_xannotates) \
-                    .order_by('code')
-    # run sub queries to include additional columns (national collation sheet)
-    parties_sub_counts_votes = parties_sub_counts.values(*['sub_total_valid_votes'][:1])
-    parties_sub_counts_votes_ec = parties_sub_counts.values(*['sub_total_votes_ec'])[:1]
-    parties_sub_counts_variance = parties_sub_counts.values(*['sub_total_ec_variance'])[:1]
-    xannotates = dict(
-                        # sum all total_votes (col) in the collation table
-                        total_valid_votes=Sum(
-                                            F('national_collation_sheets__total_votes'),
-                                            filter=Q(national_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(national_collation_sheets__region_id=rpk)
-                                        ),
-                        # sum all total_votes_ec (col) in the collation table
-                        total_votes_ec=Sum(
-                                            F('national_collation_sheets__total_votes_ec'),
-                                            filter=Q(national_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(national_collation_sheets__region_id=rpk)
-                                        ),
-                        # sum all total_invalid_votes (col) in the collation table
-                        total_invalid_votes=Sum(
-                                                F('national_collation_sheets__total_invalid_votes'),
-                                                filter=Q(national_collation_sheets__zone_ct=zone_ct)
-                                                        & Q(national_collation_sheets__region_id=rpk)
-                                            ),
-                        total_votes=F('total_valid_votes') + F('total_invalid_votes'),
-                        total_ec_variance=F('total_votes') - F('total_votes_ec'),
-                        sub_zone_total_votes_ec=Subquery(parties_sub_counts_votes_ec, output_field=IntegerField()),
-                        sub_zone_total_ec_variance=Subquery(parties_sub_counts_variance, output_field=IntegerField()),
-                     )
-
-    parties = Party.objects \
-                    .annotate(**xannotates) \
-                    .values(*xfields) \
-                    .order_by('code').all()
-
-    totals_row = dict(
-                    valid={},
-                    invalid={},
-                    total={},
-                )
-    reports = []
-    max_votes = 0
-    max_votes_party = None
-    p = 0
-    total_sheets = get_blank_total_sheets()
-
-    columns = column_model.objects.values('id', 'title') \
-                    .annotate(key=Replace(
-                                    Func(F(key_field), function='LOWER'),
-                                    Value(' '),
-                                    Value('_')
-                                )) \
-                    .filter(region=zone) \
-                    .order_by('title').all()
-    for party in parties:
-        yid = party['id']
-        total_votes = safe_get(party, 'total_votes', default=0)
-        total_valid_votes = safe_get(party, 'total_valid_votes', default=0)
-        total_invalid_votes = safe_get(party, 'total_invalid_votes', default=0)
-        total_votes_ec = safe_get(party, 'total_votes_ec', default=0)
-        total_ec_variance = safe_get(party, 'total_ec_variance', default=0)
-        sub_zone_total_votes_ec = safe_get(party, 'sub_zone_total_votes_ec', default=0)
-        sub_zone_total_ec_variance = safe_get(party, 'sub_zone_total_ec_variance', default=0)
-        report_sheet = dict(
-            party_id=party['id'],
-            party_code=party['code'],
-            party_title=party['title'],
-            lead=0,
-            total_votes=total_votes,
-            total_votes_ec=total_votes_ec,
-            total_valid_votes=total_valid_votes,
-            total_ec_variance=total_ec_variance,
-            total_invalid_votes=total_invalid_votes,
-            sub_zone_total_votes_ec=sub_zone_total_votes_ec,
-            sub_zone_total_ec_variance=sub_zone_total_ec_variance,
-        )
-        # find the leading party
-        if total_valid_votes > max_votes:
-            max_votes = total_valid_votes
-            max_votes_party = p
-        for column in columns:
-            xid = column['id']
-            xcode = column['key']
-            party_sheet = sheet_model.objects \
-                                    .annotate(total_ec_variance=F('total_votes') - F('total_votes_ec')) \
-                                    .values('total_votes', 'total_votes_ec', 'total_ec_variance') \
-                                    .filter(
-                                        constituency_id=xid,
-                                        party_id=yid,
-                                        zone_ct=zone_ct,
-                                    ).first()
-            party_votes = safe_get(party_sheet, 'total_votes', default=0, force='int')
-            party_votes_ec = safe_get(party_sheet, 'total_votes_ec', default=0, force='int')
-            party_ec_variance = safe_get(party_sheet, 'total_ec_variance', default=0, force='int')
-            party_valid_votes = party_votes
-            # set the total votes and ec
-            report_sheet[xcode] = party_votes
-            count = total_sheets['invalid'].get(xcode, 0)
-            count += 0
-            total_sheets['invalid'][xcode] = count
-            count = total_sheets['valid'].get(xcode, 0)
-            count += party_votes
-            total_sheets['valid'][xcode] = count
-            count = total_sheets['total'].get(xcode, 0)
-            count += party_votes
-            total_sheets['total'][xcode] = count
-            total_sheets['total']['total_votes_ec'] += party_votes_ec
-            total_sheets['total']['total_votes'] += party_votes
-            total_sheets['total']['total_valid_votes'] += party_valid_votes
-            total_sheets['valid']['total_votes_ec'] += party_votes_ec
-            total_sheets['valid']['total_votes'] += party_votes
-            total_sheets['valid']['total_valid_votes'] += party_valid_votes
-            total_sheets['valid']['total_ec_variance'] += party_ec_variance
-            total_sheets['invalid']['total_votes_ec'] += 0
-            total_sheets['invalid']['total_votes'] += 0
-            if total_sheets['total'][xcode] > 0:
-                column['has_votes'] = 1
+def nation_presidential_report(request, npk=None):
+    return render_report(request, 'presidential', 'nation', rid=1)
 
-        reports.append(report_sheet)
-        p += 1
-    # set the leading party
-    if max_votes_party is not None:
-        reports[max_votes_party]['lead'] = 1
-    totals_row = [
-                    total_sheets['valid'],
-                    total_sheets['invalid'],
-                    total_sheets['total']
-                ]
-    total_votes = totals_row[0]['total_votes']
-    if total_votes > 0:
-        for report in reports:
-            report['percentage'] = round(100 * report['total_votes'] / total_votes, 20)
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        zone=zone,
-        rid=rid,
-        office_type=office_type,
-        totals_row=totals_row,
-        zone_type=zone_type,
-        sub_zone_type=sub_zone_type,
-        sub_zone_type_plural=sub_zone_type_plural,
-        super_zone=super_zone,
-        super_zone_link=super_zone_link,
-        sub_zone_link=sub_zone_link,
-    )   
-    return render(request, template, context)
+@login_required
+def region_presidential_report(request, rpk=None):
+    return render_report(request, 'presidential', 'region', rpk)
 
 @login_required
 def constituency_presidential_report(request, cpk=None):
-    level = GeoLevelChoices.NATIONAL
-    zone_ct_model = Nation
-    zone_ct = get_zone_ct(zone_ct_model)
-    report_title = f'Presidential Collation Results (Constituency)'
-    template = f'report/report.html'
-    zone_type = 'constituency'
-    sub_zone_type = 'station'
-    sub_zone_type_plural = 'stations'
-    sub_zone_link=f'/reports/presidential/{sub_zone_type}/'
-    super_zone_link='/reports/presidential/region/'
-    sheet_model = ConstituencyCollationSheet
-    column_model = Station
-    page_model = Constituency
-    zone = page_model.objects.filter(pk=cpk).first()
-    super_zone = zone.region if zone is not None else None
-    key_field = 'code'
-    rid=cpk
-    office_type='presidential'
-
-    # find all parties and stats for each (y-axis)
-    xfields = ['id', 'code', 'title',
-                'total_votes',
-                'total_valid_votes',
-                'total_votes_ec',
-                'total_ec_variance',
-                'total_invalid_votes',
-                'sub_zone_total_votes_ec',
-                'sub_zone_total_ec_variance',
-                ]
-    sub_xannotates = dict(
-                # sum all total_votes (col) in the collation table
-                sub_total_valid_votes=Sum(
-                                        F('constituency_collation_sheets__total_votes'),
-                                        filter=Q(constituency_collation_sheets__zone_ct=zone_ct)
-                                                & Q(constituency_collation_sheets__station__constituency_id=cpk)
-                                    ),
-                # sum all total_votes_ec (col) in the collation table
-                sub_total_votes_ec=Sum(
-                                    F('constituency_collation_sheets__total_votes_ec'),
-                                    filter=Q(constituency_collation_sheets__zone_ct=zone_ct)
-                                            & Q(constituency_collation_sheets__station__constituency_id=cpk)
-                                ),
-                sub_total_ec_variance=F('sub_total_valid_votes') - F('sub_total_votes_ec'),
-    )
-    parties_sub_counts = Party.objects \
-                    .filter(pk=OuterRef('pk')) \
-                    .annotate(**sub_xannotates) \
-                    .order_by('code')
-    # run sub queries to include additional columns (national collation sheet)
-    parties_sub_counts_votes = parties_sub_counts.values(*['sub_total_valid_votes'][:1])
-    parties_sub_counts_votes_ec = parties_sub_counts.values(*['sub_total_votes_ec'])[:1]
-    parties_sub_counts_variance = parties_sub_counts.values(*['sub_total_ec_variance'])[:1]
-    xannotates = dict(
-                        # sum all total_votes (col) in the collation table
-                        total_valid_votes=Sum(
-                                            F('regional_collation_sheets__total_votes'),
-                                            filter=Q(regional_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(regional_collation_sheets__constituency_id=cpk)
-                                        ),
-                        # sum all total_votes_ec (col) in the collation table
-                        total_votes_ec=Sum(
-                                            F('regional_collation_sheets__total_votes_ec'),
-                                            filter=Q(regional_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(regional_collation_sheets__constituency_id=cpk)
-                                        ),
-                        # sum all total_invalid_votes (col) in the collation table
-                        total_invalid_votes=Sum(
-                                                F('regional_collation_sheets__total_invalid_votes'),
-                                                filter=Q(regional_collation_sheets__zone_ct=zone_ct)
-                                                        & Q(regional_collation_sheets__constituency_id=cpk)
-                                            ),
-                        total_votes=F('total_valid_votes') + F('total_invalid_votes'),
-                        total_ec_variance=F('total_votes') - F('total_votes_ec'),
-                        sub_zone_total_votes_ec=Subquery(parties_sub_counts_votes_ec, output_field=IntegerField()),
-                        sub_zone_total_ec_variance=Subquery(parties_sub_counts_variance, output_field=IntegerField()),
-                    )
-    parties = Party.objects \
-                    .annotate(**xannotates) \
-                    .values(*xfields) \
-                    .order_by('code').all()
-
-    totals_row = dict(
-                    valid={},
-                    invalid={},
-                    total={},
-                )
-    reports = []
-    max_votes = 0
-    max_votes_party = None
-    p = 0
-
-    total_sheets = get_blank_total_sheets()
-
-    columns = column_model.objects.values('id', 'code', 'title') \
-                    .filter(constituency=zone) \
-                    .annotate(key=Replace(
-                                    Func(F(key_field), function='LOWER'),
-                                    Value(' '),
-                                    Value('_')
-                                )) \
-                    .order_by('title').all()
-    for party in parties:
-        yid = party['id']
-        total_votes = safe_get(party, 'total_votes', default=0)
-        total_valid_votes = safe_get(party, 'total_valid_votes', default=0)
-        total_invalid_votes = safe_get(party, 'total_invalid_votes', default=0)
-        total_votes_ec = safe_get(party, 'total_votes_ec', default=0)
-        total_ec_variance = safe_get(party, 'total_ec_variance', default=0)
-        sub_zone_total_votes_ec = safe_get(party, 'sub_zone_total_votes_ec', default=0)
-        sub_zone_total_ec_variance = safe_get(party, 'sub_zone_total_ec_variance', default=0)
-        report_sheet = dict(
-            party_id=party['id'],
-            party_code=party['code'],
-            party_title=party['title'],
-            lead=0,
-            total_votes=total_votes,
-            total_votes_ec=total_votes_ec,
-            total_valid_votes=total_valid_votes,
-            total_ec_variance=total_ec_variance,
-            total_invalid_votes=total_invalid_votes,
-            sub_zone_total_votes_ec=sub_zone_total_votes_ec,
-            sub_zone_total_ec_variance=sub_zone_total_ec_variance,
-        )
-        # find the leading party
-        if total_valid_votes > max_votes:
-            max_votes = total_valid_votes
-            max_votes_party = p
-        for column in columns:
-            xid = column['id']
-            xcode = column['key']
-            party_sheet = sheet_model.objects \
-                                    .annotate(total_ec_variance=F('total_votes') - F('total_votes_ec')) \
-                                    .values('total_votes', 'total_votes_ec', 'total_ec_variance') \
-                                    .filter(
-                                        station_id=xid,
-                                        party_id=yid,
-                                        zone_ct=zone_ct,
-                                    ).first()
-            party_votes = safe_get(party_sheet, 'total_votes', default=0, force='int')
-            party_votes_ec = safe_get(party_sheet, 'total_votes_ec', default=0, force='int')
-            party_ec_variance = safe_get(party_sheet, 'total_ec_variance', default=0, force='int')
-            party_valid_votes = party_votes
-            # set the total votes and ec
-            report_sheet[xcode] = party_votes
-            count = total_sheets['invalid'].get(xcode, 0)
-            count += 0
-            total_sheets['invalid'][xcode] = count
-            count = total_sheets['valid'].get(xcode, 0)
-            count += party_votes
-            total_sheets['valid'][xcode] = count
-            count = total_sheets['total'].get(xcode, 0)
-            count += party_votes
-            total_sheets['total'][xcode] = count
-            total_sheets['total']['total_votes_ec'] += party_votes_ec
-            total_sheets['total']['total_votes'] += party_votes
-            total_sheets['total']['total_valid_votes'] += party_valid_votes
-            total_sheets['valid']['total_votes_ec'] += party_votes_ec
-            total_sheets['valid']['total_votes'] += party_votes
-            total_sheets['valid']['total_valid_votes'] += party_valid_votes
-            total_sheets['valid']['total_ec_variance'] += party_ec_variance
-            total_sheets['invalid']['total_votes_ec'] += 0
-            total_sheets['invalid']['total_votes'] += 0
-            if total_sheets['total'][xcode] > 0:
-                column['has_votes'] = 1
-
-        reports.append(report_sheet)
-        p += 1
-    # set the leading party
-    if max_votes_party is not None:
-        reports[max_votes_party]['lead'] = 1
-    totals_row = [
-                    total_sheets['valid'],
-                    total_sheets['invalid'],
-                    total_sheets['total']
-                ]
-    total_votes = totals_row[0]['total_votes']
-    if total_votes > 0:
-        for report in reports:
-            report['percentage'] = round(100 * report['total_votes'] / total_votes, 20)
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        zone=zone,
-        rid=rid,
-        office_type=office_type,
-        totals_row=totals_row,
-        zone_type=zone_type,
-        sub_zone_type=sub_zone_type,
-        sub_zone_type_plural=sub_zone_type_plural,
-        super_zone=super_zone,
-        super_zone_link=super_zone_link,
-        sub_zone_link=sub_zone_link,
-    )   
-    return render(request, template, context)
+    return render_report(request, 'presidential', 'constituency', cpk)
 
 @login_required
 def station_presidential_report(request, spk=None):
-    level = GeoLevelChoices.NATIONAL
-    zone_ct_model = Nation
-    zone_ct = get_zone_ct(zone_ct_model)
-    report_title = f'Presidential Collation Results (Station)'
-    template = f'report/report.html'
-    zone_type = 'station'
-    sub_zone_type = None
-    sub_zone_type_plural = None
-    sub_zone_link='#'
-    super_zone_link='/reports/presidential/constituency/'
-    sheet_model = StationCollationSheet
-    column_model = None
-    page_model = Station
-    zone = page_model.objects.filter(pk=spk).first()
-    super_zone = zone.constituency if zone is not None else None
-    rid=spk
-    office_type='presidential'
-
-    # find all parties and stats for each (y-axis)
-    xfields = ['id', 'code', 'title',
-                'total_votes',
-                'total_valid_votes',
-                'total_votes_ec',
-                'total_ec_variance',
-                'total_invalid_votes',
-            ]
-    xannotates = dict(
-                        # sum all total_votes (col) in the collation table
-                        total_valid_votes=Sum(
-                                            F('constituency_collation_sheets__total_votes'),
-                                            filter=Q(constituency_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(constituency_collation_sheets__station_id=spk)
-                                        ),
-                        # sum all total_votes_ec (col) in the collation table
-                        total_votes_ec=Sum(
-                                            F('constituency_collation_sheets__total_votes'),
-                                            filter=Q(constituency_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(constituency_collation_sheets__station_id=spk)
-                                        ),
-                        # sum all total_invalid_votes (col) in the collation table
-                        total_invalid_votes=Sum(
-                                            F('constituency_collation_sheets__total_votes'),
-                                            filter=Q(constituency_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(constituency_collation_sheets__station_id=spk)
-                                            ),
-                        total_votes=F('total_valid_votes') + F('total_invalid_votes'),
-                        total_ec_variance=F('total_votes') - F('total_votes_ec'),
-                    )
-    parties = Party.objects \
-                    .annotate(**xannotates) \
-                    .values(*xfields) \
-                    .order_by('code').all()
-
-    totals_row = dict(
-                    valid={},
-                    invalid={},
-                    total={},
-                )
-    reports = []
-    max_votes = 0
-    max_votes_party = None
-    p = 0
-
-    total_sheets = get_blank_total_sheets()
-
-    columns = []
-    for party in parties:
-        yid = party['id']
-        total_votes = safe_get(party, 'total_votes', default=0)
-        total_valid_votes = safe_get(party, 'total_valid_votes', default=0)
-        total_invalid_votes = safe_get(party, 'total_invalid_votes', default=0)
-        total_votes_ec = safe_get(party, 'total_votes_ec', default=0)
-        total_ec_variance = safe_get(party, 'total_ec_variance', default=0)
-        sub_zone_total_votes_ec = safe_get(party, 'sub_zone_total_votes_ec', default=0)
-        sub_zone_total_ec_variance = safe_get(party, 'sub_zone_total_ec_variance', default=0)
-        report_sheet = dict(
-            party_id=party['id'],
-            party_code=party['code'],
-            party_title=party['title'],
-            lead=0,
-            seats=0,
-            total_votes=total_votes,
-            total_valid_votes=total_valid_votes,
-            total_votes_ec=total_votes_ec,
-            total_ec_variance=total_ec_variance,
-            total_invalid_votes=total_invalid_votes,
-            sub_zone_total_votes_ec=sub_zone_total_votes_ec,
-            sub_zone_total_ec_variance=sub_zone_total_ec_variance,
-        )
-        # find the leading party
-        if report_sheet['total_valid_votes'] > max_votes:
-            max_votes = report_sheet['total_valid_votes']
-            max_votes_party = p
-        # collate totals
-        total_sheets['total']['total_votes_ec'] += total_votes_ec
-        total_sheets['total']['total_votes'] += total_votes
-        total_sheets['valid']['total_votes_ec'] += total_votes_ec
-        total_sheets['valid']['total_votes'] += total_votes
-        total_sheets['valid']['total_valid_votes'] += total_valid_votes
-        total_sheets['valid']['total_ec_variance'] += total_ec_variance
-        total_sheets['invalid']['total_votes_ec'] += 0
-        total_sheets['invalid']['total_votes'] += 0
-        # append the row the sheets
-        reports.append(report_sheet)
-        p += 1
-    # set the leading party
-    if max_votes_party is not None:
-        reports[max_votes_party]['lead'] = 1
-    totals_row = [
-                    total_sheets['valid'],
-                    total_sheets['invalid'],
-                    total_sheets['total']
-                ]
-    total_votes = totals_row[0]['total_votes']
-    if total_votes > 0:
-        for report in reports:
-            report['percentage'] = round(100 * report['total_votes'] / total_votes, 20)
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        zone=zone,
-        rid=rid,
-        office_type=office_type,
-        totals_row=totals_row,
-        zone_type=zone_type,
-        sub_zone_type=sub_zone_type,
-        sub_zone_type_plural=sub_zone_type_plural,
-        super_zone=super_zone,
-        super_zone_link=super_zone_link,
-        sub_zone_link=sub_zone_link,
-    )   
-    return render(request, template, context)
-
+    return render_report(request, 'presidential', 'station', spk)
 
 @login_required
 def nation_parliamentary_report(request, npk=None):
-    level = GeoLevelChoices.CONSTITUENCY
-    zone_ct_model = Constituency
-    zone_ct = get_zone_ct(zone_ct_model)
-    report_title = f'Parliamentary Collation Results (National)'
-    template = f'report/report.html'
-    zone_type='nation'
-    sub_zone_type='region'
-    sub_zone_type_plural = 'regions'
-    sub_zone_link=f'/reports/parliamentary/{sub_zone_type}/'
-    super_zone=None
-    super_zone_link='#'
-    sheet_model = NationalCollationSheet
-    column_model = Region
-    page_model = Nation
-    zone = page_model.objects.first()
-    key_field = 'title'
-    rid=npk or 1
-    office_type='parliamentary'
-
-    # find all parties and stats for each (y-axis)
-    xfields = ['id', 'code', 'title',
-                'total_votes',
-                'total_valid_votes',
-                'total_votes_ec',
-                'total_ec_variance',
-                'total_invalid_votes',]
-    xannotates = dict(
-                        # sum all total_votes (col) in the collation table
-                        total_valid_votes=Sum(
-                                            F('supernational_collation_sheets__total_votes'),
-                                            filter=Q(supernational_collation_sheets__zone_ct=zone_ct)
-                                        ),
-                        # sum all total_votes_ec (col) in the collation table
-                        total_votes_ec=Sum(
-                                            F('supernational_collation_sheets__total_votes_ec'),
-                                            filter=Q(supernational_collation_sheets__zone_ct=zone_ct)
-                                        ),
-                        # sum all total_invalid_votes (col) in the collation table
-                        total_invalid_votes=Sum(
-                                                F('supernational_collation_sheets__total_invalid_votes'),
-                                                filter=Q(supernational_collation_sheets__zone_ct=zone_ct)
-                                            ),
-                        total_votes=F('total_valid_votes') + F('total_invalid_votes'),
-                        total_ec_variance=F('total_votes') - F('total_votes_ec'),
-                    )
-    parties = Party.objects \
-                    .annotate(**xannotates) \
-                    .values(*xfields) \
-                    .order_by('code').all()
-
-    totals_row = dict(
-                    valid={},
-                    invalid={},
-                    total={},
-                )
-    reports = []
-    max_votes = 0
-    max_votes_party = None
-    p = 0
-    total_sheets = get_blank_total_sheets()
-    columns = []
-    seats = []
-
-    columns = column_model.objects.values('id', 'title') \
-                    .annotate(key=Replace(
-                                    Func(F(key_field), function='LOWER'),
-                                    Value(' '),
-                                    Value('_')
-                                )) \
-                    .filter(nation=zone) \
-                    .order_by('title').all()
-    for party in parties:
-        yid = party['id']
-        seats = ParliamentarySummarySheet.objects \
-                                        .filter(
-                                            constituency__in=Constituency.objects \
-                                                                    .values('id')
-                                                                    .all(),
-                                            candidate__in=Candidate.objects \
-                                                                    .values('id')
-                                                                    .filter(party_id=yid) \
-                                                                    .all(),
-                                            position__in=Position.objects \
-                                                                    .values('id')
-                                                                    .filter(zone_ct=zone_ct) \
-                                                                    .all(),
-                                        ).all().count()
-        # find the leading party
-        if max_votes <= seats:
-            max_votes = seats
-            max_votes_party = p
-            total_sheets['valid']['seats'] += seats
-
-        total_votes = safe_get(party, 'total_votes', default=0)
-        total_valid_votes = safe_get(party, 'total_valid_votes', default=0)
-        total_invalid_votes = safe_get(party, 'total_invalid_votes', default=0)
-        total_votes_ec = safe_get(party, 'total_votes_ec', default=0)
-        total_ec_variance = safe_get(party, 'total_ec_variance', default=0)
-        sub_zone_total_votes_ec = safe_get(party, 'sub_zone_total_votes_ec', default=0)
-        sub_zone_total_ec_variance = safe_get(party, 'sub_zone_total_ec_variance', default=0)
-        report_sheet = dict(
-            party_id=party['id'],
-            party_code=party['code'],
-            party_title=party['title'],
-            lead=0,
-            seats=seats,
-            total_votes=total_votes,
-            total_votes_ec=total_votes_ec,
-            total_valid_votes=total_valid_votes,
-            total_ec_variance=total_ec_variance,
-            total_invalid_votes=total_invalid_votes,
-            sub_zone_total_votes_ec=sub_zone_total_votes_ec,
-            sub_zone_total_ec_variance=sub_zone_total_ec_variance,
-        )
-        for column in columns:
-            xid = column['id']
-            xcode = column['key']
-            party_sheet = sheet_model.objects \
-                                    .annotate(total_ec_variance=F('total_votes') - F('total_votes_ec')) \
-                                    .values('total_votes', 'total_votes_ec', 'total_ec_variance') \
-                                    .filter(
-                                        region_id=xid,
-                                        party_id=yid,
-                                        zone_ct=zone_ct,
-                                    ).first()
-            party_votes = safe_get(party_sheet, 'total_votes', default=0, force='int')
-            party_votes_ec = safe_get(party_sheet, 'total_votes_ec', default=0, force='int')
-            party_ec_variance = safe_get(party_sheet, 'total_ec_variance', default=0, force='int')
-            party_valid_votes = party_votes
-            # set the total votes and ec
-            report_sheet[xcode] = party_votes
-            count = total_sheets['invalid'].get(xcode, 0)
-            count += 0
-            total_sheets['invalid'][xcode] = count
-            count = total_sheets['valid'].get(xcode, 0)
-            count += party_votes
-            total_sheets['valid'][xcode] = count
-            count = total_sheets['total'].get(xcode, 0)
-            count += party_votes
-            total_sheets['total'][xcode] = count
-            total_sheets['total']['total_votes_ec'] += party_votes_ec
-            total_sheets['total']['total_votes'] += party_votes
-            total_sheets['total']['total_valid_votes'] += party_votes
-            total_sheets['valid']['total_votes_ec'] += party_votes_ec
-            total_sheets['valid']['total_votes'] += party_votes
-            total_sheets['valid']['total_valid_votes'] += party_valid_votes
-            total_sheets['valid']['total_ec_variance'] += party_ec_variance
-            total_sheets['invalid']['total_votes_ec'] += 0
-            total_sheets['invalid']['total_votes'] += 0
-            if total_sheets['total'][xcode] > 0:
-                column['has_votes'] = 1
-
-        reports.append(report_sheet)
-        p += 1
-    # set the leading party
-    if max_votes_party is not None:
-        reports[max_votes_party]['lead'] = 1
-
-    totals_row = [
-                    total_sheets['valid'],
-                    total_sheets['invalid'],
-                    total_sheets['total']
-                ]
-    total_votes = totals_row[0]['total_votes']
-    if total_votes > 0:
-        for report in reports:
-            report['percentage'] = round(100 * report['total_votes'] / total_votes, 20)
-
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        totals_row=totals_row,
-        seats=seats,
-        zone=zone,
-        rid=rid,
-        office_type=office_type,
-        zone_type=zone_type,
-        sub_zone_type=sub_zone_type,
-        sub_zone_type_plural=sub_zone_type_plural,
-        super_zone=super_zone,
-        super_zone_link=super_zone_link,
-        sub_zone_link=sub_zone_link,
-    )
-    return render(request, template, context)
+    return render_report(request, 'parliamentary', 'nation', rid=npk or 1)
 
 @login_required
 def region_parliamentary_report(request, rpk=None):
-    level = GeoLevelChoices.CONSTITUENCY
-    zone_ct_model = Constituency
-    zone_ct = get_zone_ct(zone_ct_model)
-    report_title = f'Parliamentary Collation Results (Regional)'
-    template = f'report/report.html'
-    zone_type = 'region'
-    sub_zone_type = 'constituency'
-    sub_zone_type_plural = 'constituencies'
-    sub_zone_link = f'/reports/parliamentary/{sub_zone_type}/'
-    super_zone_link = '/reports/parliamentary/nation/'
-    sheet_model = RegionalCollationSheet
-    column_model = Constituency
-    page_model = Region
-    zone = page_model.objects.filter(pk=rpk).first()
-    super_zone = zone.nation if zone is not None else None
-    key_field = 'title'
-    rid=rpk
-    office_type='parliamentary'
-
-    # find all parties and stats for each (y-axis)
-    xfields = ['id', 'code', 'title',
-                'total_votes',
-                'total_valid_votes',
-                'total_votes_ec',
-                'total_ec_variance',
-                'total_invalid_votes',
-                'sub_zone_total_votes_ec',
-                'sub_zone_total_ec_variance',
-                ]
-    sub_xannotates = dict(
-                # sum all total_votes (col) in the collation table
-                sub_total_valid_votes=Sum(
-                                        F('regional_collation_sheets__total_votes'),
-                                        filter=Q(regional_collation_sheets__zone_ct=zone_ct)
-                                                & Q(regional_collation_sheets__constituency__region_id=rpk)
-                                    ),
-                # sum all total_votes_ec (col) in the collation table
-                sub_total_votes_ec=Sum(
-                                    F('regional_collation_sheets__total_votes_ec'),
-                                    filter=Q(regional_collation_sheets__zone_ct=zone_ct)
-                                            & Q(regional_collation_sheets__constituency__region_id=rpk)
-
-                                ),
-                sub_total_ec_variance=F('sub_total_valid_votes') - F('sub_total_votes_ec'),
-    )
-    parties_sub_counts = Party.objects \
-                    .filter(pk=OuterRef('pk')) \
-                    .annotate(**sub_xannotates) \
-                    .order_by('code')
-    # run sub queries to include additional columns (national collation sheet)
-    parties_sub_counts_votes = parties_sub_counts.values(*['sub_total_valid_votes'][:1])
-    parties_sub_counts_votes_ec = parties_sub_counts.values(*['sub_total_votes_ec'])[:1]
-    parties_sub_counts_variance = parties_sub_counts.values(*['sub_total_ec_variance'])[:1]
-    xannotates = dict(
-                        # sum all total_votes (col) in the collation table
-                        total_valid_votes=Sum(
-                                            F('national_collation_sheets__total_votes'),
-                                            filter=Q(national_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(national_collation_sheets__region_id=rpk)
-                                        ),
-                        # sum all total_votes_ec (col) in the collation table
-                        total_votes_ec=Sum(
-                                            F('national_collation_sheets__total_votes_ec'),
-                                            filter=Q(national_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(national_collation_sheets__region_id=rpk)
-                                        ),
-                        # sum all total_invalid_votes (col) in the collation table
-                        total_invalid_votes=Sum(
-                                                F('national_collation_sheets__total_invalid_votes'),
-                                                filter=Q(national_collation_sheets__zone_ct=zone_ct)
-                                                        & Q(national_collation_sheets__region_id=rpk)
-                                            ),
-                        total_votes=F('total_valid_votes') + F('total_invalid_votes'),
-                        total_ec_variance=F('total_votes') - F('total_votes_ec'),
-                        sub_zone_total_votes_ec=Subquery(parties_sub_counts_votes_ec, output_field=IntegerField()),
-                        sub_zone_total_ec_variance=Subquery(parties_sub_counts_variance, output_field=IntegerField()),
-                    )
-    parties = Party.objects \
-                    .annotate(**xannotates) \
-                    .values(*xfields) \
-                    .order_by('code').all()
-
-    totals_row = dict(
-                    valid={},
-                    invalid={},
-                    total={},
-                )
-    reports = []
-    max_votes = 0
-    max_votes_party = None
-    p = 0
-    total_sheets = get_blank_total_sheets()
-    columns = []
-    seats = []
-
-    columns = column_model.objects.values('id', 'title') \
-                    .annotate(key=Replace(
-                                    Func(F(key_field), function='LOWER'),
-                                    Value(' '),
-                                    Value('_')
-                                )) \
-                    .filter(region=zone) \
-                    .order_by('title').all()
-    sub_zones = [c['id'] for c in columns]
-    for party in parties:
-        yid = party['id']
-        seats = ParliamentarySummarySheet.objects \
-                                        .filter(
-                                            constituency_id__in=sub_zones,
-                                            candidate__in=Candidate.objects \
-                                                                    .values('id')
-                                                                    .filter(party_id=yid) \
-                                                                    .all(),
-                                            position__in=Position.objects \
-                                                                    .values('id')
-                                                                    .filter(zone_ct=zone_ct) \
-                                                                    .all(),
-                                        ).all().count()
-        # find the leading party
-        if max_votes <= seats:
-            max_votes = seats
-            max_votes_party = p
-            total_sheets['valid']['seats'] += seats
-
-        total_votes = safe_get(party, 'total_votes', default=0)
-        total_valid_votes = safe_get(party, 'total_valid_votes', default=0)
-        total_invalid_votes = safe_get(party, 'total_invalid_votes', default=0)
-        total_votes_ec = safe_get(party, 'total_votes_ec', default=0)
-        total_ec_variance = safe_get(party, 'total_ec_variance', default=0)
-        sub_zone_total_votes_ec = safe_get(party, 'sub_zone_total_votes_ec', default=0)
-        sub_zone_total_ec_variance = safe_get(party, 'sub_zone_total_ec_variance', default=0)
-        report_sheet = dict(
-            party_id=party['id'],
-            party_code=party['code'],
-            party_title=party['title'],
-            lead=0,
-            seats=seats,
-            total_votes=total_votes,
-            total_votes_ec=total_votes_ec,
-            total_valid_votes=total_valid_votes,
-            total_ec_variance=total_ec_variance,
-            total_invalid_votes=total_invalid_votes,
-            sub_zone_total_votes_ec=sub_zone_total_votes_ec,
-            sub_zone_total_ec_variance=sub_zone_total_ec_variance,
-        )
-        # find the leading party
-        for column in columns:
-            xid = column['id']
-            xcode = column['key']
-            party_sheet = sheet_model.objects \
-                                    .annotate(total_ec_variance=F('total_votes') - F('total_votes_ec')) \
-                                    .values('total_votes', 'total_votes_ec', 'total_ec_variance') \
-                                    .filter(
-                                        constituency_id=xid,
-                                        party_id=yid,
-                                        zone_ct=zone_ct,
-                                    ).first()
-            party_votes = safe_get(party_sheet, 'total_votes', default=0, force='int')
-            party_votes_ec = safe_get(party_sheet, 'total_votes_ec', default=0, force='int')
-            party_ec_variance = safe_get(party_sheet, 'total_ec_variance', default=0, force='int')
-            party_valid_votes = party_votes
-            # set the total votes and ec
-            report_sheet[xcode] = party_votes
-            count = total_sheets['invalid'].get(xcode, 0)
-            count += 0
-            total_sheets['invalid'][xcode] = count
-            count = total_sheets['valid'].get(xcode, 0)
-            count += party_votes
-            total_sheets['valid'][xcode] = count
-            count = total_sheets['total'].get(xcode, 0)
-            count += party_votes
-            total_sheets['total'][xcode] = count
-            total_sheets['total']['total_votes_ec'] += party_votes_ec
-            total_sheets['total']['total_votes'] += party_votes
-            total_sheets['valid']['total_votes_ec'] += party_votes_ec
-            total_sheets['valid']['total_votes'] += party_votes
-            total_sheets['valid']['total_valid_votes'] += party_valid_votes
-            total_sheets['valid']['total_ec_variance'] += party_ec_variance
-            total_sheets['invalid']['total_votes_ec'] += 0
-            total_sheets['invalid']['total_votes'] += 0
-            if total_sheets['total'][xcode] > 0:
-                column['has_votes'] = 1
-
-        reports.append(report_sheet)
-        p += 1
-    # set the leading party
-    if max_votes_party is not None:
-        reports[max_votes_party]['lead'] = 1
-
-    totals_row = [
-                    total_sheets['valid'],
-                    total_sheets['invalid'],
-                    total_sheets['total']
-                ]
-    total_votes = totals_row[0]['total_votes']
-    if total_votes > 0:
-        for report in reports:
-            report['percentage'] = round(100 * report['total_votes'] / total_votes, 20)
-
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        totals_row=totals_row,
-        seats=seats,
-        zone=zone,
-        rid=rid,
-        office_type=office_type,
-        zone_type=zone_type,
-        sub_zone_type=sub_zone_type,
-        sub_zone_type_plural=sub_zone_type_plural,
-        super_zone=super_zone,
-        super_zone_link=super_zone_link,
-        sub_zone_link=sub_zone_link,
-    )
-    return render(request, template, context)
+    return render_report(request, 'parliamentary', 'region', rpk)
 
 @login_required
 def constituency_parliamentary_report(request, cpk=None):
-    level = GeoLevelChoices.CONSTITUENCY
-    zone_ct_model = Constituency
-    report_title = f'Parliamentary Collation Results (Constituency)'
-    template = f'report/report.html'
-    zone_type = 'constituency'
-    sub_zone_type = 'station'
-    sub_zone_type_plural = 'stations'
-    sub_zone_link = f'/reports/parliamentary/{sub_zone_type}/'
-    super_zone_link = '/reports/parliamentary/region/'
-    sheet_model = ConstituencyCollationSheet
-    column_model = Station
-    page_model = Constituency
-    zone = page_model.objects.filter(pk=cpk).first()
-    super_zone = zone.region if zone is not None else None
-    zone_ct = get_zone_ct(zone_ct_model)
-    key_field = 'code'
-    rid=cpk
-    office_type='parliamentary'
-
-    # find all parties and stats for each (y-axis)
-    xfields = ['id', 'code', 'title',
-                'total_votes',
-                'total_valid_votes',
-                'total_votes_ec',
-                'total_ec_variance',
-                'total_invalid_votes',
-                'sub_zone_total_votes_ec',
-                'sub_zone_total_ec_variance',
-                ]
-    sub_xannotates = dict(
-                # sum all total_votes (col) in the collation table
-                sub_total_valid_votes=Sum(
-                                        F('constituency_collation_sheets__total_votes'),
-                                        filter=Q(constituency_collation_sheets__zone_ct=zone_ct)
-                                                & Q(constituency_collation_sheets__station__constituency_id=cpk)
-                                    ),
-                # sum all total_votes_ec (col) in the collation table
-                sub_total_votes_ec=Sum(
-                                    F('constituency_collation_sheets__total_votes_ec'),
-                                    filter=Q(constituency_collation_sheets__zone_ct=zone_ct)
-                                            & Q(constituency_collation_sheets__station__constituency_id=cpk)
-
-                                ),
-                sub_total_ec_variance=F('sub_total_valid_votes') - F('sub_total_votes_ec'),
-    )
-    parties_sub_counts = Party.objects \
-                    .filter(pk=OuterRef('pk')) \
-                    .annotate(**sub_xannotates) \
-                    .order_by('code')
-    # run sub queries to include additional columns (national collation sheet)
-    parties_sub_counts_votes = parties_sub_counts.values(*['sub_total_valid_votes'][:1])
-    parties_sub_counts_votes_ec = parties_sub_counts.values(*['sub_total_votes_ec'])[:1]
-    parties_sub_counts_variance = parties_sub_counts.values(*['sub_total_ec_variance'])[:1]
-    xannotates = dict(
-                        # sum all total_votes (col) in the collation table
-                        total_valid_votes=Sum(
-                                            F('regional_collation_sheets__total_votes'),
-                                            filter=Q(regional_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(regional_collation_sheets__constituency_id=cpk)
-                                        ),
-                        # sum all total_votes_ec (col) in the collation table
-                        total_votes_ec=Sum(
-                                            F('regional_collation_sheets__total_votes_ec'),
-                                            filter=Q(regional_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(regional_collation_sheets__constituency_id=cpk)
-                                        ),
-                        # sum all total_invalid_votes (col) in the collation table
-                        total_invalid_votes=Sum(
-                                                F('regional_collation_sheets__total_invalid_votes'),
-                                                filter=Q(regional_collation_sheets__zone_ct=zone_ct)
-                                                        & Q(regional_collation_sheets__constituency_id=cpk)
-                                            ),
-                        total_votes=F('total_valid_votes') + F('total_invalid_votes'),
-                        total_ec_variance=F('total_votes') - F('total_votes_ec'),
-                        sub_zone_total_votes_ec=Subquery(parties_sub_counts_votes_ec, output_field=IntegerField()),
-                        sub_zone_total_ec_variance=Subquery(parties_sub_counts_variance, output_field=IntegerField()),
-                    )
-    parties = Party.objects \
-                    .annotate(**xannotates) \
-                    .values(*xfields) \
-                    .order_by('code').all()
-
-    totals_row = dict(
-                    valid={},
-                    invalid={},
-                    total={},
-                )
-    reports = []
-    max_votes = 0
-    max_votes_party = None
-    p = 0
-    total_sheets = get_blank_total_sheets()
-    columns = []
-    seats = []
-
-    columns = column_model.objects.values('id', 'title', 'code') \
-                    .annotate(key=Replace(
-                                    Func(F(key_field), function='LOWER'),
-                                    Value(' '),
-                                    Value('_')
-                                )) \
-                    .filter(constituency=zone) \
-                    .order_by('title').all()
-    for party in parties:
-        yid = party['id']
-        seats = ParliamentarySummarySheet.objects \
-                                        .filter(
-                                            constituency=zone,
-                                            candidate__in=Candidate.objects \
-                                                                    .values('id')
-                                                                    .filter(party_id=yid) \
-                                                                    .all(),
-                                            position__in=Position.objects \
-                                                                    .values('id')
-                                                                    .filter(zone_ct=zone_ct) \
-                                                                    .all(),
-                                        ).all().count()
-        # find the leading party
-        if max_votes <= seats:
-            max_votes = seats
-            max_votes_party = p
-            total_sheets['valid']['seats'] += seats
-
-        total_votes = safe_get(party, 'total_votes', default=0)
-        total_valid_votes = safe_get(party, 'total_valid_votes', default=0)
-        total_invalid_votes = safe_get(party, 'total_invalid_votes', default=0)
-        total_votes_ec = safe_get(party, 'total_votes_ec', default=0)
-        total_ec_variance = safe_get(party, 'total_ec_variance', default=0)
-        sub_zone_total_votes_ec = safe_get(party, 'sub_zone_total_votes_ec', default=0)
-        sub_zone_total_ec_variance = safe_get(party, 'sub_zone_total_ec_variance', default=0)
-        report_sheet = dict(
-            party_id=party['id'],
-            party_code=party['code'],
-            party_title=party['title'],
-            lead=0,
-            seats=seats,
-            total_votes=total_votes,
-            total_votes_ec=total_votes_ec,
-            total_valid_votes=total_valid_votes,
-            total_ec_variance=total_ec_variance,
-            total_invalid_votes=total_invalid_votes,
-            sub_zone_total_votes_ec=sub_zone_total_votes_ec,
-            sub_zone_total_ec_variance=sub_zone_total_ec_variance,
-        )
-        for column in columns:
-            xid = column['id']
-            xcode = column['key']
-            party_sheet = sheet_model.objects \
-                                    .annotate(total_ec_variance=F('total_votes') - F('total_votes_ec')) \
-                                    .values('total_votes', 'total_votes_ec', 'total_ec_variance') \
-                                    .filter(
-                                        station_id=xid,
-                                        party_id=yid,
-                                        zone_ct=zone_ct,
-                                    ).first()
-            
-            party_votes = safe_get(party_sheet, 'total_votes', default=0, force='int')
-            party_votes_ec = safe_get(party_sheet, 'total_votes_ec', default=0, force='int')
-            party_ec_variance = safe_get(party_sheet, 'total_ec_variance', default=0, force='int')
-            party_valid_votes = party_votes
-            # set the total votes and ec
-            report_sheet[xcode] = party_votes
-            count = total_sheets['invalid'].get(xcode, 0)
-            count += 0
-            total_sheets['invalid'][xcode] = count
-            count = total_sheets['valid'].get(xcode, 0)
-            count += party_votes
-            total_sheets['valid'][xcode] = count
-            count = total_sheets['total'].get(xcode, 0)
-            count += party_votes
-            total_sheets['total'][xcode] = count
-            total_sheets['total']['total_votes_ec'] += party_votes_ec
-            total_sheets['total']['total_votes'] += party_votes
-            total_sheets['valid']['total_votes_ec'] += party_votes_ec
-            total_sheets['valid']['total_votes'] += party_votes
-            total_sheets['valid']['total_valid_votes'] += party_valid_votes
-            total_sheets['valid']['total_ec_variance'] += party_ec_variance
-            total_sheets['invalid']['total_votes_ec'] += 0
-            total_sheets['invalid']['total_votes'] += 0
-            if total_sheets['total'][xcode] > 0:
-                column['has_votes'] = 1
- 
-        reports.append(report_sheet)
-        p += 1
-    # set the leading party
-    if max_votes_party is not None:
-        reports[max_votes_party]['lead'] = 1
-
-    totals_row = [
-                    total_sheets['valid'],
-                    total_sheets['invalid'],
-                    total_sheets['total']
-                ]
-    total_votes = totals_row[0]['total_votes']
-    if total_votes > 0:
-        for report in reports:
-            report['percentage'] = round(100 * report['total_votes'] / total_votes, 20)
-
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        totals_row=totals_row,
-        seats=seats,
-        zone=zone,
-        rid=rid,
-        office_type=office_type,
-        zone_type=zone_type,
-        sub_zone_type=sub_zone_type,
-        sub_zone_type_plural=sub_zone_type_plural,
-        super_zone=super_zone,
-        super_zone_link=super_zone_link,
-        sub_zone_link=sub_zone_link,
-    )
-    return render(request, template, context)
+    return render_report(request, 'parliamentary', 'constituency', cpk)
 
 @login_required
 def station_parliamentary_report(request, spk=None):
-    level = GeoLevelChoices.CONSTITUENCY
-    zone_ct_model = Constituency
-    report_title = f'Parliamentary Collation Results (Station)'
-    template = f'report/report.html'
-    zone_type = 'station'
-    sub_zone_type = ''
-    sub_zone_type_plural = None
-    sub_zone_link = '#'
-    super_zone_link = '/reports/parliamentary/constituency/'
-    sheet_model = StationCollationSheet
-    column_model = None
-    page_model = Station
-    zone = page_model.objects.filter(pk=spk).first()
-    super_zone = zone.constituency if zone is not None else None
-    zone_ct = get_zone_ct(zone_ct_model)
-    rid=spk
-    office_type='parliamentary'
-    sub_zone_type=None
-
-    # find all parties and stats for each (y-axis)
-    xfields = ['id', 'code', 'title',
-                'total_votes',
-                'total_valid_votes',
-                'total_votes_ec',
-                'total_ec_variance',
-                'total_invalid_votes',]
-    xannotates = dict(
-                        # sum all total_votes (col) in the collation table
-                        total_valid_votes=Sum(
-                                            F('constituency_collation_sheets__total_votes'),
-                                            filter=Q(constituency_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(constituency_collation_sheets__station_id=spk)
-                                        ),
-                        # sum all total_votes_ec (col) in the collation table
-                        total_votes_ec=Sum(
-                                            F('constituency_collation_sheets__total_votes'),
-                                            filter=Q(constituency_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(constituency_collation_sheets__station_id=spk)
-                                        ),
-                        # sum all total_invalid_votes (col) in the collation table
-                        total_invalid_votes=Sum(
-                                            F('constituency_collation_sheets__total_votes'),
-                                            filter=Q(constituency_collation_sheets__zone_ct=zone_ct)
-                                                    & Q(constituency_collation_sheets__station_id=spk)
-                                            ),
-                        total_votes=F('total_valid_votes') + F('total_invalid_votes'),
-                        total_ec_variance=F('total_votes') - F('total_votes_ec'),
-                    )
-    parties = Party.objects \
-                    .annotate(**xannotates) \
-                    .values(*xfields) \
-                    .order_by('code').all()
-
-    totals_row = dict(
-                    valid={},
-                    invalid={},
-                    total={},
-                )
-    reports = []
-    max_votes = 0
-    max_votes_party = None
-    p = 0
-    total_sheets = get_blank_total_sheets()
-    columns = []
-    seats = []
-    columns = []
-
-    for party in parties:
-        yid = party['id']
-        seats = ParliamentarySummarySheet.objects \
-                                        .filter(
-                                            constituency=super_zone,
-                                            candidate__in=Candidate.objects \
-                                                                    .values('id')
-                                                                    .filter(party_id=yid) \
-                                                                    .all(),
-                                            position__in=Position.objects \
-                                                                    .values('id')
-                                                                    .filter(zone_ct=zone_ct) \
-                                                                    .all(),
-                                        ).all().count()
-        # find the leading party
-        if max_votes <= seats:
-            max_votes = seats
-            max_votes_party = p
-            total_sheets['valid']['seats'] += seats
-
-        total_votes = safe_get(party, 'total_votes', default=0)
-        total_valid_votes = safe_get(party, 'total_valid_votes', default=0)
-        total_invalid_votes = safe_get(party, 'total_invalid_votes', default=0)
-        total_votes_ec = safe_get(party, 'total_votes_ec', default=0)
-        total_ec_variance = safe_get(party, 'total_ec_variance', default=0)
-        sub_zone_total_votes_ec = safe_get(party, 'sub_zone_total_votes_ec', default=0)
-        sub_zone_total_ec_variance = safe_get(party, 'sub_zone_total_ec_variance', default=0)
-        report_sheet = dict(
-            party_id=party['id'],
-            party_code=party['code'],
-            party_title=party['title'],
-            lead=0,
-            seats=seats,
-            total_votes=total_votes,
-            total_votes_ec=total_votes_ec,
-            total_valid_votes=total_valid_votes,
-            total_ec_variance=total_ec_variance,
-            total_invalid_votes=total_invalid_votes,
-            sub_zone_total_votes_ec=sub_zone_total_votes_ec,
-            sub_zone_total_ec_variance=sub_zone_total_ec_variance,
-        )
-        # set the total votes and ec
-        total_sheets['total']['total_votes_ec'] += total_votes_ec
-        total_sheets['total']['total_votes'] += total_votes
-        total_sheets['valid']['total_votes_ec'] += total_votes_ec
-        total_sheets['valid']['total_votes'] += total_votes
-        total_sheets['valid']['total_valid_votes'] += total_valid_votes
-        total_sheets['valid']['total_ec_variance'] += total_ec_variance
-        total_sheets['invalid']['total_votes_ec'] += 0
-        total_sheets['invalid']['total_votes'] += 0
-
-        reports.append(report_sheet)
-        p += 1
-    # set the leading party
-    if max_votes_party is not None:
-        reports[max_votes_party]['lead'] = 1
-
-    totals_row = [
-                    total_sheets['valid'],
-                    total_sheets['invalid'],
-                    total_sheets['total']
-                ]
-    total_votes = totals_row[0]['total_votes']
-    if total_votes > 0:
-        for report in reports:
-            report['percentage'] = round(100 * report['total_votes'] / total_votes, 20)
+    return render_report(request, 'parliamentary', 'station', spk)
 
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        totals_row=totals_row,
-        seats=seats,
-        zone=zone,
-        rid=rid,
-        office_type=office_type,
-        zone_type=zone_type,
-        sub_zone_type=sub_zone_type,
-        sub_zone_type_plural=sub_zone_type_plural,
-        super_zone=super_zone,
-        super_zone_link=super_zone_link,
-        sub_zone_link=sub_zone_link,
-    )
-    return render(request, template, context)
 
 
+# RAW REPORT PAGES
+# The per-office report templates, rendered uncached from the report rows
+# through the prepared statements of __report/statements.py. A row's votes
+# per sub-zone are read by the templates under the column key or as
+# votes_<sub-zone title>.
 
-@login_required
-def nation_presidential_report_raw(request):
-    template = f'report/presidential/nation_report.html'
-    report_title = f'Presidential Collation Results (National)'
-    level = GeoLevelChoices.NATIONAL
-    nation = Nation.objects.first()
-    nation_id = 0
-    if nation is not None:
-        nation = nation.pk
-    key_field = 'title'
-    
-    zone_ct = get_zone_ct(Nation)
-    zone_ct_id = ""
-    if zone_ct is not None:
-        zone_ct_id = zone_ct.pk
+RawReportRow = get_row_type('RawReportRow', ('party_id', 'party_code', 'candidates', 'candidate_name',
+                                             'votes', 'total_valid_votes', 'seats', 'lead', 'max_votes', 'cells'))
 
-    positions = Position.objects.filter(zone_ct=zone_ct).all()
-    candidates = Candidate.objects \
-                            .filter(
-                                position__in=positions
-                            ).all()
 
-    position_ids = ''
-    for p in positions:
-        position_ids += ',' if len(position_ids) > 0 else ''
-        position_ids += f'{p.id}'
-
-    columns = Region.objects.values('id', 'title') \
-                    .annotate(key=Replace(
-                                    Func(F(key_field), function='LOWER'),
-                                    Value(' '),
-                                    Value('_')
-                                )) \
-                    .order_by('title').all()
-    cursor = connection.cursor()
-
-    sums = ''
-    sum_joins = ''
-    table = 'poll_national_collation_sheet'
-    summary_table = 'poll_presidential_summary_sheet'
-    fields = [
-        'party_id', 'party_code', 'candidates', 'votes', 'seats',
-    ]
-
-    imax = 'max'
-    max_query = f'''SELECT MAX(sums.votes) FROM (
-        SELECT
-            SUM(ncs{imax}.total_votes) AS votes
-        FROM {table} ncs{imax}
-            LEFT JOIN poll_party p{imax} ON p{imax}.id = ncs{imax}.party_id
-            LEFT JOIN geo_region r{imax} ON r{imax}.id = ncs{imax}.region_id
-            LEFT JOIN geo_nation n{imax} ON n{imax}.id = r{imax}.nation_id
-        WHERE
-            ncs{imax}.zone_ct_id = {zone_ct_id}
-            AND n{imax}.id = {nation_id}
-        GROUP BY p{imax}.id
-        ) AS sums'''
-    max_votes = 0
-    try:
-        cursor.execute(max_query)
-        rows = cursor.fetchall()
-        max_votes = max(rows)[0]
-    except Exception as e:
-        print("There was an error running raw query", e)
-    if max_votes is None:
-        max_votes = 0
+def get_raw_report_position_ids(office_type, zone):
+    '''Positions whose candidates are listed against their party'''
+    if office_type == 'presidential':
+        positions = Position.objects.filter(zone_ct=get_zone_ct(Nation))
+    elif isinstance(zone, (Constituency, Station)):
+        constituency_id = zone.pk if isinstance(zone, Constituency) else zone.constituency_id
+        positions = Position.objects.filter(zone_ct=get_zone_ct(Constituency), zone_id=constituency_id)
+    else:
+        return []
+    return list(positions.values_list('pk', flat=True))
 
-    totals_row = dict(
-                    valid={},
-                    invalid={},
-                    total={},
-                )
 
-    i = 0
+def get_raw_report_seats(plan, zone):
+    '''Seats declared inside the zone, by party id'''
+    seats = dict()
+    for row in execute_statement('raw_report_seats', level=plan['level'], zone_id=zone.pk):
+        seats.setdefault(row.party_id, []).append(row)
+    return seats
+
+
+def get_raw_report_totals_row(zone_ct_id, zone_type, columns):
+    '''Valid, invalid and total votes of every sub-zone column'''
+    totals_row = dict(valid={}, invalid={}, total={})
+    sub_zone_level = REPORT_LEVELS[REPORT_PAGES[zone_type]['sub_zone_type']]['level']
+    zone_totals = {row.zone_id: row for row in execute_statement('raw_report_zone_totals',
+                                                                 zone_ct_id=zone_ct_id,
+                                                                 level=sub_zone_level,
+                                                                 zone_ids=[column['id'] for column in columns])}
     for column in columns:
-        column_label = column['title']
-        column_value = column['id']
-        key = f'votes_{snakeify(column_label)}'
-        sums += f' SUM(ncs{i}.total_votes) AS {key},'
-        sum_joins += f''' LEFT JOIN (
-                    SELECT
-                            ncs{i}.id,
-                            ncs{i}.total_votes
-                        FROM {table} ncs{i}
-                            LEFT JOIN poll_party p{i} ON p{i}.id = ncs{i}.party_id
-                            LEFT JOIN geo_region r{i} ON r{i}.id = ncs{i}.region_id
-                        WHERE
-                            ncs{i}.zone_ct_id = {zone_ct_id}
-                            AND ncs{i}.region_id = {column_value}
-                        GROUP BY ncs{i}.id, ncs{i}.total_votes
-                        ORDER BY ncs{i}.id ASC
-                ) AS ncs{i} ON ncs{i}.id = ncs.id
-        '''
-        fields.append(key)
-
-        total_valid = NationalCollationSheet.objects \
-                                .values('total_votes') \
-                                .filter(
-                                    region_id=column_value,
-                                    zone_ct=zone_ct,
-                                ) \
-                                .aggregate(Sum('total_votes'))['total_votes__sum']
-
-        stations = Station.objects \
-                            .values('id') \
-                            .filter(constituency__in=Constituency.objects
-                                                                .values('id')
-                                                                .filter(region_id=column_value)
-                                                                .all()) \
-                            .all()
-        total_invalid = ResultSheet.objects \
-                    .values('total_invalid_votes') \
-                    .filter(
-                        position__in=positions,
-                        station__in=stations
-                    ).aggregate(Sum('total_invalid_votes'))['total_invalid_votes__sum']
-        
-        total_invalid = total_invalid or 0
-        total_valid = total_valid or 0
-        total = total_valid + total_invalid
-        total_key = snakeify(column_label)
-        totals_row['invalid'][total_key] = total_invalid
-        totals_row['valid'][total_key] = total_valid
-        totals_row['total'][total_key] = total
-        i += 1
-
-    query = f'''SELECT
-        p.id, p.code,
-        STRING_AGG(
-            DISTINCT(CONCAT(ca.prefix, ' ', ca.first_name, ' ', ca.last_name)), ', '
-        ) AS candidates,
-        SUM(ncs.total_votes) votes,
-        (CASE WHEN (SUM(ncs.total_votes) = {max_votes} AND SUM(ncs.total_votes) > 0) THEN 1 ELSE 0 END) AS seats,
-        {sums}
-        '|' AS row_end
-    FROM {table} ncs
-        LEFT JOIN poll_party p ON p.id = ncs.party_id
-        LEFT JOIN geo_region r ON r.id = ncs.region_id
-
-        LEFT JOIN people_candidate ca ON
-            ca.party_id = ncs.party_id
-            AND ca.position_id IN ({position_ids})
-
-        -- LEFT JOIN {summary_table} summ ON
-            -- summ.constituency_id IN (
-                -- SELECT c.id
-                    -- FROM geo_constituency c
-                    -- WHERE c.region_id = r.id
-            -- )
-            -- AND summ.candidate_id IN (
-                -- SELECT ca.id
-                    -- FROM people_candidate ca
-                    -- WHERE ca.party_id = p.id
-            -- )
-
-        {sum_joins}
-    WHERE
-        ncs.zone_ct_id = {zone_ct_id}
-    GROUP BY p.id
-    ORDER BY p.code ASC;'''
-
-    reports = []
+        key = snakeify(column['title'])
+        row = zone_totals.get(column['id'])
+        totals_row['valid'][key] = row.valid_votes if row is not None else 0
+        totals_row['invalid'][key] = row.invalid_votes if row is not None else 0
+        totals_row['total'][key] = totals_row['valid'][key] + totals_row['invalid'][key]
+    return totals_row
+
+
+def render_raw_report(request, office_type, zone_type, zone_id=None):
+    plan = REPORT_LEVELS[zone_type]
+    page = REPORT_PAGES[zone_type]
+    zone_ct_id = get_zone_ct_id(REPORT_OFFICE_TYPES[office_type])
+    zone = get_report_zone(plan, zone_id)
+    columns = list(get_report_columns(plan, zone)) if zone is not None else []
+    # seats are declared per constituency, a station page shows its lead instead
+    with_seats = office_type == 'parliamentary' and zone_type != 'station'
+
+    rows = []
+    seats = None
+    totals_row = None
     try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            reports.append(dict(zip(fields, row)))
+        if zone is not None:
+            rows = execute_statement('raw_report_rows',
+                                     zone_ct_id=zone_ct_id,
+                                     level=plan['level'],
+                                     zone_id=zone.pk,
+                                     position_ids=get_raw_report_position_ids(office_type, zone))
+            if with_seats:
+                seats = get_raw_report_seats(plan, zone)
+            if office_type == 'presidential' and zone_type == 'nation':
+                totals_row = get_raw_report_totals_row(zone_ct_id, zone_type, columns)
     except Exception as e:
         print("There was an error running raw query", e)
 
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        zone=nation,
-        totals_row=totals_row,
-        zone_type='nation',
-        sub_zone_type='region',
-        sub_zone_type_plural='regions',
-        super_zone=None,
-        super_zone_link='#',
-        sub_zone_link='/reports/presidential/region/',
-    )   
-    return render(request, template, context)
-
-@login_required
-def region_presidential_report_raw(request, rpk=None):
-    template = f'report/presidential/region_report.html'
-    report_title = f'Regional Presidential Collation Results'
-    level = GeoLevelChoices.NATIONAL
-    zone_ct = get_zone_ct(Nation)
-    zone_ct_id = ""
-    if zone_ct is not None:
-        zone_ct_id = zone_ct.pk
-    region = Region.objects.filter(pk=rpk).first()
-    columns = Constituency.objects.filter(region=region).order_by('title').all()
-    cursor = connection.cursor()
-
-    position_ids = ''
-    for p in Position.objects.filter(zone_ct=zone_ct).all():
-        position_ids += ',' if len(position_ids) > 0 else ''
-        position_ids += f'{p.id}'
-
-    sums = ''
-    sum_joins = ''
-    table = 'poll_regional_collation_sheet'
-    summary_table = 'poll_presidential_summary_sheet'
-    fields = [
-        'party_id', 'party_code',
-        'candidates',
-        'votes', 'seats',
-    ]
-
-    imax = 'max'
-    max_query = f'''SELECT
-            SUM(ncs{imax}.total_votes) sum_votes
-        FROM {table} ncs{imax}
-            LEFT JOIN poll_party p{imax} ON p{imax}.id = ncs{imax}.party_id
-            LEFT JOIN geo_constituency c{imax} ON c{imax}.id = ncs{imax}.constituency_id
-            LEFT JOIN geo_region r{imax} ON r{imax}.id = c{imax}.region_id
-        WHERE
-            ncs{imax}.zone_ct_id = {zone_ct_id}
-            AND r{imax}.id = {rpk}
-        GROUP BY p{imax}.id'''
-    max_votes = 0
-    try:
-        cursor.execute(max_query)
-        rows = cursor.fetchall()
-        max_votes = max(rows)[0]
-    except Exception as e:
-        print("There was an error running raw query", e)
-    if max_votes is None:
-        max_votes = 0
-
-    i = 0
     for column in columns:
-        key = f'votes_{snakeify(column.title)}'
-        sums += f' SUM(ncs{i}.total_votes) AS {key},'
-        sum_joins += f''' LEFT JOIN (
-                    SELECT
-                            ncs{i}.id,
-                            ncs{i}.total_votes
-                        FROM {table} ncs{i}
-                            LEFT JOIN poll_party p{i} ON p{i}.id = ncs{i}.party_id
-                            LEFT JOIN geo_constituency c{i} ON c{i}.id = ncs{i}.constituency_id
-                            LEFT JOIN geo_region r{i} ON r{i}.id = c{i}.region_id
-                        WHERE
-                            ncs{i}.zone_ct_id = {zone_ct_id}
-                            AND ncs{i}.constituency_id = {column.pk}
-                            AND r{i}.id = {rpk}
-                        GROUP BY ncs{i}.id, ncs{i}.total_votes
-                        ORDER BY ncs{i}.id ASC
-                ) AS ncs{i} ON ncs{i}.id = ncs.id
-        '''
-        fields.append(key)
-        i += 1
-
-    query = f'''SELECT
-            p.id, p.code,
-            STRING_AGG(
-                DISTINCT(CONCAT(ca.prefix, ' ', ca.first_name, ' ', ca.last_name)), ', '
-            ) AS candidates,
-            SUM(ncs.total_votes) votes,
-            (CASE WHEN (SUM(ncs.total_votes) = {max_votes} AND SUM(ncs.total_votes) > 0) THEN 1 ELSE 0 END) AS seats,
-            {sums}
-            '|' AS row_end
-        FROM {table} ncs
-
-            LEFT JOIN poll_party p ON p.id = ncs.party_id
-            LEFT JOIN geo_constituency c ON c.id = ncs.constituency_id
-            LEFT JOIN geo_region r ON r.id = c.region_id
-
-            -- LEFT JOIN {summary_table} summ ON
-                -- summ.constituency_id = c.id
-                -- AND summ.constituency_id = ncs.constituency_id
-                -- AND summ.candidate_id IN (
-                    -- SELECT ca.id
-                    -- FROM people_candidate ca
-                    -- WHERE ca.party_id = p.id
-                -- )
-
-            LEFT JOIN people_candidate ca ON
-                ca.party_id = p.id
-                AND ca.position_id IN ({position_ids})
-
-            {sum_joins}
-        WHERE
-            ncs.zone_ct_id = {zone_ct_id}
-            AND r.id = {rpk}
-        GROUP BY p.id
-        ORDER BY p.code ASC;'''
-
+        column['pk'] = column['id']
+    max_votes = max([row.votes for row in rows], default=0)
     reports = []
-    try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            reports.append(dict(zip(fields, row)))
-    except Exception as e:
-        print("There was an error running raw query", e)
-
+    for row in rows:
+        cells = get_cells(row.cells)
+        report_cells = dict()
+        for column in columns:
+            votes = cells.get(str(column['id']), 0)
+            report_cells[column['key']] = votes
+            report_cells[f'votes_{snakeify(column["title"])}'] = votes
+            if votes > 0:
+                column['has_votes'] = 1
+        lead = int(row.votes == max_votes and row.votes > 0)
+        reports.append(RawReportRow(
+            party_id=row.party_id,
+            party_code=row.party_code,
+            candidates=row.candidates,
+            candidate_name=row.candidates,
+            votes=row.votes,
+            total_valid_votes=row.votes,
+            seats=row.seats if with_seats else lead,
+            lead=lead,
+            max_votes=max_votes,
+            cells=report_cells,
+        ))
+
+    super_zone = None
+    if zone is not None and plan['super_zone_field'] is not None:
+        super_zone = getattr(zone, plan['super_zone_field'])
+    sub_zone_type = page['sub_zone_type']
+    super_zone_type = page['super_zone_type']
     context = dict(
-        title=report_title,
-        level=level,
+        title=f'{page["title"]} {office_type.title()} Collation Results',
+        level=GeoLevelChoices.CONSTITUENCY if office_type == 'parliamentary' else GeoLevelChoices.NATIONAL,
         columns=columns,
         reports=reports,
-        zone=region,
-        zone_type='region',
-        sub_zone_type='constituency',
-        sub_zone_type_plural='constituencies',
-        super_zone=region.nation,
-        super_zone_link='/reports/presidential/nation/',
-        sub_zone_link='/reports/presidential/constituency/',
-    )    
-    return render(request, template, context)
+        zone=zone,
+        zone_type=zone_type,
+        sub_zone_type=sub_zone_type,
+        sub_zone_type_plural=page['sub_zone_type_plural'],
+        super_zone=super_zone,
+        super_zone_link=f'/reports/{office_type}/{super_zone_type}/' if super_zone_type is not None else '#',
+        sub_zone_link=f'/reports/{office_type}/{sub_zone_type}/' if sub_zone_type is not None else '#',
+    )
+    if seats is not None:
+        context['seats'] = seats
+    if totals_row is not None:
+        context['totals_row'] = totals_row
+    return render(request, f'report/{office_type}/{zone_type}_report.html', context)
 
 @login_required
-def constituency_presidential_report_raw(request, cpk=None):
-    '''
-    '''
-
-    template = f'report/presidential/constituency_report.html'
-    report_title = f'Constituency Presidential Collation Results'
-    level = GeoLevelChoices.NATIONAL
-    zone_ct = get_zone_ct(Nation)
-    zone_ct_id = ""
-    if zone_ct is not None:
-        zone_ct_id = zone_ct.pk
-    constituency = Constituency.objects.filter(pk=cpk).first()
-    columns = Station.objects.filter(constituency=constituency).order_by('code').all()
-    cursor = connection.cursor()
-
-    position_ids = ''
-    for p in Position.objects.filter(zone_ct=zone_ct).all():
-        position_ids += ',' if len(position_ids) > 0 else ''
-        position_ids += f'{p.id}'
-
-    sums = ''
-    sum_joins = ''
-    table = 'poll_constituency_collation_sheet'
-    summary_table = 'poll_presidential_summary_sheet'
-    fields = [
-        'party_id', 'party_code', 'candidates', 'votes', 'seats', 'max_votes'
-    ]
-
-
-    imax = 'max'
-    max_query = f'''SELECT
-            SUM(ncs{imax}.total_votes) sum_votes
-        FROM {table} ncs{imax}
-            LEFT JOIN poll_party p{imax} ON p{imax}.id = ncs{imax}.party_id
-            LEFT JOIN geo_station s{imax} ON s{imax}.id = ncs{imax}.station_id
-            LEFT JOIN geo_constituency c{imax} ON c{imax}.id = s{imax}.constituency_id
-            -- LEFT JOIN geo_region r ON r{imax}.id = c{imax}.region_id
-        WHERE
-            ncs{imax}.zone_ct_id = {zone_ct_id}
-            AND c{imax}.id = {cpk}
-        GROUP BY p{imax}.id'''
-    max_votes = 0
-    try:
-        cursor.execute(max_query)
-        rows = cursor.fetchall()
-        max_votes = max(rows)[0]
-    except Exception as e:
-        print("There was an error running raw query", e)
-    if max_votes is None:
-        max_votes = 0
-
-
-    i = 0
-    for column in columns:
-        key = f'votes_{snakeify(column.title)}'
-        sums += f' SUM(ncs{i}.total_votes) AS {key},'
-        sum_joins += f''' LEFT JOIN (
-                    SELECT
-                            ncs{i}.id,
-                            ncs{i}.total_votes
-                        FROM {table} ncs{i}
-                            LEFT JOIN poll_party p{i} ON p{i}.id = ncs{i}.party_id
-                            LEFT JOIN geo_station s{i} ON s{i}.id = ncs{i}.station_id
-                            LEFT JOIN geo_constituency c{i} ON c{i}.id = s{i}.constituency_id
-                            LEFT JOIN geo_region r{i} ON r{i}.id = c{i}.region_id
-                        WHERE
-                            ncs{i}.zone_ct_id = {zone_ct_id}
-                            AND ncs{i}.station_id = {column.pk}
-                            AND c{i}.id = {cpk}
-                        GROUP BY ncs{i}.id, ncs{i}.total_votes
-                        ORDER BY ncs{i}.id ASC
-                ) AS ncs{i} ON ncs{i}.id = ncs.id
-        '''
-        fields.append(key)
-        i += 1
-
-    query = f'''SELECT
-        p.id, p.code,
-        STRING_AGG(
-            DISTINCT(CONCAT(ca.prefix, ' ', ca.first_name, ' ', ca.last_name)), ', '
-        ) AS candidates,
-        SUM(ncs.total_votes) votes,
-        (CASE WHEN (SUM(ncs.total_votes) = {max_votes} AND SUM(ncs.total_votes) > 0) THEN 1 ELSE 0 END) AS seats,
-        {max_votes} AS seats,
-        {sums}
-        '|' AS row_end
-    FROM {table} ncs
-        LEFT JOIN poll_party p ON p.id = ncs.party_id
-        LEFT JOIN geo_station s ON s.id = ncs.station_id
-        LEFT JOIN geo_constituency c ON c.id = s.constituency_id
-        LEFT JOIN geo_region r ON r.id = c.region_id
-        LEFT JOIN people_candidate ca ON
-            ca.party_id = p.id
-            AND ca.position_id IN ({position_ids})
-        {sum_joins}
-    WHERE
-        ncs.zone_ct_id = {zone_ct_id}
-        AND c.id = {cpk}
-    GROUP BY p.id
-    ORDER BY p.code ASC;'''
+def nation_presidential_report_raw(request):
+    return render_raw_report(request, 'presidential', 'nation')
 
-    reports = []
-    try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            reports.append(dict(zip(fields, row)))
-    except Exception as e:
-        print("There was an error running raw query", e)
+@login_required
+def region_presidential_report_raw(request, rpk=None):
+    return render_raw_report(request, 'presidential', 'region', rpk)
 
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        zone=constituency,
-        zone_type='constituency',
-        sub_zone_type='station',
-        sub_zone_type_plural='stations',
-        super_zone=constituency.region,
-        super_zone_link='/reports/presidential/region/',
-        sub_zone_link='/reports/presidential/station/',
-    )
-    return render(request, template, context)
+@login_required
+def constituency_presidential_report_raw(request, cpk=None):
+    return render_raw_report(request, 'presidential', 'constituency', cpk)
 
 @login_required
 def station_presidential_report_raw(request, spk=None):
-    template = f'report/presidential/station_report.html'
-    report_title = f'Station Presidential Collation Results'
-    level = GeoLevelChoices.NATIONAL
-    zone_ct = get_zone_ct(Nation)
-    zone_ct_id = ""
-    if zone_ct is not None:
-        zone_ct_id = zone_ct.pk
-    station = Station.objects.filter(pk=spk).first()
-    columns = [] # Station.objects.filter(constituency=constituency).order_by('code').all()
-
-    sums = ''
-    sum_joins = ''
-    table = 'poll_station_collation_sheet'
-    fields = [
-        'party_id', 'party_code', 'candidate_name', 'votes', 'seats', 'max_votes',
-    ]
-    
-    select_candidate_name = " CONCAT(ca.prefix, ' ', ca.first_name, ' ', ca.last_name) candidate_name,"
-    group_candidate_name = ', ca.prefix, ca.first_name, ca.last_name'
-
-    query = f'''SELECT
-        p.id, p.code,
-        {select_candidate_name}
-        ncs.total_votes AS votes,
-        (CASE WHEN (ncs.total_votes = MAX(summ_max.total_votes) AND ncs.total_votes > 0) THEN 1 ELSE 0 END) seats,
-        -- MAX(summ_max.total_votes) AS max_votes,
-        MAX(ncs.total_votes) AS max_votes,
-        {sums}
-        '|' AS row_end
-    FROM {table} ncs
-        LEFT JOIN people_candidate ca ON ca.id = ncs.candidate_id
-        LEFT JOIN poll_party p ON p.id = ca.party_id
-        LEFT JOIN geo_station s ON s.id = ncs.station_id
-        LEFT JOIN geo_constituency c ON c.id = s.constituency_id
-        LEFT JOIN geo_region r ON r.id = c.region_id
-        {sum_joins}
-        LEFT JOIN {table} summ_max ON summ_max.station_id = ncs.station_id
-    WHERE
-        ncs.zone_ct_id = {zone_ct_id}
-        AND s.id = {spk}
-    GROUP BY p.id
-        , ncs.total_votes
-        {group_candidate_name}
-    ORDER BY p.code ASC;'''
-
-    reports = []
-    cursor = connection.cursor()
-    try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            reports.append(dict(zip(fields, row)))
-    except Exception as e:
-        print("There was an error running raw query", e)
-
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        zone=station,
-        zone_type='station',
-        sub_zone_type=None,
-        super_zone=station.constituency,
-        super_zone_link='/reports/presidential/constituency/',
-        sub_zone_link='#',
-    )
-    return render(request, template, context)
-
+    return render_raw_report(request, 'presidential', 'station', spk)
 
 @login_required
 def nation_parliamentary_report_raw(request):
-    template = f'report/parliamentary/nation_report.html'
-    report_title = f'National Parliamentary Collation Results'
-    level = GeoLevelChoices.CONSTITUENCY
-    nation = Nation.objects.first()
-    zone_ct = get_zone_ct(Constituency)
-    zone_ct_id = ""
-    if zone_ct is not None:
-        zone_ct_id = zone_ct.pk
-    columns = Region.objects.order_by('title').all()
-    cursor = connection.cursor()
-
-    sums = ''
-    sum_joins = ''
-    table = 'poll_national_collation_sheet'
-    summary_table = 'poll_parliamentary_summary_sheet'
-    fields = [
-        'party_id', 'party_code', 'votes', 'seats',
-    ]
-
-
-    npk = 1
-    iseat = 'seat'
-    # party_id is this position in the select field array (below)
-    party_pos = 2
-    seat_fields = [
-        'constituency_id', 'constituency',
-        'party_id', 'party_code', 'party_title',
-        'candidate_id', 'candidates',
-        'votes', 'seats',
-    ]
-    seats = dict()
-    seats_query = f'''SELECT
-                c{iseat}.id AS constituency_id,
-                c{iseat}.title,
-                pa{iseat}.id,
-                pa{iseat}.code,
-                pa{iseat}.title,
-                ca{iseat}.id AS candidate_id,
-                STRING_AGG(CONCAT(ca{iseat}.prefix, ' ', ca{iseat}.first_name, ' ', ca{iseat}.last_name), ', ') AS candidates{iseat},
-                SUM(ssheet{iseat}.votes) AS votes,
-                COUNT(ssheet{iseat}.id) AS seats
-            FROM
-                geo_constituency c{iseat}
-                LEFT JOIN geo_region r{iseat} ON r{iseat}.id = c{iseat}.region_id
-                LEFT JOIN geo_nation n{iseat} ON n{iseat}.id = r{iseat}.nation_id
-                LEFT JOIN poll_parliamentary_summary_sheet ssheet{iseat} ON ssheet{iseat}.constituency_id = c{iseat}.id
-                LEFT JOIN people_candidate ca{iseat} ON ca{iseat}.id = ssheet{iseat}.candidate_id
-                LEFT JOIN poll_party pa{iseat} ON pa{iseat}.id = ca{iseat}.party_id
-            WHERE
-                r{iseat}.nation_id = {npk}
-            GROUP BY c{iseat}.id, ca{iseat}.id, pa{iseat}.id, pa{iseat}.code, pa{iseat}.title
-            ORDER BY candidates{iseat} DESC'''
-
-    try:
-        cursor.execute(seats_query)
-        rows = cursor.fetchall()
-        for row in rows:
-            party_seats = seats.get(row[party_pos], [])
-            party_seats.append(dict(zip(seat_fields, row)))
-            seats[row[party_pos]] = party_seats
-    except Exception as e:
-        print("There was an error running raw query", e)
-
-
-
-    i = 0
-    for column in columns:
-        key = f'votes_{snakeify(column.title)}'
-        sums += f' SUM(ncs{i}.total_votes) AS {key},'
-        sum_joins += f''' LEFT JOIN (
-                    SELECT
-                            ncs{i}.id,
-                            ncs{i}.total_votes
-                        FROM {table} ncs{i}
-                            LEFT JOIN poll_party p{i} ON p{i}.id = ncs{i}.party_id
-                            LEFT JOIN geo_region r{i} ON r{i}.id = ncs{i}.region_id
-                        WHERE
-                            ncs{i}.zone_ct_id = {zone_ct_id}
-                            AND ncs{i}.region_id = {column.pk}
-                        GROUP BY ncs{i}.id, ncs{i}.total_votes
-                        ORDER BY ncs{i}.id ASC
-                ) AS ncs{i} ON ncs{i}.id = ncs.id
-        '''
-        fields.append(key)
-        i += 1
-
-    query = f'''SELECT
-        p.id, p.code,
-        SUM(ncs.total_votes) votes,
-        COUNT(summ.id) seats,
-        {sums}
-        '|' AS row_end
-    FROM {table} ncs
-        LEFT JOIN poll_party p ON p.id = ncs.party_id
-        LEFT JOIN geo_region r ON r.id = ncs.region_id
-
-        LEFT JOIN {summary_table} summ ON
-            summ.constituency_id IN (
-                SELECT c.id
-                    FROM geo_constituency c
-                    WHERE c.region_id = r.id
-            )
-            AND summ.candidate_id IN (
-                SELECT ca.id
-                    FROM people_candidate ca
-                    WHERE ca.party_id = p.id
-            )
-
-        {sum_joins}
-    WHERE
-        ncs.zone_ct_id = {zone_ct_id}
-    GROUP BY p.id
-    ORDER BY p.code ASC;'''
-
-    reports = []
-    try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            reports.append(dict(zip(fields, row)))
-    except Exception as e:
-        print("There was an error running raw query", e)
-
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        seats=seats,
-        zone=nation,
-        zone_type='nation',
-        sub_zone_type='region',
-        sub_zone_type_plural='regions',
-        super_zone=None,
-        super_zone_link='#',
-        sub_zone_link='/reports/parliamentary/region/',
-    )
-    return render(request, template, context)
+    return render_raw_report(request, 'parliamentary', 'nation')
 
 @login_required
 def region_parliamentary_report_raw(request, rpk=None):
-    template = f'report/parliamentary/region_report.html'
-    report_title = f'Regional Parliamentary Collation Results'
-    level = GeoLevelChoices.CONSTITUENCY
-    zone_ct = get_zone_ct(Constituency)
-    zone_ct_id = ""
-    if zone_ct is not None:
-        zone_ct_id = zone_ct.pk
-    region = Region.objects.filter(pk=rpk).first()
-    columns = Constituency.objects.filter(region=region).order_by('title').all()
-    cursor = connection.cursor()
-
-    sums = ''
-    sum_joins = ''
-    table = 'poll_regional_collation_sheet'
-    summary_table = 'poll_parliamentary_summary_sheet'
-    fields = [
-        'party_id', 'party_code', 'votes',
-        'seats',
-    ]
-
-
-    iseat = 'seat'
-    # party_id is this position in the select field array (below)
-    party_pos = 2
-    seat_fields = [
-        'constituency_id', 'constituency',
-        'party_id', 'party_code', 'party_title',
-        'candidate_id', 'candidates',
-        'votes', 'seats',
-    ]
-    seats = dict()
-    seats_query = f'''SELECT
-                c{iseat}.id AS constituency_id,
-                c{iseat}.title,
-                pa{iseat}.id,
-                pa{iseat}.code,
-                pa{iseat}.title,
-                ca{iseat}.id AS candidate_id,
-                STRING_AGG(CONCAT(ca{iseat}.prefix, ' ', ca{iseat}.first_name, ' ', ca{iseat}.last_name), ', ') AS candidates{iseat},
-                SUM(ssheet{iseat}.votes) AS votes,
-                COUNT(ssheet{iseat}.id) AS seats
-            FROM
-                geo_constituency c{iseat}
-                LEFT JOIN geo_region r{iseat} ON r{iseat}.id = c{iseat}.region_id
-                LEFT JOIN poll_parliamentary_summary_sheet ssheet{iseat} ON ssheet{iseat}.constituency_id = c{iseat}.id
-                LEFT JOIN people_candidate ca{iseat} ON ca{iseat}.id = ssheet{iseat}.candidate_id
-                LEFT JOIN poll_party pa{iseat} ON pa{iseat}.id = ca{iseat}.party_id
-            WHERE
-                r{iseat}.id = {rpk}
-            GROUP BY c{iseat}.id, ca{iseat}.id, pa{iseat}.id, pa{iseat}.code, pa{iseat}.title
-            ORDER BY candidates{iseat} DESC'''
-
-    try:
-        cursor.execute(seats_query)
-        rows = cursor.fetchall()
-        for row in rows:
-            party_seats = seats.get(row[party_pos], [])
-            party_seats.append(dict(zip(seat_fields, row)))
-            seats[row[party_pos]] = party_seats
-    except Exception as e:
-        print("There was an error running raw query", e)
-
-
-    i = 0
-    for column in columns:
-        key = f'votes_{snakeify(column.title)}'
-        sums += f' SUM(ncs{i}.total_votes) AS {key},'
-        sum_joins += f''' LEFT JOIN (
-                    SELECT
-                            ncs{i}.id,
-                            ncs{i}.total_votes
-                        FROM {table} ncs{i}
-                            LEFT JOIN poll_party p{i} ON p{i}.id = ncs{i}.party_id
-                            LEFT JOIN geo_constituency c{i} ON c{i}.id = ncs{i}.constituency_id
-                            LEFT JOIN geo_region r{i} ON r{i}.id = c{i}.region_id
-                        WHERE
-                            ncs{i}.zone_ct_id = {zone_ct_id}
-                            AND ncs{i}.constituency_id = {column.pk}
-                            AND r{i}.id = {rpk}
-                        GROUP BY ncs{i}.id, ncs{i}.total_votes
-                        ORDER BY ncs{i}.id ASC
-                ) AS ncs{i} ON ncs{i}.id = ncs.id
-        '''
-        fields.append(key)
-        i += 1
-
-    query = f'''SELECT
-            p.id, p.code,
-            SUM(ncs.total_votes) votes,
-            COUNT(summ.id) seats,
-            {sums}
-            '|' AS row_end
-        FROM {table} ncs
-
-            LEFT JOIN poll_party p ON p.id = ncs.party_id
-            LEFT JOIN geo_constituency c ON c.id = ncs.constituency_id
-            LEFT JOIN geo_region r ON r.id = c.region_id
-
-            LEFT JOIN {summary_table} summ ON
-                summ.constituency_id = c.id
-                AND summ.constituency_id = ncs.constituency_id
-                AND summ.candidate_id IN (
-                    SELECT ca.id
-                    FROM people_candidate ca
-                    WHERE ca.party_id = p.id
-                )
-
-            {sum_joins}
-        WHERE
-            ncs.zone_ct_id = {zone_ct_id}
-            AND r.id = {rpk}
-        GROUP BY p.id
-        ORDER BY p.code ASC;'''
-
-    reports = []
-    try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            reports.append(dict(zip(fields, row)))
-    except Exception as e:
-        print("There was an error running raw query", e)
-
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        seats=seats,
-        zone=region,
-        zone_type='region',
-        sub_zone_type='constituency',
-        sub_zone_type_plural='constituencies',
-        super_zone=region.nation,
-        super_zone_link='/reports/parliamentary/nation/',
-        sub_zone_link='/reports/parliamentary/constituency/',
-    )
-    return render(request, template, context)
+    return render_raw_report(request, 'parliamentary', 'region', rpk)
 
 @login_required
 def constituency_parliamentary_report_raw(request, cpk=None):
-    template = f'report/parliamentary/constituency_report.html'
-    report_title = f'Constituency Parliamentary Collation Results'
-    level = GeoLevelChoices.CONSTITUENCY
-    zone_ct = get_zone_ct(Constituency)
-    zone_ct_id = ""
-    if zone_ct is not None:
-        zone_ct_id = zone_ct.pk
-    constituency = Constituency.objects.filter(pk=cpk).first()
-    columns = Station.objects.filter(constituency=constituency).order_by('code').all()
-    cursor = connection.cursor()
-
-    sums = ''
-    sum_joins = ''
-    table = 'poll_constituency_collation_sheet'
-    summary_table = 'poll_parliamentary_summary_sheet'
-    fields = [
-        'party_id', 'party_code', 'votes', 'seats', 'max_votes'
-    ]
-
-
-    iseat = 'seat'
-    # party_id is this position in the select field array (below)
-    party_pos = 2
-    seat_fields = [
-        'constituency_id', 'constituency',
-        'party_id', 'party_code', 'party_title',
-        'candidate_id', 'candidates',
-        'votes', 'seats',
-    ]
-    seats = dict()
-    seats_query = f'''SELECT
-                c{iseat}.id AS constituency_id,
-                c{iseat}.title,
-                pa{iseat}.id,
-                pa{iseat}.code,
-                pa{iseat}.title,
-                ca{iseat}.id AS candidate_id,
-                STRING_AGG(CONCAT(ca{iseat}.prefix, ' ', ca{iseat}.first_name, ' ', ca{iseat}.last_name), ', ') AS candidates{iseat},
-                SUM(ssheet{iseat}.votes) AS votes,
-                COUNT(ssheet{iseat}.id) AS seats
-            FROM
-                geo_constituency c{iseat}
-                LEFT JOIN poll_parliamentary_summary_sheet ssheet{iseat} ON ssheet{iseat}.constituency_id = c{iseat}.id
-                LEFT JOIN people_candidate ca{iseat} ON ca{iseat}.id = ssheet{iseat}.candidate_id
-                LEFT JOIN poll_party pa{iseat} ON pa{iseat}.id = ca{iseat}.party_id
-            WHERE
-                c{iseat}.id = {cpk}
-            GROUP BY c{iseat}.id, ca{iseat}.id, pa{iseat}.id, pa{iseat}.code, pa{iseat}.title
-            ORDER BY candidates{iseat} DESC'''
-    try:
-        cursor.execute(seats_query)
-        rows = cursor.fetchall()
-        for row in rows:
-            party_seats = seats.get(row[party_pos], [])
-            party_seats.append(dict(zip(seat_fields, row)))
-            seats[row[party_pos]] = party_seats
-    except Exception as e:
-        print("There was an error running raw query", e)
-
-    imax = 'max'
-    max_query = f'''SELECT
-            SUM(ncs{imax}.total_votes) sum_votes
-        FROM {table} ncs{imax}
-            LEFT JOIN poll_party p{imax} ON p{imax}.id = ncs{imax}.party_id
-            LEFT JOIN geo_station s{imax} ON s{imax}.id = ncs{imax}.station_id
-            LEFT JOIN geo_constituency c{imax} ON c{imax}.id = s{imax}.constituency_id
-            -- LEFT JOIN geo_region r ON r{imax}.id = c{imax}.region_id
-        WHERE
-            ncs{imax}.zone_ct_id = {zone_ct_id}
-            AND c{imax}.id = {cpk}
-        GROUP BY p{imax}.id'''
-    max_votes = 0
-    try:
-        cursor.execute(max_query)
-        rows = cursor.fetchall()
-        max_votes = max(rows)[0]
-    except Exception as e:
-        print("There was an error running raw query", e)
-
-    i = 0
-    for column in columns:
-        key = f'votes_{snakeify(column.title)}'
-        sums += f' SUM(ncs{i}.total_votes) AS {key},'
-        sum_joins += f''' LEFT JOIN (
-                    SELECT
-                            ncs{i}.id,
-                            ncs{i}.total_votes
-                        FROM {table} ncs{i}
-                            LEFT JOIN poll_party p{i} ON p{i}.id = ncs{i}.party_id
-                            LEFT JOIN geo_station s{i} ON s{i}.id = ncs{i}.station_id
-                            LEFT JOIN geo_constituency c{i} ON c{i}.id = s{i}.constituency_id
-                            LEFT JOIN geo_region r{i} ON r{i}.id = c{i}.region_id
-                        WHERE
-                            ncs{i}.zone_ct_id = {zone_ct_id}
-                            AND ncs{i}.station_id = {column.pk}
-                            AND c{i}.id = {cpk}
-                        GROUP BY ncs{i}.id, ncs{i}.total_votes
-                        ORDER BY ncs{i}.id ASC
-                ) AS ncs{i} ON ncs{i}.id = ncs.id
-        '''
-        fields.append(key)
-        i += 1
-
-    query = f'''SELECT
-        p.id, p.code,
-        SUM(ncs.total_votes) AS votes,
-        (CASE WHEN (SUM(ncs.total_votes) = {max_votes} AND SUM(ncs.total_votes) > 0) THEN 1 ELSE 0 END) seats,
-        -- COUNT(summ.constituency_id) AS max_votes,
-        -- COUNT(summ.seats) AS seats,
-        '{max_votes}' AS max_votes,
-        {sums}
-        '|' AS row_end
-
-        
-    FROM {table} ncs
-        LEFT JOIN poll_party p ON p.id = ncs.party_id
-        LEFT JOIN geo_station s ON s.id = ncs.station_id
-        LEFT JOIN geo_constituency c ON c.id = s.constituency_id
-        LEFT JOIN geo_region r ON r.id = c.region_id
-        -- LEFT JOIN people_candidate ca ON ca.party_id = p.id
-
-
-        LEFT JOIN {summary_table} summ ON
-            summ.constituency_id = {cpk}
-            AND summ.constituency_id = c.id
-            AND summ.constituency_id = s.constituency_id
-            AND summ.candidate_id IN (
-                SELECT ca.id
-                    FROM people_candidate ca
-                    WHERE ca.party_id = p.id
-                        AND ca.party_id = ncs.party_id
-            )
-
-        {sum_joins}
-    WHERE
-        ncs.zone_ct_id = {zone_ct_id}
-        AND c.id = {cpk}
-    GROUP BY p.id
-    ORDER BY p.code ASC;'''
-
-    reports = []
-    try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            reports.append(dict(zip(fields, row)))
-    except Exception as e:
-        print("There was an error running raw query", e)
-
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        seats=seats,
-        zone=constituency,
-        zone_type='constituency',
-        sub_zone_type='station',
-        sub_zone_type_plural='stations',
-        super_zone=constituency.region,
-        super_zone_link='/reports/parliamentary/region/',
-        sub_zone_link='/reports/parliamentary/station/',
-    )
-    return render(request, template, context)
+    return render_raw_report(request, 'parliamentary', 'constituency', cpk)
 
 @login_required
 def station_parliamentary_report_raw(request, spk=None):
-    template = f'report/parliamentary/station_report.html'
-    report_title = f'Station Parliamentary Collation Results'
-    level = GeoLevelChoices.CONSTITUENCY
-    zone_ct = get_zone_ct(Constituency)
-    zone_ct_id = ""
-    if zone_ct is not None:
-        zone_ct_id = zone_ct.pk
-    station = Station.objects.filter(pk=spk).first()
-    columns = [] # Station.objects.filter(constituency=constituency).order_by('code').all()
-    cursor = connection.cursor()
-
-    sums = ''
-    sum_joins = ''
-    table = 'poll_station_collation_sheet'
-    fields = [
-        'party_id', 'party_code',
-        'votes', 'max_votes', 'seats',
-        'candidate_name',
-    ]
-    
-    select_candidate_name = " CONCAT(ca.prefix, ' ', ca.first_name, ' ', ca.last_name) candidate_name,"
-    group_candidate_name = ', ca.prefix, ca.first_name, ca.last_name'
-
-    imax = 'max'
-    max_query = f'''SELECT MAX(sums.votes) FROM (
-        SELECT
-            SUM(ncs{imax}.total_votes) AS votes
-        FROM {table} ncs{imax}
-            LEFT JOIN people_candidate c{imax} ON c{imax}.id = ncs{imax}.candidate_id
-            LEFT JOIN poll_party p{imax} ON p{imax}.id = c{imax}.party_id
-            LEFT JOIN geo_station s{imax} ON s{imax}.id = ncs{imax}.station_id
-        WHERE
-            ncs{imax}.zone_ct_id = {zone_ct_id}
-            AND s{imax}.id = {station.pk}
-        GROUP BY p{imax}.id
-        ) AS sums'''
-    max_votes = 0
-    try:
-        cursor.execute(max_query)
-        rows = cursor.fetchall()
-        max_votes = max(rows)[0]
-    except Exception as e:
-        print("There was an error running raw query", e)
-    if max_votes is None:
-        max_votes = 0
-
-
-    i = 0
-    for column in columns:
-        key = f'votes_{snakeify(column.title)}'
-        sums += f' SUM(ncs{i}.total_votes) AS {key},'
-        sum_joins += f''' LEFT JOIN (
-                    SELECT
-                            ncs{i}.id,
-                            ncs{i}.total_votes
-                        FROM {table} ncs{i}
-                            LEFT JOIN poll_party p{i} ON p{i}.id = ncs{i}.party_id
-                            LEFT JOIN geo_station s{i} ON s{i}.id = ncs{i}.station_id
-                            LEFT JOIN geo_constituency c{i} ON c{i}.id = s{i}.constituency_id
-                            LEFT JOIN geo_region r{i} ON r{i}.id = c{i}.region_id
-                        WHERE
-                            ncs{i}.zone_ct_id = {zone_ct_id}
-                            AND ncs{i}.station_id = {column.pk}
-                            AND c{i}.id = {cpk}
-                        GROUP BY ncs{i}.id, ncs{i}.total_votes
-                        ORDER BY ncs{i}.id ASC
-                ) AS ncs{i} ON ncs{i}.id = ncs.id
-        '''
-        fields.append(key)
-        i += 1
-
-    query = f'''SELECT
-        p.id, p.code,
-        SUM(ncs.total_votes) votes,
-        {max_votes} max_votes,
-        (CASE WHEN (SUM(ncs.total_votes) > 0 AND SUM(ncs.total_votes) = {max_votes}) THEN 1 ELSE 0 END) seats,
-        {select_candidate_name}
-        {sums}
-        '|' AS row_end
-    FROM {table} ncs
-        LEFT JOIN people_candidate ca ON ca.id = ncs.candidate_id
-        LEFT JOIN poll_party p ON p.id = ca.party_id
-        LEFT JOIN geo_station s ON s.id = ncs.station_id
-        LEFT JOIN geo_constituency c ON c.id = s.constituency_id
-        LEFT JOIN geo_region r ON r.id = c.region_id
-        {sum_joins}
-    WHERE
-        ncs.zone_ct_id = {zone_ct_id}
-        AND s.id = {spk}
-    GROUP BY p.id
-        {group_candidate_name}
-    ORDER BY p.code ASC;'''
-
-    reports = []
-    try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        for row in rows:
-            reports.append(dict(zip(fields, row)))
-    except Exception as e:
-        print("There was an error running raw query", e)
-
-    context = dict(
-        title=report_title,
-        level=level,
-        columns=columns,
-        reports=reports,
-        zone=station,
-        zone_type='station',
-        sub_zone_type=None,
-        super_zone=station.constituency,
-        super_zone_link='/reports/parliamentary/constituency/',
-        sub_zone_link='#',
-    )
-    return render(request, template, context)
+    return render_raw_report(request, 'parliamentary', 'station', spk)
 
 
 
@@ -3205,14 +821,13 @@ def bar(request):
     labels = []
     data = []
 
-    queryset = Result.objects \
-                    .values('station__code') \
-                    .annotate(station_votes=Sum('votes')) \
-                    .order_by('-station_votes')
-    for entry in queryset:
-        labels.append(entry['station__code'])
-        data.append(entry['station_votes'])
-    
+    # every station, ranked by the station leaderboard
+    leaders = get_leaderboard(LEADERBOARD_ALL_OFFICES, 'station', limit=None)
+    codes = dict(Station.objects.values_list('pk', 'code'))
+    for station_id, votes in leaders:
+        labels.append(codes.get(station_id))
+        data.append(votes)
+
     return JsonResponse(data={
         'labels': labels,
         'data': data,
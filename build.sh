@@ -5,6 +5,7 @@ set -o errexit  # exit on error
 pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
+python manage.py dedupe_collations
 python manage.py migrate
 python manage.py test
 python manage.py populate
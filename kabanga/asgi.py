@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kabanga.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported once django is set up
+from __report.live import LiveEventsApp
+
+# live collation updates are streamed outside of django's request cycle
+application = LiveEventsApp(django_application)
@@ -154,6 +154,46 @@ RQ_QUEUES = {
 
 # RQ_EXCEPTION_HANDLERS = ['path.to.my.handler']
 
+# collate result saves on an rq queue instead of the request thread, inline
+# when off (or when the queue cannot be reached)
+COLLATION_ASYNC = os.getenv('COLLATION_ASYNC', 'True').lower() in ['1', 'true', 'yes']
+COLLATION_QUEUE = os.getenv('COLLATION_QUEUE', 'high')
+# refresh report rows and bump the collation versions after a change on the
+# collation queue, coalescing the changes made while a refresh is waiting
+REPORT_REFRESH_ASYNC = os.getenv('REPORT_REFRESH_ASYNC', 'True').lower() in ['1', 'true', 'yes']
+# minimum seconds between collation snapshots taken as results trickle in, 0 disables
+COLLATION_SNAPSHOT_INTERVAL = int(os.getenv('COLLATION_SNAPSHOT_INTERVAL', '300'))
+# seconds a cached report page or dashboard payload is kept, they are
+# keyed by collation version so this only bounds non-collation changes
+REPORT_CACHE_TIMEOUT = int(os.getenv('REPORT_CACHE_TIMEOUT', '600'))
+# seconds a cache miss with no previous entry waits for another caller's
+# computation before computing the entry itself
+REPORT_CACHE_WAIT = float(os.getenv('REPORT_CACHE_WAIT', '5'))
+# dashboard panels run concurrently, each on its own database connection,
+# a panel still running after the timeout (seconds) is left blank
+DASHBOARD_PANEL_WORKERS = int(os.getenv('DASHBOARD_PANEL_WORKERS', '4'))
+DASHBOARD_PANEL_TIMEOUT = float(os.getenv('DASHBOARD_PANEL_TIMEOUT', '10'))
+# the raw report queries are prepared once per database session, so they are
+# only planned once per connection; turn off behind a pooler in transaction mode
+RAW_REPORT_PREPARED_STATEMENTS = os.getenv('RAW_REPORT_PREPARED_STATEMENTS', 'True').lower() in ['1', 'true', 'yes']
+# most records (station/position result sheets) accepted by one bulk result submission
+RESULT_INGEST_MAX_RECORDS = int(os.getenv('RESULT_INGEST_MAX_RECORDS', '500'))
+# queue bulk ingests on a redis stream, written by drain_result_stream consumers
+RESULT_INGEST_WRITE_BEHIND = os.getenv('RESULT_INGEST_WRITE_BEHIND', 'False').lower() in ['1', 'true', 'yes']
+RESULT_INGEST_STREAM_BATCH = int(os.getenv('RESULT_INGEST_STREAM_BATCH', '50'))
+RESULT_INGEST_STREAM_CLAIM_IDLE = int(os.getenv('RESULT_INGEST_STREAM_CLAIM_IDLE', '60'))
+# entries delivered this many times without being written are moved to the dead stream
+RESULT_INGEST_STREAM_MAX_DELIVERIES = int(os.getenv('RESULT_INGEST_STREAM_MAX_DELIVERIES', '5'))
+# hash, dedupe and render previews of uploaded result sheets on an rq queue,
+# inline in the request (and the upload's last chunk) when off
+RESULT_SHEET_ASYNC = os.getenv('RESULT_SHEET_ASYNC', 'True').lower() in ['1', 'true', 'yes']
+RESULT_SHEET_QUEUE = os.getenv('RESULT_SHEET_QUEUE', 'low')
+# resumable result sheet uploads, assembled outside MEDIA_ROOT until complete
+RESULT_SHEET_UPLOAD_DIR = os.getenv('RESULT_SHEET_UPLOAD_DIR', os.path.join(BASE_DIR, 'uploads'))
+RESULT_SHEET_UPLOAD_CHUNK_SIZE = int(os.getenv('RESULT_SHEET_UPLOAD_CHUNK_SIZE', str(1024 * 1024)))
+RESULT_SHEET_UPLOAD_MAX_SIZE = int(os.getenv('RESULT_SHEET_UPLOAD_MAX_SIZE', str(50 * 1024 * 1024)))
+RESULT_SHEET_UPLOAD_EXPIRY = int(os.getenv('RESULT_SHEET_UPLOAD_EXPIRY', '48'))
+
 SESSION_ENGINE = 'django.contrib.sessions.backends.db' 
 
 MIDDLEWARE = [
@@ -208,6 +248,8 @@ DATABASES = {
         'USER': POSTGRES_USER,
         'PASSWORD': POSTGRES_PASSWORD,
         'PORT': POSTGRES_PORT,
+        # seconds a connection is kept between requests, with its prepared statements
+        'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', '0')),
     },
     'alt': {
         'ENGINE': 'django.db.backends.sqlite3',